@@ -0,0 +1,528 @@
+﻿# -*- coding: utf-8 -*-
+"""
+HTTP İş API'si - İndirme hattını ağ üzerinden kullanma
+GUI olmadan tek bir makinede çalışır; LAN'daki kullanıcılar ve betikler işleri
+buraya gönderir, hepsi aynı JobManager çalışan havuzunda sırayla yürür.
+
+    python main.py serve --host 0.0.0.0 --port 8765 --workers 4 --token secret
+
+Uç noktalar (JSON):
+    POST   /api/jobs                 {"url" | "urls", "format", "also", "normalize",
+                                      "trim_silence", "split_chapters", "clip"}
+    GET    /api/jobs[?status=...]    iş listesi
+    GET    /api/jobs/<id>            tek iş
+    DELETE /api/jobs/<id>            iptal (POST /api/jobs/<id>/cancel da olur)
+    GET    /api/events?after=N&timeout=25[&job=<id>]   long-poll
+    GET    /api/events/stream?after=N[&job=<id>]       Server-Sent Events
+    GET    /api/history?q=...&limit=50&offset=0        indirme geçmişi / arama
+    GET    /api/health
+
+Dağıtık mod (serve --coordinator, bkz. distributed) - çalışanlar için:
+    POST   /api/worker/lease                 {"worker", "wait"} -> {"job", "lease_seconds"}
+    POST   /api/worker/jobs/<id>/heartbeat   {"worker", "progress", "text"} -> {"cancel"}
+    PUT    /api/worker/jobs/<id>/files/<yol>?worker=...   çıktı dosyası (gövde)
+    POST   /api/worker/jobs/<id>/complete    {"worker", "status", "result", "error", "records"}
+    GET    /api/workers
+Kirası başka çalışana geçmiş işler için 409 döner.
+
+Web uygulaması (cobalt uyumlu, bkz. cobalt_api):
+    GET    /                         index.html (Accept: application/json ise sunucu bilgisi)
+    POST   /                         cobalt isteği -> {"status": "tunnel", "url", "filename"}
+    GET    /tunnel/<id>/<dosya>      üretilen dosya (HTTP Range, HEAD, ETag)
+
+Token verilirse /api/ altındaki her istek, POST / (iş başlatır) ve /tunnel/
+(tünel kimliği video ID'sinden tahmin edilebilir) "Authorization: Bearer <token>"
+(veya ?token=) ister. Web sayfası ?token= ile açılırsa token'ı isteklere ekler;
+tünel adreslerine de eklenir. open_web=True (serve --open-web) web uygulamasını
+token'sız bırakır: LAN'daki herkes iş gönderip dosya indirebilir.
+"""
+import hmac
+import json
+import os
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote, quote
+from cobalt_api import CobaltError, CobaltService
+from distributed import LeaseError
+from bandwidth_utils import get_scheduler
+from retry_utils import get_retry_engine
+from disk_utils import get_disk_guard
+from log_utils import debug_print
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# İstek gövdesi sınırı (URL listesi için fazlasıyla yeterli)
+MAX_BODY_BYTES = 1024 * 1024
+# Long-poll ve SSE bekleme süreleri
+MAX_POLL_TIMEOUT = 60.0
+SSE_KEEPALIVE = 15.0
+
+_JOB_PATH = re.compile(r"^/api/jobs/([0-9a-f]{12})(/cancel)?$")
+_WORKER_JOB_PATH = re.compile(r"^/api/worker/jobs/([0-9a-f]{12})/(heartbeat|complete)$")
+_WORKER_FILE_PATH = re.compile(r"^/api/worker/jobs/([0-9a-f]{12})/files/(.+)$")
+_TUNNEL_PATH = re.compile(r"^/tunnel/([0-9a-f]{20})(?:/[^/]*)?$")
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "index.html")
+# index.html bu meta etiketiyle yerel arka ucu tanır (başka yerde barındırılırsa boş kalır)
+_LOCAL_API_META = b'<meta name="yt2mp3-local-api" content="">'
+_AUDIO_TYPES = {".mp3": "audio/mpeg", ".m4a": "audio/mp4", ".wav": "audio/wav"}
+_JOB_OPTIONS = ("normalize", "trim_silence", "split_chapters", "clip")
+
+
+class ApiError(Exception):
+    """İstemciye HTTP durum koduyla dönülecek hata"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def query_history(query="", limit=50, offset=0):
+    """
+    History satırları (en yeniler önce) ve kütüphane kayıtları: arama sorgusu
+    GUI'deki trigram indeksiyle aynı alanlarda (isim, yol, sanatçı, albüm, URL) çalışır.
+    """
+    from history_utils import load_history, shorten_title
+    from search_module import build_index
+
+    history = load_history()
+    titles = history.get("music_titles", [])
+    doc_ids = build_index(history).search(query) if query else range(len(titles))
+    records_by_title = {}
+    for record in history.get("library", {}).values():
+        records_by_title[shorten_title(os.path.splitext(os.path.basename(record["path"]))[0])] = record
+    doc_ids = list(reversed(list(doc_ids)))
+    items = []
+    for doc_id in doc_ids[offset:offset + limit]:
+        items.append({"id": doc_id, "title": titles[doc_id], "record": records_by_title.get(titles[doc_id])})
+    return {"total": len(doc_ids), "offset": offset, "items": items}
+
+
+def _job_options(body):
+    """İstek gövdesi -> JobManager.submit seçenekleri (doğrulanmış)"""
+    from clip_utils import parse_clip, make_clip, ClipError
+
+    options = {}
+    also = body.get("also") or []
+    if isinstance(also, str):
+        also = [also]
+    targets = []
+    for target in also:
+        if isinstance(target, str):
+            label, _, folder = target.partition("=")
+            target = {"format": label.strip(), "folder": folder.strip() or None}
+        if not isinstance(target, dict) or not target.get("format"):
+            raise ApiError(400, "'also' items must be a format label or {\"format\", \"folder\"}")
+        targets.append({"format": target["format"], "folder": target.get("folder")})
+    if targets:
+        options["extra_targets"] = targets
+    for key in _JOB_OPTIONS:
+        if body.get(key) is not None:
+            options[key] = body[key]
+    if options.get("normalize") not in (None, "off", "tags", "apply"):
+        raise ApiError(400, "'normalize' must be off, tags or apply")
+    clip = options.get("clip")
+    try:
+        if isinstance(clip, str):
+            options["clip"] = parse_clip(clip)
+        elif isinstance(clip, dict):
+            options["clip"] = make_clip(clip.get("start"), clip.get("end"))
+    except ClipError as e:
+        raise ApiError(400, f"Invalid clip: {e}")
+    return options
+
+
+def make_handler(manager, token=None, default_format="MP3 (128k) - Car Compatible", web=None, open_web=False):
+    """JobManager'a (ve web verilirse cobalt_api.CobaltService'e) bağlı istek işleyici sınıfı"""
+
+    # Koordinatör modunda JobManager yerine distributed.JobCoordinator gelir
+    coordinator = manager if hasattr(manager, "lease") else None
+
+    class ApiHandler(BaseHTTPRequestHandler):
+        server_version = "YT2MP3-API/1.0"
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            debug_print(f"🌐 {self.client_address[0]} {format % args}", "DEBUG")
+
+        # -- Yardımcılar ---------------------------------------------------
+
+        def send_cors_headers(self):
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Expose-Headers", "Content-Length, Content-Range, Content-Disposition")
+
+        def send_json(self, status, payload, cors=False):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            if cors:
+                self.send_cors_headers()
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise ApiError(413, "Request body too large")
+            raw = self.rfile.read(length) if length else b"{}"
+            try:
+                body = json.loads(raw.decode("utf-8") or "{}")
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                raise ApiError(400, f"Invalid JSON: {e}")
+            if not isinstance(body, dict):
+                raise ApiError(400, "JSON body must be an object")
+            return body
+
+        def token_valid(self, query):
+            header = self.headers.get("Authorization", "")
+            supplied = header[7:] if header.startswith("Bearer ") else (query.get("token") or [""])[0]
+            return hmac.compare_digest(supplied.encode(), token.encode())
+
+        def check_token(self, path, query):
+            """/api/ ve (open_web değilse) tüneller token ister; POST / cobalt_request'te denetlenir"""
+            protected = path.startswith("/api/") or (web and not open_web and _TUNNEL_PATH.match(path))
+            if token and protected and not self.token_valid(query):
+                raise ApiError(401, "Missing or invalid token")
+
+        def dispatch(self, method):
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+            try:
+                self.check_token(parts.path, query)
+                route = getattr(self, f"route_{method}")
+                route(parts.path.rstrip("/") or "/", query)
+            except ApiError as e:
+                self.send_json(e.status, {"error": str(e)})
+            except LeaseError as e:
+                self.send_json(409, {"error": str(e)})
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            except Exception as e:
+                debug_print(f"💥 API error on {method} {self.path}: {e}", "ERROR")
+                self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def do_GET(self):
+            self.dispatch("GET")
+
+        def do_HEAD(self):
+            self.dispatch("GET")
+
+        def do_OPTIONS(self):
+            # CORS ön kontrolü (başka adresteki web istemcileri için)
+            self.send_response(204)
+            self.send_cors_headers()
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type, Accept, Authorization, Range")
+            self.send_header("Access-Control-Max-Age", "86400")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            self.dispatch("POST")
+
+        def do_PUT(self):
+            self.dispatch("PUT")
+
+        def do_DELETE(self):
+            self.dispatch("DELETE")
+
+        # -- Uç noktalar -----------------------------------------------------
+
+        def route_GET(self, path, query):
+            if web and path == "/":
+                accept = self.headers.get("Accept", "")
+                if "application/json" in accept and "text/html" not in accept:
+                    self.send_json(200, web.info(), cors=True)
+                else:
+                    self.send_index()
+            elif web and _TUNNEL_PATH.match(path):
+                found = web.tunnel_file(_TUNNEL_PATH.match(path).group(1))
+                if found is None:
+                    raise ApiError(404, "File expired or not found")
+                self.send_file(*found)
+            elif path == "/api/health":
+                health = {"status": "ok", "workers": manager.max_workers,
+                          "jobs": len(manager.list()), "running": len(manager.list("running"))}
+                if coordinator:
+                    health["remote_workers"] = len(coordinator.active_workers())
+                else:
+                    health["bandwidth"] = get_scheduler().summary()
+                    health["retry"] = get_retry_engine().summary()
+                    health["disk"] = get_disk_guard().summary(manager.music_folder)
+                self.send_json(200, health)
+            elif path == "/api/workers":
+                self.send_json(200, {"workers": self.require_coordinator().active_workers()})
+            elif path == "/api/jobs":
+                status = (query.get("status") or [None])[0]
+                self.send_json(200, {"jobs": [job.snapshot() for job in manager.list(status)],
+                                     "last": manager.seq})
+            elif _JOB_PATH.match(path) and not _JOB_PATH.match(path).group(2):
+                job = manager.get(_JOB_PATH.match(path).group(1))
+                if job is None:
+                    raise ApiError(404, "Job not found")
+                self.send_json(200, job.snapshot())
+            elif path == "/api/events":
+                after = self.int_param(query, "after", 0)
+                timeout = min(MAX_POLL_TIMEOUT, float((query.get("timeout") or ["25"])[0]))
+                events, last, missed = manager.events_since(after, timeout, (query.get("job") or [None])[0])
+                self.send_json(200, {"events": events, "last": last, "missed": missed})
+            elif path == "/api/events/stream":
+                self.stream_events(query)
+            elif path == "/api/history":
+                q = (query.get("q") or [""])[0]
+                self.send_json(200, query_history(q, self.int_param(query, "limit", 50),
+                                                  self.int_param(query, "offset", 0)))
+            else:
+                raise ApiError(404, "Not found")
+
+        def route_POST(self, path, query):
+            if web and path == "/":
+                self.cobalt_request()
+                return
+            match = _JOB_PATH.match(path)
+            if match and match.group(2):
+                self.cancel_job(match.group(1))
+                return
+            if path.startswith("/api/worker/"):
+                self.worker_request(path)
+                return
+            if path != "/api/jobs":
+                raise ApiError(404, "Not found")
+            body = self.read_json()
+            urls = body.get("urls") or ([body["url"]] if body.get("url") else [])
+            if not urls or not all(isinstance(url, str) and url.strip() for url in urls):
+                raise ApiError(400, "Give 'url' or a non-empty 'urls' list")
+            selected_format = body.get("format") or default_format
+            options = _job_options(body)
+            client = self.client_address[0]
+            jobs = []
+            for url in urls:
+                try:
+                    jobs.extend(manager.submit(url, selected_format, client=client, **dict(options)))
+                except ValueError as e:
+                    raise ApiError(400, f"{url}: {e}")
+            self.send_json(202, {"jobs": [job.snapshot() for job in jobs]})
+
+        def route_PUT(self, path, query):
+            match = _WORKER_FILE_PATH.match(path)
+            if not match:
+                raise ApiError(404, "Not found")
+            worker_id = (query.get("worker") or [""])[0]
+            if "Content-Length" not in self.headers:
+                raise ApiError(411, "Content-Length required")
+            try:
+                stored = self.require_coordinator().store_upload(
+                    match.group(1), worker_id, unquote(match.group(2)), self.rfile,
+                    int(self.headers["Content-Length"]))
+            except ValueError as e:
+                self.close_connection = True
+                raise ApiError(400, str(e))
+            self.send_json(201, {"path": stored, "bytes": os.path.getsize(stored)})
+
+        def route_DELETE(self, path, query):
+            match = _JOB_PATH.match(path)
+            if not match or match.group(2):
+                raise ApiError(404, "Not found")
+            self.cancel_job(match.group(1))
+
+        def cancel_job(self, job_id):
+            job = manager.cancel(job_id)
+            if job is None:
+                raise ApiError(404, "Job not found")
+            self.send_json(200, job.snapshot())
+
+        def require_coordinator(self):
+            if coordinator is None:
+                raise ApiError(404, "Not a coordinator (start with: serve --coordinator)")
+            return coordinator
+
+        def worker_request(self, path):
+            """Çalışan uçları: kiralama, heartbeat ve sonuç"""
+            jobs = self.require_coordinator()
+            body = self.read_json()
+            worker_id = body.get("worker")
+            if not isinstance(worker_id, str) or not worker_id:
+                raise ApiError(400, "'worker' is required")
+            if path == "/api/worker/lease":
+                wait = min(MAX_POLL_TIMEOUT, float(body.get("wait") or 0))
+                job = jobs.lease(worker_id, wait)
+                self.send_json(200, {"job": job.snapshot() if job else None, "lease_seconds": jobs.lease_seconds})
+                return
+            match = _WORKER_JOB_PATH.match(path)
+            if not match:
+                raise ApiError(404, "Not found")
+            job_id, action = match.groups()
+            if action == "heartbeat":
+                cancel = jobs.heartbeat(job_id, worker_id, body.get("progress"), body.get("text"), body.get("speed"))
+                self.send_json(200, {"cancel": cancel})
+            else:
+                status = body.get("status")
+                if status not in ("success", "error", "cancelled"):
+                    raise ApiError(400, "'status' must be success, error or cancelled")
+                try:
+                    job = jobs.complete(job_id, worker_id, status, body.get("result"), body.get("error"),
+                                        body.get("records"), body.get("music_titles"))
+                except ValueError as e:
+                    raise ApiError(400, str(e))
+                self.send_json(200, job.snapshot())
+
+        def cobalt_request(self):
+            """cobalt POST /: hatalar da cobalt biçiminde ({"status": "error", "error": {"code"}})"""
+            try:
+                if token and not open_web and not self.token_valid(parse_qs(urlsplit(self.path).query)):
+                    raise CobaltError("error.api.auth.key.missing", status=401)
+                try:
+                    payload = self.read_json()
+                except ApiError:
+                    raise CobaltError("error.api.invalid_body")
+                host = self.headers.get("Host") or "%s:%s" % self.server.server_address[:2]
+                response = web.handle(payload, f"http://{host}", client=self.client_address[0])
+                if token and not open_web and response.get("url"):
+                    # Tarayıcı indirmesi başlık taşımaz: token tünel adresine eklenir
+                    response["url"] += f"?token={quote(token)}"
+                self.send_json(200, response, cors=True)
+            except CobaltError as e:
+                self.send_json(e.status, e.payload(), cors=True)
+
+        def send_index(self):
+            """index.html; yerel arka uç meta etiketi doldurularak"""
+            try:
+                with open(INDEX_FILE, "rb") as f:
+                    body = f.read()
+            except OSError:
+                raise ApiError(404, "index.html not found")
+            body = body.replace(_LOCAL_API_META, _LOCAL_API_META.replace(b'content=""', b'content="/"'))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def send_file(self, path, filename):
+            """Dosyayı tek aralıklı HTTP Range desteğiyle gönder (gövde sendfile ile)"""
+            try:
+                f = open(path, "rb")
+            except OSError:
+                raise ApiError(404, "File not found")
+            with f:
+                stat = os.fstat(f.fileno())
+                size = stat.st_size
+                etag = f'"{size:x}-{int(stat.st_mtime):x}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                start, end, status = 0, size - 1, 200
+                range_header = self.headers.get("Range")
+                if range_header and self.headers.get("If-Range", etag) == etag:
+                    match = _RANGE_PATTERN.match(range_header.strip())
+                    if match and (match.group(1) or match.group(2)):
+                        if match.group(1):
+                            start = int(match.group(1))
+                            if match.group(2):
+                                end = min(int(match.group(2)), size - 1)
+                        else:
+                            start = max(0, size - int(match.group(2)))
+                        if start >= size or start > end:
+                            self.send_response(416)
+                            self.send_cors_headers()
+                            self.send_header("Content-Range", f"bytes */{size}")
+                            self.send_header("Content-Length", "0")
+                            self.end_headers()
+                            return
+                        status = 206
+                length = end - start + 1
+                self.send_response(status)
+                self.send_cors_headers()
+                self.send_header("Content-Type", _AUDIO_TYPES.get(os.path.splitext(path)[1].lower(),
+                                                                  "application/octet-stream"))
+                self.send_header("Content-Length", str(length))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "private, max-age=86400")
+                self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename)}")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                if self.command != "HEAD" and length > 0:
+                    self.connection.sendfile(f, start, length)
+
+        def int_param(self, query, name, default):
+            try:
+                return max(0, int((query.get(name) or [default])[0]))
+            except ValueError:
+                raise ApiError(400, f"'{name}' must be an integer")
+
+        def stream_events(self, query):
+            """Server-Sent Events: bağlantı açık kaldıkça olaylar anında gönderilir"""
+            after = self.int_param(query, "after", 0)
+            if self.headers.get("Last-Event-ID", "").isdigit():
+                after = int(self.headers["Last-Event-ID"])
+            job_id = (query.get("job") or [None])[0]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            while True:
+                events, last, missed = manager.events_since(after, SSE_KEEPALIVE, job_id)
+                chunks = []
+                if missed:
+                    chunks.append(f"event: missed\ndata: {json.dumps({'last': last})}\n\n")
+                for event in events:
+                    data = json.dumps(event, ensure_ascii=False, default=str)
+                    chunks.append(f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n")
+                if not chunks:
+                    chunks.append(": keepalive\n\n")
+                after = last
+                self.wfile.write("".join(chunks).encode("utf-8"))
+                self.wfile.flush()
+
+    return ApiHandler
+
+
+class ApiServer:
+    """
+    Arka planda veya ön planda çalışan HTTP API sunucusu.
+
+        with ApiServer(JobManager(), port=0) as server:
+            print(server.base_url)
+    """
+    def __init__(self, manager, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None, web=True, open_web=False):
+        self.manager = manager
+        self.web = CobaltService(manager) if web else None
+        self.httpd = ThreadingHTTPServer((host, port),
+                                         make_handler(manager, token, web=self.web, open_web=open_web))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.manager.shutdown()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,269 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Bant Genişliği Modülü - Tüm indirmeler için ortak token-bucket hız sınırı
+Her indirme, yt-dlp progress hook'unda aldığı bayt kadar jeton harcar; jeton
+yoksa hook bekler ve yt-dlp'nin okuma döngüsü yavaşlar (ydl_opts'ta ayrı bir
+ratelimit gerekmez). İki kova vardır:
+  - genel kova: tüm aktif indirmelerin toplamı (saat aralığına göre profil)
+  - iş kovası: her indirmenin payı = min(iş sınırı, genel hız / aktif indirme);
+    indirme başlayınca/bitince paylar yeniden hesaplanır.
+
+Profil: "4M" (her zaman) veya "08:00-18:00=2M,18:00-08:00=off" (yerel saat).
+Hızlar bayt/sn'dir; K/M/G ekleri 1024 katlarıdır, "off"/"0" sınırsız demektir.
+
+Açmak için: --rate-limit / --job-rate-limit veya YT2MP3_RATE_LIMIT /
+YT2MP3_JOB_RATE_LIMIT.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from log_utils import debug_print
+
+# Kova kapasitesi: bu kadar saniyelik jeton birikebilir (kısa patlamalar serbest)
+BURST_SECONDS = 0.5
+# Uzun beklemeler bu aralıklarla bölünür (durdurma isteği gecikmeden fark edilir)
+WAIT_SLICE = 0.25
+
+_RATE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?\s*$", re.IGNORECASE)
+_WINDOW_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*=\s*(.+)$")
+_MULTIPLIERS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_rate(value):
+    """"2M" / "512K" / "1.5MB" / 1000000 -> bayt/sn; "off", "0" veya boş -> None (sınırsız)"""
+    if value is None or isinstance(value, (int, float)):
+        return float(value) if value else None
+    if value.strip().lower() in ("", "off", "none", "0", "unlimited"):
+        return None
+    match = _RATE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid rate: {value!r} (use e.g. 512K, 2M, 1.5MB or off)")
+    rate = float(match.group(1)) * _MULTIPLIERS[match.group(2).upper()]
+    return rate or None
+
+
+def parse_profile(spec):
+    """
+    Profil metni -> [(başlangıç_dk, bitiş_dk, hız), ...]. Tek hız tüm güne yayılır.
+    Aralık gece yarısını geçebilir (22:00-06:00); eşleşmeyen saatler sınırsızdır.
+    """
+    if spec is None or not str(spec).strip():
+        return []
+    spec = str(spec)
+    if "=" not in spec:
+        return [(0, 24 * 60, parse_rate(spec))]
+    windows = []
+    for part in spec.split(","):
+        match = _WINDOW_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Invalid rate profile entry: {part!r} (use HH:MM-HH:MM=RATE)")
+        start_h, start_m, end_h, end_m, rate = match.groups()
+        start, end = int(start_h) * 60 + int(start_m), int(end_h) * 60 + int(end_m)
+        if start >= 24 * 60 or end > 24 * 60:
+            raise ValueError(f"Invalid time in rate profile: {part!r}")
+        windows.append((start, end, parse_rate(rate)))
+    return windows
+
+
+def profile_rate(windows, now=None):
+    """Profilde şu anki saate düşen hız (yoksa None)"""
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end, rate in windows:
+        inside = start <= minute < end if start < end else (minute >= start or minute < end)
+        if inside:
+            return rate
+    return None
+
+
+def format_rate(rate):
+    if not rate:
+        return "unlimited"
+    for suffix, factor in (("G", 1024 ** 3), ("M", 1024 ** 2), ("K", 1024)):
+        if rate >= factor:
+            return f"{rate / factor:.1f}{suffix}B/s"
+    return f"{rate:.0f}B/s"
+
+
+class TokenBucket:
+    """
+    Rezervasyonlu token-bucket: take(n) jetonu hemen düşer ve borç varsa kaç
+    saniye beklenmesi gerektiğini döndürür. Eşzamanlı çağıranlar sırayla
+    rezerve ettiğinden toplam hız sınırı aşılmaz (lock dışarıda tutulur).
+    """
+    def __init__(self, rate=None, clock=time.monotonic):
+        self.clock = clock
+        self.rate = None
+        self.tokens = 0.0
+        self.updated = clock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        self._refill()
+        self.rate = rate or None
+        if self.rate:
+            self.tokens = min(self.tokens, self.rate * BURST_SECONDS)
+
+    def _refill(self):
+        now = self.clock()
+        if self.rate:
+            self.tokens = min(self.rate * BURST_SECONDS, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount):
+        if not self.rate:
+            return 0.0
+        self._refill()
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class JobThrottle:
+    """Tek indirmenin kovası; consume() progress hook'undan çağrılır"""
+    def __init__(self, scheduler, name):
+        self.scheduler = scheduler
+        self.name = name
+        self.bucket = TokenBucket(clock=scheduler.clock)
+        self.last_bytes = 0
+        self.waited = 0.0
+        self.closed = False
+
+    def close(self):
+        """İndirme bitti: payını diğer işlere bırak (son işlem sırasında kova tutulmaz)"""
+        self.scheduler.release(self)
+
+    def consume_total(self, downloaded_bytes, stop_check=None):
+        """Hook'taki toplam downloaded_bytes'tan yeni baytları hesapla ve harca"""
+        if downloaded_bytes is None:
+            return
+        delta = downloaded_bytes - self.last_bytes
+        self.last_bytes = downloaded_bytes
+        if delta > 0:
+            self.consume(delta, stop_check)
+
+    def consume(self, amount, stop_check=None):
+        delay = self.scheduler.reserve(self, amount)
+        if delay <= 0:
+            return
+        self.waited += delay
+        deadline = time.monotonic() + delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (stop_check and stop_check()):
+                return
+            time.sleep(min(WAIT_SLICE, remaining))
+
+
+class BandwidthScheduler:
+    """
+    Aktif indirmelerin ortak hız sınırlayıcısı.
+
+        scheduler = get_scheduler()
+        with scheduler.job("abc123") as throttle:
+            ... progress hook: throttle.consume_total(d["downloaded_bytes"], stop_check)
+    """
+    def __init__(self, profile=None, job_limit=None, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.windows = parse_profile(profile) if isinstance(profile, str) else list(profile or [])
+        self.job_limit = parse_rate(job_limit)
+        self.global_bucket = TokenBucket(clock=clock)
+        self.active = []
+        self.current_rate = None
+        self.profile_checked = 0.0
+        self.total_bytes = 0
+        self._rebalance()
+
+    @property
+    def enabled(self):
+        return bool(self.windows or self.job_limit)
+
+    def configure(self, profile=None, job_limit=None):
+        with self.lock:
+            self.windows = parse_profile(profile) if isinstance(profile, str) else list(profile or [])
+            self.job_limit = parse_rate(job_limit)
+            self.profile_checked = 0.0
+            self._rebalance()
+
+    def _rebalance(self):
+        """Genel hızı profilden al, aktif işlerin paylarını yeniden dağıt (lock tutulurken)"""
+        rate = profile_rate(self.windows)
+        self.profile_checked = self.clock()
+        if rate != self.current_rate:
+            if self.active:
+                debug_print(f"📶 Bandwidth limit: {format_rate(rate)}", "INFO")
+            self.current_rate = rate
+            self.global_bucket.set_rate(rate)
+        share = rate / len(self.active) if rate and self.active else None
+        job_rate = min(r for r in (share, self.job_limit) if r) if share or self.job_limit else None
+        for throttle in self.active:
+            throttle.bucket.set_rate(job_rate)
+
+    @contextmanager
+    def job(self, name):
+        """İndirme süresince aktif iş olarak kaydol (paylar yeniden dağıtılır)"""
+        throttle = JobThrottle(self, name)
+        with self.lock:
+            self.active.append(throttle)
+            self._rebalance()
+        try:
+            yield throttle
+        finally:
+            self.release(throttle)
+
+    def release(self, throttle):
+        with self.lock:
+            if throttle.closed:
+                return
+            throttle.closed = True
+            self.active.remove(throttle)
+            self._rebalance()
+
+    def reserve(self, throttle, amount):
+        """amount bayt için gereken bekleme süresi (genel ve iş kovasının büyüğü)"""
+        if not self.enabled:
+            return 0.0
+        with self.lock:
+            self.total_bytes += amount
+            if self.windows and self.clock() - self.profile_checked > 60:
+                # Saat aralığı değişmiş olabilir (gece/gündüz profili)
+                self._rebalance()
+            return max(self.global_bucket.take(amount), throttle.bucket.take(amount))
+
+    def summary(self):
+        with self.lock:
+            return {"limit": self.current_rate, "job_limit": self.job_limit, "active_downloads": len(self.active),
+                    "job_rate": self.active[0].bucket.rate if self.active else None,
+                    "bytes": self.total_bytes}
+
+
+_state = {
+    "profile": os.environ.get("YT2MP3_RATE_LIMIT", ""),
+    "job_limit": os.environ.get("YT2MP3_JOB_RATE_LIMIT", ""),
+    "scheduler": None,
+}
+_state_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Süreç genelindeki ortak zamanlayıcı"""
+    with _state_lock:
+        if _state["scheduler"] is None:
+            try:
+                _state["scheduler"] = BandwidthScheduler(_state["profile"], _state["job_limit"])
+            except ValueError as e:
+                debug_print(f"⚠️ Ignoring invalid rate limit setting: {e}", "WARNING")
+                _state["scheduler"] = BandwidthScheduler()
+        return _state["scheduler"]
+
+
+def set_rate_limit(profile=None, job_limit=None):
+    """Genel profil ve iş başı sınırı ayarla (aktif indirmeler dahil hemen geçerli)"""
+    parse_profile(profile)
+    parse_rate(job_limit)
+    _state["profile"], _state["job_limit"] = profile or "", job_limit or ""
+    get_scheduler().configure(profile, job_limit)
+    debug_print(f"📶 Bandwidth: total {profile or 'unlimited'}, per job {job_limit or 'unlimited'}", "INFO")
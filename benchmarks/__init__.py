@@ -0,0 +1,9 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Çevrimdışı Benchmark Paketi
+YouTube ve ffmpeg yerine yerel taklitler (stand-in) kullanarak gerçek indirme,
+dönüştürme ve history kod yollarını ölçer.
+
+Çalıştırma (depo kökünden):
+    python -m benchmarks.run_benchmarks
+"""
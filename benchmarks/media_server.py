@@ -0,0 +1,255 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Yerel Medya Sunucusu - YouTube yerine geçen HTTP sunucusu
+/api/<id>.json   : video metadata'sı
+/media/<id>.m4a  : sentetik ses verisi (Range / 206 ve HEAD destekli)
+/thumb/<id>.jpg  : sentetik kapak resmi (JPEG başlıklı, ~20 KB)
+
+Gecikme (istek başına) ve bant genişliği (bağlantı başına bayt/sn) ayarlanabilir.
+Ses verisi CBR MPEG-1 Layer III çerçevelerinden oluşur; böylece tag_utils
+süreyi doğru okur ve ffmpeg taklidi çıktı boyutunu hesaplayabilir.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MP3_SAMPLES_PER_FRAME = 1152
+MP3_SAMPLE_RATE = 44100
+
+_BITRATE_INDEX = {32: 1, 40: 2, 48: 3, 56: 4, 64: 5, 80: 6, 96: 7, 112: 8,
+                  128: 9, 160: 10, 192: 11, 224: 12, 256: 13, 320: 14}
+
+_RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+_PATH_PATTERN = re.compile(r"^/(api|media|thumb)/([\w-]+)\.(json|m4a|jpg)$")
+
+# Kapak taklidi: JPEG SOI/APP0 başlığı + dolgu + EOI (tag yazıcı sadece imzaya bakar)
+THUMBNAIL_BYTES = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + bytes(20 * 1024) + b"\xff\xd9"
+
+
+def mp3_frame(bitrate_kbps=128):
+    """Verilen bit hızında tek bir (sessiz) MPEG-1 Layer III çerçevesi (44.1 kHz, stereo, CRC'siz)"""
+    index = _BITRATE_INDEX.get(int(bitrate_kbps), 9)
+    header = bytes([0xFF, 0xFB, (index << 4) | 0x00, 0x00])
+    frame_length = 144 * int(bitrate_kbps) * 1000 // MP3_SAMPLE_RATE
+    return header + bytes(frame_length - len(header))
+
+
+def mp3_stream_size(duration, bitrate_kbps=128):
+    """Süreye karşılık gelen toplam çerçeve bayt sayısı"""
+    frames = int(duration * MP3_SAMPLE_RATE / MP3_SAMPLES_PER_FRAME) + 1
+    return frames * len(mp3_frame(bitrate_kbps))
+
+
+def write_mp3_file(path, duration, bitrate_kbps=128, chunk_frames=2048):
+    """Diske sentetik MP3 yaz (kütüphane ve ffmpeg taklidi için)"""
+    frame = mp3_frame(bitrate_kbps)
+    remaining = mp3_stream_size(duration, bitrate_kbps) // len(frame)
+    with open(path, "wb") as f:
+        while remaining > 0:
+            count = min(chunk_frames, remaining)
+            f.write(frame * count)
+            remaining -= count
+
+
+class SyntheticMedia:
+    """Tek bir videonun metadata'sı ve bayt aralığı üretimi"""
+    def __init__(self, video_id, duration, bitrate_kbps=128, chapters=0):
+        self.video_id = video_id
+        self.duration = duration
+        # Eşit uzunlukta bölümler (0: bölüm yok)
+        self.chapters = chapters
+        self.frame = mp3_frame(bitrate_kbps)
+        self.size = mp3_stream_size(duration, bitrate_kbps)
+        # Çerçeveye hizalı ~256 KB blok; aralıklar bu bloktan kesilir
+        self.block = self.frame * max(1, (256 * 1024) // len(self.frame))
+
+    def read_range(self, start, end):
+        """[start, end] (dahil) aralığını parça parça üret"""
+        block = self.block
+        block_len = len(block)
+        position = start
+        while position <= end:
+            offset = position % block_len
+            length = min(block_len - offset, end - position + 1)
+            yield block[offset:offset + length]
+            position += length
+
+
+class MediaServer:
+    """
+    Arka planda çalışan yerel HTTP sunucusu.
+
+        with MediaServer(latency=0.02, bandwidth=8 * 1024 * 1024) as server:
+            url = server.video_url("bench0001")
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, bandwidth=None,
+                 duration=30.0, bitrate_kbps=128):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.duration = duration
+        self.bitrate_kbps = bitrate_kbps
+        self.requests = 0
+        self.bytes_sent = 0
+        self._media = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def video_url(self, video_id):
+        """Taklit yt-dlp'nin tanıdığı izleme adresi"""
+        return f"{self.base_url}/watch?v={video_id}"
+
+    def add_media(self, video_id, duration, chapters=0):
+        """Varsayılandan farklı süre/bölüm sayısı olan bir video tanımla"""
+        with self._lock:
+            media = self._media[video_id] = SyntheticMedia(video_id, duration, self.bitrate_kbps, chapters)
+            return media
+
+    def media(self, video_id):
+        with self._lock:
+            media = self._media.get(video_id)
+            if media is None:
+                media = self._media[video_id] = SyntheticMedia(video_id, self.duration, self.bitrate_kbps)
+            return media
+
+    def metadata(self, video_id):
+        media = self.media(video_id)
+        length = media.duration / media.chapters if media.chapters else 0
+        chapters = [{"start_time": i * length, "end_time": (i + 1) * length, "title": f"Part {i + 1}"}
+                    for i in range(media.chapters)]
+        return {
+            "id": video_id,
+            "title": f"Benchmark Track {video_id}",
+            "uploader": "Benchmark Artist",
+            "duration": media.duration,
+            "ext": "m4a",
+            "filesize": media.size,
+            "abr": self.bitrate_kbps,
+            "url": f"{self.base_url}/media/{video_id}.m4a",
+            "webpage_url": self.video_url(video_id),
+            "thumbnails": [{"url": f"{self.base_url}/thumb/{video_id}.jpg", "width": 480}],
+            "chapters": chapters or None,
+        }
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, sent_bytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent_bytes
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self.handle_request(send_body=False)
+
+            def do_GET(self):
+                self.handle_request(send_body=True)
+
+            def handle_request(self, send_body):
+                if server.latency:
+                    time.sleep(server.latency)
+                match = _PATH_PATTERN.match(self.path.split("?", 1)[0])
+                if not match:
+                    self.send_error(404)
+                    return
+                kind, video_id, _ = match.groups()
+                if kind == "api":
+                    body = json.dumps(server.metadata(video_id)).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    if send_body:
+                        self.wfile.write(body)
+                    server._count(len(body))
+                    return
+                if kind == "thumb":
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(THUMBNAIL_BYTES)))
+                    self.end_headers()
+                    if send_body:
+                        self.wfile.write(THUMBNAIL_BYTES)
+                    server._count(len(THUMBNAIL_BYTES))
+                    return
+                self.send_media(server.media(video_id), send_body)
+
+            def send_media(self, media, send_body):
+                start, end = 0, media.size - 1
+                status = 200
+                range_header = self.headers.get("Range")
+                if range_header:
+                    match = _RANGE_PATTERN.match(range_header.strip())
+                    if not match or (not match.group(1) and not match.group(2)):
+                        self.send_error(416)
+                        return
+                    if match.group(1):
+                        start = int(match.group(1))
+                        if match.group(2):
+                            end = min(int(match.group(2)), media.size - 1)
+                    else:
+                        start = max(0, media.size - int(match.group(2)))
+                    if start >= media.size or start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{media.size}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status = 206
+
+                length = end - start + 1
+                self.send_response(status)
+                self.send_header("Content-Type", "audio/mp4")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(length))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{media.size}")
+                self.end_headers()
+                if not send_body:
+                    return
+
+                sent = 0
+                started = time.perf_counter()
+                try:
+                    for chunk in media.read_range(start, end):
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if server.bandwidth:
+                            # Bağlantı başına bant genişliği sınırı
+                            ahead = sent / server.bandwidth - (time.perf_counter() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                server._count(sent)
+
+        return Handler
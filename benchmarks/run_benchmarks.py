@@ -0,0 +1,180 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Benchmark Çalıştırıcı
+Yerel medya sunucusunu ve ffmpeg taklidini başlatır, yt-dlp taklidini yükler,
+senaryoları geçici veri klasörlerinde çalıştırır ve sonuçları yazdırır.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --scenario batch --batch-size 500 --workers 8
+    python -m benchmarks.run_benchmarks --json results.json --compare baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks import stub_ytdlp
+from benchmarks.media_server import MediaServer
+from benchmarks.scenarios import SCENARIOS, run_scenarios
+from benchmarks.stub_ffmpeg import install_ffmpeg_stub
+from log_utils import setup_logging, shutdown_logging
+from profile_utils import set_profiling, print_profile_summary
+
+# Karşılaştırmada izin verilen yavaşlama oranı
+DEFAULT_TOLERANCE = 0.20
+
+
+def parse_size(value):
+    """'8M', '512K', '1048576' -> bayt/sn"""
+    value = value.strip().upper()
+    multipliers = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+    if value[-1:] in multipliers:
+        return int(float(value[:-1]) * multipliers[value[-1]])
+    return int(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmarks with local YouTube/ffmpeg stand-ins")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS + ("all",),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Downloads in the batch scenario")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads in the batch scenario")
+    parser.add_argument("--multi-size", type=int, default=50,
+                        help="Downloads in the multi-output (128k + 320k) scenario")
+    parser.add_argument("--rate-limit", default="1M", help="Shared bandwidth limit in the bandwidth scenario")
+    parser.add_argument("--outage-size", type=int, default=40, help="Jobs per run in the outage scenario")
+    parser.add_argument("--chapter-videos", type=int, default=2, help="Videos in the chapter-split scenario")
+    parser.add_argument("--chapter-duration", type=float, default=3600.0,
+                        help="Seconds per video in the chapter-split scenario")
+    parser.add_argument("--chapter-count", type=int, default=12, help="Chapters per video")
+    parser.add_argument("--clip-videos", type=int, default=5, help="Downloads in the clip-range scenario")
+    parser.add_argument("--clip", default="20:00-23:00",
+                        help="Time range cut from each --chapter-duration long video in the clip scenario")
+    parser.add_argument("--cache-videos", type=int, default=10,
+                        help="Videos requested in three formats, then repeated, in the media cache scenario")
+    parser.add_argument("--api-jobs", type=int, default=50, help="Jobs submitted in the HTTP API scenario")
+    parser.add_argument("--worker-processes", type=int, default=3,
+                        help="Worker processes pulling from the coordinator in the distributed scenario")
+    parser.add_argument("--library-size", type=int, default=200, help="Files in the conversion scenario")
+    parser.add_argument("--library-duration", type=float, default=180.0, help="Seconds per library file")
+    parser.add_argument("--history-size", type=int, default=100_000, help="Entries in the history scenario")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio per served track")
+    parser.add_argument("--latency", type=float, default=0.0, help="Per-request server latency (seconds)")
+    parser.add_argument("--bandwidth", type=parse_size, default=None,
+                        help="Per-connection bandwidth limit, e.g. 8M (default: unlimited)")
+    parser.add_argument("--ffmpeg-speed", type=float, default=None,
+                        help="Simulated encode speed as a multiple of realtime (0 = no delay)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file; exit 1 if any scenario regresses")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed wall-time regression ratio for --compare (default 0.20)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary work directory")
+    parser.add_argument("--verbose", action="store_true", help="Show the application's console output")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile every job with cProfile and print the hot functions")
+    return parser
+
+
+def print_results(results):
+    print(f"{'scenario':<20} {'items':>7} {'wall s':>9} {'items/s':>9} {'MB/s':>8} {'p50 s':>8} {'p95 s':>8}")
+    for result in results:
+        def fmt(key, spec):
+            value = result.get(key)
+            return format(value, spec) if value is not None else "-"
+        print(f"{result['scenario']:<20} {result['items']:>7} {fmt('wall_s', '9.3f')} "
+              f"{fmt('throughput_items_s', '9.2f')} {fmt('throughput_mb_s', '8.2f')} "
+              f"{fmt('p50_s', '8.4f')} {fmt('p95_s', '8.4f')}")
+        if result.get("failures"):
+            print(f"   ⚠️ {result['failures']} failed")
+        if result.get("phases_ms"):
+            phases = "  ".join(f"{name}={ms:.2f}ms" for name, ms in result["phases_ms"].items())
+            print(f"   {phases}")
+
+
+def compare_results(results, baseline_file, tolerance):
+    """Baseline'a göre duvar süresi karşılaştırması; gerileme listesi döndürür"""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {r["scenario"]: r for r in json.load(f).get("results", [])}
+
+    regressions = []
+    print(f"\n📈 Compared with {baseline_file} (tolerance {tolerance:.0%})")
+    for result in results:
+        old = baseline.get(result["scenario"])
+        if not old or not old.get("wall_s"):
+            print(f"   {result['scenario']:<20} (no baseline)")
+            continue
+        ratio = result["wall_s"] / old["wall_s"]
+        marker = "❌" if ratio > 1 + tolerance else "✅"
+        print(f"   {marker} {result['scenario']:<20} {old['wall_s']:.3f}s -> {result['wall_s']:.3f}s ({ratio - 1:+.1%})")
+        if ratio > 1 + tolerance:
+            regressions.append(result["scenario"])
+    return regressions
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    names = args.scenario or ["all"]
+    names = list(SCENARIOS) if "all" in names else list(dict.fromkeys(names))
+
+    work_dir = tempfile.mkdtemp(prefix="yt2mp3-bench-")
+    saved_env = {key: os.environ.get(key) for key in ("YT2MP3_DATA_DIR", "YT2MP3_FFMPEG_DIR", "STUB_FFMPEG_SPEED")}
+    try:
+        bin_dir = os.path.join(work_dir, "bin")
+        install_ffmpeg_stub(bin_dir)
+        os.environ["YT2MP3_FFMPEG_DIR"] = bin_dir
+        if args.ffmpeg_speed is not None:
+            os.environ["STUB_FFMPEG_SPEED"] = str(args.ffmpeg_speed)
+        stub_ytdlp.install()
+        if args.profile:
+            set_profiling(True)
+        if not args.verbose:
+            # Uygulama logları terminal yerine çalışma klasöründeki dosyaya yazılır
+            setup_logging(log_file=os.path.join(work_dir, "benchmark.log"))
+
+        with MediaServer(latency=args.latency, bandwidth=args.bandwidth, duration=args.duration) as server:
+            print(f"🧪 Benchmarks: {', '.join(names)}  (server {server.base_url}, work dir {work_dir})")
+            with open(os.devnull, "w", encoding="utf-8") as devnull:
+                output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+                with output:
+                    results = run_scenarios(names, work_dir, server, args)
+    finally:
+        if not args.verbose:
+            shutdown_logging()
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print_results(results)
+    if args.profile:
+        print()
+        print_profile_summary()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "options": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Results written to {args.json}")
+
+    if args.compare:
+        if compare_results(results, args.compare, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,831 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Benchmark Senaryoları
+Her senaryo gerçek kod yolunu (start_download_process, convert_existing_files,
+history_utils, search_module) taklit YouTube/ffmpeg ile çalıştırır ve
+verim (iş/sn, MB/sn) ile gecikme (p50/p95) döndürür.
+"""
+import hashlib
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import chapter_utils
+import download_module
+import history_utils
+from benchmarks.media_server import write_mp3_file
+from search_module import build_index
+from trace_module import percentile
+
+
+class StubWidget:
+    """Tkinter widget'larının (label, button, progress bar, entry) yerine geçer"""
+    def __init__(self, value=""):
+        self.value = value
+        self.options = {}
+
+    def config(self, **kwargs):
+        self.options.update(kwargs)
+
+    configure = config
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def __getitem__(self, key):
+        return self.options.get(key)
+
+    def get(self):
+        return self.value
+
+    def delete(self, *args):
+        self.value = ""
+
+    def pack(self, *args, **kwargs):
+        pass
+
+    def pack_forget(self):
+        pass
+
+
+class StubRoot:
+    """root.after çağrılarını hemen çalıştırır (ana döngü yok)"""
+    def after(self, delay, callback=None, *args):
+        if callback:
+            callback(*args)
+
+    def update_idletasks(self):
+        pass
+
+
+class StubGUI:
+    """gui_instance arayüzü: ilerleme ve başarı bildirimlerini kaydeder"""
+    def __init__(self):
+        self.progress_updates = 0
+        self.finished_file = None
+
+    def update_progress(self, *args, **kwargs):
+        self.progress_updates += 1
+
+    def reset_progress(self):
+        pass
+
+    def finish_download_success(self, file_path, music_title=None):
+        self.finished_file = file_path
+
+
+class AutoMessagebox:
+    """tkinter.messagebox yerine: onayları kabul eder, mesajları kaydeder"""
+    def __init__(self):
+        self.messages = []
+
+    def askyesno(self, title, message):
+        return True
+
+    def _record(self, title, message):
+        self.messages.append((title, message))
+
+    showinfo = showwarning = showerror = _record
+
+
+def patch_messageboxes():
+    """download_module ve gui_module'deki messagebox'ı AutoMessagebox ile değiştir"""
+    import gui_module
+    box = AutoMessagebox()
+    download_module.messagebox = box
+    gui_module.messagebox = box
+    return box
+
+
+def summarize_latencies(name, latencies, wall, items, total_bytes=0, **extra):
+    """Ortak sonuç sözlüğü"""
+    ordered = sorted(latencies)
+    result = {
+        "scenario": name,
+        "items": items,
+        "wall_s": round(wall, 4),
+        "throughput_items_s": round(items / wall, 3) if wall > 0 else None,
+        "throughput_mb_s": round(total_bytes / wall / 1024 / 1024, 3) if wall > 0 and total_bytes else None,
+        "p50_s": round(percentile(ordered, 0.50), 4) if ordered else None,
+        "p95_s": round(percentile(ordered, 0.95), 4) if ordered else None,
+        "max_s": round(ordered[-1], 4) if ordered else None,
+    }
+    result.update(extra)
+    return result
+
+
+def _download_one(url, extra_targets=None, selected_format="MP3 128kbps (Car Compatible)"):
+    """Tek bir indirmeyi arayüz yoluyla (start_download_process) çalıştır"""
+    gui = StubGUI()
+    widgets = {name: StubWidget() for name in ("entry", "download", "stop", "status", "progress")}
+    format_var = StubWidget(selected_format)
+    start = time.perf_counter()
+    download_module.start_download_process(
+        url, None, format_var, widgets["entry"], widgets["download"], widgets["stop"],
+        widgets["status"], widgets["progress"], StubRoot(), gui_instance=gui, extra_targets=extra_targets)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(gui.finished_file) if gui.finished_file and os.path.exists(gui.finished_file) else 0
+    return elapsed, gui.finished_file, size
+
+
+def bench_download(server, count=1, workers=1, name=None, extra_targets=None):
+    """
+    count adet indirme; workers > 1 ise aynı anda birden fazla iş.
+    extra_targets verilirse her iş ek kopyaları tek ffmpeg geçişinde üretir.
+    """
+    urls = [server.video_url(f"bench{i:06d}") for i in range(count)]
+    latencies = []
+    failures = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for elapsed, new_file, size in executor.map(lambda url: _download_one(url, extra_targets), urls):
+            if new_file:
+                latencies.append(elapsed)
+                total_bytes += size
+            else:
+                failures += 1
+    wall = time.perf_counter() - start
+
+    history = history_utils.load_history()
+    return summarize_latencies(name or ("single_track" if count == 1 else "batch"), latencies, wall,
+                               count - failures, total_bytes, failures=failures, workers=workers,
+                               history_urls=len(history.get("urls", [])),
+                               server_mb=round(server.bytes_sent / 1024 / 1024, 2))
+
+
+def bench_bandwidth(server, count=8, workers=4, limit="1M", job_limit=None):
+    """
+    Ortak hız sınırı: workers kadar eşzamanlı indirme toplamda limit'i aşmamalı.
+    achieved_mb_s sunucudan çekilen toplam bayt / indirme süresi.
+    """
+    import bandwidth_utils
+
+    bandwidth_utils.set_rate_limit(limit, job_limit)
+    bytes_before = server.bytes_sent
+    try:
+        result = bench_download(server, count=count, workers=workers, name="bandwidth_limit")
+    finally:
+        bandwidth_utils.set_rate_limit(None, None)
+    sent = server.bytes_sent - bytes_before
+    result.update(limit=limit, job_limit=job_limit,
+                  limit_mb_s=round((bandwidth_utils.parse_rate(limit) or 0) / 1024 / 1024, 3),
+                  achieved_mb_s=round(sent / result["wall_s"] / 1024 / 1024, 3))
+    return result
+
+
+def bench_outage(server, count=40, workers=4, fault_delay=0.5):
+    """
+    Extractor kesintisi: 'ios' istemcisi her denemede fault_delay sonra hata verir.
+    Devre kesici kapalı/açık iki tur; açıkken ilk birkaç hatadan sonra işler
+    bozuk istemciyi hiç denememeli (wasted_s ~ 0).
+    """
+    import retry_utils
+    from benchmarks import stub_ytdlp
+
+    stub_ytdlp.FAULTS["ios"] = "Failed to extract any player response"
+    stub_ytdlp.FAULT_DELAY = fault_delay
+    base_dir = os.environ["YT2MP3_DATA_DIR"]
+    results = []
+    try:
+        for breaker in (False, True):
+            _isolated_data_dir(base_dir, f"breaker-{'on' if breaker else 'off'}")
+            retry_utils.set_circuit_breaker(breaker)
+            result = bench_download(server, count=count, workers=workers,
+                                    name=f"outage_breaker_{'on' if breaker else 'off'}")
+            summary = retry_utils.get_retry_engine().summary()
+            result.update(attempts=summary["attempts"], failed_attempts=sum(summary["errors"].values()),
+                          wasted_s=round(sum(summary["errors"].values()) * fault_delay, 2),
+                          clients=summary["clients"])
+            results.append(result)
+    finally:
+        stub_ytdlp.FAULTS.pop("ios", None)
+        retry_utils.set_circuit_breaker(retry_utils.is_circuit_breaker_enabled())
+    return results
+
+
+def bench_disk(server, count=16, workers=4, fit_jobs=2):
+    """
+    Disk kabul kontrolü: yedek alan, boş alana sadece fit_jobs işin tahmini
+    ihtiyacı sığacak şekilde ayarlanır. İşler bekletilmeli ama başarısız
+    olmamalı (max_concurrent ~ fit_jobs; gerçek boş alan dosya sistemi
+    ayırmalarıyla biraz oynar). İkinci turda tek iş bile sığmaz: hepsi indirme
+    başlamadan başarısız olmalı ve Music'te dosya kalmamalı.
+    """
+    import shutil
+    import disk_utils
+
+    patch_messageboxes()
+    need = disk_utils.estimate_job_bytes(server.metadata("bench000000"), [("mp3", "128")])
+    base_dir = os.environ["YT2MP3_DATA_DIR"]
+    finished = {"bytes": 0}
+
+    def disk_usage(path):
+        # Biten işlerin çıktıları sayılmaz: diskte sadece çalışan işler yer kaplıyor gibi
+        usage = shutil.disk_usage(path)
+        return usage._replace(free=usage.free + finished["bytes"])
+
+    guard = disk_utils.DiskGuard(preallocate=True, poll=0.2, disk_usage=disk_usage)
+    original = disk_utils._state["guard"]
+    disk_utils._state["guard"] = guard
+    release = guard._release
+
+    def release_finished(reservation):
+        # Kütüphaneye kaydedilmiş (bitmiş) çıktılar; yazılmakta olanlar sayılmaz
+        music_folder = history_utils.get_music_folder()
+        with history_utils.HISTORY_LOCK:
+            library = history_utils.load_history().get("library", {})
+        finished["bytes"] = sum(os.path.getsize(os.path.join(music_folder, path)) for path in library
+                                if os.path.exists(os.path.join(music_folder, path)))
+        release(reservation)
+
+    guard._release = release_finished
+    results = []
+    try:
+        for name, jobs in (("disk_admission_held", fit_jobs + 0.5), ("disk_admission_full", 0.5)):
+            _isolated_data_dir(base_dir, name)
+            music_folder = history_utils.get_music_folder()
+            os.makedirs(music_folder, exist_ok=True)
+            free = shutil.disk_usage(music_folder).free
+            guard.reserve_bytes = free - int(need * jobs)
+            guard.stats.update(admitted=0, held=0, rejected=0, peak_jobs=0, waited_s=0.0)
+            finished["bytes"] = 0
+            result = bench_download(server, count=count, workers=workers, name=name)
+            leftovers = [f for _, _, files in os.walk(music_folder) for f in files
+                         if f.endswith((".part", ".m4a")) or f.startswith(disk_utils.RESERVE_PREFIX)]
+            result.update(need_mb=round(need / 1024 / 1024, 2), fit_jobs=jobs, max_concurrent=guard.stats["peak_jobs"],
+                          held=guard.stats["held"], rejected=guard.stats["rejected"],
+                          waited_s=round(guard.stats["waited_s"], 2), leftover_files=len(leftovers))
+            results.append(result)
+    finally:
+        disk_utils._state["guard"] = original
+    return results
+
+
+def bench_chapters(server, count=1, duration=3600.0, chapters=12):
+    """
+    Bölümlü uzun video: tek indirme, bölümler paralel ffmpeg süreçlerinde
+    kodlanır (chapter_encode fazı), her bölüm ayrı tag'li parça olur.
+    """
+    video_ids = [f"chap{i:05d}" for i in range(count)]
+    for video_id in video_ids:
+        server.add_media(video_id, duration, chapters)
+    chapter_utils.set_chapter_split(True)
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    try:
+        for video_id in video_ids:
+            elapsed, new_file, _ = _download_one(server.video_url(video_id))
+            if new_file:
+                latencies.append(elapsed)
+            else:
+                failures += 1
+    finally:
+        chapter_utils.set_chapter_split(False)
+    wall = time.perf_counter() - start
+
+    history = history_utils.load_history()
+    tracks = len(history.get("music_titles", []))
+    total_bytes = sum(os.path.getsize(os.path.join(history_utils.get_music_folder(), path))
+                      for path in history.get("library", {}))
+    return summarize_latencies("chapter_split", latencies, wall, count - failures, total_bytes,
+                               failures=failures, tracks=tracks, chapters_per_video=chapters,
+                               media_duration_s=duration)
+
+
+def bench_clip(server, count=5, duration=3600.0, clip="20:00-23:00"):
+    """
+    Uzun videodan kısa klip: sadece aralığa düşen baytlar indirilir ve
+    sadece o bölüm kodlanır; server_mb tam indirmeyle karşılaştırılabilir.
+    """
+    video_ids = [f"clip{i:05d}" for i in range(count)]
+    for video_id in video_ids:
+        server.add_media(video_id, duration)
+    bytes_before = server.bytes_sent
+    latencies = []
+    failures = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    for video_id in video_ids:
+        elapsed, new_file, size = _download_one(f"{server.video_url(video_id)} {clip}")
+        if new_file:
+            latencies.append(elapsed)
+            total_bytes += size
+        else:
+            failures += 1
+    wall = time.perf_counter() - start
+
+    full_mb = sum(server.media(video_id).size for video_id in video_ids) / 1024 / 1024
+    return summarize_latencies("clip_range", latencies, wall, count - failures, total_bytes,
+                               failures=failures, clip=clip, media_duration_s=duration,
+                               server_mb=round((server.bytes_sent - bytes_before) / 1024 / 1024, 2),
+                               full_source_mb=round(full_mb, 2))
+
+
+def bench_media_cache(server, count=10, repeats=3,
+                      formats=("MP3 (128k) - Car Compatible", "MP3 (320k) - High Quality", "M4A - Mobile")):
+    """
+    Medya önbelleği: count video her formatta bir kez (ilk format indirir,
+    diğerleri önbellekteki kaynaktan kodlar), ardından repeats tur aynı istekler
+    (çıktı önbellekten hardlink). p50/p95 tekrar isteklerinin gecikmesidir.
+    """
+    import media_cache
+
+    video_ids = [f"mcache{i:05d}" for i in range(count)]
+    media_cache.set_media_cache(True)
+    hit_latencies = []
+    failures = 0
+    start = time.perf_counter()
+    try:
+        for video_id in video_ids:
+            for selected_format in formats:
+                if not _download_one(server.video_url(video_id), selected_format=selected_format)[1]:
+                    failures += 1
+        cold = time.perf_counter() - start
+        cold_mb = server.bytes_sent / 1024 / 1024
+        for _ in range(repeats):
+            for video_id in video_ids:
+                for selected_format in formats:
+                    elapsed, new_file, _ = _download_one(server.video_url(video_id), selected_format=selected_format)
+                    if new_file:
+                        hit_latencies.append(elapsed)
+                    else:
+                        failures += 1
+    finally:
+        media_cache.set_media_cache(False)
+    wall = time.perf_counter() - start
+
+    summary = media_cache.get_media_cache().summary()
+    return summarize_latencies("media_cache", hit_latencies, wall, len(hit_latencies), failures=failures,
+                               cold_s=round(cold, 3), cold_per_request_s=round(cold / (count * len(formats)), 4),
+                               server_mb=round(server.bytes_sent / 1024 / 1024, 2), cold_server_mb=round(cold_mb, 2),
+                               cache_hits=summary["hits"], cache_entries=summary["entries"],
+                               cache_mb=round(summary["bytes"] / 1024 / 1024, 2))
+
+
+def _api_call(base_url, method, path, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=90) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def bench_api(server, count=50, workers=4, cancel=2):
+    """
+    HTTP iş API'si: işler tek POST ile gönderilir, bitişleri long-poll olay
+    akışından izlenir; son `cancel` iş kuyruktayken iptal edilir.
+    Gecikme = gönderim -> "success" olayı.
+    """
+    from api_server import ApiServer
+    from job_queue import JobManager
+
+    urls = [server.video_url(f"api{i:06d}") for i in range(count)]
+    latencies = []
+    finished = {}
+    start = time.perf_counter()
+    with ApiServer(JobManager(max_workers=workers), port=0) as api:
+        jobs = _api_call(api.base_url, "POST", "/api/jobs", {"urls": urls})["jobs"]
+        submitted = time.perf_counter()
+        for job in jobs[len(jobs) - cancel:]:
+            _api_call(api.base_url, "DELETE", f"/api/jobs/{job['id']}")
+        after = 0
+        polls = 0
+        while len(finished) < len(jobs):
+            reply = _api_call(api.base_url, "GET", f"/api/events?after={after}&timeout=30")
+            polls += 1
+            after = reply["last"]
+            for event in reply["events"]:
+                if event["type"] in ("success", "error", "cancelled"):
+                    job_id = event["job"]["id"]
+                    finished.setdefault(job_id, event["type"])
+                    if event["type"] == "success":
+                        latencies.append(time.perf_counter() - submitted)
+        history = _api_call(api.base_url, "GET", "/api/history?limit=5")
+    wall = time.perf_counter() - start
+
+    states = list(finished.values())
+    return summarize_latencies("http_api", latencies, wall, states.count("success"),
+                               failures=states.count("error"), cancelled=states.count("cancelled"),
+                               workers=workers, polls=polls, history_total=history["total"])
+
+
+def _start_worker_process(coordinator_url, data_dir, worker_id, slots):
+    """Ayrı süreçte çalışan (taklit yt-dlp ile); kendi veri klasörü, ortak ffmpeg taklidi"""
+    import subprocess
+    import sys
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys; from benchmarks import stub_ytdlp; stub_ytdlp.install(); import main; "
+            "sys.exit(main.main(sys.argv[1:]))")
+    env = dict(os.environ, YT2MP3_DATA_DIR=data_dir)
+    args = ["--log-file", os.path.join(data_dir, "worker.log"), "worker", "--coordinator", coordinator_url,
+            "--workers", str(slots), "--id", worker_id]
+    os.makedirs(data_dir, exist_ok=True)
+    return subprocess.Popen([sys.executable, "-c", code] + args, cwd=root, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def bench_distributed(server, count=40, worker_processes=3, slots=2):
+    """
+    Dağıtık mod: koordinatör (bu süreç) + worker_processes ayrı çalışan süreci.
+    İşler HTTP ile kiralanır, çıktılar koordinatörün Music klasörüne yüklenir.
+    Gecikme = gönderim -> "success" olayı.
+    """
+    from api_server import ApiServer
+    from distributed import JobCoordinator
+
+    urls = [server.video_url(f"dist{i:06d}") for i in range(count)]
+    latencies = []
+    finished = {}
+    workers_seen = set()
+    processes = []
+    start = time.perf_counter()
+    with ApiServer(JobCoordinator(), port=0) as api:
+        data_root = os.path.join(history_utils.get_data_dir(), "workers")
+        for index in range(worker_processes):
+            processes.append(_start_worker_process(api.base_url, os.path.join(data_root, f"w{index}"),
+                                                   f"w{index}", slots))
+        try:
+            jobs = _api_call(api.base_url, "POST", "/api/jobs", {"urls": urls})["jobs"]
+            submitted = time.perf_counter()
+            after = 0
+            while len(finished) < len(jobs):
+                reply = _api_call(api.base_url, "GET", f"/api/events?after={after}&timeout=30")
+                after = reply["last"]
+                if not reply["events"] and all(process.poll() is not None for process in processes):
+                    break
+                for event in reply["events"]:
+                    if event["type"] in ("success", "error", "cancelled"):
+                        finished.setdefault(event["job"]["id"], event["type"])
+                        if event["type"] == "success":
+                            latencies.append(time.perf_counter() - submitted)
+                            workers_seen.add(event["job"]["worker"].split("/")[0])
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=30)
+    wall = time.perf_counter() - start
+
+    history = history_utils.load_history()
+    total_bytes = sum(os.path.getsize(os.path.join(history_utils.get_music_folder(), path))
+                      for path in history.get("library", {}))
+    states = list(finished.values())
+    return summarize_latencies("distributed", latencies, wall, states.count("success"), total_bytes,
+                               failures=states.count("error"), worker_processes=worker_processes,
+                               slots=slots, workers_used=len(workers_seen),
+                               library_records=len(history.get("library", {})))
+
+
+def bench_web(server, count=20, repeats=5, workers=4):
+    """
+    cobalt uyumlu web arka ucu: count farklı video (ilk istekte dönüştürme),
+    ardından her biri için repeats kez aynı istek (önbellekten tünel) ve
+    tünelden Range ile ilk 64 KB. p50/p95 tekrar isteklerinin gecikmesidir.
+    """
+    from api_server import ApiServer
+    from job_queue import JobManager
+
+    def post(base_url, video_id):
+        body = {"url": server.video_url(video_id), "downloadMode": "audio", "audioFormat": "mp3",
+                "audioBitrate": "128"}
+        return _api_call(base_url, "POST", "/", body)
+
+    video_ids = [f"web{i:06d}" for i in range(count)]
+    hit_latencies = []
+    start = time.perf_counter()
+    with ApiServer(JobManager(max_workers=workers), port=0) as api:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            first = list(executor.map(lambda video_id: post(api.base_url, video_id), video_ids))
+        cold = time.perf_counter() - start
+        range_bytes = 0
+        for _ in range(repeats):
+            for video_id in video_ids:
+                request_start = time.perf_counter()
+                reply = post(api.base_url, video_id)
+                request = urllib.request.Request(reply["url"], headers={"Range": "bytes=0-65535"})
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    range_bytes += len(response.read())
+                hit_latencies.append(time.perf_counter() - request_start)
+        stats = api.web.stats
+    wall = time.perf_counter() - start
+
+    ok = sum(1 for reply in first if reply.get("status") == "tunnel")
+    return summarize_latencies("web_cache", hit_latencies, wall, ok, range_bytes,
+                               cold_s=round(cold, 3), cache_hits=stats["hits"], cache_misses=stats["misses"],
+                               workers=workers)
+
+
+def bench_library_conversion(file_count=200, duration=180.0, bitrate_kbps=256):
+    """
+    Büyük kütüphane dönüştürme: file_count adet yüksek bit hızlı .m4a dosyası
+    convert_existing_files ile 128 kbps MP3'e çevrilir.
+    """
+    music_folder = history_utils.get_music_folder()
+    os.makedirs(music_folder, exist_ok=True)
+    total_input = 0
+    for i in range(file_count):
+        path = os.path.join(music_folder, f"Library Track {i:05d}.m4a")
+        write_mp3_file(path, duration, bitrate_kbps)
+        total_input += os.path.getsize(path)
+
+    box = patch_messageboxes()
+    status, download_button, stop_button = StubWidget(), StubWidget(), StubWidget()
+    trace_file = os.path.join(history_utils.get_data_dir(), "traces", "download_trace.jsonl")
+
+    start = time.perf_counter()
+    download_module.convert_existing_files(status, download_button, stop_button)
+    if download_module.current_thread:
+        download_module.current_thread.join()
+    wall = time.perf_counter() - start
+
+    latencies = _trace_durations(trace_file, "convert")
+    # Başarılı dönüştürme sayısı trace'ten alınır (yarım kalan geçici .mp3'ler sayılmaz)
+    converted = len(latencies)
+    return summarize_latencies("library_conversion", latencies, wall, converted, total_input,
+                               failures=file_count - converted,
+                               messages=[title for title, _ in box.messages])
+
+
+def bench_sync(file_count=200, duration=180.0, albums=10, changes=10):
+    """
+    USB eşitleme: ilk tam kopya, değişiklik yokken tekrar (sadece stat), sonra
+    changes adet değiştirilmiş + dokunulmuş (sadece mtime) + silinmiş + yeni
+    dosyayla artımlı eşitleme. Son olarak .m4a'lar araba ön ayarına
+    dönüştürülerek ayrı bir hedefe yazılır.
+    """
+    import sync_module
+
+    music_folder = history_utils.get_music_folder()
+    target = os.path.join(history_utils.get_data_dir(), "usb")
+    os.makedirs(target, exist_ok=True)
+    paths = []
+    for i in range(file_count):
+        folder = os.path.join(music_folder, f"Album {i % albums:02d}")
+        os.makedirs(folder, exist_ok=True)
+        # Her onuncu dosya yüksek bit hızlı m4a (dönüştürme turu için)
+        ext, bitrate = (".m4a", 256) if i % 10 == 0 else (".mp3", 128)
+        path = os.path.join(folder, f"Library Track {i:05d}: live{ext}")
+        write_mp3_file(path, duration, bitrate)
+        paths.append(path)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+
+    def run(name, **options):
+        start = time.perf_counter()
+        summary = sync_module.sync_library(target, music_folder, **options)
+        wall = time.perf_counter() - start
+        synced = summary["copied"] + summary["converted"]
+        return summarize_latencies(name, [], wall, synced, summary["bytes"], failures=summary["failed"],
+                                   **{key: summary[key] for key in ("total", "copied", "converted", "unchanged",
+                                                                    "deleted", "skipped")})
+
+    results = [run("sync_full"), run("sync_noop")]
+    for i, path in enumerate(paths[1:changes * 3 + 1]):
+        if i % 3 == 0:
+            with open(path, "ab") as f:
+                f.write(b"\0" * 417)
+        elif i % 3 == 1:
+            os.utime(path, (time.time() + 10, time.time() + 10))
+        else:
+            os.remove(path)
+    for i in range(changes):
+        write_mp3_file(os.path.join(music_folder, f"New Track {i:03d}.mp3"), duration)
+    results.append(run("sync_incremental"))
+    target = os.path.join(history_utils.get_data_dir(), "usb-car")
+    os.makedirs(target, exist_ok=True)
+    results.append(run("sync_convert", convert=True, include=["*.m4a"]))
+    results[0]["library_mb"] = round(total_bytes / 1024 / 1024, 2)
+    return results
+
+
+def bench_verify(server, file_count=200, duration=180.0, downloads=8, workers=4):
+    """
+    Kütüphane bütünlük denetimi: file_count sentetik MP3 + downloads adet gerçek
+    (taklit) indirme. Dosyaların bir kısmı yarıda kesilir, sonu sıfırlanır,
+    M4A içeriğiyle değiştirilir veya boyut/mtime korunarak bozulur. Tek süreç,
+    süreç havuzu ve sadece değişenler turları ölçülür; sonra indirilmiş bozuk
+    dosyalar yeniden kuyruğa verilir ve kütüphane tekrar denetlenir.
+    Karşılaştırma: media_cache.file_digest ile tek thread okuma+özet.
+    """
+    import struct
+    import verify_module
+    from job_queue import JobManager
+    from media_cache import file_digest
+    from scanner_module import scan_library
+
+    music_folder = history_utils.get_music_folder()
+    os.makedirs(music_folder, exist_ok=True)
+    for i in range(file_count):
+        write_mp3_file(os.path.join(music_folder, f"Library Track {i:05d}.mp3"), duration)
+    manager = JobManager(max_workers=workers)
+    jobs = [job for i in range(downloads)
+            for job in manager.submit(server.video_url(f"verify{i:04d}"), "MP3 (128k) - Car Compatible", expand=False)]
+    for job in jobs:
+        job.future.result()
+    history_utils.upsert_library_records(scan_library(music_folder, history_utils.load_history().get("library")))
+    downloaded = [job.result["file"] for job in jobs if job.status == "success"]
+    library = sorted(os.path.join(music_folder, name) for name in os.listdir(music_folder)
+                     if name.startswith("Library Track"))
+    total_bytes = sum(os.path.getsize(path) for path in library + downloaded)
+
+    def atom(kind, body):
+        return struct.pack(">I4s", 8 + len(body), kind) + body
+
+    mp4 = atom(b"ftyp", b"M4A \0\0\0\0M4A ") + atom(b"moov", atom(b"mvhd", bytes(100))) + atom(b"mdat", bytes(65536))
+
+    def damage(path, kind):
+        size = os.path.getsize(path)
+        if kind == "truncated":
+            with open(path, "r+b") as f:
+                f.truncate(size // 2 + 7)
+        elif kind == "zeroed":
+            with open(path, "r+b") as f:
+                f.seek(size // 2)
+                f.write(bytes(size - size // 2))
+        elif kind == "mislabeled":
+            with open(path, "wb") as f:
+                f.write(mp4)
+
+    def run(name, **options):
+        start = time.perf_counter()
+        summary = verify_module.verify_library(music_folder, **options)
+        wall = time.perf_counter() - start
+        return summary, summarize_latencies(name, [], wall, summary["checked"], summary["bytes"],
+                                            **{key: summary[key] for key in ("total", "skipped") + verify_module.STATUSES})
+
+    # Sağlam kütüphane: özetler kaydedilir
+    results = [run("verify_clean", max_workers=1)[1]]
+    kinds = ("truncated", "zeroed", "mislabeled")
+    expected = 0
+    for i, path in enumerate(library[:15] + downloaded[:len(kinds)]):
+        damage(path, kinds[i % len(kinds)])
+        expected += 1
+    # Sessiz bozulma: boyut ve mtime aynı (sadece tam denetim bulur)
+    silent = library[15:20]
+    for path in silent:
+        stat = os.stat(path)
+        with open(path, "r+b") as f:
+            f.seek(stat.st_size // 3)
+            f.write(b"\x55" * 64)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    start = time.perf_counter()
+    for path in library + downloaded:
+        file_digest(path)
+    wall = time.perf_counter() - start
+    results.append(summarize_latencies("verify_read_hash_1t", [], wall, len(library + downloaded), total_bytes))
+    for name, options in (("verify_1proc", {"max_workers": 1, "record": False}),
+                          ("verify_pool", {"max_workers": verify_module.default_process_count(), "record": False})):
+        summary, result = run(name, **options)
+        result["detected"], result["expected"] = len(summary["problems"]), expected + len(silent)
+        results.append(result)
+    summary, result = run("verify_changed_only", changed_only=True)
+    result["detected"], result["expected"] = len(summary["problems"]), expected
+    results.append(result)
+
+    start = time.perf_counter()
+    requeued, skipped = verify_module.requeue_problems(summary["problems"], manager)
+    for job in requeued:
+        job.future.result()
+    summary, result = run("verify_after_requeue")
+    result["wall_s"] = round(result["wall_s"] + time.perf_counter() - start, 4)
+    result.update(requeued=len(requeued), redownloaded=sum(job.status == "success" for job in requeued),
+                  left_in_place=len(skipped), problems=len(summary["problems"]))
+    results.append(result)
+    manager.shutdown()
+    results[0]["library_mb"] = round(total_bytes / 1024 / 1024, 2)
+    return results
+
+
+def _trace_durations(trace_file, job_type):
+    durations = []
+    if not os.path.exists(trace_file):
+        return durations
+    with open(trace_file, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("type") == "job" and record.get("job_type") == job_type \
+                    and record.get("status") == "success":
+                durations.append(record["duration_s"])
+    return durations
+
+
+def build_synthetic_history(entries):
+    """entries adet indirme içeren history sözlüğü (dosyalar diske yazılmaz)"""
+    history = {"urls": [], "files": [], "music_titles": [], "library": {}}
+    for i in range(entries):
+        title = f"Synthetic Artist {i % 997} - Song Number {i:06d}"
+        history["urls"].append(f"https://www.youtube.com/watch?v=syn{i:08d}")
+        history["files"].append(hashlib.md5(str(i).encode()).hexdigest())
+        history["music_titles"].append(history_utils.shorten_title(title))
+        history["library"][f"{title}.mp3"] = {
+            "path": f"{title}.mp3", "ext": ".mp3", "size": 4_000_000 + i, "mtime": 1_700_000_000 + i,
+            "title": title, "artist": f"Synthetic Artist {i % 997}", "duration": 180.0,
+        }
+    return history
+
+
+def _timed(callable_, repeat=1):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = callable_()
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def bench_history(entries=100_000, lookups=1000, upserts=100, queries=("song number 0421", "artist 99", "zzz")):
+    """
+    Büyük history: kaydet/yükle, tekrar indirme kontrolü, kütüphane upsert'i
+    ve arama indeksinin kurulması/sorgulanması.
+    """
+    os.makedirs(history_utils.get_music_folder(), exist_ok=True)
+    history = build_synthetic_history(entries)
+    phases = {}
+
+    _, phases["save"] = _timed(lambda: history_utils.save_history(history))
+    size = os.path.getsize(history_utils.get_history_file())
+    loaded, phases["load"] = _timed(history_utils.load_history, repeat=3)
+
+    # download_worker'daki "bu URL daha önce indirildi mi?" kontrolü
+    urls = [f"https://www.youtube.com/watch?v=syn{i:08d}" for i in range(0, entries, max(1, entries // lookups))]
+    _, phases["duplicate_check"] = _timed(lambda: [u in loaded.get("urls", []) for u in urls])
+
+    records = [{"path": f"Upserted {i}.mp3", "ext": ".mp3", "size": i, "mtime": i} for i in range(upserts)]
+    _, phases["upsert"] = _timed(lambda: history_utils.upsert_library_records(records))
+
+    index, phases["index_build"] = _timed(lambda: build_index(loaded))
+    search_durations = []
+    for query in queries:
+        _, durations = _timed(lambda: index.search(query), repeat=20)
+        search_durations.extend(durations)
+    phases["search"] = search_durations
+
+    total_wall = sum(sum(d) for d in phases.values())
+    result = summarize_latencies("history", search_durations, total_wall, entries, size,
+                                 history_mb=round(size / 1024 / 1024, 2))
+    result["phases_ms"] = {name: round(1000 * sum(d) / len(d), 3) for name, d in phases.items()}
+    return result
+
+
+SCENARIOS = ("single", "batch", "multi", "bandwidth", "outage", "disk", "chapters", "clip", "cache", "api",
+             "distributed", "web", "convert", "sync", "verify", "history")
+
+
+def _isolated_data_dir(root, name):
+    """Her senaryo ayrı bir veri klasöründe çalışır"""
+    data_dir = os.path.join(root, name)
+    os.makedirs(data_dir, exist_ok=True)
+    os.environ["YT2MP3_DATA_DIR"] = data_dir
+    return data_dir
+
+
+def run_scenarios(names, work_dir, server, options):
+    """Seçilen senaryoları sırayla çalıştır, sonuç listesini döndür"""
+    results = []
+    for name in names:
+        _isolated_data_dir(work_dir, name)
+        download_module.current_thread = None
+        if name == "single":
+            results.append(bench_download(server, count=1, workers=1))
+        elif name == "batch":
+            results.append(bench_download(server, count=options.batch_size, workers=options.workers))
+        elif name == "multi":
+            # 128k araba kopyası + 320k arşiv kopyası, tek indirme ve tek kod çözme
+            results.append(bench_download(server, count=options.multi_size, workers=options.workers,
+                                          name="multi_output",
+                                          extra_targets=[{"format": "MP3 (320k) - High Quality"}]))
+        elif name == "bandwidth":
+            results.append(bench_bandwidth(server, workers=options.workers, limit=options.rate_limit))
+        elif name == "outage":
+            results.extend(bench_outage(server, options.outage_size, options.workers))
+        elif name == "disk":
+            results.extend(bench_disk(server, workers=options.workers))
+        elif name == "chapters":
+            results.append(bench_chapters(server, options.chapter_videos, options.chapter_duration,
+                                          options.chapter_count))
+        elif name == "clip":
+            results.append(bench_clip(server, options.clip_videos, options.chapter_duration, options.clip))
+        elif name == "cache":
+            results.append(bench_media_cache(server, options.cache_videos))
+        elif name == "api":
+            results.append(bench_api(server, options.api_jobs, options.workers))
+        elif name == "distributed":
+            results.append(bench_distributed(server, options.api_jobs, options.worker_processes))
+        elif name == "web":
+            results.append(bench_web(server, options.api_jobs, workers=options.workers))
+        elif name == "convert":
+            results.append(bench_library_conversion(options.library_size, options.library_duration))
+        elif name == "sync":
+            results.extend(bench_sync(options.library_size, options.library_duration))
+        elif name == "verify":
+            results.extend(bench_verify(server, options.library_size, options.library_duration,
+                                        workers=options.workers))
+        elif name == "history":
+            results.append(bench_history(options.history_size))
+    return results
+
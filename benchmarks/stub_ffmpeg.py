@@ -0,0 +1,204 @@
+﻿# -*- coding: utf-8 -*-
+"""
+FFmpeg Taklidi - Benchmark'larda gerçek ffmpeg yerine çalışan komut satırı aracı
+Girişi baştan sona okur (gerçek kod çözme I/O'su), süreyi tag_utils ile bulur ve
+her çıktı için istenen bit hızında sentetik MP3 yazar ('-f f32le pipe:1' için
+başında ve sonunda 2 sn sessizlik olan 1 kHz PCM ton üretir; seviyesi dosya
+adına göre değişir). -ss/-t kesimleri çıktı süresine yansır. Kodlama süresi
+STUB_FFMPEG_SPEED (gerçek zamanın katı, varsayılan 400x) ile taklit edilir.
+
+install_ffmpeg_stub(bin_dir) klasöre 'ffmpeg' (POSIX) veya 'ffmpeg.cmd' (Windows)
+başlatıcısı yazar; YT2MP3_FFMPEG_DIR bu klasöre yönlendirilir.
+"""
+import os
+import sys
+import math
+import time
+import zlib
+import array
+
+# Doğrudan script olarak çalıştırıldığında depo kökünü import yoluna ekle
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.insert(0, _REPO_ROOT)
+
+from tag_utils import read_audio_metadata
+from benchmarks.media_server import write_mp3_file
+
+# Değer almayan ffmpeg seçenekleri
+_FLAG_OPTIONS = {"-y", "-n", "-vn", "-an", "-sn", "-dn", "-nostdin", "-nostats", "-hide_banner"}
+
+DEFAULT_SPEED = 400.0
+
+# PCM tonunun başındaki ve sonundaki sessizlik (saniye)
+PCM_SILENCE = 2.0
+
+
+def parse_arguments(args):
+    """
+    ffmpeg argümanlarını (girişler, çıktılar) olarak ayrıştır.
+    Her çıktı, kendinden önce gelen seçenekleri (ör. -b:a) taşır.
+    """
+    inputs = []
+    outputs = []
+    options = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "-i" and i + 1 < len(args):
+            inputs.append(args[i + 1])
+            options = {}
+            i += 2
+        elif arg.startswith("-") and arg != "-" and arg not in _FLAG_OPTIONS and i + 1 < len(args):
+            options[arg] = args[i + 1]
+            i += 2
+        elif arg.startswith("-") and arg != "-":
+            i += 1
+        else:
+            outputs.append((arg, options))
+            options = {}
+            i += 1
+    return inputs, outputs
+
+
+def parse_bitrate(value, default=128):
+    """'128k' / '192000' -> kbps"""
+    if not value:
+        return default
+    value = value.lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]))
+    return int(value) // 1000
+
+
+def read_input(path, chunk_size=1024 * 1024):
+    """Girişi tamamen oku (kod çözücünün dosya okuması yerine), bayt sayısını döndür"""
+    total = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return total
+            total += len(chunk)
+
+
+def _progress_stream(args):
+    """'-progress pipe:1' verildiyse stdout, değilse None"""
+    if "-progress" in args:
+        target = args[args.index("-progress") + 1]
+        if target.startswith("pipe:"):
+            return sys.stdout
+    return None
+
+
+def simulate_encode(duration, speed, progress=None, period=0.1):
+    """Kodlama süresini bekle; istenirse ffmpeg -progress blokları yaz"""
+    total = duration / speed if speed > 0 else 0.0
+    started = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - started
+        done = elapsed >= total
+        if progress is not None:
+            out_time = duration if done or total == 0 else duration * elapsed / total
+            current_speed = out_time / elapsed if elapsed > 0 else 0.0
+            progress.write(f"out_time_us={int(out_time * 1_000_000)}\n"
+                           f"speed={current_speed:.3g}x\n"
+                           f"progress={'end' if done else 'continue'}\n")
+            progress.flush()
+        if done:
+            return
+        time.sleep(min(period, total - elapsed))
+
+
+def _write_zeros(stream, count, chunk=1024 * 1024):
+    while count > 0:
+        stream.write(bytes(min(chunk, count)))
+        count -= chunk
+
+
+def write_pcm_tone(stream, source, duration, sample_rate=48000, channels=2, chunk_seconds=1):
+    """
+    float32 PCM 1 kHz ton (genlik kaynak adından: parçalar farklı yüksekliklerde),
+    başında ve sonunda PCM_SILENCE sn sessizlik
+    """
+    amplitude = 0.05 + (zlib.crc32(os.path.basename(source).encode("utf-8")) % 1000) / 1000 * 0.6
+    period = sample_rate // 1000
+    frame = array.array("f")
+    for i in range(period):
+        value = amplitude * math.sin(2 * math.pi * i / period)
+        frame.extend([value] * channels)
+    if sys.byteorder != "little":
+        frame.byteswap()
+    chunk = frame.tobytes() * (sample_rate * chunk_seconds // period)
+    silence = min(PCM_SILENCE, duration / 4)
+    silence_bytes = int(silence * sample_rate) * channels * 4
+    total = int((duration - 2 * silence) * sample_rate) * channels * 4
+    _write_zeros(stream, silence_bytes)
+    while total > 0:
+        piece = chunk[:total]
+        stream.write(piece)
+        total -= len(piece)
+    _write_zeros(stream, silence_bytes)
+    stream.flush()
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if "-version" in args:
+        print("ffmpeg version benchmark-stub")
+        return 0
+
+    inputs, outputs = parse_arguments(args)
+    if not inputs or not outputs:
+        sys.stderr.write("stub ffmpeg: at least one input and one output required\n")
+        return 1
+
+    source = inputs[0]
+    try:
+        read_input(source)
+        duration = read_audio_metadata(source).get("duration") or 0.0
+    except OSError as e:
+        sys.stderr.write(f"{source}: {e}\n")
+        return 1
+
+    sys.stderr.write(f"Input #0, mp3, from '{source}':\n  Duration: {duration:.2f}\n")
+    # Kesim: -ss (giriş) ve -t (giriş veya çıktı) çıktı süresini kısaltır
+    if "-ss" in args:
+        duration = max(0.0, duration - float(args[args.index("-ss") + 1]))
+    if "-t" in args:
+        duration = min(duration, float(args[args.index("-t") + 1]))
+    progress = _progress_stream(args)
+    speed = float(os.environ.get("STUB_FFMPEG_SPEED") or DEFAULT_SPEED)
+    simulate_encode(duration, speed, progress)
+
+    for output, options in outputs:
+        if output in ("-", "pipe:", "pipe:1") or output.startswith("pipe:"):
+            if options.get("-f") == "f32le":
+                write_pcm_tone(sys.stdout.buffer, source, duration, int(options.get("-ar") or 48000),
+                               int(options.get("-ac") or 2))
+            continue
+        if os.path.exists(output) and "-y" not in args:
+            sys.stderr.write(f"File '{output}' already exists. Exiting.\n")
+            return 1
+        write_mp3_file(output, duration, parse_bitrate(options.get("-b:a")))
+    return 0
+
+
+def install_ffmpeg_stub(bin_dir):
+    """Taklit ffmpeg başlatıcısını bin_dir'e yaz ve yolunu döndür"""
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.abspath(__file__)
+    if os.name == 'nt':
+        path = os.path.join(bin_dir, "ffmpeg.cmd")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\r\n')
+    else:
+        path = os.path.join(bin_dir, "ffmpeg")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, 0o755)
+    return path
+
+
+if __name__ == "__main__":
+    sys.exit(main())
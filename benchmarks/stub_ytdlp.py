@@ -0,0 +1,222 @@
+﻿# -*- coding: utf-8 -*-
+"""
+yt-dlp Taklidi - download_module'ün kullandığı YoutubeDL API alt kümesi
+extract_info(process=False) metadata'yı yerel sunucudan alır;
+process_ie_result(download=True) medyayı parça parça Range istekleriyle indirir,
+progress/postprocessor hook'larını çağırır ve FFmpegExtractAudio'yu ffmpeg
+taklidiyle çalıştırır. download_ranges verilirse sadece aralığa düşen baytlar
+(sabit bit hızı varsayımıyla) istenir.
+ignoreerrors=True iken hatalar gerçek yt-dlp gibi fırlatılmaz, 'logger'a yazılır.
+FAULTS ile player_client başına extractor hatası taklit edilir (kesinti senaryosu).
+
+install() ile download_module._yt_dlp yerine bu modül konur.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.request
+from types import SimpleNamespace
+from urllib.parse import urlsplit, parse_qs
+
+from benchmarks.media_server import mp3_frame
+from ffmpeg_utils import get_ffmpeg_path
+
+# yt-dlp'nin YouTube için varsayılan http_chunk_size değeri
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+
+_FIELD_PATTERN = re.compile(r"%\((\w+)\)s")
+
+# player_client -> hata mesajı; FAULT_DELAY: hatadan önceki bekleme (gerçek extractor denemeleri)
+FAULTS = {}
+FAULT_DELAY = 0.0
+
+
+class DownloadError(Exception):
+    pass
+
+
+def download_range_func(chapters, ranges):
+    """yt_dlp.utils.download_range_func alt kümesi (sadece zaman aralıkları)"""
+    def inner(info_dict, ydl):
+        for start, end in ranges or []:
+            yield {"start_time": start, "end_time": min(end, info_dict.get("duration") or end)}
+    return inner
+
+
+utils = SimpleNamespace(download_range_func=download_range_func)
+
+
+def install():
+    """download_module'ün lazy yt_dlp referansını bu modülle değiştir"""
+    import download_module
+    download_module._yt_dlp = sys.modules[__name__]
+
+
+def _sanitize(value):
+    return re.sub(r'[\\/:*?"<>|]', "_", str(value))
+
+
+class YoutubeDL:
+    """Taklit YoutubeDL; parametreler gerçek yt-dlp ile aynı sözlük yapısındadır"""
+    def __init__(self, params=None):
+        self.params = params or {}
+        self.chunk_size = self.params.get("http_chunk_size") or DEFAULT_CHUNK_SIZE
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def report_error(self, message):
+        """ignoreerrors=True: logla ve devam et (None döner), aksi halde fırlat"""
+        if not self.params.get("ignoreerrors"):
+            raise DownloadError(message)
+        logger = self.params.get("logger")
+        if logger:
+            logger.error(f"ERROR: {message}")
+        else:
+            print(f"ERROR: {message}", file=sys.stderr)
+        return None
+
+    def player_client(self):
+        clients = (self.params.get("extractor_args") or {}).get("youtube", {}).get("player_client")
+        return clients[0] if clients else "default"
+
+    def extract_info(self, url, download=True, process=True):
+        parts = urlsplit(url)
+        video_id = (parse_qs(parts.query).get("v") or [None])[0]
+        if not video_id:
+            return self.report_error(f"Unsupported URL: {url}")
+        fault = FAULTS.get(self.player_client())
+        if fault:
+            time.sleep(FAULT_DELAY)
+            return self.report_error(f"[youtube] {video_id}: {fault}")
+        api_url = f"{parts.scheme}://{parts.netloc}/api/{video_id}.json"
+        try:
+            with urllib.request.urlopen(api_url, timeout=30) as response:
+                info = json.loads(response.read().decode("utf-8"))
+        except OSError as e:
+            return self.report_error(f"Unable to download API page: {e}")
+        if process:
+            return self.process_ie_result(info, download=download)
+        return info
+
+    def prepare_filename(self, info):
+        template = self.params.get("outtmpl", "%(title)s.%(ext)s")
+        if isinstance(template, dict):
+            template = template.get("default", "%(title)s.%(ext)s")
+        return _FIELD_PATTERN.sub(lambda m: _sanitize(info.get(m.group(1), "NA")), template)
+
+    def process_ie_result(self, info, download=True):
+        info = dict(info)
+        filename = self.prepare_filename(info)
+        if download:
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+            try:
+                self._download(info["url"], filename, info, self._section_bytes(info))
+                filename = self._post_process(filename, info)
+            except DownloadError as e:
+                self.report_error(str(e))
+                return info
+            info["requested_downloads"] = [{"filepath": filename}]
+        info["filepath"] = filename
+        return info
+
+    def _call_hooks(self, key, status):
+        for hook in self.params.get(key, []):
+            hook(status)
+
+    def _section_bytes(self, info):
+        """download_ranges -> (ilk bayt, son bayt hariç); aralık yoksa None"""
+        ranges = self.params.get("download_ranges")
+        section = next(iter(ranges(info, self)), None) if ranges else None
+        if not section or not info.get("filesize") or not info.get("duration"):
+            return None
+        bytes_per_second = info["filesize"] / info["duration"]
+        # Sunucu sabit boyutlu MP3 çerçeveleri gönderir; aralık çerçeve sınırına hizalanır
+        frame = len(mp3_frame(info.get("abr") or 128))
+        info["section_start"], info["section_end"] = section["start_time"], section["end_time"]
+        info["duration"] = section["end_time"] - section["start_time"]
+        first = int(section["start_time"] * bytes_per_second) // frame * frame
+        last = min(info["filesize"], int(section["end_time"] * bytes_per_second) // frame * frame)
+        return first, last
+
+    def _download(self, media_url, filename, info, section=None):
+        """HTTP Range ile parça parça indir (yt-dlp'nin http_chunk_size davranışı)"""
+        first, total = section or (0, info.get("filesize"))
+        if section:
+            total -= first
+        downloaded = 0
+        started = time.perf_counter()
+        part_file = filename + ".part"
+        with open(part_file, "wb") as f:
+            while total is None or downloaded < total:
+                end = downloaded + self.chunk_size - 1
+                if total is not None:
+                    end = min(end, total - 1)
+                request = urllib.request.Request(media_url, headers={
+                    "Range": f"bytes={first + downloaded}-{first + end}"})
+                try:
+                    with urllib.request.urlopen(request, timeout=30) as response:
+                        if total is None:
+                            content_range = response.headers.get("Content-Range", "")
+                            total = int(content_range.rsplit("/", 1)[-1]) if "/" in content_range else None
+                        while True:
+                            data = response.read(64 * 1024)
+                            if not data:
+                                break
+                            f.write(data)
+                            downloaded += len(data)
+                            elapsed = time.perf_counter() - started
+                            self._call_hooks("progress_hooks", {
+                                "status": "downloading",
+                                "filename": filename,
+                                "downloaded_bytes": downloaded,
+                                "total_bytes": total,
+                                "elapsed": elapsed,
+                                "speed": downloaded / elapsed if elapsed > 0 else None,
+                            })
+                except OSError as e:
+                    self._call_hooks("progress_hooks", {"status": "error", "error": str(e)})
+                    raise DownloadError(f"Unable to download media: {e}")
+                if total is None:
+                    break
+        os.replace(part_file, filename)
+        self._call_hooks("progress_hooks", {
+            "status": "finished",
+            "filename": filename,
+            "total_bytes": downloaded,
+            "elapsed": time.perf_counter() - started,
+        })
+
+    def _post_process(self, filename, info):
+        for pp in self.params.get("postprocessors", []):
+            if pp.get("key") != "FFmpegExtractAudio":
+                continue
+            codec = pp.get("preferredcodec") or "mp3"
+            target = os.path.splitext(filename)[0] + "." + codec
+            if target == filename:
+                continue
+            self._call_hooks("postprocessor_hooks", {"status": "started", "postprocessor": "ExtractAudio",
+                                                     "info_dict": info})
+            ffmpeg = get_ffmpeg_path()
+            command = [ffmpeg, "-y", "-i", filename, "-vn"]
+            args = self.params.get("postprocessor_args")
+            if isinstance(args, dict):
+                args = args.get("default", [])
+            command += list(args or [])
+            if "-b:a" not in command and pp.get("preferredquality"):
+                command += ["-b:a", f"{pp['preferredquality']}k"]
+            command.append(target)
+            result = subprocess.run(command, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise DownloadError(f"Postprocessing: {result.stderr.strip()[-200:]}")
+            os.remove(filename)
+            filename = target
+            self._call_hooks("postprocessor_hooks", {"status": "finished", "postprocessor": "ExtractAudio",
+                                                     "info_dict": info})
+        return filename
@@ -0,0 +1,72 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Bölüm (Chapter) Modülü - Uzun videoları bölümlerine göre ayrı parçalara ayırma
+yt-dlp info sözlüğündeki "chapters" listesinden parça listesi, dosya/klasör
+isimleri ve paralel kodlama için iş parçacığı sayısı.
+
+Ses bir kez indirilir; her bölüm kendi ffmpeg sürecinde (-ss/-t ile) paralel
+kodlanır. Parçalar Music/<video başlığı>/NN - <bölüm>.mp3 olarak kaydedilir.
+
+Açmak için: GUI'deki "Split chapters", download --split-chapters veya
+YT2MP3_SPLIT_CHAPTERS=1.
+"""
+import os
+import re
+from log_utils import debug_print
+
+# Bundan kısa bölümler (ör. boş "intro" işaretleri) bir sonrakine katılmaz, atlanır
+MIN_CHAPTER_SECONDS = 1.0
+# Windows dosya sistemi sınırları için isim uzunluğu
+MAX_NAME_LENGTH = 120
+
+_INVALID_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+_state = {"enabled": os.environ.get("YT2MP3_SPLIT_CHAPTERS", "") not in ("", "0")}
+
+
+def set_chapter_split(enabled):
+    """Bölümlere ayırmayı aç/kapat (yeni işler için geçerli)"""
+    _state["enabled"] = bool(enabled)
+    debug_print(f"📚 Chapter splitting {'enabled' if enabled else 'disabled'}", "INFO")
+
+
+def is_chapter_split_enabled():
+    return _state["enabled"]
+
+
+def safe_filename(name, fallback="Untitled"):
+    """Dosya/klasör ismi için geçersiz karakterleri temizle ve kısalt"""
+    name = _INVALID_CHARS.sub("_", name or "").strip().rstrip(".")
+    name = re.sub(r"\s+", " ", name)[:MAX_NAME_LENGTH].strip()
+    return name or fallback
+
+
+def chapter_tracks(info):
+    """
+    info["chapters"] -> [{"index", "title", "start", "end", "stem"}, ...]
+    İkiden az geçerli bölüm varsa boş liste (video tek parça kalır).
+    """
+    chapters = info.get("chapters") or []
+    duration = info.get("duration")
+    tracks = []
+    for chapter in chapters:
+        start = float(chapter.get("start_time") or 0.0)
+        end = chapter.get("end_time")
+        end = float(end) if end is not None else (float(duration) if duration else None)
+        if end is None or end - start < MIN_CHAPTER_SECONDS:
+            continue
+        tracks.append({"title": (chapter.get("title") or "").strip(), "start": start, "end": end})
+    if len(tracks) < 2:
+        return []
+
+    width = max(2, len(str(len(tracks))))
+    for index, track in enumerate(tracks, 1):
+        track["index"] = index
+        track["title"] = track["title"] or f"Track {index}"
+        track["stem"] = f"{index:0{width}d} - {safe_filename(track['title'])}"
+    return tracks
+
+
+def default_chapter_workers(track_count):
+    """Paralel ffmpeg süreci sayısı: çekirdek sayısı kadar (libmp3lame tek çekirdek kullanır)"""
+    return max(1, min(track_count, os.cpu_count() or 1))
@@ -0,0 +1,117 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Klip (Zaman Aralığı) Modülü - Videonun sadece bir bölümünü indirme
+URL kutusuna/CLI'ye yazılan başlangıç-bitiş zamanlarını çözer ve işin
+kimliği olarak URL'ye medya fragmanı (#t=başlangıç,bitiş) ekler; böylece
+aynı videonun farklı klipleri ayrı indirme sayılır.
+
+İndirme yt-dlp'nin download_ranges seçeneği ile yapılır: sadece aralığı
+kapsayan bayt/fragman aralıkları çekilir ve sadece o bölüm kodlanır.
+
+Kabul edilen yazımlar:
+    https://youtu.be/ID 1:00-4:30       (başlangıç-bitiş)
+    https://youtu.be/ID 1h02m-           (başlangıçtan sona kadar)
+    https://youtu.be/ID -90              (baştan 90. saniyeye kadar)
+    https://youtu.be/ID#t=60,270         (medya fragmanı)
+"""
+import re
+
+_TIME_PATTERN = re.compile(r"^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+(?:\.\d+)?)s?)?$")
+_FRAGMENT_PATTERN = re.compile(r"#t=([\d.:hms]*)(?:,([\d.:hms]*))?$")
+
+
+class ClipError(ValueError):
+    """Zaman aralığı geçersiz"""
+
+
+def parse_timestamp(text):
+    """'90', '90.5', '1:30', '1:02:03', '1h2m3s', '2m' -> saniye"""
+    text = text.strip().lower()
+    if not text:
+        raise ClipError("Empty timestamp")
+    if ":" in text:
+        parts = text.split(":")
+        if len(parts) > 3 or not all(re.fullmatch(r"\d+(?:\.\d+)?", p) for p in parts):
+            raise ClipError(f"Invalid timestamp: {text}")
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+        return seconds
+    match = _TIME_PATTERN.match(text)
+    if not match or not any(match.groups()):
+        raise ClipError(f"Invalid timestamp: {text}")
+    hours, minutes, seconds = match.groups()
+    return int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds or 0)
+
+
+def make_clip(start=None, end=None):
+    """Başlangıç/bitiş (saniye veya metin) -> {"start", "end"}; end None ise sona kadar"""
+    start = parse_timestamp(start) if isinstance(start, str) and start.strip() else float(start or 0.0)
+    if isinstance(end, str):
+        end = parse_timestamp(end) if end.strip() else None
+    end = float(end) if end is not None else None
+    if start < 0 or (end is not None and end <= start):
+        raise ClipError(f"Clip end must be after start ({format_timestamp(start)}-"
+                        f"{format_timestamp(end) if end is not None else ''})")
+    if start == 0 and end is None:
+        return None
+    return {"start": start, "end": end}
+
+
+def parse_clip(text):
+    """'1:00-4:30', '1:00-', '-90' -> {"start", "end"}"""
+    start, separator, end = text.strip().partition("-")
+    if not separator:
+        raise ClipError(f"Clip range needs START-END: {text}")
+    return make_clip(start, end)
+
+
+def split_clip(entry):
+    """
+    URL kutusu metni -> (url, klip veya None).
+    'URL 1:00-4:30' ve 'URL#t=60,270' yazımlarını tanır.
+    """
+    entry = entry.strip()
+    url, _, rest = entry.partition(" ")
+    if rest.strip():
+        return url, parse_clip(rest)
+    match = _FRAGMENT_PATTERN.search(url)
+    if match:
+        return url[:match.start()], make_clip(match.group(1), match.group(2) or "")
+    return url, None
+
+
+def clip_url(url, clip):
+    """İşin kimliği: URL + #t=başlangıç,bitiş (klip yoksa URL'nin kendisi)"""
+    if not clip:
+        return url
+    end = f",{clip['end']:g}" if clip["end"] is not None else ""
+    return f"{url}#t={clip['start']:g}{end}"
+
+
+def format_timestamp(seconds):
+    """Saniye -> '4:30' / '1:02:03'"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def clip_label(clip):
+    """Dosya ismine eklenecek etiket (':' Windows'ta geçersiz): '1m00s-4m30s'"""
+    def part(seconds):
+        seconds = int(round(seconds))
+        hours, rest = divmod(seconds, 3600)
+        minutes, seconds = divmod(rest, 60)
+        return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+    return f"{part(clip['start'])}-{part(clip['end']) if clip['end'] is not None else 'end'}"
+
+
+def clip_duration(clip, duration=None):
+    """Klibin süresi (bitiş yoksa videonun süresine kadar; bilinmiyorsa None)"""
+    end = clip["end"] if clip["end"] is not None else duration
+    if end is None:
+        return None
+    if duration:
+        end = min(end, duration)
+    return max(0.0, end - clip["start"])
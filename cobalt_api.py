@@ -0,0 +1,233 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Cobalt Uyumlu Yerel Arka Uç - index.html web uygulaması için
+cobalt'ın JSON API'sini (POST /, {"url", "downloadMode", "audioFormat",
+"audioBitrate"}) download_module ile karşılar. Dönüşüm JobManager'ın çalışan
+havuzunda yapılır, yanıt {"status": "tunnel", "url", "filename"} olur; dosya
+api_server'ın /tunnel/ yolundan HTTP Range desteğiyle sunulur.
+
+Çıktılar video ID + format anahtarıyla önbelleğe alınır (web_cache.json):
+aynı istek tekrar geldiğinde iş çalışmaz, dosya hemen döner. Aynı anahtar için
+aynı anda gelen istekler tek işi bekler.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from history_utils import get_data_dir, get_music_folder
+from log_utils import debug_print
+
+CACHE_FILE = "web_cache.json"
+
+# cobalt audioFormat/audioBitrate -> GUI format etiketi
+_MP3_LABELS = ((320, "MP3 (320k) - High Quality"), (192, "MP3 (192k) - Good Quality"),
+               (0, "MP3 (128k) - Car Compatible"))
+_FORMAT_LABELS = {"wav": "WAV - Lossless", "best": "M4A - Mobile", "m4a": "M4A - Mobile"}
+# Bu arka ucun üretemediği biçimler (web uygulaması bunları genel cobalt'a yollar)
+UNSUPPORTED_FORMATS = ("opus", "ogg")
+
+
+class CobaltError(Exception):
+    """cobalt hata kodu ile dönülecek hata (ör. error.api.link.invalid)"""
+    def __init__(self, code, status=400, **context):
+        super().__init__(code)
+        self.code = code
+        self.status = status
+        self.context = context
+
+    def payload(self):
+        error = {"code": self.code}
+        if self.context:
+            error["context"] = self.context
+        return {"status": "error", "error": error}
+
+
+def cobalt_format(payload):
+    """İstek gövdesi -> (GUI format etiketi, önbellek anahtarı parçası)"""
+    if payload.get("downloadMode", "audio") not in ("audio", "auto"):
+        raise CobaltError("error.api.fetch.empty", mode=payload.get("downloadMode"))
+    audio_format = str(payload.get("audioFormat") or "mp3").lower()
+    if audio_format in UNSUPPORTED_FORMATS:
+        raise CobaltError("error.api.format.unsupported", format=audio_format,
+                          supported=["mp3", "wav", "best"])
+    if audio_format == "mp3":
+        try:
+            bitrate = int(payload.get("audioBitrate") or 128)
+        except (TypeError, ValueError):
+            raise CobaltError("error.api.invalid_body", field="audioBitrate")
+        label = next(label for minimum, label in _MP3_LABELS if bitrate >= minimum)
+    elif audio_format in _FORMAT_LABELS:
+        label = _FORMAT_LABELS[audio_format]
+    else:
+        raise CobaltError("error.api.invalid_body", field="audioFormat")
+    return label, "-".join(label.split(" - ")[0].replace("(", "").replace(")", "").lower().split())
+
+
+def video_key(url):
+    """Önbellek için video kimliği: YouTube ID'si, değilse URL özeti"""
+    from media_cache import media_id
+    return media_id(url)
+
+
+def tunnel_id(key):
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+class OutputCache:
+    """
+    Anahtar -> üretilmiş dosya. Kayıt dosya boyutu/mtime ile doğrulanır;
+    dosya silinmiş veya değişmişse (ör. yeniden tag'lendi) kayıt geçersiz sayılır.
+    """
+    def __init__(self, path=None, music_folder=None):
+        self.path = path or os.path.join(get_data_dir(), CACHE_FILE)
+        self.music_folder = music_folder or get_music_folder()
+        self.lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def full_path(self, entry):
+        return os.path.join(self.music_folder, entry["path"])
+
+    def get(self, key):
+        """Geçerli kayıt veya None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            try:
+                stat = os.stat(self.full_path(entry))
+            except OSError:
+                stat = None
+            if stat is None or stat.st_size != entry["size"]:
+                del self.entries[key]
+                self._save()
+                return None
+            if stat.st_mtime != entry["mtime"]:
+                # Tag yeniden yazımı: ses aynı, kayıt güncellenir
+                entry["mtime"] = stat.st_mtime
+            entry["hits"] = entry.get("hits", 0) + 1
+            entry["last_used"] = time.time()
+            return dict(entry)
+
+    def put(self, key, file_path, url):
+        stat = os.stat(file_path)
+        entry = {
+            "path": os.path.relpath(file_path, self.music_folder).replace(os.sep, "/"),
+            "filename": os.path.basename(file_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "url": url,
+            "tunnel": tunnel_id(key),
+            "created": time.time(),
+            "last_used": time.time(),
+            "hits": 0,
+        }
+        with self.lock:
+            self.entries[key] = entry
+            self._save()
+        return dict(entry)
+
+    def by_tunnel(self, tunnel):
+        """Tünel kimliği -> (anahtar, kayıt) veya (None, None)"""
+        with self.lock:
+            for key, entry in self.entries.items():
+                if entry.get("tunnel") == tunnel:
+                    return key, dict(entry)
+        return None, None
+
+
+class CobaltService:
+    """
+    cobalt isteklerini karşılar: önbellekte varsa hemen, yoksa JobManager'da
+    dönüştürüp bekler. Aynı anahtar için eşzamanlı istekler tek işi paylaşır.
+    """
+    def __init__(self, manager, cache=None, wait_timeout=3600):
+        self.manager = manager
+        self.cache = cache or OutputCache(music_folder=manager.music_folder)
+        self.wait_timeout = wait_timeout
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "shared": 0}
+        self.started = time.time()
+
+    def handle(self, payload, base_url, client=None):
+        """İstek gövdesi -> cobalt yanıtı (dict); hatada CobaltError"""
+        from download_module import normalize_url, is_playlist_url, extract_video_id
+
+        url = str(payload.get("url") or "").strip()
+        if not url.startswith(("http://", "https://")):
+            raise CobaltError("error.api.link.invalid")
+        if is_playlist_url(url) and not extract_video_id(url):
+            raise CobaltError("error.api.link.unsupported", reason="playlist")
+        url = normalize_url(url)
+        label, format_key = cobalt_format(payload)
+        key = f"{video_key(url)}:{format_key}"
+
+        entry = self.cache.get(key)
+        if entry:
+            self.stats["hits"] += 1
+            debug_print(f"⚡ Web cache hit: {entry['filename']}", "DEBUG")
+            return self.tunnel_response(entry, base_url)
+
+        with self.lock:
+            job = self.inflight.get(key)
+            if job is None:
+                self.stats["misses"] += 1
+                job = self.manager.submit(url, label, client=client, expand=False)[0]
+                self.inflight[key] = job
+            else:
+                self.stats["shared"] += 1
+        try:
+            job.future.result(timeout=self.wait_timeout)
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                if self.inflight.get(key) is job:
+                    del self.inflight[key]
+
+        if job.status != "success":
+            if "unavailable" in (job.error or "").lower() or "private" in (job.error or "").lower():
+                raise CobaltError("error.api.content.video.unavailable", status=400)
+            raise CobaltError("error.api.fetch.fail", status=500, message=(job.error or job.status)[:300])
+        entry = self.cache.get(key) or self.cache.put(key, job.result["file"], url)
+        return self.tunnel_response(entry, base_url)
+
+    @staticmethod
+    def tunnel_response(entry, base_url):
+        from urllib.parse import quote
+        return {
+            "status": "tunnel",
+            "url": f"{base_url}/tunnel/{entry['tunnel']}/{quote(entry['filename'])}",
+            "filename": entry["filename"],
+        }
+
+    def tunnel_file(self, tunnel):
+        """Tünel kimliği -> (tam_yol, dosya_adı) veya None"""
+        key, entry = self.cache.by_tunnel(tunnel)
+        if key is None or self.cache.get(key) is None:
+            return None
+        return self.cache.full_path(entry), entry["filename"]
+
+    def info(self):
+        """cobalt'ın GET / sunucu bilgisi"""
+        from media_cache import is_media_cache_enabled, get_media_cache
+        info = {
+            "cobalt": {"version": "10.0.0-yt2mp3", "url": "", "startTime": str(int(self.started * 1000)),
+                       "durationLimit": 10800, "services": ["youtube"]},
+            "yt2mp3": {"cache_entries": len(self.cache.entries), **self.stats},
+        }
+        if is_media_cache_enabled():
+            info["yt2mp3"]["media_cache"] = get_media_cache().summary()
+        return info
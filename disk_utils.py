@@ -0,0 +1,337 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Disk Alanı Modülü - İşleri başlatmadan önce tahmini en yüksek disk ihtiyacını
+boş alanla karşılaştıran kabul kontrolü (admission control).
+
+Tahmin: kaynak boyutu (filesize / filesize_approx, yoksa süre × bit hızı) +
+her çıktı için süre × ön ayar bit hızı (+ sessizlik kırpma geçici kopyası),
+SAFETY payıyla. Kabul edilen işlerin ihtiyacı süreç içinde rezerve edilir
+(indirilen baytlar boş alandan düştükçe rezerveden de düşülür);
+boş alan - rezerveler - yedek (reserve) yetmezse iş, başka bir iş bitip alan
+netleşene kadar bekletilir. Bekleyen başka iş yoksa ve alan yine yetmiyorsa
+iş hemen DiskSpaceError ile başarısız olur (kodlamanın ortasında disk dolup
+yarım dosya bırakmak yerine).
+
+İsteğe bağlı ön ayırma (preallocate): ihtiyaç kadar alan gizli bir rezerv
+dosyasıyla (posix_fallocate) gerçekten ayrılır; dosya indirme ilerledikçe
+küçültülür ve indirme bitince silinir. Böylece disk başka süreçlerce de
+doldurulamaz; kota gibi disk_usage'ın göremediği sınırlar da baştan yakalanır.
+
+Ayarlar: --disk-reserve MB / YT2MP3_DISK_RESERVE_MB (varsayılan 500),
+--preallocate / YT2MP3_DISK_PREALLOCATE=1.
+"""
+import errno
+import os
+import shutil
+import threading
+import time
+from log_utils import debug_print
+
+DEFAULT_RESERVE_MB = 500
+# Tahmin payı (VBR kaynaklar, kapsayıcı ek yükü, tag/kapak)
+SAFETY = 1.15
+# Kaynak boyutu bilinmiyorsa varsayılan bit hızı (YouTube m4a ~128-160k)
+DEFAULT_SOURCE_KBPS = 160
+# Süre de bilinmiyorsa tek iş için varsayılan ihtiyaç
+UNKNOWN_JOB_BYTES = 64 * 1024 * 1024
+# WAV: 44.1 kHz, 16 bit, stereo
+WAV_BYTES_PER_SECOND = 44100 * 2 * 2
+# Bekleyen işler bu aralıkla yeniden dener (başka süreçler de alan açabilir)
+POLL_SECONDS = 5.0
+# Rezerv dosyası en az bu kadar değişince küçültülür
+SHRINK_STEP = 8 * 1024 * 1024
+RESERVE_PREFIX = ".yt2mp3-reserve-"
+
+
+class DiskSpaceError(Exception):
+    """Tahmini ihtiyaç boş alana sığmıyor (mesaj retry_utils'te 'disk' sınıfıdır)"""
+
+
+def format_bytes(size):
+    for suffix, factor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024)):
+        if abs(size) >= factor:
+            return f"{size / factor:.1f} {suffix}"
+    return f"{size:.0f} B"
+
+
+def output_bytes_per_second(codec, quality):
+    if codec == "wav":
+        return WAV_BYTES_PER_SECOND
+    return int(quality) * 1000 / 8
+
+
+def source_bytes(info):
+    """Kaynak ses boyutu: info'daki boyut, yoksa en büyük ses formatı, yoksa süre × bit hızı"""
+    size = info.get("filesize") or info.get("filesize_approx")
+    if size:
+        return size
+    audio_sizes = [f.get("filesize") or f.get("filesize_approx") for f in info.get("formats") or []
+                   if f.get("vcodec") == "none"]
+    audio_sizes = [s for s in audio_sizes if s]
+    if audio_sizes:
+        return max(audio_sizes)
+    if info.get("duration"):
+        return info["duration"] * (info.get("abr") or info.get("tbr") or DEFAULT_SOURCE_KBPS) * 1000 / 8
+    return None
+
+
+def estimate_job_bytes(info, targets, clip=None, trim_silence=False, include_source=True):
+    """
+    İşin en yüksek disk ihtiyacı (bayt). targets: [(codec, quality), ...] (ana çıktı + ek kopyalar).
+    include_source=False: kaynak zaten diskte (ör. önbellekten hardlink).
+    """
+    duration = info.get("duration")
+    source = source_bytes(info) if include_source else 0
+    if clip and duration:
+        end = clip["end"] if clip.get("end") is not None else duration
+        span = max(0.0, min(end, duration) - clip["start"])
+        source = source and source * span / duration
+        duration = span
+    if not duration:
+        return int(UNKNOWN_JOB_BYTES + (source or 0) * SAFETY)
+    outputs = [duration * output_bytes_per_second(codec, quality) for codec, quality in targets]
+    need = (source or 0) + sum(outputs)
+    if trim_silence and outputs:
+        # Kırpma dosyayı geçici bir kopyaya yazıp yer değiştirir
+        need += max(outputs)
+    return int(need * SAFETY)
+
+
+class Reservation:
+    """Kabul edilmiş bir işin rezervasyonu; release() ile bırakılır (birden çok çağrı güvenli)"""
+    def __init__(self, guard, device, need, folder, name, preallocate=False):
+        self.guard = guard
+        self.device = device
+        self.need = need
+        self.name = name
+        self.waited = 0.0
+        self.written = 0
+        self.released = False
+        self.reserve_path = None
+        self.reserve_size = 0
+        if preallocate and hasattr(os, "posix_fallocate"):
+            self._preallocate(folder)
+
+    def _preallocate(self, folder):
+        if folder not in self.guard.cleaned:
+            self.guard.cleaned.add(folder)
+            cleanup_reserve_files(folder)
+        path = os.path.join(folder, f"{RESERVE_PREFIX}{os.getpid()}-{id(self):x}")
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.posix_fallocate(fd, 0, self.need)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            if os.path.exists(path):
+                os.remove(path)
+            if e.errno in (errno.ENOSPC, errno.EDQUOT):
+                self.release()
+                raise DiskSpaceError(f"Not enough disk space: could not preallocate {format_bytes(self.need)} "
+                                     f"in {folder} ({e.strerror})")
+            debug_print(f"⚠️ Preallocation not supported here: {e}", "DEBUG")
+            return
+        self.reserve_path = path
+        self._set_reserve_size(self.need)
+
+    def _set_reserve_size(self, size):
+        with self.guard.cond:
+            self.guard.preallocated[self.device] = (self.guard.preallocated.get(self.device, 0)
+                                                    - self.reserve_size + size)
+            self.reserve_size = size
+
+    def consume(self, written):
+        """
+        İş toplam written bayt yazdı: bu kısım artık boş alandan düşüldüğü için
+        rezerveden de düşülür (iki kez sayılmaz); ön ayırmada rezerv dosyası da
+        o kadar küçültülür (yer gerçek dosyaya geçer).
+        """
+        if written is None:
+            return
+        self.guard._consume(self, min(written, self.need))
+        if not self.reserve_path:
+            return
+        size = max(0, self.need - written)
+        if self.reserve_size - size < SHRINK_STEP:
+            return
+        try:
+            os.truncate(self.reserve_path, size)
+            self._set_reserve_size(size)
+        except OSError:
+            self.release_preallocation()
+
+    def release_preallocation(self):
+        """Rezerv dosyasını sil (ör. indirme bitti, kodlama kendi dosyalarını yazacak)"""
+        if not self.reserve_path:
+            return
+        try:
+            os.remove(self.reserve_path)
+        except OSError:
+            pass
+        self.reserve_path = None
+        self._set_reserve_size(0)
+
+    def release(self):
+        self.release_preallocation()
+        self.guard._release(self)
+
+
+class DiskGuard:
+    """
+    Süreç genelindeki disk kabul kontrolü (dosya sistemi başına rezerveler).
+
+        reservation = get_disk_guard().admit("Music", need, name="abc123")
+        try: ... finally: reservation.release()
+    """
+    def __init__(self, reserve_bytes=None, preallocate=False, poll=POLL_SECONDS, disk_usage=shutil.disk_usage):
+        self.reserve_bytes = DEFAULT_RESERVE_MB * 1024 * 1024 if reserve_bytes is None else reserve_bytes
+        self.preallocate = preallocate
+        self.poll = poll
+        self.disk_usage = disk_usage
+        self.cond = threading.Condition()
+        self.reserved = {}
+        self.preallocated = {}
+        self.active = {}
+        self.cleaned = set()
+        self.stats = {"admitted": 0, "held": 0, "rejected": 0, "peak_jobs": 0, "waited_s": 0.0}
+
+    def available(self, folder, device):
+        """Yeni işlere kalan alan: boş alan - yedek - kabul edilmiş işlerin henüz yazmadığı kısım (lock tutulurken)"""
+        free = self.disk_usage(folder).free + self.preallocated.get(device, 0)
+        return free - self.reserve_bytes - self.reserved.get(device, 0)
+
+    def admit(self, folder, need, name=None, stop_check=None, on_wait=None):
+        """
+        İhtiyaç sığana kadar bekle ve rezerve et. Reservation döndürür; stop_check
+        True dönerse None. Sığmıyorsa ve bekleyecek başka iş yoksa DiskSpaceError.
+        """
+        device = os.stat(folder).st_dev
+        start = time.monotonic()
+        held = False
+        with self.cond:
+            while True:
+                available = self.available(folder, device)
+                if need <= available:
+                    break
+                if not self.active.get(device):
+                    self.stats["rejected"] += 1
+                    raise DiskSpaceError(
+                        f"Not enough disk space: job needs ~{format_bytes(need)}, "
+                        f"{format_bytes(max(0, available))} available in {folder} "
+                        f"(keeping {format_bytes(self.reserve_bytes)} free)")
+                if stop_check and stop_check():
+                    return None
+                if not held:
+                    held = True
+                    self.stats["held"] += 1
+                    debug_print(f"💾 Holding {name or 'job'}: needs {format_bytes(need)}, "
+                                f"{format_bytes(max(0, available))} available", "WARNING")
+                    if on_wait:
+                        on_wait(need, available)
+                self.cond.wait(self.poll)
+            self.reserved[device] = self.reserved.get(device, 0) + need
+            self.active[device] = self.active.get(device, 0) + 1
+            self.stats["admitted"] += 1
+            self.stats["peak_jobs"] = max(self.stats["peak_jobs"], sum(self.active.values()))
+            waited = time.monotonic() - start if held else 0.0
+            self.stats["waited_s"] += waited
+        reservation = Reservation(self, device, need, folder, name, self.preallocate)
+        reservation.waited = waited
+        return reservation
+
+    def _consume(self, reservation, written):
+        with self.cond:
+            # Yeniden denemede sayaç sıfırdan başlayabilir; en yüksek değer esas alınır
+            if reservation.released or written <= reservation.written:
+                return
+            self.reserved[reservation.device] -= written - reservation.written
+            reservation.written = written
+
+    def _release(self, reservation):
+        with self.cond:
+            if reservation.released:
+                return
+            reservation.released = True
+            self.reserved[reservation.device] -= reservation.need - reservation.written
+            self.active[reservation.device] -= 1
+            self.cond.notify_all()
+
+    def summary(self, folder=None):
+        with self.cond:
+            summary = {"reserve_bytes": self.reserve_bytes, "preallocate": self.preallocate,
+                       "reserved_bytes": sum(self.reserved.values()), "active_jobs": sum(self.active.values()),
+                       **{key: round(value, 3) if isinstance(value, float) else value
+                          for key, value in self.stats.items()}}
+        if folder and os.path.isdir(folder):
+            summary["free_bytes"] = self.disk_usage(folder).free
+        return summary
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def cleanup_reserve_files(folder):
+    """Çökmüş süreçlerden kalmış rezerv dosyalarını sil (çalışan süreçlerinkine dokunulmaz)"""
+    try:
+        names = [name for name in os.listdir(folder) if name.startswith(RESERVE_PREFIX)]
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        pid = name[len(RESERVE_PREFIX):].split("-", 1)[0]
+        if pid.isdigit() and (int(pid) == os.getpid() or _process_alive(int(pid))):
+            continue
+        try:
+            os.remove(os.path.join(folder, name))
+            removed += 1
+        except OSError:
+            pass
+    if removed:
+        debug_print(f"💾 Removed {removed} stale disk reserve file(s) from {folder}", "INFO")
+    return removed
+
+
+def _env_reserve_bytes():
+    value = os.environ.get("YT2MP3_DISK_RESERVE_MB", "")
+    return (int(value) if value.isdigit() else DEFAULT_RESERVE_MB) * 1024 * 1024
+
+
+_state = {
+    "reserve": _env_reserve_bytes(),
+    "preallocate": os.environ.get("YT2MP3_DISK_PREALLOCATE", "") not in ("", "0"),
+    "guard": None,
+}
+_state_lock = threading.Lock()
+
+
+def get_disk_guard():
+    """Süreç genelindeki ortak kabul kontrolü"""
+    with _state_lock:
+        if _state["guard"] is None:
+            _state["guard"] = DiskGuard(_state["reserve"], _state["preallocate"])
+        return _state["guard"]
+
+
+def set_disk_reserve(reserve_mb=None, preallocate=None):
+    """Boş bırakılacak alanı (MB) ve ön ayırmayı ayarla (yeni işler için geçerli)"""
+    if reserve_mb is not None:
+        _state["reserve"] = int(reserve_mb) * 1024 * 1024
+    if preallocate is not None:
+        _state["preallocate"] = bool(preallocate)
+    with _state_lock:
+        guard = _state["guard"]
+        if guard is not None:
+            with guard.cond:
+                guard.reserve_bytes = _state["reserve"]
+                guard.preallocate = _state["preallocate"]
+                guard.cond.notify_all()
+    debug_print(f"💾 Disk reserve {format_bytes(_state['reserve'])}"
+                f"{', preallocation on' if _state['preallocate'] else ''}", "INFO")
@@ -0,0 +1,452 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Dağıtık Çalışma Modülü - Birden çok makinenin tek iş kuyruğunu paylaşması
+Koordinatör (serve --coordinator) işleri kendisi çalıştırmaz; çalışanlar
+(python main.py worker --coordinator URL) HTTP ile iş kiralar (lease), iş
+sürerken heartbeat ile kirayı uzatır ve ilerlemeyi bildirir, çıktıları
+koordinatöre yükler ve sonucu bildirir.
+
+Kirası dolan işler (çalışan çöktü, ağ koptu) tekrar kuyruğa alınır;
+MAX_ATTEMPTS denemeden sonra hata olur. Çıktılar ve history/kütüphane
+kayıtları koordinatörün Music klasöründe toplanır; çalışanlar her işi geçici
+bir klasörde yürütür. Music dışındaki mutlak klasörlü ek hedefler ('also'
+FORMAT=KLASÖR) çalışan makinede kalır.
+
+    python main.py serve --coordinator --host 0.0.0.0 --token secret
+    python main.py worker --coordinator http://server:8765 --token secret --workers 4
+"""
+import hashlib
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from collections import deque
+from urllib.parse import quote
+from history_utils import load_history, save_history, get_music_folder, get_data_dir, HISTORY_LOCK
+from job_queue import JobManager, default_job_workers, PROGRESS_INTERVAL
+from log_utils import debug_print
+
+# Kira süresi: çalışan bu süre içinde heartbeat göndermezse iş tekrar kuyruğa alınır
+LEASE_SECONDS = 30.0
+# Bir iş en fazla bu kadar kez kiralanır (kirası dolan her deneme sayılır)
+MAX_ATTEMPTS = 3
+# Kira kontrolü aralığı
+REAPER_INTERVAL = 1.0
+# Çalışanın boşta iş beklerken yaptığı long-poll süresi
+LEASE_WAIT = 20.0
+# Yükleme parçası
+UPLOAD_CHUNK = 1024 * 1024
+
+
+class LeaseError(Exception):
+    """İşin kirası bu çalışanda değil (süresi doldu, iş bitti veya başkasına verildi)"""
+
+
+def default_lease_seconds():
+    value = os.environ.get("YT2MP3_LEASE_SECONDS", "")
+    try:
+        return max(1.0, float(value)) if value else LEASE_SECONDS
+    except ValueError:
+        return LEASE_SECONDS
+
+
+def safe_relative_path(path):
+    """Yüklenen dosyanın Music altındaki yolu; dışarı çıkan/mutlak yollar için ValueError"""
+    parts = [part for part in path.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or any(part == ".." or ":" in part for part in parts) or path.startswith(("/", "\\")):
+        raise ValueError(f"Invalid upload path: {path}")
+    return os.path.join(*parts)
+
+
+def record_remote_result(url, music_titles, records):
+    """Çalışandan gelen sonucu merkezi history'ye yaz (URL bir kez, dosya başına kayıt)"""
+    with HISTORY_LOCK:
+        history = load_history()
+        history["urls"].append(hashlib.md5(url.encode()).hexdigest())
+        history.setdefault("real_urls", []).append(url)
+        history.setdefault("music_titles", []).extend(music_titles)
+        library = history.setdefault("library", {})
+        for record in records:
+            library.setdefault(record["path"], {}).update(record)
+        save_history(history)
+
+
+class JobCoordinator(JobManager):
+    """
+    Çalışanları uzak makinelerde olan JobManager. İşler kuyrukta bekler;
+    lease/heartbeat/complete çağrıları api_server'ın /api/worker/ uçlarından gelir.
+    Olay günlüğü, iptal ve cobalt web arka ucu yerel moddaki gibi çalışır.
+    """
+    def __init__(self, music_folder=None, lease_seconds=None, max_attempts=MAX_ATTEMPTS):
+        self.pending = deque()
+        self.workers = {}
+        self.lease_seconds = lease_seconds or default_lease_seconds()
+        self.max_attempts = max_attempts
+        super().__init__(max_workers=1, music_folder=music_folder)
+        self.max_workers = 0
+        self.closed = threading.Event()
+        self.reaper = threading.Thread(target=self._reap, name="lease-reaper", daemon=True)
+        self.reaper.start()
+
+    def _make_executor(self):
+        # İşler bu süreçte çalışmaz
+        return None
+
+    def _dispatch(self, job):
+        job.future = Future()
+        with self.lock:
+            self.pending.append(job)
+            self.changed.notify_all()
+
+    def _seen(self, worker_id):
+        """Çalışanın son görülme zamanı (lock tutulurken)"""
+        self.workers.setdefault(worker_id, {"jobs": 0, "completed": 0})["last_seen"] = time.time()
+
+    def active_workers(self):
+        cutoff = time.time() - 2 * self.lease_seconds
+        with self.lock:
+            return {worker_id: dict(state) for worker_id, state in self.workers.items()
+                    if state["last_seen"] >= cutoff}
+
+    # -- Kiralama ------------------------------------------------------------
+
+    def lease(self, worker_id, wait=0.0):
+        """Kuyruktaki ilk işi worker_id'ye kirala; wait saniye içinde iş yoksa None"""
+        deadline = time.monotonic() + max(0.0, wait)
+        with self.lock:
+            self._seen(worker_id)
+            while True:
+                while self.pending:
+                    job = self.pending.popleft()
+                    if job.status != "queued":
+                        continue
+                    job.status = "running"
+                    job.worker = worker_id
+                    job.attempts += 1
+                    job.lease_until = time.time() + self.lease_seconds
+                    job.started_at = time.time()
+                    job.text = f"Running on {worker_id}"
+                    self.workers[worker_id]["jobs"] += 1
+                    self._emit("started", job)
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.closed.is_set():
+                    return None
+                self.changed.wait(remaining)
+
+    def _leased(self, job_id, worker_id):
+        """worker_id'nin kiraladığı çalışan iş; değilse LeaseError (lock tutulurken)"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != "running" or job.worker != worker_id:
+            raise LeaseError(f"Job {job_id} is not leased to {worker_id}")
+        self._seen(worker_id)
+        return job
+
+    def heartbeat(self, job_id, worker_id, progress=None, text=None, speed=None):
+        """Kirayı uzat, ilerlemeyi yayınla; iş iptal edildiyse True döner"""
+        with self.lock:
+            job = self._leased(job_id, worker_id)
+            job.lease_until = time.time() + self.lease_seconds
+            if progress is not None or text:
+                job.progress = float(progress or job.progress)
+                job.text = text or job.text
+                job.speed = speed
+                self._emit("progress", job)
+            return job.cancel_event.is_set()
+
+    def store_upload(self, job_id, worker_id, rel_path, stream, length):
+        """Yüklenen çıktıyı Music altına yaz (önce .part, sonra yerine taşınır); tam yolu döndürür"""
+        with self.lock:
+            self._leased(job_id, worker_id)
+        music_folder = self.music_folder or get_music_folder()
+        path = os.path.join(music_folder, safe_relative_path(rel_path))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = f"{path}.{job_id}.part"
+        remaining = length
+        with open(part_path, "wb") as f:
+            while remaining > 0:
+                chunk = stream.read(min(UPLOAD_CHUNK, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+        if remaining:
+            os.remove(part_path)
+            raise ValueError(f"Upload ended {remaining} bytes early")
+        os.replace(part_path, path)
+        return path
+
+    def complete(self, job_id, worker_id, status, result=None, error=None, records=None, music_titles=None):
+        """
+        Çalışanın sonucu: success / error / cancelled. Başarılıysa dosya yolları
+        Music'e göre mutlak yapılır ve history merkezi olarak yazılır.
+        """
+        music_folder = self.music_folder or get_music_folder()
+        with self.lock:
+            job = self._leased(job_id, worker_id)
+            job.lease_until = None
+        if status == "success":
+            result = dict(result or {})
+            for key in ("file", "extra_files", "chapter_files"):
+                if isinstance(result.get(key), list):
+                    result[key] = [os.path.join(music_folder, safe_relative_path(p)) for p in result[key]]
+                elif result.get(key):
+                    result[key] = os.path.join(music_folder, safe_relative_path(result[key]))
+            record_remote_result(job.url, music_titles or [], records or [])
+            self._finish(job, "success", progress=100.0, text="Done", result=result)
+        elif status == "cancelled":
+            self._finish(job, "cancelled", text="Cancelled")
+        else:
+            self._finish(job, "error", text="Failed", error=error or "Worker reported an error")
+        with self.lock:
+            self.workers[worker_id]["completed"] += 1
+        return job
+
+    def _finish(self, job, status, **fields):
+        self._update(job, status, status=status, finished_at=time.time(), **fields)
+        if not job.future.done():
+            job.future.set_result(None)
+
+    # -- Süresi dolan kiralar --------------------------------------------------
+
+    def expire_leases(self):
+        """Kirası dolan işleri tekrar kuyruğa al (deneme hakkı bittiyse hata)"""
+        now = time.time()
+        expired = []
+        with self.lock:
+            for job in self.jobs.values():
+                if job.status == "running" and job.lease_until and job.lease_until < now:
+                    expired.append(job)
+            for job in expired:
+                worker_id = job.worker
+                debug_print(f"⏰ Lease expired: job {job.id} on {worker_id} (attempt {job.attempts})", "WARNING")
+                if job.cancel_event.is_set() or job.attempts >= self.max_attempts:
+                    continue
+                job.status = "queued"
+                job.worker = None
+                job.lease_until = None
+                job.text = f"Requeued (lease expired on {worker_id})"
+                # Tekrar denenen iş sıranın başına alınır
+                self.pending.appendleft(job)
+                self._emit("requeued", job)
+        for job in expired:
+            if job.status != "running":
+                continue
+            if job.cancel_event.is_set():
+                self._finish(job, "cancelled", text="Cancelled")
+            else:
+                self._finish(job, "error", text="Failed",
+                             error=f"Lease expired {job.attempts} times (last worker: {job.worker})")
+        return len(expired)
+
+    def _reap(self):
+        while not self.closed.wait(REAPER_INTERVAL):
+            try:
+                self.expire_leases()
+            except Exception as e:
+                debug_print(f"⚠️ Lease reaper error: {e}", "WARNING")
+
+    def shutdown(self, cancel_running=True):
+        if cancel_running:
+            for job in self.list():
+                self.cancel(job.id)
+        self.closed.set()
+        with self.lock:
+            self.changed.notify_all()
+        for job in self.list():
+            if job.future and not job.future.done():
+                job.future.cancel()
+
+
+class RemoteWorker:
+    """
+    Koordinatörden iş kiralayıp bu makinede run_download_job ile çalıştıran
+    çalışan. slots kadar iş aynı anda yürür; her iş kendi geçici Music
+    klasöründe çalışır, çıktılar bitince koordinatöre yüklenir.
+
+        RemoteWorker("http://server:8765", token="secret", slots=4).run()
+    """
+    def __init__(self, coordinator_url, token=None, slots=None, worker_id=None, work_dir=None):
+        self.base_url = coordinator_url.rstrip("/")
+        self.token = token
+        self.slots = slots or default_job_workers()
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.work_dir = work_dir or os.path.join(get_data_dir(), "worker")
+        self.stop_event = threading.Event()
+        self.stats = {"success": 0, "error": 0, "cancelled": 0, "lost": 0}
+        self.stats_lock = threading.Lock()
+
+    # -- HTTP ------------------------------------------------------------------
+
+    def _request(self, method, path, body=None, data=None, headers=None, timeout=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=timeout or LEASE_WAIT + 30) as response:
+                return json.loads(response.read().decode("utf-8") or "{}")
+        except urllib.error.HTTPError as e:
+            message = e.read().decode("utf-8", errors="replace")
+            if e.code == 409:
+                raise LeaseError(message)
+            raise
+
+    # -- Döngü -----------------------------------------------------------------
+
+    def run(self):
+        """slots iş parçacığıyla stop() çağrılana kadar (Ctrl+C) iş al ve çalıştır"""
+        os.makedirs(self.work_dir, exist_ok=True)
+        threads = [threading.Thread(target=self._loop, args=(slot,), name=f"worker-{slot}", daemon=True)
+                   for slot in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+        return dict(self.stats)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _loop(self, slot):
+        failures = 0
+        while not self.stop_event.is_set():
+            try:
+                reply = self._request("POST", "/api/worker/lease", {"worker": f"{self.worker_id}/{slot}",
+                                                                     "wait": LEASE_WAIT})
+                failures = 0
+            except (OSError, ValueError) as e:
+                # Koordinatör yeniden başlıyor olabilir: artan bekleme ile tekrar dene
+                failures += 1
+                debug_print(f"⚠️ Coordinator unreachable ({e}), retrying...", "WARNING")
+                self.stop_event.wait(min(30.0, 2 ** failures))
+                continue
+            if reply.get("job"):
+                self.run_job(reply["job"], f"{self.worker_id}/{slot}", reply.get("lease_seconds", LEASE_SECONDS))
+
+    def run_job(self, job, worker_id, lease_seconds=LEASE_SECONDS):
+        """Kiralanan tek işi çalıştır, heartbeat gönder, çıktıları yükle ve sonucu bildir"""
+        from download_module import run_download_job, DownloadCancelled, DownloadJobError
+
+        job_id = job["id"]
+        music_folder = os.path.join(self.work_dir, job_id)
+        cancel = threading.Event()
+        lost = threading.Event()
+        progress = {"progress": 0.0, "text": "Starting...", "speed": None, "sent": None}
+        debug_print(f"🛠️ Job {job_id} leased: {job['url']}", "INFO")
+
+        def call(action, **body):
+            return self._request("POST", f"/api/worker/jobs/{job_id}/{action}", dict(body, worker=worker_id))
+
+        def beat():
+            # Kira süresinin üçte birinde bir (ilerleme değiştiyse daha sık) heartbeat
+            last_sent = time.monotonic()
+            while not done.wait(max(PROGRESS_INTERVAL, min(1.0, lease_seconds / 3))):
+                current = (round(progress["progress"], 1), progress["text"])
+                if current == progress["sent"] and time.monotonic() - last_sent < lease_seconds / 3:
+                    continue
+                try:
+                    reply = call("heartbeat", progress=progress["progress"], text=progress["text"],
+                                 speed=progress["speed"])
+                except LeaseError:
+                    lost.set()
+                    cancel.set()
+                    return
+                except (OSError, ValueError) as e:
+                    debug_print(f"⚠️ Heartbeat failed for {job_id}: {e}", "WARNING")
+                    continue
+                progress["sent"] = current
+                last_sent = time.monotonic()
+                if reply.get("cancel"):
+                    cancel.set()
+
+        def on_progress(percent, text, speed=None):
+            progress.update(progress=percent or 0.0, text=text, speed=speed)
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+        heartbeat.start()
+        options = dict(job.get("options") or {})
+        outcome = {"status": "success"}
+        try:
+            try:
+                result = run_download_job(job["url"], job["format"], music_folder=music_folder,
+                                          progress_callback=on_progress,
+                                          status_callback=lambda text: progress.update(text=text),
+                                          stop_check=cancel.is_set, **options)
+                progress.update(progress=99.0, text="Uploading...")
+                outcome = self._upload_result(job_id, worker_id, music_folder, result)
+            except LeaseError:
+                lost.set()
+            except DownloadCancelled:
+                outcome = {"status": "cancelled"}
+            except DownloadJobError as e:
+                outcome = {"status": "error", "error": str(e)}
+            except Exception as e:
+                debug_print(f"💥 Job {job_id} crashed: {e}", "ERROR")
+                outcome = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            finally:
+                done.set()
+                heartbeat.join()
+            if lost.is_set():
+                raise LeaseError("lease lost during the job")
+            call("complete", **outcome)
+        except LeaseError as e:
+            # Koordinatör işi başka bir çalışana vermiş: sonuç bildirilmez
+            outcome = {"status": "lost"}
+            debug_print(f"⚠️ Job {job_id} dropped: {e}", "WARNING")
+        except (OSError, ValueError) as e:
+            outcome = {"status": "lost"}
+            debug_print(f"⚠️ Job {job_id} result could not be reported: {e}", "WARNING")
+        finally:
+            shutil.rmtree(music_folder, ignore_errors=True)
+        with self.stats_lock:
+            self.stats[outcome["status"]] += 1
+        debug_print(f"🛠️ Job {job_id}: {outcome['status']}", "SUCCESS" if outcome["status"] == "success" else "INFO")
+
+    def _upload_result(self, job_id, worker_id, music_folder, result):
+        """Music altındaki çıktıları yükle; complete için sonuç gövdesini döndür"""
+        files = [result["file"]] + list(result.get("extra_files") or [])
+        if result.get("chapter_files"):
+            files = list(result["chapter_files"]) + list(result.get("extra_files") or [])
+        relative = {}
+        for path in files:
+            rel_path = os.path.relpath(path, music_folder)
+            if rel_path.startswith(".."):
+                debug_print(f"Kept on this worker (outside Music): {path}", "DEBUG")
+                continue
+            rel_path = rel_path.replace(os.sep, "/")
+            with open(path, "rb") as f:
+                self._request("PUT", f"/api/worker/jobs/{job_id}/files/{quote(rel_path)}?worker={quote(worker_id)}",
+                              data=f, headers={"Content-Length": str(os.path.getsize(path)),
+                                               "Content-Type": "application/octet-stream"},
+                              timeout=600)
+            relative[path] = rel_path
+
+        # Diğer slotlar aynı history dosyasını yazarken yarım okunmasın
+        with HISTORY_LOCK:
+            library = load_history().get("library", {})
+        records = [library[rel_path] for rel_path in relative.values() if rel_path in library]
+        titles = result.get("music_titles") or [result.get("music_title")]
+        remote = {key: value for key, value in result.items()
+                  if key not in ("file", "extra_files", "chapter_files", "music_titles")}
+        remote["file"] = relative.get(result["file"], os.path.basename(result["file"]))
+        remote["extra_files"] = [relative[p] for p in result.get("extra_files") or [] if p in relative]
+        if result.get("chapter_files"):
+            remote["chapter_files"] = [relative[p] for p in result["chapter_files"] if p in relative]
+            remote["music_titles"] = titles
+        return {"status": "success", "result": remote, "records": records,
+                "music_titles": [title for title in titles if title]}
@@ -2,43 +2,70 @@
 """
 YouTube İndirme ve Dönüştürme Modülü - Enhanced Debug v2.0
 """
-import yt_dlp
 import os
 import threading
 import hashlib
 import warnings
 import subprocess
 import time
-import sys
-from datetime import datetime
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tkinter import messagebox
-from history_utils import load_history, save_history
+from history_utils import load_history, save_history, get_music_folder, shorten_title, HISTORY_LOCK
+from trace_module import JobTrace
+from ffmpeg_utils import get_ffmpeg_dir, get_ffmpeg_path, probe_duration, run_ffmpeg
+from log_utils import debug_print
+from profile_utils import profile_job, print_profile_summary, reset_profile_session
+from tag_writer import write_tags, tags_from_info, thumbnail_url, fetch_cover, TagWriteError
+from silence_utils import (is_silence_trim_enabled, detect_silence, trim_range, trim_input_args, trim_file,
+                           SilenceError)
+from tag_utils import detect_container
+from chapter_utils import is_chapter_split_enabled, chapter_tracks, default_chapter_workers, safe_filename
+from clip_utils import ClipError, split_clip, parse_clip, clip_url, clip_label
+from loudness_utils import (get_normalization_mode, analyze_file, measure_loudness, store_loudness,
+                            normalization_gain, volume_filter, replaygain_tags, shifted_result, LoudnessError)
+from media_cache import is_media_cache_enabled, get_media_cache, media_id, preset_key, slim_info, detach
+from bandwidth_utils import get_scheduler
+from retry_utils import get_retry_engine, ErrorLog, RetryExhausted, FALLBACK_CLIENT
+from disk_utils import get_disk_guard, estimate_job_bytes, format_bytes, DiskSpaceError
 
 # Global variables
 stop_requested = False
 current_thread = None
 
-def debug_print(message, level="INFO"):
-    """Terminal çıktısı için debug yazdırma fonksiyonu"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    level_colors = {
-        "INFO": "\033[36m",      # Cyan
-        "SUCCESS": "\033[32m",   # Green
-        "WARNING": "\033[33m",   # Yellow
-        "ERROR": "\033[31m",     # Red
-        "DEBUG": "\033[35m"      # Magenta
-    }
-    
-    reset_color = "\033[0m"
-    color = level_colors.get(level, "\033[36m")
-    
-    print(f"{color}[{timestamp}] [{level}] {message}{reset_color}")
-    sys.stdout.flush()
+# yt_dlp yüzlerce extractor içeren büyük bir paket; ilk kullanımda yüklenir
+_yt_dlp = None
+_yt_dlp_lock = threading.Lock()
 
-def download_and_convert(url, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance=None):
+def get_yt_dlp():
+    """yt_dlp modülünü ilk kullanımda import et ve döndür"""
+    global _yt_dlp
+    if _yt_dlp is None:
+        with _yt_dlp_lock:
+            if _yt_dlp is None:
+                start_time = time.perf_counter()
+                import yt_dlp
+                _yt_dlp = yt_dlp
+                debug_print(f"📦 yt_dlp loaded in {time.perf_counter() - start_time:.2f}s", "DEBUG")
+    return _yt_dlp
+
+def preload_yt_dlp():
+    """yt_dlp'yi arka plan thread'inde önceden yükle (pencere açıldıktan sonra)"""
+    def preload():
+        try:
+            get_yt_dlp()
+        except ImportError as e:
+            debug_print(f"❌ yt_dlp could not be loaded: {e}", "ERROR")
+    threading.Thread(target=preload, daemon=True).start()
+
+def download_and_convert(url, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance=None, extra_targets=None):
     """
     Downloads the YouTube URL entered by the user and converts it to MP3.
     Runs in the background using threading.
+    extra_targets: aynı indirmeden tek ffmpeg geçişiyle üretilecek ek kopyalar
+    ([{"format": etiket, "folder": klasör veya None}], bkz. run_download_job)
     """
     debug_print("🎵 YouTube MP3 Converter Started", "INFO")
     debug_print(f"Target URL: {url}", "DEBUG")
@@ -48,17 +75,32 @@ def download_and_convert(url, format_var, url_entry, download_button, stop_butto
         messagebox.showerror("Error", "Please enter a YouTube URL.")
         return
     
+    # URL normalizasyonu - iş izleme burada başlar
+    trace = JobTrace("download", url)
+    with trace.phase("normalize_url"):
+        # 'URL 1:00-4:30' -> sadece o aralık; klip URL'ye #t=60,270 olarak eklenir
+        try:
+            url, clip = split_clip(url)
+        except ClipError as e:
+            trace.finish("error", e)
+            messagebox.showerror("Error", f"Invalid clip range.\n\n{e}\n\nExample: URL 1:00-4:30")
+            return
+        # Kanonikleştirmeden önceki history kayıtları yazıldığı haliyle tutulur (bkz. is_downloaded)
+        raw_url = url.strip() if not clip else None
+        url = clip_url(normalize_url(url), clip)
+    
     # Check if the URL has been downloaded before
     history = load_history()
     url_hash = hashlib.md5(url.encode()).hexdigest()
     debug_print(f"URL Hash: {url_hash[:8]}...", "DEBUG")
     
     # URL hash kontrolü için eski sistem (uyumluluk)
-    if url_hash in history["urls"]:
+    if is_downloaded(history, url, raw_url):
         debug_print("⚠️ Duplicate URL detected (hash match)", "WARNING")
         result = messagebox.askyesno("Warning", "This video has been downloaded before!\n\nDo you still want to download it?")
         if not result:
             debug_print("❌ Download cancelled by user", "INFO")
+            trace.finish("cancelled")
             if gui_instance:
                 gui_instance.reset_progress()
             return
@@ -86,7 +128,8 @@ def download_and_convert(url, format_var, url_entry, download_button, stop_butto
     # Run in the background
     current_thread = threading.Thread(target=download_worker, 
                                     args=(url, url_hash, format_var, url_entry, download_button, 
-                                         stop_button, status_label, progress_bar, root, gui_instance))
+                                         stop_button, status_label, progress_bar, root, gui_instance, trace,
+                                         extra_targets, raw_url))
     current_thread.daemon = True
     current_thread.start()
     debug_print("🚀 Download thread started", "SUCCESS")
@@ -100,9 +143,10 @@ def update_progress(percent, text, progress_bar, status_label, root):
     except:
         pass
 
-def download_worker(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance=None):
+def download_worker(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance=None, trace=None, extra_targets=None, raw_url=None):
     """Performs the download in the background with enhanced debugging"""
     debug_print("🔧 Download worker started", "INFO")
+    trace = trace or JobTrace("download", url)
     
     def progress_hook(d):
         """yt-dlp progress hook with debugging"""
@@ -151,13 +195,17 @@ def download_worker(url, url_hash, format_var, url_entry, download_button, stop_
         # Check for stop request
         if stop_requested:
             debug_print("🛑 Download stop requested", "WARNING")
+            trace.finish("cancelled")
             from gui_module import reset_ui
             root.after(0, lambda: reset_ui(download_button, stop_button, progress_bar, status_label))
             return
             
         # Check if already downloaded (duplicate detection)
-        history = load_history()
-        if url_hash in history.get("urls", []) or url in history.get("real_urls", []):
+        with trace.phase("duplicate_check") as record:
+            history = load_history()
+            is_duplicate = is_downloaded(history, url, raw_url)
+            record["duplicate"] = is_duplicate
+        if is_duplicate:
             debug_print("🔍 Duplicate URL detected, asking user", "WARNING")
             def show_duplicate_warning():
                 choice = messagebox.askyesno(
@@ -168,10 +216,14 @@ def download_worker(url, url_hash, format_var, url_entry, download_button, stop_
                 )
                 if choice:
                     debug_print("👤 User chose to re-download", "INFO")
-                    # User wants to download again, continue
-                    start_download_process(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance)
+                    # User wants to download again, continue (Tk thread'ini bloklamadan)
+                    threading.Thread(target=start_download_process, daemon=True,
+                                     args=(url, url_hash, format_var, url_entry, download_button, stop_button,
+                                           status_label, progress_bar, root, gui_instance, trace,
+                                           extra_targets)).start()
                 else:
                     debug_print("👤 User cancelled re-download", "INFO")
+                    trace.finish("cancelled")
                     # User cancelled, reset UI
                     from gui_module import reset_ui
                     reset_ui(download_button, stop_button, progress_bar, status_label)
@@ -181,237 +233,1053 @@ def download_worker(url, url_hash, format_var, url_entry, download_button, stop_
         
         debug_print("🎯 Starting fresh download process", "INFO")
         # Start download process
-        start_download_process(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance)
+        start_download_process(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance, trace, extra_targets)
         
     except Exception as e:
         debug_print(f"💥 Critical error in download worker: {e}", "ERROR")
+        trace.finish("error", e)
         error_msg = f"An error occurred:\n{str(e)}"
         from gui_module import finish_download_error
         root.after(0, lambda: finish_download_error(error_msg, download_button, stop_button, progress_bar, status_label))
 
-def start_download_process(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance=None):
-    """Starts the actual download process with enhanced debugging"""
-    debug_print("🚀 Starting download process", "INFO")
+class DownloadJobError(Exception):
+    """İndirme başarısız oldu (istemciler ve yedek format denendi, bkz. retry_utils)"""
+
+class DownloadedFileNotFound(DownloadJobError):
+    """İndirme bitti ama çıktı dosyası bulunamadı"""
+
+class DownloadCancelled(DownloadJobError):
+    """İş kullanıcı isteğiyle durduruldu (stop_check True döndü)"""
+
+_VIDEO_ID_PATTERN = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/|/v/)([A-Za-z0-9_-]{11})')
+
+def extract_video_id(url):
+    """YouTube URL'sinden 11 karakterlik video ID'sini çıkar (yoksa None)"""
+    match = _VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def normalize_url(url):
+    """
+    YouTube URL'lerini kanonik biçime getirir (youtu.be, shorts, m.youtube,
+    takip parametreleri), böylece aynı video farklı yazımlarla tekrar indirilmez.
+    """
+    url = url.strip()
+    video_id = extract_video_id(url)
+    if video_id and ('youtube.com' in url or 'youtu.be' in url):
+        return f"https://www.youtube.com/watch?v={video_id}"
+    return url
+
+def is_downloaded(history, url, raw_url=None):
+    """
+    URL daha önce indirildi mi (md5 özeti "urls"te veya kendisi "real_urls"te)?
+    Kanonik URL'nin yanında yazıldığı haliyle ham URL de aranır: kanonikleştirmeden
+    önceki kayıtlar youtu.be/..., /shorts/..., &t=... biçimlerini tutar.
+    """
+    hashes = history.get("urls", [])
+    real_urls = history.get("real_urls", [])
+    for candidate in dict.fromkeys(filter(None, (url, raw_url))):
+        if hashlib.md5(candidate.encode()).hexdigest() in hashes or candidate in real_urls:
+            return True
+    return False
+
+def is_playlist_url(url):
+    """Tek video değil, oynatma listesi adresi mi? (watch?v=...&list=... tek video sayılır)"""
+    return ('list=' in url or '/playlist' in url) and extract_video_id(url) is None
+
+def expand_playlist(url):
+    """
+    Oynatma listesindeki videoların kanonik URL'leri (sadece liste sayfası okunur,
+    videoların metadata'sı çekilmez). Liste değilse veya boşsa [url].
+    """
+    opts = {'extract_flat': 'in_playlist', 'quiet': True, 'no_warnings': True, 'ignoreerrors': True}
+    with get_yt_dlp().YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    urls = []
+    for entry in (info or {}).get('entries') or []:
+        if not entry:
+            continue
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if not entry_url and entry.get('id'):
+            entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if entry_url:
+            urls.append(normalize_url(entry_url))
+    return urls or [url]
+
+def resolve_format(selected_format):
+    """GUI format seçiminden (codec, quality) çiftini belirle"""
+    if "128k" in selected_format:
+        return 'mp3', '128'
+    elif "192k" in selected_format:
+        return 'mp3', '192'
+    elif "320k" in selected_format:
+        return 'mp3', '320'
+    elif "WAV" in selected_format:
+        return 'wav', 'best'
+    elif "M4A" in selected_format:
+        return 'm4a', '192'
+    return 'mp3', '128'  # Default car-friendly
+
+def build_ydl_options(music_folder, codec, quality, progress_hook, postprocessor_hook=None, extract_audio=True,
+                      clip=None):
+    """
+    Birincil ve yedek (fallback) yt-dlp seçeneklerini oluştur.
+    extract_audio=False: indirilen dosya olduğu gibi bırakılır (çoklu çıktı
+    kodlaması tek ffmpeg geçişinde ayrıca yapılır).
+    clip: {"start", "end"} - sadece bu aralığı kapsayan bayt/fragman aralıkları
+          indirilir (download_ranges) ve sadece o bölüm kodlanır.
+    """
+    # Klip dosyası aynı videonun tamamıyla veya diğer kliplerle çakışmasın
+    outtmpl = f'{music_folder}/%(title)s [{clip_label(clip)}].%(ext)s' if clip else f'{music_folder}/%(title)s.%(ext)s'
+    
+    # Download best quality audio with yt-dlp
+    ydl_opts = {
+        'format': 'bestaudio[ext=m4a]',
+        'outtmpl': outtmpl,
+        'noplaylist': True,
+        'progress_hooks': [progress_hook],
+        'retries': 3,
+        # Extractor hataları retry_utils'te sınıflandırılıp istemci değiştirilerek denenir
+        'extractor_retries': 1,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'ffmpeg_location': get_ffmpeg_dir(),
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['ios'],
+            }
+        }
+    }
+    
+    # Fallback options
+    fallback_opts = {
+        'format': 'worst',
+        'outtmpl': outtmpl,
+        'noplaylist': True,
+        'progress_hooks': [progress_hook],
+        'retries': 1,
+        'ignoreerrors': True,
+        'no_warnings': True,
+        'ffmpeg_location': get_ffmpeg_dir(),
+    }
+    
+    if postprocessor_hook:
+        ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
+        fallback_opts['postprocessor_hooks'] = [postprocessor_hook]
+    
+    if clip:
+        end = clip["end"] if clip["end"] is not None else float("inf")
+        download_ranges = get_yt_dlp().utils.download_range_func(None, [(clip["start"], end)])
+        for opts in (ydl_opts, fallback_opts):
+            opts['download_ranges'] = download_ranges
+            # Ses için anahtar kare hizalaması gereksiz (yeniden kodlama yapmaz)
+            opts['force_keyframes_at_cuts'] = False
+    
+    # Add postprocessor
+    if not extract_audio:
+        pass
+    elif codec != 'wav':
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': codec,
+            'preferredquality': quality,
+        }]
+        
+        if codec == 'mp3':
+            ydl_opts['postprocessor_args'] = [
+                '-ar', '44100',
+                '-ac', '2',
+                '-id3v2_version', '3',
+                '-write_id3v1', '1',
+                '-c:a', 'libmp3lame',
+                '-b:a', f'{quality}k'
+            ]
+    else:
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'wav',
+        }]
+    
+    return ydl_opts, fallback_opts
+
+def encoder_settings(codec, quality):
+    """Codec/kalite için (dosya uzantısı, ffmpeg kodlayıcı argümanları)"""
+    if codec == 'wav':
+        return 'wav', ['-c:a', 'pcm_s16le']
+    if codec == 'm4a':
+        return 'm4a', ['-c:a', 'aac', '-b:a', f'{quality}k', '-movflags', '+faststart']
+    return 'mp3', ['-c:a', 'libmp3lame', '-b:a', f'{quality}k', '-ar', '44100', '-ac', '2',
+                   '-id3v2_version', '3', '-write_id3v1', '1']
+
+def default_target_folder(music_folder, codec, quality):
+    """Ek kopyaların varsayılan klasörü: Music/MP3 320k, Music/WAV ..."""
+    name = codec.upper() if codec == 'wav' else f"{codec.upper()} {quality}k"
+    return os.path.join(music_folder, name)
+
+def build_multi_output_command(ffmpeg_path, input_path, outputs, audio_filter=None, input_args=None):
+    """
+    Tek girişten birden fazla çıktı: giriş bir kez çözülür, her çıktı kendi
+    kodlayıcısıyla yazılır. outputs: [(çıktı_yolu, codec, quality), ...]
+    audio_filter: her çıktıya uygulanan -af (ör. normalizasyon kazancı)
+    input_args: '-i'den önce giriş seçenekleri (ör. sessizlik kesimi -ss/-t)
+    """
+    command = [ffmpeg_path, '-y'] + list(input_args or []) + ['-i', input_path]
+    filter_args = ['-af', audio_filter] if audio_filter else []
+    for output_path, codec, quality in outputs:
+        _, args = encoder_settings(codec, quality)
+        command += ['-map', '0:a:0', '-vn'] + filter_args + args + [output_path]
+    return command
+
+def plan_outputs(stem, codec, quality, music_folder, extra_targets, subfolder=None):
+    """
+    Ana çıktı ve ek kopyalar: [(çıktı_yolu, codec, quality), ...]; klasörler oluşturulur.
+    subfolder verilirse (ör. bölümlere ayrılan albüm) her hedef klasörün altına eklenir.
+    """
+    ext, _ = encoder_settings(codec, quality)
+    primary_folder = os.path.join(music_folder, subfolder) if subfolder else music_folder
+    os.makedirs(primary_folder, exist_ok=True)
+    outputs = [(os.path.join(primary_folder, f"{stem}.{ext}"), codec, quality)]
+    for target in extra_targets:
+        target_codec, target_quality = resolve_format(target["format"])
+        if (target_codec, target_quality) == (codec, quality) and not target.get("folder"):
+            continue
+        folder = target.get("folder") or default_target_folder(music_folder, target_codec, target_quality)
+        if subfolder:
+            folder = os.path.join(folder, subfolder)
+        os.makedirs(folder, exist_ok=True)
+        target_ext, _ = encoder_settings(target_codec, target_quality)
+        output_path = os.path.join(folder, f"{stem}.{target_ext}")
+        if all(os.path.abspath(output_path) != os.path.abspath(o[0]) for o in outputs):
+            outputs.append((output_path, target_codec, target_quality))
+    return outputs
+
+def transcode_targets(source_file, codec, quality, music_folder, extra_targets, progress_callback, trace,
+                      audio_filter=None, input_args=None, stop_check=None):
+    """
+    İndirilen kaynak dosyadan ana çıktı (music_folder) ve ek kopyaları tek ffmpeg
+    çağrısıyla üretir, kaynağı siler. (ana_dosya, [ek_dosyalar]) döndürür.
+    stop_check True dönerse ffmpeg durdurulur ve DownloadCancelled fırlatılır.
+    """
+    stem = os.path.splitext(os.path.basename(source_file))[0]
+    outputs = plan_outputs(stem, codec, quality, music_folder, extra_targets)
+    for output_path, _, _ in outputs:
+        detach(output_path)
+    
+    # Çıktı kaynakla aynı yoldaysa (ör. m4a -> m4a) kaynak önce kenara alınır
+    if any(os.path.abspath(o[0]) == os.path.abspath(source_file) for o in outputs):
+        moved = os.path.splitext(source_file)[0] + ".source" + os.path.splitext(source_file)[1]
+        os.replace(source_file, moved)
+        source_file = moved
+    
+    command = build_multi_output_command(get_ffmpeg_path(), source_file, outputs, audio_filter, input_args)
+    duration = probe_duration(source_file)
+    if input_args and "-t" in input_args:
+        duration = float(input_args[input_args.index("-t") + 1])
+    
+    def on_progress(percent, speed, out_time):
+        if percent is not None:
+            progress_callback(percent, f"Encoding {len(outputs)} formats... {percent:.0f}%")
+    
+    with trace.phase("transcode", bytes=os.path.getsize(source_file), outputs=len(outputs),
+                     audio_filter=audio_filter) as record:
+        result = run_ffmpeg(command, duration, on_progress, stop_check=stop_check)
+        record["speed_x"] = result["speed"]
+        if result["stopped"]:
+            # Yarım çıktılar ve indirilen kaynak Music klasöründe bırakılmaz
+            for path in [o[0] for o in outputs] + [source_file]:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise DownloadCancelled("Encoding stopped")
+        if result["returncode"] != 0:
+            # Yarım çıktılar (ör. disk doldu) bırakılmaz; kaynak tekrar deneme için durur
+            for output_path, _, _ in outputs:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+            raise DownloadJobError("ffmpeg failed:\n" + "\n".join(result["stderr_tail"][-5:]))
+    
+    os.remove(source_file)
+    debug_print(f"🎚️ {len(outputs)} outputs from one decode: " +
+                ", ".join(os.path.relpath(o[0], music_folder) for o in outputs), "SUCCESS")
+    return outputs[0][0], [o[0] for o in outputs[1:]]
+
+def encode_chapters(source_file, tracks, codec, quality, music_folder, extra_targets, subfolder,
+                    progress_callback, trace, audio_filter=None, stop_check=None):
+    """
+    Her bölümü (ve ek kopyalarını) ayrı bir ffmpeg sürecinde, çekirdek sayısı
+    kadar paralel kodlar. Kaynak bir kez indirilmiştir; her süreç -ss/-t ile
+    sadece kendi aralığını çözer. Başarılıysa kaynağı siler ve
+    [(bölüm, [ana_dosya, ek_dosyalar...]), ...] döndürür.
+    """
+    plans = [(track, plan_outputs(track["stem"], codec, quality, music_folder, extra_targets, subfolder))
+             for track in tracks]
+    for _, outputs in plans:
+        for output_path, _, _ in outputs:
+            detach(output_path)
+    ffmpeg_path = get_ffmpeg_path()
+    total = sum(track["end"] - track["start"] for track in tracks) or 1.0
+    encoded_time = {}
+    lock = threading.Lock()
+    last_update = [0.0]
+    
+    def encode(track, outputs):
+        length = track["end"] - track["start"]
+        input_args = ["-ss", f"{track['start']:.3f}", "-t", f"{length:.3f}"]
+        command = build_multi_output_command(ffmpeg_path, source_file, outputs, audio_filter, input_args)
+        
+        def on_progress(percent, speed, out_time):
+            # Tüm bölümlerin toplam ilerlemesi, en fazla 5 kez/saniye
+            with lock:
+                encoded_time[track["index"]] = length if percent == 100.0 else min(out_time or 0.0, length)
+                encoded = sum(encoded_time.values())
+                now = time.monotonic()
+                if now - last_update[0] < 0.2 and encoded < total:
+                    return
+                last_update[0] = now
+            overall = min(100.0, encoded / total * 100)
+            progress_callback(overall, f"Encoding {len(tracks)} chapters... {overall:.0f}%")
+        
+        return run_ffmpeg(command, length, on_progress, stop_check=stop_check)
+    
+    workers = default_chapter_workers(len(tracks))
+    failures = []
+    with trace.phase("chapter_encode", bytes=os.path.getsize(source_file), chapters=len(tracks),
+                     workers=workers, media_duration_s=round(total, 2), audio_filter=audio_filter) as record:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(encode, track, outputs): track for track, outputs in plans}
+            for future in as_completed(futures):
+                track = futures[future]
+                try:
+                    result = future.result()
+                except subprocess.TimeoutExpired as e:
+                    failures.append(f"{track['stem']}: {getattr(e, 'reason', 'timeout')}")
+                    continue
+                if result["stopped"]:
+                    failures.append(f"{track['stem']}: stopped")
+                elif result["returncode"] != 0:
+                    failures.append(f"{track['stem']}: " + " | ".join(result["stderr_tail"][-2:]))
+        elapsed = time.perf_counter() - start
+        record["speed_x"] = round(total / elapsed, 1) if elapsed > 0 else None
+        if failures:
+            # Yarım kalan parçalar bırakılmaz; kaynak tekrar deneme için durur
+            for _, outputs in plans:
+                for output_path, _, _ in outputs:
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+            if stop_check and stop_check():
+                os.remove(source_file)
+                raise DownloadCancelled("Chapter encoding stopped")
+            raise DownloadJobError(f"{len(failures)}/{len(tracks)} chapters failed:\n" + "\n".join(failures[:5]))
+    
+    os.remove(source_file)
+    debug_print(f"📚 {len(tracks)} chapters encoded with {workers} workers "
+                f"({record['speed_x']}x realtime)", "SUCCESS")
+    return [(track, [o[0] for o in outputs]) for track, outputs in plans]
+
+def find_downloaded_file(music_folder, title, info=None):
+    """
+    İndirilen dosyayı bul. yt-dlp son dosya yolunu bildirdiyse doğrudan onu kullan,
+    yoksa klasördeki en yeni / başlığa en çok benzeyen ses dosyasını seç.
+    """
+    for download in (info or {}).get('requested_downloads') or []:
+        file_path = download.get('filepath')
+        if file_path and os.path.exists(file_path):
+            return file_path
+    
+    new_file = None
+    all_audio_files = []
+    for file in os.listdir(music_folder):
+        if any(ext in file.lower() for ext in ['.m4a', '.mp3', '.webm', '.opus', '.wav', '.mp4']):
+            file_path = os.path.join(music_folder, file)
+            file_time = os.path.getctime(file_path)
+            all_audio_files.append((file, file_path, file_time))
+    
+    if all_audio_files:
+        all_audio_files.sort(key=lambda x: x[2], reverse=True)
+        new_file = all_audio_files[0][1]
+        
+        safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        for file, file_path, _ in all_audio_files:
+            if (safe_title.lower() in file.lower() or 
+                title.lower() in file.lower() or
+                any(word.lower() in file.lower() for word in title.split() if len(word) > 3)):
+                new_file = file_path
+                break
+    
+    return new_file
+
+def tag_downloaded_files(files, title, info, embed_cover=True, custom_tags=None, overrides=None):
+    """
+    İndirilen dosyalara tag ve kapak resmi yaz (yeniden kodlama yok).
+    Kapak bir kez indirilir, tüm kopyalara aynı baytlar yazılır.
+    custom_tags: ek serbest alanlar (ör. ReplayGain)
+    overrides: {dosya: {alan: değer}} - dosyaya özel tag'ler (ör. bölüm adı, parça no)
+    Trace için {"files", "rewrites", "cover_bytes"} döndürür.
+    """
+    tags = tags_from_info(info, title)
+    tags["custom"] = custom_tags
+    cover = fetch_cover(thumbnail_url(info)) if embed_cover else None
+    summary = {"files": 0, "rewrites": 0, "cover_bytes": len(cover) if cover else 0}
+    for path in files:
+        try:
+            file_tags = dict(tags, **overrides[path]) if overrides and path in overrides else tags
+            mode = write_tags(path, file_tags, cover)
+        except TagWriteError as e:
+            debug_print(f"Tags skipped for {os.path.basename(path)}: {e}", "DEBUG")
+            continue
+        except OSError as e:
+            debug_print(f"⚠️ Tags could not be written to {os.path.basename(path)}: {e}", "WARNING")
+            continue
+        summary["files"] += 1
+        if mode == "rewrite":
+            summary["rewrites"] += 1
+    debug_print(f"🏷️ Tagged {summary['files']} file(s), cover: {summary['cover_bytes']} bytes", "DEBUG")
+    return summary
+
+def measure_loudness_phase(path, trace, use_cache=False):
+    """
+    Normalizasyon için loudness ölçümü ("loudness" trace aşaması).
+    Ölçülemezse (NumPy yok, ffmpeg hatası) None döner ve iş normalizasyonsuz devam eder.
+    """
+    with trace.phase("loudness") as record:
+        try:
+            if use_cache:
+                result, record["cached"] = analyze_file(path)
+            else:
+                result = measure_loudness(path)
+        except (LoudnessError, OSError) as e:
+            record["skipped"] = str(e)[:200]
+            debug_print(f"⚠️ Loudness analysis skipped: {e}", "WARNING")
+            return None
+        record["integrated_lufs"] = result["integrated_lufs"]
+        record["true_peak_db"] = result["true_peak_db"]
+    debug_print(f"🔊 {result['integrated_lufs']} LUFS, true peak {result['true_peak_db']} dBTP", "DEBUG")
+    return result
+
+def detect_silence_phase(path, trace):
+    """
+    Baştaki/sondaki sessizliği bul ("silence_detect" trace aşaması).
+    Kesilecek aralık ya da None (kesilecek sessizlik yok veya analiz yapılamadı).
+    """
+    with trace.phase("silence_detect") as record:
+        try:
+            cut = trim_range(detect_silence(path))
+        except (SilenceError, OSError) as e:
+            record["skipped"] = str(e)[:200]
+            debug_print(f"⚠️ Silence detection skipped: {e}", "WARNING")
+            return None
+        if cut:
+            record["leading_s"] = cut["leading"]
+            record["trailing_s"] = cut["trailing"]
+    if cut:
+        debug_print(f"✂️ Silence: {cut['leading']:.2f}s leading, {cut['trailing']:.2f}s trailing", "DEBUG")
+    return cut
+
+def trim_silence_phase(path, cut, trace):
+    """Kesimi yeniden kodlamadan uygula ("trim" trace aşaması); başarılıysa True"""
+    with open(path, "rb") as f:
+        container = detect_container(f.read(64))
+    with trace.phase("trim", bytes=os.path.getsize(path), container=container) as record:
+        try:
+            trimmed = trim_file(path, cut, container)
+        except (SilenceError, OSError, subprocess.TimeoutExpired) as e:
+            record["skipped"] = str(e)[:200]
+            debug_print(f"⚠️ Silence trim failed: {e}", "WARNING")
+            return False
+        if trimmed:
+            record["bytes_after"] = os.path.getsize(path)
+    return trimmed
+
+def record_download(url, url_hash, new_file, music_folder, title, info, clip=None):
+    """İndirmeyi history'ye kaydet, listede gösterilecek müzik ismini döndür"""
+    with HISTORY_LOCK:
+        return _record_download(url, url_hash, new_file, music_folder, title, info, clip)
+
+def _record_download(url, url_hash, new_file, music_folder, title, info, clip=None):
+    history = load_history()
+    history["urls"].append(url_hash)
+    
+    if "real_urls" not in history:
+        history["real_urls"] = []
+    history["real_urls"].append(url)
+    
+    # Müzik ismini de kaydet
+    if "music_titles" not in history:
+        history["music_titles"] = []
+    
+    # Dosya isminden müzik ismini çıkar (uzantıyı kaldır), çok uzun isimleri kısalt
+    music_title = shorten_title(os.path.splitext(os.path.basename(new_file))[0])
+    
+    history["music_titles"].append(music_title)
+    debug_print(f"🎵 Music title saved: {music_title}", "SUCCESS")
+    
+    clip_fields = {"clip_start": clip["start"], "clip_end": clip["end"]} if clip else {}
+    _add_library_record(history, new_file, music_folder, url, title, info, **clip_fields)
+    
+    save_history(history)
+    return music_title
+
+def _add_library_record(history, path, music_folder, url, title, info, **fields):
+    """Kütüphane kaydı - arama ve tag işlemleri için indirme metadata'sı"""
+    rel_path = os.path.relpath(path, music_folder).replace(os.sep, "/")
+    library_record = history.setdefault("library", {}).setdefault(rel_path, {"path": rel_path})
+    tags = tags_from_info(info, title)
+    library_record.update({
+        "title": title,
+        "artist": tags["artist"],
+        "album": tags["album"],
+        "year": tags["year"],
+        "genre": tags["genre"],
+        "thumbnail": thumbnail_url(info),
+        "url": url,
+    })
+    library_record.update(fields)
+
+def record_chapter_downloads(url, url_hash, encoded, music_folder, title, info):
+    """
+    Bölümlere ayrılmış indirmeyi history'ye kaydet: URL bir kez, her bölüm
+    ayrı liste satırı ve kütüphane kaydı. Müzik isimlerini döndürür.
+    """
+    with HISTORY_LOCK:
+        history = load_history()
+        history["urls"].append(url_hash)
+        history.setdefault("real_urls", []).append(url)
+        titles = history.setdefault("music_titles", [])
+        album = info.get("album") or title
+        music_titles = []
+        for track, files in encoded:
+            music_title = shorten_title(f"{safe_filename(title)} - {track['stem']}")
+            titles.append(music_title)
+            music_titles.append(music_title)
+            _add_library_record(history, files[0], music_folder, url, track["title"], info,
+                                album=album, track=f"{track['index']}/{len(encoded)}",
+                                chapter_start=track["start"], chapter_end=track["end"])
+        save_history(history)
+    debug_print(f"🎵 {len(music_titles)} chapter tracks saved: {safe_filename(title)}", "SUCCESS")
+    return music_titles
+
+def split_into_chapters(url, url_hash, source_file, tracks, title, info, codec, quality, music_folder,
+                        extra_targets, normalize, progress_callback, status_callback, trace, stop_check=None):
+    """
+    Bölümlü video: tek indirilmiş kaynaktan her bölüm ayrı, tag'li parça olarak
+    Music/<video başlığı>/ altına paralel kodlanır ve history'ye kaydedilir.
+    Normalizasyon tüm kaynak için bir kez ölçülür (albüm kazancı; bölümler arası
+    ses seviyesi farkı korunur). Sessizlik kırpma bölümlere uygulanmaz.
+    """
+    status_callback(f"Splitting into {len(tracks)} chapters...")
+    audio_filter = None
+    custom_tags = None
+    if normalize != "off":
+        loudness = measure_loudness_phase(source_file, trace)
+        if loudness and normalize == "apply":
+            audio_filter = volume_filter(normalization_gain(loudness))
+        elif loudness:
+            custom_tags = replaygain_tags(loudness, scope="album")
+    
+    subfolder = safe_filename(title)
+    encoded = encode_chapters(source_file, tracks, codec, quality, music_folder, extra_targets or [],
+                              subfolder, progress_callback, trace, audio_filter, stop_check)
+    
+    album = info.get("album") or title
+    overrides = {}
+    for track, files in encoded:
+        for path in files:
+            overrides[path] = {"title": track["title"], "album": album,
+                               "track": f"{track['index']}/{len(tracks)}"}
+    with trace.phase("tag") as record:
+        record.update(tag_downloaded_files(list(overrides), title, info, custom_tags=custom_tags,
+                                           overrides=overrides))
+    
+    with trace.phase("history_write"):
+        music_titles = record_chapter_downloads(url, url_hash, encoded, music_folder, title, info)
+    
+    chapter_files = [files[0] for _, files in encoded]
+    return {"file": chapter_files[0], "title": title, "music_title": music_titles[0], "url": url,
+            "extra_files": [path for _, files in encoded for path in files[1:]],
+            "chapter_files": chapter_files, "music_titles": music_titles}
+
+def admit_job(music_folder, info, codec, quality, extra_targets, clip, trim_silence, trace, status_callback,
+              stop_check, include_source=True):
+    """
+    İşin tahmini en yüksek disk ihtiyacını rezerve et (bkz. disk_utils). Alan
+    yoksa başka işler bitene kadar bekler; hiç sığmıyorsa DiskSpaceError.
+    """
+    targets = [(codec, quality)] + [resolve_format(target["format"]) for target in extra_targets or []]
+    need = estimate_job_bytes(info, targets, clip, trim_silence, include_source)
+    
+    def on_wait(need, available):
+        status_callback(f"Waiting for disk space ({format_bytes(need)} needed)...")
+    
+    with trace.phase("disk_admission", bytes=need) as record:
+        reservation = get_disk_guard().admit(music_folder, need, name=trace.job_id, stop_check=stop_check,
+                                             on_wait=on_wait)
+        if reservation is None:
+            raise DownloadCancelled("Download stopped")
+        record["waited_s"] = round(reservation.waited, 3) if reservation.waited else None
+    return reservation
+
+def serve_cached_outputs(cache, video, url, url_hash, clip, codec, quality, music_folder, extra_targets,
+                         normalize, trim_silence, trace):
+    """
+    Medya önbelleği: istenen tüm çıktılar (ana format + ek kopyalar) önbellekteyse
+    Music/'e hardlink ile bağlanır ve history'ye yazılır; indirme ve kodlama yapılmaz.
+    Eksik çıktı varsa None döner ve iş normal yoldan devam eder.
+    """
+    label = clip_label(clip) if clip else None
+    primary = cache.find("output", video, preset_key(codec, quality, normalize, trim_silence), label)
+    if not primary:
+        return None
+    outputs = plan_outputs(primary["stem"], codec, quality, music_folder, extra_targets or [])
+    entries = [primary]
+    for _, target_codec, target_quality in outputs[1:]:
+        entry = cache.find("output", video, preset_key(target_codec, target_quality, normalize, trim_silence), label)
+        if not entry:
+            return None
+        entries.append(entry)
+    
+    with trace.phase("cache_link", kind="output", outputs=len(outputs),
+                     bytes=sum(entry["size"] for entry in entries)) as record:
+        try:
+            modes = [cache.link(entry, output[0]) for entry, output in zip(entries, outputs)]
+        except OSError as e:
+            # Nesne bu arada silinmiş olabilir (LRU); iş normal yoldan devam eder
+            record["skipped"] = str(e)[:200]
+            debug_print(f"⚠️ Media cache link failed: {e}", "WARNING")
+            return None
+        record["hardlinks"] = modes.count("hardlink")
+    
+    info = primary["info"]
+    title = info.get("title", "Unknown")
+    with trace.phase("history_write"):
+        music_title = record_download(url, url_hash, outputs[0][0], music_folder, title, info, clip)
+    debug_print(f"⚡ Media cache hit: {os.path.relpath(outputs[0][0], music_folder)}", "SUCCESS")
+    return {"file": outputs[0][0], "title": title, "music_title": music_title, "url": url,
+            "extra_files": [output[0] for output in outputs[1:]], "cached": True}
+
+def cache_outputs(cache, video, format_id, clip, new_file, codec, quality, music_folder, extra_targets,
+                  normalize, trim_silence, info, trace):
+    """Kodlanmış ve tag'lenmiş çıktıları (ana + ek kopyalar) önbelleğe al; hata işi bozmaz"""
+    label = clip_label(clip) if clip else None
+    stem = os.path.splitext(os.path.basename(new_file))[0]
+    outputs = plan_outputs(stem, codec, quality, music_folder, extra_targets or [])
+    with trace.phase("cache_store", kind="output", outputs=len(outputs)) as record:
+        try:
+            record["bytes"] = sum(
+                cache.store("output", video, path, format_id, preset_key(target_codec, target_quality, normalize,
+                                                                         trim_silence), label,
+                            stem=stem, info=info)["size"]
+                for path, target_codec, target_quality in outputs)
+        except OSError as e:
+            record["skipped"] = str(e)[:200]
+            debug_print(f"⚠️ Outputs could not be cached: {e}", "WARNING")
+
+def run_download_job(url, selected_format, url_hash=None, music_folder=None,
+                     progress_callback=None, status_callback=None, trace=None, extra_targets=None,
+                     normalize=None, trim_silence=None, split_chapters=None, clip=None, stop_check=None):
+    """
+    Arayüzden bağımsız indirme işi: metadata -> indirme -> son işlem -> dosya -> history.
+    
+    progress_callback(percent, text, speed): indirme ilerlemesi (0-100)
+    status_callback(text): durum metni
+    trace: JobTrace; her aşama süre/bayt/hata sınıfı ile kaydedilir.
+    extra_targets: [{"format": etiket, "folder": klasör}] - verilirse kaynak bir kez
+                   indirilir ve ana format ile ek kopyalar tek ffmpeg geçişinde
+                   (tek kod çözme) üretilir. folder boşsa Music/<format> kullanılır.
+    normalize: "off" / "tags" (ReplayGain tag'leri) / "apply" (kazanç kodlama
+               geçişinde uygulanır); None ise loudness_utils'teki genel mod.
+    trim_silence: baştaki/sondaki sessizliği kes; None ise silence_utils'teki genel ayar.
+    split_chapters: bölümlü videoları ayrı parçalara ayır (Music/<başlık>/);
+                    None ise chapter_utils'teki genel ayar. Bölüm yoksa tek parça.
+    
+    clip: {"start", "end"} veya "1:00-4:30" - sadece bu aralık indirilir ve kodlanır.
+          URL'deki #t=60,270 fragmanı da klip olarak okunur. İşin URL'si (history,
+          tekrar kontrolü) fragmanlı haldir. Klipte bölümlere ayırma yapılmaz.
+    
+    stop_check(): True dönerse iş indirme/kodlama sırasında durdurulur ve
+                  DownloadCancelled fırlatılır; None ise GUI'nin Stop butonu (stop_requested).
+    
+    Bölümlere ayrıldıysa sonuçta ayrıca "chapter_files" ve "music_titles" bulunur.
+    
+    Başarılıysa {"file", "title", "music_title", "url", "extra_files"} döndürür;
+    başarısızsa DownloadJobError fırlatır.
+    """
+    try:
+        source_url, url_clip = split_clip(url)
+        clip = parse_clip(clip) if isinstance(clip, str) else clip or url_clip
+    except ClipError as e:
+        raise DownloadJobError(f"Invalid clip range: {e}")
+    url = clip_url(source_url, clip)
+    trace = trace or JobTrace("download", url)
+    with profile_job("download", trace.job_id):
+        return _run_download_job(url, selected_format, url_hash, music_folder,
+                                 progress_callback, status_callback, trace, extra_targets, normalize,
+                                 trim_silence, split_chapters, source_url, clip, stop_check)
+
+def _run_download_job(url, selected_format, url_hash, music_folder, progress_callback, status_callback, trace,
+                      extra_targets=None, normalize=None, trim_silence=None, split_chapters=None,
+                      source_url=None, clip=None, stop_check=None):
+    source_url = source_url or url
+    stop_check = stop_check or (lambda: stop_requested)
+    url_hash = url_hash or hashlib.md5(url.encode()).hexdigest()
+    progress_callback = progress_callback or (lambda percent, text, speed=None: None)
+    status_callback = status_callback or (lambda text: None)
+    normalize = normalize or get_normalization_mode()
+    split_chapters = is_chapter_split_enabled() if split_chapters is None else split_chapters
+    cache = get_media_cache() if is_media_cache_enabled() else None
+    # Kazanç uygulanacaksa, bölümlere ayrılacaksa veya kaynak önbelleğe alınacaksa
+    # kaynak olduğu gibi indirilir ve kodlama kendi ffmpeg geçişimizde yapılır
+    own_encode = bool(extra_targets) or normalize == "apply" or split_chapters or cache is not None
+    trim_silence = is_silence_trim_enabled() if trim_silence is None else trim_silence
+    
+    # Aşama zamanlamaları yt-dlp hook'larından toplanır
+    timings = {}
+    # İndirme sürerken ortak bant genişliği sınırlayıcısındaki kova (bkz. bandwidth_utils)
+    throttle = {}
+    # Disk alanı rezervasyonu (bkz. disk_utils); iş bitince bırakılır
+    disk = {}
     
     def progress_hook(d):
         """yt-dlp progress hook with debugging"""
+        # Hook'tan fırlatılan hata yt-dlp indirmesini keser
+        if stop_check():
+            raise DownloadCancelled("Download stopped")
+        if d['status'] == 'downloading' and throttle:
+            # Hook beklerken yt-dlp'nin okuma döngüsü de bekler
+            throttle["job"].consume_total(d.get('downloaded_bytes'), stop_check)
+        if d['status'] == 'downloading' and disk:
+            disk["job"].consume(d.get('downloaded_bytes'))
         try:
+            now = time.perf_counter()
             if d['status'] == 'downloading':
+                timings.setdefault('download_start', now)
+                timings['bytes'] = d.get('downloaded_bytes') or timings.get('bytes', 0)
                 if 'total_bytes' in d and d['total_bytes']:
                     percent = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                    root.after(0, lambda p=percent: update_progress(p, f"Downloading... {p:.1f}%", progress_bar, status_label, root))
+                    progress_callback(percent, f"Downloading... {percent:.1f}%", d.get('speed'))
                 elif '_percent_str' in d:
                     percent_str = d['_percent_str'].replace('%', '')
                     try:
                         percent = float(percent_str)
-                        root.after(0, lambda p=percent: update_progress(p, f"Downloading... {p:.1f}%", progress_bar, status_label, root))
+                        progress_callback(percent, f"Downloading... {percent:.1f}%", d.get('speed'))
                     except:
-                        root.after(0, lambda: update_progress(50, "Downloading...", progress_bar, status_label, root))
+                        progress_callback(50, "Downloading...")
                 else:
-                    root.after(0, lambda: update_progress(50, "Downloading...", progress_bar, status_label, root))
+                    progress_callback(50, "Downloading...")
             elif d['status'] == 'finished':
+                if throttle:
+                    throttle["job"].close()
+                if disk:
+                    disk["job"].release_preallocation()
+                timings.setdefault('download_start', now)
+                timings['download_end'] = now
+                timings['bytes'] = d.get('total_bytes') or d.get('downloaded_bytes') or timings.get('bytes', 0)
                 debug_print("✅ Video download completed", "SUCCESS")
-                root.after(0, lambda: update_progress(100, "Processing...", progress_bar, status_label, root))
+                progress_callback(100, "Processing...")
             elif d['status'] == 'error':
                 debug_print(f"❌ Download error in process: {d.get('error', 'Unknown')}", "ERROR")
-                root.after(0, lambda: update_progress(0, "An error occurred...", progress_bar, status_label, root))
+                progress_callback(0, "An error occurred...")
         except Exception as e:
             debug_print(f"⚠️ Progress hook error in process: {e}", "WARNING")
     
+    def postprocessor_hook(d):
+        """Son işlem (ffmpeg) sürelerini topla"""
+        now = time.perf_counter()
+        if d['status'] == 'started':
+            timings['pp_start'] = now
+        elif d['status'] == 'finished' and 'pp_start' in timings:
+            timings['post_process'] = timings.get('post_process', 0.0) + now - timings.pop('pp_start')
+            timings.setdefault('postprocessors', []).append(d.get('postprocessor'))
+    
+    def run_attempt(opts, attempt, client=None):
+        """Bir format denemesi: metadata çıkarma + indirme (+ son işlem)"""
+        timings.clear()
+        # ignoreerrors=True iken yt-dlp hataları fırlatmaz, loglar; mesaj sınıflandırma için gerekli
+        errors = ErrorLog()
+        with get_yt_dlp().YoutubeDL(dict(opts, logger=errors)) as ydl:
+            with trace.phase("metadata", attempt=attempt, client=client):
+                # process=False: bilgi bir kez çıkarılır, indirme aynı bilgiyi kullanır
+                info = ydl.extract_info(source_url, download=False, process=False)
+                if not info:
+                    raise DownloadJobError(errors.last_error or "Could not extract video information")
+                if clip and info.get("duration") and clip["start"] >= info["duration"]:
+                    raise DownloadJobError(f"Clip starts after the end of the video ({info['duration']:.0f}s)")
+            if not disk:
+                disk["job"] = admit_job(music_folder, info, codec, quality, extra_targets, clip, trim_silence,
+                                        trace, status_callback, stop_check)
+            title = info.get('title', 'Unknown')
+            status_callback(f"Downloading '{title}'...")
+            
+            process_start = time.perf_counter()
+            try:
+                with get_scheduler().job(trace.job_id) as job_throttle:
+                    throttle["job"] = job_throttle
+                    try:
+                        result = ydl.process_ie_result(info, download=True)
+                    finally:
+                        throttle.clear()
+                        timings['throttled'] = job_throttle.waited
+                if errors.last_error and 'download_end' not in timings and not stop_check():
+                    raise DownloadJobError(errors.last_error)
+            except Exception as e:
+                trace.add_phase("download", time.perf_counter() - process_start, attempt=attempt, client=client,
+                                bytes=timings.get('bytes'), error_class=type(e).__name__, error=str(e)[:200])
+                raise
+            if stop_check():
+                # ignoreerrors=True iken hook hatası yutulabilir
+                raise DownloadCancelled("Download stopped")
+            process_end = time.perf_counter()
+            
+            download_end = timings.get('download_end', process_end)
+            post_process = timings.get('post_process', 0.0)
+            trace.add_phase("download", download_end - timings.get('download_start', process_start),
+                            attempt=attempt, client=client, bytes=timings.get('bytes'),
+                            clip=clip_label(clip) if clip else None,
+                            throttled_s=round(timings['throttled'], 3) if timings.get('throttled') else None)
+            trace.add_phase("post_process", post_process or max(0.0, process_end - download_end),
+                            attempt=attempt, postprocessors=timings.get('postprocessors'))
+            return result or info, title
+    
+    work_dir = None
     try:
-        # UI update - thread-safe
-        debug_print("📱 Updating UI for download start", "DEBUG")
-        
-        # GUI instance varsa progress entegrasyonu kullan
-        if gui_instance:
-            def ui_update():
-                gui_instance.update_progress(10, "🔍 *Getting video information...*", "", "⏳ *Analyzing YouTube URL...*")
-            root.after(0, ui_update)
-        else:
-            # Fallback traditional method
-            root.after(0, lambda: status_label.config(text="Getting video information..."))
-            root.after(0, lambda: update_progress(0, "Preparing...", progress_bar, status_label, root))
-
         # Create the Music folder - where the program is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        music_folder = os.path.join(script_dir, "Music")
+        music_folder = music_folder or get_music_folder()
         if not os.path.exists(music_folder):
             os.makedirs(music_folder)
             debug_print(f"📁 Created Music folder: {music_folder}", "INFO")
         else:
             debug_print(f"📁 Using existing Music folder: {music_folder}", "DEBUG")
-
+        
         # Get selected format and set quality/codec accordingly
-        selected_format = format_var.get()
         debug_print(f"🎵 Selected format: {selected_format}", "INFO")
+        codec, quality = resolve_format(selected_format)
         
-        if "128k" in selected_format:
-            codec, quality = 'mp3', '128'
-        elif "192k" in selected_format:
-            codec, quality = 'mp3', '192'
-        elif "320k" in selected_format:
-            codec, quality = 'mp3', '320'
-        elif "WAV" in selected_format:
-            codec, quality = 'wav', 'best'
-        elif "M4A" in selected_format:
-            codec, quality = 'm4a', '192'
+        # Medya önbelleği: tüm çıktılar hazırsa bağla ve bitir, kaynak hazırsa indirmeyi atla
+        video = media_id(source_url) if cache else None
+        clip_key = clip_label(clip) if clip else None
+        if cache and not split_chapters:
+            result = serve_cached_outputs(cache, video, url, url_hash, clip, codec, quality, music_folder,
+                                          extra_targets, normalize, trim_silence, trace)
+            if result:
+                trace.finish("success")
+                return result
+        source_entry = cache.find("source", video, clip=clip_key) if cache else None
+        if source_entry:
+            # Kaynak iş klasörüne bağlanır: Music'teki aynı isimli dosyalara dokunulmaz,
+            # kodlama çıktıları yine music_folder'a yazılır
+            work_dir = tempfile.mkdtemp(prefix="job-", dir=cache.root)
+            new_file = os.path.join(work_dir, source_entry["filename"])
+            with trace.phase("cache_link", kind="source", bytes=source_entry["size"]) as record:
+                try:
+                    record["mode"] = cache.link(source_entry, new_file)
+                except OSError as e:
+                    record["skipped"] = str(e)[:200]
+                    source_entry = None
+        if source_entry:
+            info = dict(source_entry["info"])
+            title = info.get("title", "Unknown")
+            format_id = source_entry["format_id"]
+            disk["job"] = admit_job(music_folder, info, codec, quality, extra_targets, clip, trim_silence, trace,
+                                    status_callback, stop_check, include_source=False)
+            status_callback(f"Encoding cached '{title}'...")
+            debug_print(f"⚡ Media cache source hit: {source_entry['filename']}", "SUCCESS")
         else:
-            codec, quality = 'mp3', '128'  # Default car-friendly
-
-        # Download best quality audio with yt-dlp
-        ydl_opts = {
-            'format': 'bestaudio[ext=m4a]',
-            'outtmpl': f'{music_folder}/%(title)s.%(ext)s',
-            'noplaylist': True,
-            'progress_hooks': [progress_hook],
-            'retries': 3,
-            'ignoreerrors': True,
-            'no_warnings': True,
-            'ffmpeg_location': r'C:\ffmpeg\ffmpeg-7.1.1-essentials_build\bin',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['ios'],
-                }
-            }
-        }
+            ydl_opts, fallback_opts = build_ydl_options(music_folder, codec, quality, progress_hook, postprocessor_hook,
+                                                        extract_audio=not own_encode, clip=clip)
         
-        # Fallback options
-        fallback_opts = {
-            'format': 'worst',
-            'outtmpl': f'{music_folder}/%(title)s.%(ext)s',
-            'noplaylist': True,
-            'progress_hooks': [progress_hook],
-            'retries': 1,
-            'ignoreerrors': True,
-            'no_warnings': True,
-            'ffmpeg_location': r'C:\ffmpeg\ffmpeg-7.1.1-essentials_build\bin',
-        }
+            attempts = []
+            
+            def attempt(client, fallback):
+                """Birincil format seçili player_client ile, yedek format yt-dlp varsayılanıyla"""
+                attempts.append(client)
+                if fallback:
+                    status_callback("Trying alternative format...")
+                    progress_callback(50, "Downloading with fallback format...")
+                    return run_attempt(fallback_opts, "fallback", client)
+                opts = dict(ydl_opts, extractor_args={'youtube': {'player_client': [client]}})
+                return run_attempt(opts, "primary" if len(attempts) == 1 else "retry", client)
+            
+            def on_retry(client, kind, delay, error):
+                debug_print(f"Attempt with '{client}' failed ({kind}): {str(error)[:200]}", "WARNING")
+                trace.add_phase("retry_wait", delay, client=client, error_class=kind)
+                if delay:
+                    status_callback(f"Retrying in {delay:.0f}s ({kind} error)...")
+            
+            # İstemci/format denemeleri hata sınıfına göre (bkz. retry_utils)
+            try:
+                info, title = get_retry_engine().run(attempt, stop_check, on_retry)
+            except DownloadCancelled:
+                raise
+            except RetryExhausted as e:
+                if stop_check():
+                    raise DownloadCancelled("Download stopped")
+                debug_print(f"All download attempts failed ({e.kind})", "ERROR")
+                raise DownloadJobError(f"Download failed ({e.kind}):\n{e}")
+            except Exception:
+                if stop_check():
+                    raise DownloadCancelled("Download stopped")
+                raise
+            if attempts[-1] == FALLBACK_CLIENT:
+                debug_print(f"Fallback download successful!", "SUCCESS")
+                progress_callback(90, "Download completed ")
         
-        # Add postprocessor
-        if codec != 'wav':
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': codec,
-                'preferredquality': quality,
-            }]
+            # Find downloaded file
+            debug_print(f"Looking for downloaded file...", "DEBUG")
+            with trace.phase("resolve_file") as record:
+                new_file = find_downloaded_file(music_folder, title, info)
+                if not new_file or not os.path.exists(new_file):
+                    raise DownloadedFileNotFound(f"Downloaded file not found!\n\nSearched title: {title}")
             
-            if codec == 'mp3':
-                ydl_opts['postprocessor_args'] = [
-                    '-ar', '44100',
-                    '-ac', '2',
-                    '-id3v2_version', '3',
-                    '-write_id3v1', '1',
-                    '-c:a', 'libmp3lame',
-                    '-b:a', f'{quality}k'
-                ]
-        else:
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-            }]
+                if not own_encode and new_file.lower().endswith(('.m4a', '.mp4')):
+                    # Sadece ad değişir: içerik MP3 değilse (son işlem başarısız) .mp3 adı
+                    # dosyayı yanlış etiketler (araba teybi çalamaz), dosya olduğu gibi kalır
+                    with open(new_file, "rb") as f:
+                        container = detect_container(f.read(64))
+                    record["container"] = container
+                    if container != "mp3":
+                        debug_print(f"⚠️ Audio was not converted to MP3 ({container}), keeping {new_file}", "WARNING")
+                        progress_callback(100, "Download complete ")
+                    else:
+                        mp3_file = new_file.rsplit('.', 1)[0] + '.mp3'
+                        try:
+                            os.rename(new_file, mp3_file)
+                            new_file = mp3_file
+                            progress_callback(100, "Converted to MP3 ")
+                        except Exception:
+                            progress_callback(100, "Download complete ")
+                record["bytes"] = os.path.getsize(new_file)
         
-        # Try primary download
-        download_success = False
-        error_message = ""
+            format_id = info.get("format_id") or info.get("ext")
+            if cache:
+                with trace.phase("cache_store", kind="source", bytes=os.path.getsize(new_file)) as record:
+                    try:
+                        cache.store("source", video, new_file, format_id, clip=clip_key,
+                                    filename=os.path.basename(new_file), info=slim_info(info, title))
+                    except OSError as e:
+                        record["skipped"] = str(e)[:200]
+                        debug_print(f"⚠️ Source could not be cached: {e}", "WARNING")
         
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                title = info.get('title', 'Unknown')
-                
-                root.after(0, lambda: status_label.config(text=f"Downloading '{title}'..."))
-                ydl.download([url])
-                download_success = True
-                
-        except Exception as e:
-            error_message = str(e)
-            print(f"\n Primary format failed, trying alternative format...")
-            
+        # Çoklu çıktı: ana format + ek kopyalar tek ffmpeg geçişinde
+        tracks = chapter_tracks(info) if split_chapters and not clip else []
+        if tracks:
+            result = split_into_chapters(url, url_hash, new_file, tracks, title, info, codec, quality,
+                                         music_folder, extra_targets, normalize, progress_callback,
+                                         status_callback, trace, stop_check)
+            trace.finish("success")
+            return result
+        
+        extra_files = []
+        loudness = None
+        cut = None
+        if trim_silence:
+            status_callback("Detecting silence...")
+            cut = detect_silence_phase(new_file, trace)
+            # Kendi kodlamamız yoksa (yt-dlp zaten kodladı) kesim stream copy ile yapılır
+            if cut and not own_encode:
+                trim_silence_phase(new_file, cut, trace)
+        if own_encode:
+            audio_filter = None
+            if normalize == "apply":
+                status_callback("Measuring loudness...")
+                loudness = measure_loudness_phase(new_file, trace)
+                if loudness:
+                    gain = normalization_gain(loudness)
+                    audio_filter = volume_filter(gain)
+                    loudness = shifted_result(loudness, gain)
+            status_callback("Encoding all formats in one pass..." if extra_targets else "Encoding...")
+            new_file, extra_files = transcode_targets(new_file, codec, quality, music_folder, extra_targets or [],
+                                                      progress_callback, trace, audio_filter,
+                                                      trim_input_args(cut) if cut else None, stop_check)
+        if normalize == "tags":
+            status_callback("Measuring loudness...")
+            loudness = measure_loudness_phase(new_file, trace)
+        
+        # Tag'ler ve kapak resmi: ses verisine dokunmadan, mümkünse yerinde
+        custom_tags = replaygain_tags(loudness) if loudness and normalize == "tags" else None
+        with trace.phase("tag") as record:
+            record.update(tag_downloaded_files([new_file] + extra_files, title, info, custom_tags=custom_tags))
+        if loudness:
+            # Tag yazımı boyut/mtime'ı değiştirdiği için önbelleğe en son yazılır
             try:
-                root.after(0, lambda: status_label.config(text="Trying alternative format..."))
-                root.after(0, lambda: update_progress(50, "Downloading with fallback format...", progress_bar, status_label, root))
-                with yt_dlp.YoutubeDL(fallback_opts) as ydl_fallback:
-                    info = ydl_fallback.extract_info(url, download=False)
-                    title = info.get('title', 'Unknown')
-                    ydl_fallback.download([url])
-                    download_success = True
-                    print(f"\n Fallback download successful!")
-                    root.after(0, lambda: update_progress(90, "Download completed ", progress_bar, status_label, root))
-                    
-            except Exception as fallback_e:
-                print(f"\n Both formats failed")
-                error_message = f"Primary error: {error_message}\nFallback error: {fallback_e}"
+                store_loudness(new_file, loudness)
+            except OSError:
+                pass
         
-        if not download_success:
-            messagebox.showerror("Download Error", f"Could not download video.\n\n{error_message}")
-            from gui_module import reset_ui
-            root.after(0, lambda: reset_ui(download_button, stop_button, progress_bar, status_label))
-            return
-            
-        # Find downloaded file
-        print(f" Looking for downloaded file...")
-        new_file = None
+        if cache:
+            cache_outputs(cache, video, format_id, clip, new_file, codec, quality, music_folder, extra_targets,
+                          normalize, trim_silence, slim_info(info, title), trace)
         
-        all_audio_files = []
-        for file in os.listdir(music_folder):
-            if any(ext in file.lower() for ext in ['.m4a', '.mp3', '.webm', '.opus', '.wav', '.mp4']):
-                file_path = os.path.join(music_folder, file)
-                file_time = os.path.getctime(file_path)
-                all_audio_files.append((file, file_path, file_time))
+        # Update history with music title
+        with trace.phase("history_write"):
+            music_title = record_download(url, url_hash, new_file, music_folder, title, info, clip)
         
-        if all_audio_files:
-            all_audio_files.sort(key=lambda x: x[2], reverse=True)
-            new_file = all_audio_files[0][1]
-            
-            safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            for file, file_path, _ in all_audio_files:
-                if (safe_title.lower() in file.lower() or 
-                    title.lower() in file.lower() or
-                    any(word.lower() in file.lower() for word in title.split() if len(word) > 3)):
-                    new_file = file_path
-                    break
-            
-        if new_file and os.path.exists(new_file):
-            if new_file.lower().endswith(('.m4a', '.mp4')):
-                mp3_file = new_file.rsplit('.', 1)[0] + '.mp3'
-                try:
-                    os.rename(new_file, mp3_file)
-                    new_file = mp3_file
-                    root.after(0, lambda: update_progress(100, "Converted to MP3 ", progress_bar, status_label, root))
-                except Exception:
-                    root.after(0, lambda: update_progress(100, "Download complete ", progress_bar, status_label, root))
-            
-            # Update history with music title
-            history = load_history()
-            history["urls"].append(url_hash)
-            
-            if "real_urls" not in history:
-                history["real_urls"] = []
-            history["real_urls"].append(url)
-            
-            # Müzik ismini de kaydet
-            if "music_titles" not in history:
-                history["music_titles"] = []
-            
-            # Dosya isminden müzik ismini çıkar (uzantıyı kaldır)
-            music_title = os.path.splitext(os.path.basename(new_file))[0]
-            
-            # Çok uzun isimleri kısalt
-            if len(music_title) > 60:
-                music_title = music_title[:57] + "..."
-            
-            history["music_titles"].append(music_title)
-            debug_print(f"🎵 Music title saved: {music_title}", "SUCCESS")
-            
-            save_history(history)
-            
+        trace.finish("success")
+        return {"file": new_file, "title": title, "music_title": music_title, "url": url,
+                "extra_files": extra_files}
+    
+    except DownloadCancelled:
+        trace.finish("cancelled")
+        raise
+    except Exception as e:
+        trace.finish("error", e)
+        raise
+    finally:
+        if disk:
+            disk["job"].release()
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def start_download_process(url, url_hash, format_var, url_entry, download_button, stop_button, status_label, progress_bar, root, gui_instance=None, trace=None, extra_targets=None):
+    """Starts the actual download process with enhanced debugging"""
+    debug_print("🚀 Starting download process", "INFO")
+    
+    def on_progress(percent, text, speed=None):
+        root.after(0, lambda: update_progress(percent, text, progress_bar, status_label, root))
+    
+    def on_status(text):
+        root.after(0, lambda: status_label.config(text=text))
+    
+    try:
+        # UI update - thread-safe
+        debug_print("📱 Updating UI for download start", "DEBUG")
+        
+        # GUI instance varsa progress entegrasyonu kullan
+        if gui_instance:
+            def ui_update():
+                gui_instance.update_progress(10, "🔍 *Getting video information...*", "", "⏳ *Analyzing YouTube URL...*")
+            root.after(0, ui_update)
+        else:
+            # Fallback traditional method
+            root.after(0, lambda: status_label.config(text="Getting video information..."))
+            root.after(0, lambda: update_progress(0, "Preparing...", progress_bar, status_label, root))
+        
+        result = run_download_job(url, format_var.get(), url_hash,
+                                  progress_callback=on_progress, status_callback=on_status, trace=trace,
+                                  extra_targets=extra_targets)
+        new_file = result["file"]
+        music_title = result["music_title"]
+        if result.get("chapter_files"):
+            # Birden çok satır eklendi: liste history'den yeniden yüklenir, klasör gösterilir
+            new_file = os.path.dirname(new_file)
+            music_title = None
+        
+        if gui_instance:
+            # Listeye tek satır eklenir, tüm history yeniden çizilmez
+            root.after(0, lambda: gui_instance.finish_download_success(new_file, music_title))
+        else:
             from gui_module import finish_download_success
             root.after(0, lambda: finish_download_success(new_file, url_entry, download_button, stop_button, progress_bar, status_label, root))
-        else:
-            error_msg = f"Downloaded file not found!\n\nSearched title: {title}"
-            from gui_module import finish_download_error
-            root.after(0, lambda: finish_download_error(error_msg, download_button, stop_button, progress_bar, status_label))
-
+    
+    except DownloadedFileNotFound as e:
+        error_msg = str(e)
+        from gui_module import finish_download_error
+        root.after(0, lambda: finish_download_error(error_msg, download_button, stop_button, progress_bar, status_label))
+    except DownloadCancelled:
+        debug_print("🛑 Download stopped by user", "WARNING")
+        from gui_module import reset_ui
+        root.after(0, lambda: reset_ui(download_button, stop_button, progress_bar, status_label))
+    except DownloadJobError as e:
+        messagebox.showerror("Download Error", f"Could not download video.\n\n{e}")
+        from gui_module import reset_ui
+        root.after(0, lambda: reset_ui(download_button, stop_button, progress_bar, status_label))
     except Exception as e:
         error_msg = f"An error occurred:\n{str(e)}"
         from gui_module import finish_download_error
@@ -419,16 +1287,15 @@ def start_download_process(url, url_hash, format_var, url_entry, download_button
 
 def convert_existing_files(status_label, download_button, stop_button):
     """Eski dosyaları 128kbps MP3'e dönüştürür - Detaylı Debug"""
-    print("\n Convert Existing Files başlatılıyor...")
+    debug_print("Convert Existing Files başlatılıyor...", "INFO")
     
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    music_folder = os.path.join(script_dir, "Music")
+    music_folder = get_music_folder()
     
-    print(f" Klasör kontrol ediliyor: {music_folder}")
+    debug_print(f"Klasör kontrol ediliyor: {music_folder}", "DEBUG")
     
     # Klasör kontrolü
     if not os.path.exists(music_folder):
-        print(f" Music klasörü bulunamadı!")
+        debug_print(f"Music klasörü bulunamadı!", "ERROR")
         messagebox.showwarning("Uyarı", f"Music klasörü bulunamadı!\nAranan yol: {music_folder}")
         return
     
@@ -438,27 +1305,27 @@ def convert_existing_files(status_label, download_button, stop_button):
     
     try:
         all_files = os.listdir(music_folder)
-        print(f" Klasörde {len(all_files)} dosya bulundu")
+        debug_print(f"Klasörde {len(all_files)} dosya bulundu", "DEBUG")
         
         for file in all_files:
             if any(ext in file.lower() for ext in supported_extensions):
                 audio_files.append(file)
-                print(f" Ses dosyası bulundu: {file}")
+                debug_print(f"Ses dosyası bulundu: {file}", "DEBUG")
                 
     except Exception as e:
-        print(f" Klasör okuma hatası: {e}")
+        debug_print(f"Klasör okuma hatası: {e}", "ERROR")
         messagebox.showerror("Hata", f"Klasör okunamıyor: {str(e)}")
         return
     
-    print(f" Toplam {len(audio_files)} ses dosyası tespit edildi")
+    debug_print(f"Toplam {len(audio_files)} ses dosyası tespit edildi", "INFO")
     
     if not audio_files:
-        print(" Hiç ses dosyası bulunamadı")
+        debug_print("Hiç ses dosyası bulunamadı", "INFO")
         messagebox.showinfo("Bilgi", "Music klasöründe ses dosyası bulunamadı!")
         return
     
     # Kullanıcıdan onay al
-    print(" Kullanıcıdan onay bekleniyor...")
+    debug_print("Kullanıcıdan onay bekleniyor...", "DEBUG")
     result = messagebox.askyesno(" Araba Uyumlu Dönüştürme", 
                                 f"{len(audio_files)} dosya bulundu:\n\n"
                                 f"{chr(10).join(audio_files[:5])}\n"
@@ -467,126 +1334,215 @@ def convert_existing_files(status_label, download_button, stop_button):
                                 f" Not: Orijinal dosyalar silinecek ve\n"
                                 f"128kbps MP3 formatına dönüştürülecek!")
     if not result:
-        print(" Kullanıcı işlemi iptal etti")
+        debug_print("Kullanıcı işlemi iptal etti", "INFO")
         return
     
-    print(" Kullanıcı onayladı, dönüştürme başlıyor...")
+    debug_print("Kullanıcı onayladı, dönüştürme başlıyor...", "INFO")
     
     def convert_process():
         try:
             global stop_requested, current_thread
             stop_requested = False
             
-            print(" UI kilitleniyor...")
+            debug_print("UI kilitleniyor...", "DEBUG")
             # UI'yi kilitle
             download_button.config(state='disabled')
             stop_button.config(state='normal')
             
             success_count = 0
             failed_count = 0
+            normalize = get_normalization_mode()
+            trim_silence = is_silence_trim_enabled()
             
             # FFmpeg kontrol et
-            ffmpeg_path = r'C:\ffmpeg\ffmpeg-7.1.1-essentials_build\bin\ffmpeg.exe'
+            ffmpeg_path = get_ffmpeg_path()
             if not os.path.exists(ffmpeg_path):
-                print(f" FFmpeg bulunamadı: {ffmpeg_path}")
+                debug_print(f"FFmpeg bulunamadı: {ffmpeg_path}", "ERROR")
                 messagebox.showerror("Hata", f"FFmpeg bulunamadı!\nBeklenen konum: {ffmpeg_path}")
                 return
             
-            print(f" FFmpeg bulundu: {ffmpeg_path}")
+            debug_print(f"FFmpeg bulundu: {ffmpeg_path}", "DEBUG")
             
             for i, file in enumerate(audio_files):
                 if stop_requested:
-                    print(" Kullanıcı tarafından durduruldu")
+                    debug_print("Kullanıcı tarafından durduruldu", "WARNING")
                     break
                 
-                print(f"\n--- Dosya {i+1}/{len(audio_files)}: {file} ---")
+                debug_print(f"Dosya {i+1}/{len(audio_files)}: {file}", "INFO")
+                trace = JobTrace("convert", file)
+                reservation = None
+                temp_output = None
                 
-                try:
-                    status_label.config(text=f" Converting: {file} ({i+1}/{len(audio_files)})")
-                    
-                    input_path = os.path.join(music_folder, file)
-                    file_name, file_ext = os.path.splitext(file)
-                    
-                    print(f" Giriş dosyası: {input_path}")
-                    print(f" Dosya adı: {file_name}, Uzantı: {file_ext}")
-                    
-                    # Eğer zaten MP3 ise ve boyutu küçükse skip et
-                    if file_ext.lower() == '.mp3':
-                        file_size = os.path.getsize(input_path) / (1024 * 1024)  # MB
-                        print(f" MP3 dosya boyutu: {file_size:.2f} MB")
+                # Her dosya ayrı profil dosyası (indirmedeki URL başına profil gibi)
+                with profile_job("convert", trace.job_id):
+                    try:
+                        status_label.config(text=f" Converting: {file} ({i+1}/{len(audio_files)})")
                         
-                        if file_size < 5:  # 5MB'dan küçükse muhtemelen zaten 128kbps
-                            print(" Zaten küçük MP3, atlanıyor...")
-                            success_count += 1
-                            continue
-                    
-                    # Temp dosya oluştur
-                    temp_output = os.path.join(music_folder, f"{file_name}_TEMP_128k.mp3")
-                    print(f" Temp dosya: {temp_output}")
-                    
-                    # FFmpeg komutu
-                    ffmpeg_cmd = [
-                        ffmpeg_path,
-                        '-i', input_path,
-                        '-c:a', 'libmp3lame',
-                        '-b:a', '128k',
-                        '-ar', '44100',
-                        '-ac', '2',
-                        '-id3v2_version', '3',
-                        '-write_id3v1', '1',
-                        '-y', temp_output
-                    ]
-                    
-                    print(f" FFmpeg komutu çalıştırılıyor...")
-                    print(f"   Command: {' '.join(ffmpeg_cmd[:3])} ... {ffmpeg_cmd[-1]}")
-                    
-                    start_time = time.time()
-                    result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True,
-                                          creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0,
-                                          timeout=300)  # 5 dakika timeout
-                    end_time = time.time()
-                    
-                    print(f" Dönüştürme süresi: {end_time - start_time:.2f} saniye")
-                    print(f" Return code: {result.returncode}")
-                    
-                    if result.returncode == 0 and os.path.exists(temp_output):
-                        # Dosya boyutlarını karşılaştır
-                        original_size = os.path.getsize(input_path) / (1024 * 1024)
-                        new_size = os.path.getsize(temp_output) / (1024 * 1024)
-                        print(f" Orijinal: {original_size:.2f} MB  Yeni: {new_size:.2f} MB")
+                        input_path = os.path.join(music_folder, file)
+                        file_name, file_ext = os.path.splitext(file)
                         
-                        # Orijinal dosyayı sil ve yenisiyle değiştir
-                        final_output = os.path.join(music_folder, f"{file_name}.mp3")
-                        print(f" Orijinal dosya siliniyor: {input_path}")
-                        os.remove(input_path)
+                        debug_print(f"Giriş dosyası: {input_path}", "DEBUG")
+                        debug_print(f"Dosya adı: {file_name}, Uzantı: {file_ext}", "DEBUG")
                         
-                        print(f" Yeni dosya adlandırılıyor: {temp_output}  {final_output}")
-                        os.rename(temp_output, final_output)
+                        # Eğer zaten MP3 ise ve boyutu küçükse skip et
+                        if file_ext.lower() == '.mp3':
+                            file_size = os.path.getsize(input_path) / (1024 * 1024)  # MB
+                            debug_print(f"MP3 dosya boyutu: {file_size:.2f} MB", "DEBUG")
+                            
+                            if file_size < 5:  # 5MB'dan küçükse muhtemelen zaten 128kbps
+                                debug_print("Zaten küçük MP3, atlanıyor...", "INFO")
+                                # Sessizlik kırpma açıksa yeniden kodlamadan kesilir (eski dosyalar için)
+                                if trim_silence:
+                                    cut = detect_silence_phase(input_path, trace)
+                                    if cut:
+                                        trim_silence_phase(input_path, cut, trace)
+                                success_count += 1
+                                trace.finish("skipped")
+                                continue
                         
-                        success_count += 1
-                        print(f" Başarılı: {file}  128kbps MP3 ({new_size:.2f} MB)")
-                    else:
-                        # Temp dosyayı temizle
+                        # Temp dosya oluştur
+                        temp_output = os.path.join(music_folder, f"{file_name}_TEMP_128k.mp3")
+                        debug_print(f"Temp dosya: {temp_output}", "DEBUG")
+                        
+                        # Normalizasyon: ölçüm önbellekli; kazanç aynı kodlama geçişinde uygulanır
+                        loudness = None
+                        audio_filter = None
+                        if normalize != "off":
+                            loudness = measure_loudness_phase(input_path, trace, use_cache=True)
+                        if loudness and normalize == "apply":
+                            gain = normalization_gain(loudness)
+                            audio_filter = volume_filter(gain)
+                            loudness = shifted_result(loudness, gain)
+                        
+                        # Sessizlik kesimi aynı kodlama geçişinde (giriş -ss/-t)
+                        cut = detect_silence_phase(input_path, trace) if trim_silence else None
+                        
+                        # FFmpeg komutu
+                        ffmpeg_cmd = [
+                            ffmpeg_path,
+                        ] + (trim_input_args(cut) if cut else []) + [
+                            '-i', input_path,
+                        ] + (['-af', audio_filter] if audio_filter else []) + [
+                            '-c:a', 'libmp3lame',
+                            '-b:a', '128k',
+                            '-ar', '44100',
+                            '-ac', '2',
+                            '-id3v2_version', '3',
+                            '-write_id3v1', '1',
+                            '-y', temp_output
+                        ]
+                        
+                        debug_print(f"FFmpeg komutu çalıştırılıyor...", "DEBUG")
+                        debug_print(f"Command: {' '.join(ffmpeg_cmd[:3])} ... {ffmpeg_cmd[-1]}", "DEBUG")
+                        
+                        # Zaman aşımı sabit 300 sn yerine dosya süresinden hesaplanır
+                        duration = probe_duration(input_path)
+                        if cut:
+                            duration = cut["end"] - cut["start"]
+                        file_label = f" Converting: {file} ({i+1}/{len(audio_files)})"
+                        last_update = [0.0]
+                        
+                        # Disk doluysa yarım dosya bırakmadan dur (bkz. disk_utils)
+                        need = estimate_job_bytes({"duration": duration}, [("mp3", "128")], include_source=False)
+                        try:
+                            reservation = get_disk_guard().admit(music_folder, need, name=file,
+                                                                 stop_check=lambda: stop_requested)
+                        except DiskSpaceError as e:
+                            debug_print(f"{e}", "ERROR")
+                            failed_count += 1
+                            trace.finish("error", e)
+                            break
+                        if reservation is None:
+                            trace.finish("stopped")
+                            break
+                        
+                        def on_ffmpeg_progress(percent, speed, out_time):
+                            now = time.monotonic()
+                            if now - last_update[0] < 0.2 and percent != 100.0:
+                                return
+                            last_update[0] = now
+                            details = []
+                            if percent is not None:
+                                details.append(f"{percent:.0f}%")
+                            if speed:
+                                details.append(f"{speed:.1f}x")
+                            status_label.config(text=f"{file_label} {' • '.join(details)}")
+                        
+                        with trace.phase("transcode", bytes=os.path.getsize(input_path), media_duration_s=duration) as record:
+                            result = run_ffmpeg(ffmpeg_cmd, duration, on_ffmpeg_progress,
+                                                stop_check=lambda: stop_requested)
+                            record["returncode"] = result["returncode"]
+                            record["speed_x"] = result["speed"]
+                        
+                        debug_print(f"Dönüştürme süresi: {result['elapsed']:.2f} saniye ({result['speed'] or 0:.1f}x)", "DEBUG")
+                        debug_print(f"Return code: {result['returncode']}", "DEBUG")
+                        
+                        if result["returncode"] == 0 and os.path.exists(temp_output):
+                            # Dosya boyutlarını karşılaştır
+                            original_size = os.path.getsize(input_path) / (1024 * 1024)
+                            new_size = os.path.getsize(temp_output) / (1024 * 1024)
+                            debug_print(f"Orijinal: {original_size:.2f} MB  Yeni: {new_size:.2f} MB", "DEBUG")
+                            
+                            # Orijinal dosyayı sil ve yenisiyle değiştir
+                            final_output = os.path.join(music_folder, f"{file_name}.mp3")
+                            with trace.phase("replace", bytes=os.path.getsize(temp_output)):
+                                debug_print(f"Orijinal dosya siliniyor: {input_path}", "DEBUG")
+                                os.remove(input_path)
+                                
+                                debug_print(f"Yeni dosya adlandırılıyor: {temp_output}  {final_output}", "DEBUG")
+                                os.rename(temp_output, final_output)
+                            
+                            if loudness:
+                                try:
+                                    if normalize == "tags":
+                                        write_tags(final_output, {"custom": replaygain_tags(loudness)})
+                                    store_loudness(final_output, loudness)
+                                except (TagWriteError, OSError) as e:
+                                    debug_print(f"ReplayGain tag yazılamadı: {e}", "WARNING")
+                            
+                            success_count += 1
+                            trace.finish("success")
+                            debug_print(f"Başarılı: {file}  128kbps MP3 ({new_size:.2f} MB)", "SUCCESS")
+                        else:
+                            # Temp dosyayı temizle
+                            if os.path.exists(temp_output):
+                                debug_print(f"Temp dosya temizleniyor: {temp_output}", "DEBUG")
+                                os.remove(temp_output)
+                            
+                            if result["stopped"]:
+                                trace.finish("stopped")
+                                continue
+                            failed_count += 1
+                            trace.finish("error", f"ffmpeg exit code {result['returncode']}")
+                            debug_print(f"Başarısız: {file}", "ERROR")
+                            if result["stderr_tail"]:
+                                debug_print("Hata:\n" + "\n".join(result["stderr_tail"][-10:]), "ERROR")
+                    
+                    except subprocess.TimeoutExpired as e:
+                        debug_print(f"Timeout: {file} - {e.timeout:.0f} sn içinde tamamlanamadı "
+                                    f"({getattr(e, 'reason', 'timeout')})", "ERROR")
                         if os.path.exists(temp_output):
-                            print(f" Temp dosya temizleniyor: {temp_output}")
                             os.remove(temp_output)
-                        
                         failed_count += 1
-                        print(f" Başarısız: {file}")
-                        if result.stderr:
-                            print(f"   Hata: {result.stderr[:200]}...")
-                
-                except subprocess.TimeoutExpired:
-                    print(f" Timeout: {file} - 5 dakikada tamamlanamadı")
-                    failed_count += 1
-                except Exception as e:
-                    print(f" Beklenmedik hata {file}: {e}")
-                    failed_count += 1
-                    continue
+                        trace.finish("error", e)
+                    except Exception as e:
+                        debug_print(f"Beklenmedik hata {file}: {e}", "ERROR")
+                        if temp_output and os.path.exists(temp_output):
+                            os.remove(temp_output)
+                        failed_count += 1
+                        trace.finish("error", e)
+                        continue
+                    finally:
+                        if reservation:
+                            reservation.release()
+            
+            debug_print(f"Dönüştürme tamamlandı!", "SUCCESS")
+            debug_print(f"Başarılı: {success_count}", "INFO")
+            debug_print(f"Başarısız: {failed_count}", "INFO")
             
-            print(f"\n Dönüştürme tamamlandı!")
-            print(f" Başarılı: {success_count}")
-            print(f" Başarısız: {failed_count}")
+            # Profil modu açıksa bu dönüştürme partisinin özeti (CLI indirmesindeki gibi)
+            print_profile_summary()
+            reset_profile_session()
             
             # UI'yi serbest bırak
             download_button.config(state='normal')
@@ -606,17 +1562,17 @@ def convert_existing_files(status_label, download_button, stop_button):
                                                f" Başarısız: {failed_count} dosya")
                 
         except Exception as e:
-            print(f" Genel hata: {e}")
+            debug_print(f"Genel hata: {e}", "ERROR")
             download_button.config(state='normal')
             stop_button.config(state='disabled')
             status_label.config(text=" Error occurred!")
             messagebox.showerror("Hata", f"Dönüştürme sırasında hata: {str(e)}")
         finally:
-            print(" UI sıfırlanıyor...")
+            debug_print("UI sıfırlanıyor...", "DEBUG")
             status_label.config(text="Ready ")
     
     # Dönüştürmeyi thread'de çalıştır
-    print(" Thread başlatılıyor...")
+    debug_print("Thread başlatılıyor...", "DEBUG")
     global current_thread
     current_thread = threading.Thread(target=convert_process, daemon=True)
     current_thread.start()
@@ -0,0 +1,259 @@
+﻿# -*- coding: utf-8 -*-
+"""
+FFmpeg Yardımcıları - ffmpeg/ffprobe konumunu bulma ve ilerleme akışıyla çalıştırma
+"""
+import os
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+# Varsayılan Windows kurulum klasörü
+FFMPEG_DIR = r'C:\ffmpeg\ffmpeg-7.1.1-essentials_build\bin'
+
+
+def get_ffmpeg_dir():
+    """
+    ffmpeg klasörü: önce YT2MP3_FFMPEG_DIR ortam değişkeni, sonra varsayılan
+    Windows kurulumu, en son PATH üzerindeki ffmpeg.
+    """
+    env_dir = os.environ.get("YT2MP3_FFMPEG_DIR")
+    if env_dir:
+        return env_dir
+    if os.path.isdir(FFMPEG_DIR):
+        return FFMPEG_DIR
+    found = shutil.which("ffmpeg")
+    return os.path.dirname(found) if found else FFMPEG_DIR
+
+
+def get_ffmpeg_path(tool="ffmpeg"):
+    """ffmpeg (veya ffprobe) çalıştırılabilir dosyasının tam yolu"""
+    ffmpeg_dir = get_ffmpeg_dir()
+    names = [f"{tool}.exe", f"{tool}.cmd", f"{tool}.bat"] if os.name == 'nt' else [tool]
+    for name in names:
+        path = os.path.join(ffmpeg_dir, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(ffmpeg_dir, names[0])
+
+
+# -progress çıktısı gelmezse süreç takılmış sayılır (saniye)
+STALL_TIMEOUT = 60.0
+
+# stderr'den saklanan en fazla satır (tanı için halka tampon)
+STDERR_TAIL_LINES = 40
+
+
+def probe_duration(path):
+    """
+    Dosyanın süresi (saniye). Önce tag_utils ile başlıklardan okunur,
+    bulunamazsa ffprobe denenir; o da yoksa None.
+    """
+    try:
+        from tag_utils import read_audio_metadata
+        duration = read_audio_metadata(path).get("duration")
+        if duration:
+            return float(duration)
+    except Exception:
+        pass
+
+    ffprobe = get_ffmpeg_path("ffprobe")
+    if not os.path.exists(ffprobe):
+        return None
+    try:
+        result = subprocess.run([ffprobe, "-v", "error", "-show_entries", "format=duration",
+                                 "-of", "default=noprint_wrappers=1:nokey=1", path],
+                                capture_output=True, text=True, timeout=30,
+                                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def timeout_for_duration(duration, minimum=120.0, min_speed=0.5):
+    """
+    Toplam zaman aşımı: en yavaş kabul edilen hızda (min_speed x gerçek zaman)
+    süre + pay. Süre bilinmiyorsa None (sadece takılma zaman aşımı geçerli).
+    """
+    if not duration:
+        return None
+    return max(minimum, duration / min_speed + 60.0)
+
+
+def _parse_out_time(block):
+    """-progress bloğundan çıktı zamanını saniye olarak al"""
+    value = block.get("out_time_us") or block.get("out_time_ms")
+    if value and value.lstrip("-").isdigit():
+        # ffmpeg out_time_ms değerini de mikrosaniye olarak yazar
+        return max(0, int(value)) / 1_000_000
+    out_time = block.get("out_time")
+    if out_time and ":" in out_time:
+        try:
+            hours, minutes, seconds = out_time.split(":")
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        except ValueError:
+            return None
+    return None
+
+
+def run_ffmpeg(command, duration=None, progress_callback=None, stop_check=None,
+               timeout=None, stall_timeout=STALL_TIMEOUT, stderr_lines=STDERR_TAIL_LINES):
+    """
+    ffmpeg'i '-progress pipe:1' ile çalıştırır ve çıktıyı satır satır okur.
+
+    command: [ffmpeg_yolu, argümanlar...] ('-progress' eklenir)
+    duration: giriş süresi; yüzde hesabı ve varsayılan zaman aşımı için
+    progress_callback(percent, speed_x, out_time): her ilerleme bloğunda
+    stop_check(): True dönerse ffmpeg sonlandırılır
+    timeout: toplam süre sınırı (varsayılan timeout_for_duration(duration))
+
+    {"returncode", "stderr_tail", "elapsed", "out_time", "speed", "stopped"} döndürür.
+    Zaman aşımında subprocess.TimeoutExpired fırlatır (stderr_tail ile).
+    """
+    command = [command[0], "-nostats", "-progress", "pipe:1"] + list(command[1:])
+    timeout = timeout if timeout is not None else timeout_for_duration(duration)
+    stderr_tail = deque(maxlen=stderr_lines)
+    state = {"last_progress": time.monotonic(), "killed": None, "out_time": None, "speed": None}
+    start = time.monotonic()
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               stdin=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace",
+                               creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+
+    def read_stderr():
+        for line in process.stderr:
+            line = line.rstrip()
+            if line:
+                stderr_tail.append(line)
+
+    def watchdog():
+        while process.poll() is None:
+            now = time.monotonic()
+            reason = None
+            if stop_check is not None and stop_check():
+                reason = "stopped"
+            elif timeout is not None and now - start > timeout:
+                reason = "timeout"
+            elif stall_timeout and now - state["last_progress"] > stall_timeout:
+                reason = "stalled"
+            if reason:
+                state["killed"] = reason
+                process.kill()
+                return
+            time.sleep(0.2)
+
+    stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+    stderr_thread.start()
+    threading.Thread(target=watchdog, daemon=True).start()
+
+    block = {}
+    for line in process.stdout:
+        key, _, value = line.strip().partition("=")
+        if not key:
+            continue
+        if key != "progress":
+            block[key] = value
+            continue
+
+        state["last_progress"] = time.monotonic()
+        out_time = _parse_out_time(block)
+        speed = block.get("speed", "").rstrip("x").strip()
+        try:
+            speed = float(speed)
+        except ValueError:
+            speed = None
+        if out_time is not None:
+            state["out_time"] = out_time
+        if speed is not None:
+            state["speed"] = speed
+        if progress_callback:
+            if value == "end":
+                percent = 100.0
+            elif duration and out_time is not None:
+                percent = min(100.0, out_time / duration * 100)
+            else:
+                percent = None
+            progress_callback(percent, speed, out_time)
+        block = {}
+
+    returncode = process.wait()
+    stderr_thread.join(timeout=2.0)
+    elapsed = time.monotonic() - start
+
+    if state["killed"] in ("timeout", "stalled"):
+        error = subprocess.TimeoutExpired(command, timeout if state["killed"] == "timeout" else stall_timeout,
+                                          stderr="\n".join(stderr_tail))
+        error.reason = state["killed"]
+        raise error
+
+    return {
+        "returncode": returncode,
+        "stderr_tail": list(stderr_tail),
+        "elapsed": elapsed,
+        "out_time": state["out_time"],
+        "speed": state["speed"],
+        "stopped": state["killed"] == "stopped",
+    }
+
+
+def iter_pcm(path, sample_rate=48000, channels=2, chunk_frames=65536, timeout=None):
+    """
+    Dosyayı ffmpeg ile float32 (little-endian) PCM'e çözer ve chunk_frames
+    karelik bayt blokları üretir (son blok daha kısa olabilir). Bellek
+    kullanımı blok boyutuyla sınırlıdır.
+    ffmpeg hata ile biterse subprocess.CalledProcessError (stderr son satırları ile).
+    timeout: toplam süre sınırı (saniye, tüketicinin işleme süresi dahil); aşılırsa
+    run_ffmpeg'deki gibi bekçi thread ffmpeg'i sonlandırır ve okuma döngüsü
+    subprocess.TimeoutExpired fırlatır.
+    """
+    command = [get_ffmpeg_path(), '-nostdin', '-v', 'error', '-i', path, '-map', '0:a:0',
+               '-f', 'f32le', '-ac', str(channels), '-ar', str(sample_rate), 'pipe:1']
+    frame_bytes = 4 * channels
+    state = {"killed": False}
+    # stderr geçici dosyaya: -v error ile küçük kalır, pipe dolup kilitlenmez
+    with tempfile.TemporaryFile() as stderr, \
+            subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, stdin=subprocess.DEVNULL,
+                             creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0) as process:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        def watchdog():
+            # readinto bloklar; süre dolunca ffmpeg'i öldürmek okumayı EOF ile çözer
+            while process.poll() is None:
+                if time.monotonic() > deadline:
+                    state["killed"] = True
+                    process.kill()
+                    return
+                time.sleep(0.2)
+
+        if deadline is not None:
+            threading.Thread(target=watchdog, daemon=True).start()
+        try:
+            buffer = bytearray(chunk_frames * frame_bytes)
+            view = memoryview(buffer)
+            while True:
+                filled = 0
+                while filled < len(buffer):
+                    read = process.stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                if state["killed"]:
+                    raise subprocess.TimeoutExpired(command, timeout)
+                usable = filled - filled % frame_bytes
+                if usable:
+                    yield bytes(view[:usable])
+                if filled < len(buffer):
+                    break
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            returncode = process.wait(timeout=remaining)
+            if state["killed"]:
+                raise subprocess.TimeoutExpired(command, timeout)
+        finally:
+            if process.poll() is None:
+                process.kill()
+        if returncode != 0:
+            stderr.seek(0)
+            tail = stderr.read().decode("utf-8", errors="replace").strip().splitlines()[-3:]
+            raise subprocess.CalledProcessError(returncode, command, stderr="\n".join(tail))
@@ -4,15 +4,21 @@ YouTube MP3 İndirici - Modern GUI Modülü v2.0 - Enhanced UI
 """
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
+import tkinter.font as tkfont
 import os
 import sys
-from download_module import download_and_convert, convert_existing_files, stop_download
-from history_utils import load_history, save_history
+import time
+import threading
+from download_module import download_and_convert, convert_existing_files, stop_download, preload_yt_dlp
+from history_utils import load_history, save_history, get_music_folder, upsert_library_records
+from scanner_module import scan_library
+from search_module import build_index, normalize_text
+from log_utils import debug_print
+from profile_utils import set_profiling, is_profiling_enabled
+from loudness_utils import set_normalization_mode, get_normalization_mode
+from silence_utils import set_silence_trim, is_silence_trim_enabled
+from chapter_utils import set_chapter_split, is_chapter_split_enabled
 
-# Debug fonksiyonu için basit tanım
-def debug_print(message, level="INFO"):
-    """Basit debug print fonksiyonu"""
-    print(f"[{level}] {message}")
 
 # Gelişmiş Modern Temalar
 THEMES = {
@@ -78,6 +84,204 @@ THEMES = {
     }
 }
 
+# Widget sınıfı -> tema rolü (download/stop butonu ve sayaç etiketi kimlikle belirlenir)
+CLASS_ROLES = {
+    "Frame": "frame",
+    "Label": "label",
+    "Button": "button",
+    "Entry": "entry",
+    "Listbox": "listbox",
+    "Labelframe": "labelframe",
+    "Radiobutton": "radiobutton",
+    "Checkbutton": "checkbutton"
+}
+
+# Derlenmiş tema önbelleği: tema adı -> {"roles": ..., "options": ...}
+_COMPILED_THEMES = {}
+
+def compile_theme(theme):
+    """
+    Tema renklerini bir kez derler:
+    - roles: rol başına hazır Tcl configure argümanları
+    - options: sonradan oluşturulan widget'lar için Tk option database girdileri
+    """
+    radio = {"-background": theme["bg"], "-foreground": theme["fg"],
+             "-activebackground": theme["bg"], "-selectcolor": theme["accent"]}
+    roles = {
+        "frame": {"-background": theme["bg"]},
+        "label": {"-background": theme["bg"], "-foreground": theme["fg"]},
+        "count_label": {"-background": theme["bg"], "-foreground": theme["accent"]},
+        "button": {"-background": theme["button_bg"], "-foreground": theme["button_fg"],
+                   "-activebackground": theme["hover"], "-activeforeground": theme["fg"]},
+        # Ana download butonu - Yeşil tonları
+        "download_button": {"-background": theme["success"], "-foreground": "#ffffff",
+                            "-activebackground": theme["accent"], "-activeforeground": "#ffffff"},
+        # Stop butonu - Kırmızı tonları
+        "stop_button": {"-background": theme["error"], "-foreground": "#ffffff",
+                        "-activebackground": "#c0392b", "-activeforeground": "#ffffff"},
+        "entry": {"-background": theme["entry_bg"], "-foreground": theme["entry_fg"],
+                  "-insertbackground": theme["fg"]},
+        "listbox": {"-background": theme["entry_bg"], "-foreground": theme["entry_fg"],
+                    "-selectbackground": theme["accent"]},
+        "labelframe": {"-background": theme["bg"], "-foreground": theme["fg"]},
+        "radiobutton": radio,
+        "checkbutton": radio
+    }
+    
+    options = [
+        ("*Frame.background", theme["bg"]),
+        ("*Label.background", theme["bg"]),
+        ("*Label.foreground", theme["fg"]),
+        ("*Labelframe.background", theme["bg"]),
+        ("*Labelframe.foreground", theme["fg"]),
+        ("*Button.background", theme["button_bg"]),
+        ("*Button.foreground", theme["button_fg"]),
+        ("*Button.activeBackground", theme["hover"]),
+        ("*Entry.background", theme["entry_bg"]),
+        ("*Entry.foreground", theme["entry_fg"]),
+        ("*Listbox.background", theme["entry_bg"]),
+        ("*Listbox.foreground", theme["entry_fg"]),
+        ("*Checkbutton.background", theme["bg"]),
+        ("*Checkbutton.foreground", theme["fg"]),
+        ("*Checkbutton.selectColor", theme["accent"]),
+        ("*Radiobutton.background", theme["bg"]),
+        ("*Radiobutton.foreground", theme["fg"]),
+        ("*Radiobutton.selectColor", theme["accent"])
+    ]
+    
+    return {
+        "roles": {role: " ".join(f"{k} {v}" for k, v in opts.items()) for role, opts in roles.items()},
+        "options": options
+    }
+
+def get_compiled_theme(theme_name):
+    """Derlenmiş temayı önbellekten getir (ilk kullanımda derle)"""
+    compiled = _COMPILED_THEMES.get(theme_name)
+    if compiled is None:
+        compiled = _COMPILED_THEMES[theme_name] = compile_theme(THEMES[theme_name])
+    return compiled
+
+# Liste süslemesi için emoji döngüsü
+MUSIC_EMOJIS = ["🎵", "🎶", "🎼", "🎤", "🎸", "🎹", "🥁", "🎺", "🎻", "🪕"]
+
+def format_history_line(index, title):
+    """Numaralandırılmış liste satırı: "01. 🎵 Song Name" (index 0 tabanlı)"""
+    emoji = MUSIC_EMOJIS[index % len(MUSIC_EMOJIS)]
+    return f"{index + 1:02d}. {emoji} {title}"
+
+class VirtualHistoryList:
+    """
+    Sanal (virtualized) müzik listesi.
+    Listbox'a sadece görünen pencere kadar satır yazılır; kaydırma çubuğu
+    tüm listeyi temsil eder. Böylece çizim maliyeti liste boyutundan bağımsızdır.
+    """
+    def __init__(self, parent, font, placeholder_lines=()):
+        self.frame = tk.Frame(parent)
+        self.items = []
+        self.indices = None
+        self.offset = 0
+        self.rows = 10
+        self.placeholder_lines = list(placeholder_lines)
+        self.row_height = max(1, tkfont.Font(font=font).metrics("linespace"))
+        
+        self.scrollbar = tk.Scrollbar(self.frame, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.listbox = tk.Listbox(self.frame, 
+                                font=font,
+                                height=self.rows,
+                                relief=tk.SUNKEN,
+                                bd=2,
+                                activestyle="none")
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        # Listbox'ın kendi kaydırmasını devre dışı bırak, kaydırmayı biz yönetiyoruz
+        self.listbox.bind('<Configure>', self.on_resize)
+        self.listbox.bind('<MouseWheel>', self.on_mousewheel)
+        self.listbox.bind('<Button-4>', lambda e: self.scroll_by(-3) or "break")
+        self.listbox.bind('<Button-5>', lambda e: self.scroll_by(3) or "break")
+        self.listbox.bind('<Up>', lambda e: self.scroll_by(-1) or "break")
+        self.listbox.bind('<Down>', lambda e: self.scroll_by(1) or "break")
+        self.listbox.bind('<Prior>', lambda e: self.scroll_by(-self.rows) or "break")
+        self.listbox.bind('<Next>', lambda e: self.scroll_by(self.rows) or "break")
+        self.listbox.bind('<Home>', lambda e: self.scroll_to(0) or "break")
+        self.listbox.bind('<End>', lambda e: self.scroll_to(len(self.items)) or "break")
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def set_items(self, items, indices=None):
+        """
+        Listeyi tamamen değiştir (başlangıç, tarama, temizleme, arama).
+        indices verilirse satır numaraları orijinal history sırasından gösterilir.
+        """
+        self.items = items
+        self.indices = indices
+        self.offset = min(self.offset, self.max_offset())
+        self.render()
+    
+    def append(self, item):
+        """Tek bir öğe ekle - sadece görünen pencereye düşüyorsa yeniden çizilir"""
+        self.items.append(item)
+        index = len(self.items) - 1
+        if index == 0 or self.offset <= index < self.offset + self.rows:
+            self.render()
+        else:
+            self.update_scrollbar()
+    
+    def max_offset(self):
+        return max(0, len(self.items) - self.rows)
+    
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+    
+    def scroll_by(self, delta):
+        self.scroll_to(self.offset + delta)
+    
+    def on_scrollbar(self, action, value, unit=None):
+        """Scrollbar komutları: moveto <oran> / scroll <n> units|pages"""
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self.items))
+        elif action == "scroll":
+            step = self.rows if unit == "pages" else 1
+            self.scroll_by(int(value) * step)
+    
+    def on_mousewheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+        return "break"
+    
+    def on_resize(self, event):
+        rows = max(1, event.height // self.row_height)
+        if rows != self.rows:
+            self.rows = rows
+            self.offset = min(self.offset, self.max_offset())
+            self.render()
+    
+    def render(self):
+        """Sadece görünen satırları Listbox'a yaz"""
+        self.listbox.delete(0, tk.END)
+        if not self.items:
+            if self.placeholder_lines:
+                self.listbox.insert(tk.END, *self.placeholder_lines)
+        else:
+            end = min(len(self.items), self.offset + self.rows + 1)
+            if self.indices is None:
+                lines = [format_history_line(i, self.items[i]) for i in range(self.offset, end)]
+            else:
+                lines = [format_history_line(self.indices[i], self.items[i]) for i in range(self.offset, end)]
+            self.listbox.insert(tk.END, *lines)
+        self.update_scrollbar()
+    
+    def update_scrollbar(self):
+        total = len(self.items)
+        if total <= self.rows:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.rows) / total))
+
 class ModernGUI:
     def __init__(self):
         """Modern GUI başlat"""
@@ -109,13 +313,34 @@ class ModernGUI:
         # Widget referansları
         self.widgets = {}
         
+        # Arka plan kütüphane taraması
+        self.scan_thread = None
+        
+        # Tema rol kaydı: rol -> widget yolları (bir kez gezilir)
+        self.themed_widgets = {}
+        self.theme_scripts = {}
+        
+        # Bellekteki history listesi (sanal liste veri kaynağı)
+        self.history_titles = []
+        
+        # Arama indeksi arka planda oluşturulur
+        self.search_index = None
+        self.index_generation = 0
+        self.search_job = None
+        
+        # İkincil bölümler ilk çizimden sonra oluşturulur
+        self.history_list = None
+        self.history_loaded = False
+        
         # Ana layout oluştur
         self.create_layout()
         self.apply_theme()
-        self.load_history_display()
         
         # Pencereyi ortala
         self.center_window()
+        
+        # Pencere çizildikten sonra: history paneli, history yükleme ve yt_dlp ön yüklemesi
+        self.root.after_idle(self.create_deferred_sections)
 
     def setup_window_icon(self):
         """Pencere ikonunu ayarla"""
@@ -180,11 +405,21 @@ class ModernGUI:
         # Progress bölümü
         self.create_progress_section()
         
-        # Tarihçe bölümü
+        # Footer (tarihçe bölümü ilk çizimden sonra create_deferred_sections ile eklenir)
+        self.create_footer()
+    
+    def create_deferred_sections(self):
+        """Başlangıcı hızlandırmak için ilk çizimden sonra oluşturulan bölümler"""
+        # Tarihçe bölümü - footer side=BOTTOM olduğu için üstünde kalan alanı doldurur
         self.create_history_section()
+        self.theme_new_widgets(self.widgets['history_frame'])
+        self.history_list.set_items([])
         
-        # Footer
-        self.create_footer()
+        # History dosyası ana thread dışında okunur
+        self.load_history_async()
+        
+        # yt_dlp ilk indirmeden önce arka planda yüklenir
+        preload_yt_dlp()
         
     def create_header(self):
         """Header bölümü"""
@@ -272,7 +507,15 @@ class ModernGUI:
         self.url_entry.bind('<FocusIn>', self.clear_placeholder)
         self.url_entry.bind('<FocusOut>', self.restore_placeholder)
         
+        # Klip: URL'den sonra zaman aralığı yazılırsa sadece o bölüm indirilir
+        url_hint = tk.Label(url_frame,
+                            text="✂️ Only a part? Add a time range after the URL, e.g.  1:00-4:30",
+                            font=self.fonts["small"],
+                            anchor="w")
+        url_hint.pack(fill=tk.X, pady=(6, 0))
+        
         self.widgets['url_frame'] = url_frame
+        self.widgets['url_hint'] = url_hint
         self.widgets['url_entry'] = self.url_entry
         self.widgets['paste_button'] = paste_button
 
@@ -330,7 +573,65 @@ class ModernGUI:
                                  anchor="w")
             radio.grid(row=row, column=col, sticky="w", padx=(10, 20), pady=5)
         
+        # İş profilleme (cProfile) - yeni başlayan işler için geçerli
+        self.profile_var = tk.BooleanVar(value=is_profiling_enabled())
+        profile_check = tk.Checkbutton(format_frame,
+                                       text="🔬 Profile jobs (cProfile)",
+                                       variable=self.profile_var,
+                                       command=lambda: set_profiling(self.profile_var.get()),
+                                       font=self.fonts["small"],
+                                       anchor="w")
+        profile_check.grid(row=2, column=1, sticky="w", padx=(10, 20), pady=5)
+        
+        # Ek kopyalar: aynı indirmeden tek ffmpeg geçişinde (Music/<format> klasörüne)
+        extra_frame = tk.Frame(format_frame)
+        extra_frame.grid(row=3, column=0, columnspan=2, sticky="w", padx=(10, 20), pady=(5, 0))
+        tk.Label(extra_frame, text="📦 Extra copies:", font=self.fonts["small"]).pack(side=tk.LEFT)
+        self.extra_format_vars = {}
+        for text, value in formats:
+            var = tk.BooleanVar(value=False)
+            short = value.split(" - ")[0]
+            tk.Checkbutton(extra_frame, text=short, variable=var,
+                           font=self.fonts["small"]).pack(side=tk.LEFT, padx=(6, 0))
+            self.extra_format_vars[value] = var
+        
+        # Ses yüksekliği normalizasyonu (EBU R128): kapalı / ReplayGain tag'i / kazanç uygula
+        normalize_frame = tk.Frame(format_frame)
+        normalize_frame.grid(row=4, column=0, columnspan=2, sticky="w", padx=(10, 20), pady=(5, 0))
+        tk.Label(normalize_frame, text="🔊 Normalize:", font=self.fonts["small"]).pack(side=tk.LEFT)
+        normalize_modes = {"Off": "off", "ReplayGain tags": "tags", "Apply gain": "apply"}
+        self.normalize_var = tk.StringVar(value=next(label for label, mode in normalize_modes.items()
+                                                     if mode == get_normalization_mode()))
+        normalize_menu = ttk.Combobox(normalize_frame,
+                                      textvariable=self.normalize_var,
+                                      values=list(normalize_modes),
+                                      state="readonly",
+                                      width=16,
+                                      font=self.fonts["small"])
+        normalize_menu.pack(side=tk.LEFT, padx=(6, 0))
+        normalize_menu.bind('<<ComboboxSelected>>',
+                            lambda e: set_normalization_mode(normalize_modes[self.normalize_var.get()]))
+        
+        # Baştaki/sondaki sessizliği kes (yeniden kodlamadan veya aynı kodlama geçişinde)
+        self.trim_var = tk.BooleanVar(value=is_silence_trim_enabled())
+        tk.Checkbutton(normalize_frame,
+                       text="✂️ Trim silence",
+                       variable=self.trim_var,
+                       command=lambda: set_silence_trim(self.trim_var.get()),
+                       font=self.fonts["small"]).pack(side=tk.LEFT, padx=(12, 0))
+        
+        # Bölümlü videoları Music/<başlık>/ altında ayrı parçalara ayır
+        self.chapters_var = tk.BooleanVar(value=is_chapter_split_enabled())
+        tk.Checkbutton(normalize_frame,
+                       text="📚 Split chapters",
+                       variable=self.chapters_var,
+                       command=lambda: set_chapter_split(self.chapters_var.get()),
+                       font=self.fonts["small"]).pack(side=tk.LEFT, padx=(12, 0))
+        
         self.widgets['format_frame'] = format_frame
+        self.widgets['profile_check'] = profile_check
+        self.widgets['extra_frame'] = extra_frame
+        self.widgets['normalize_frame'] = normalize_frame
         self.widgets['format_var'] = self.format_var
 
     def create_buttons(self):
@@ -510,26 +811,48 @@ class ModernGUI:
                                pady=3)
         clear_button.pack(side=tk.RIGHT)
         
-        # History listbox with scrollbar
-        hist_scroll_frame = tk.Frame(history_frame)
-        hist_scroll_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Scrollbar
-        scrollbar = tk.Scrollbar(hist_scroll_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Listbox - İtalik font ile müzik isimleri
-        self.history_listbox = tk.Listbox(hist_scroll_frame, 
-                                        font=self.fonts["history"],
-                                        yscrollcommand=scrollbar.set,
-                                        height=10,
-                                        relief=tk.SUNKEN,
-                                        bd=2)
-        self.history_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.history_listbox.yview)
+        # Arama kutusu - yazdıkça filtreler
+        search_frame = tk.Frame(history_frame)
+        search_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        search_label = tk.Label(search_frame, 
+                              text="🔎 Search:",
+                              font=self.fonts["text"])
+        search_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(search_frame, 
+                                   textvariable=self.search_var,
+                                   font=self.fonts["text"],
+                                   relief=tk.FLAT,
+                                   bd=1)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=4)
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+        
+        clear_search_button = tk.Button(search_frame, 
+                                      text="✖",
+                                      font=self.fonts["button_small"],
+                                      width=3,
+                                      command=lambda: self.search_var.set(""),
+                                      relief=tk.FLAT,
+                                      bd=1)
+        clear_search_button.pack(side=tk.RIGHT, padx=(5, 0))
+        
+        # Sanal history listesi - sadece görünen satırlar çizilir
+        self.history_list = VirtualHistoryList(history_frame,
+                                               font=self.fonts["history"],
+                                               placeholder_lines=[
+                                                   "🎭 No music downloaded yet...",
+                                                   "🌟 Start downloading some awesome music!",
+                                                   "🔍 Or scan existing music files!"
+                                               ])
+        self.history_list.pack(fill=tk.BOTH, expand=True)
+        self.history_listbox = self.history_list.listbox
         
         self.widgets['history_frame'] = history_frame
         self.widgets['history_listbox'] = self.history_listbox
+        self.widgets['search_entry'] = self.search_entry
+        self.widgets['clear_search_button'] = clear_search_button
         self.widgets['clear_button'] = clear_button
         self.widgets['music_count_label'] = self.music_count_label
 
@@ -583,68 +906,70 @@ class ModernGUI:
         self.apply_theme()
         
     def apply_theme(self):
-        """Seçili temayı uygula"""
-        theme = THEMES[self.current_theme]
+        """
+        Seçili temayı uygula.
+        Widget ağacı sadece ilk seferde gezilir; sonraki geçişler önbellekteki
+        tek bir Tcl betiği ve option database güncellemesinden ibarettir.
+        """
+        compiled = get_compiled_theme(self.current_theme)
+        if not self.themed_widgets:
+            self.register_themed_widgets(self.main_frame)
+        
+        # Sonradan oluşturulacak widget'lar (ör. iş satırları) doğru renkle doğar
+        for pattern, value in compiled["options"]:
+            self.root.option_add(pattern, value)
+        
+        script = self.theme_scripts.get(self.current_theme)
+        if script is None:
+            script = self.theme_scripts[self.current_theme] = self.build_theme_script(compiled)
+        self.root.tk.eval(script)
         
         # Ana pencere
-        self.root.configure(bg=theme["bg"])
-        
-        # Tüm widget'ları güncelle
-        self.update_widget_colors(self.main_frame, theme)
-        
-    def update_widget_colors(self, widget, theme):
-        """Widget'ların renklerini güncelle - Geliştirilmiş"""
-        try:
-            widget_class = widget.winfo_class()
-            
-            if widget_class == "Frame":
-                widget.configure(bg=theme["bg"])
-            elif widget_class == "Label":
-                widget.configure(bg=theme["bg"], fg=theme["fg"])
-                # Müzik sayısı label'ı için özel renk
-                try:
-                    label_text = widget.cget("text")
-                    if "Total Music:" in label_text:
-                        widget.configure(fg=theme["accent"])
-                except:
-                    pass
-            elif widget_class == "Button":
-                # Özel buton renkleri
-                button_text = widget.cget("text")
-                if "Download" in button_text:
-                    # Ana download butonu - Yeşil tonları
-                    widget.configure(bg=theme["success"], fg="#ffffff",
-                                   activebackground=theme["accent"],
-                                   activeforeground="#ffffff")
-                elif "Stop" in button_text:
-                    # Stop butonu - Kırmızı tonları
-                    widget.configure(bg=theme["error"], fg="#ffffff",
-                                   activebackground="#c0392b",
-                                   activeforeground="#ffffff")
-                else:
-                    # Diğer butonlar
-                    widget.configure(bg=theme["button_bg"], fg=theme["button_fg"],
-                                   activebackground=theme["hover"],
-                                   activeforeground=theme["fg"])
-            elif widget_class == "Entry":
-                widget.configure(bg=theme["entry_bg"], fg=theme["entry_fg"],
-                               insertbackground=theme["fg"])
-            elif widget_class == "Listbox":
-                widget.configure(bg=theme["entry_bg"], fg=theme["entry_fg"],
-                               selectbackground=theme["accent"])
-            elif widget_class == "Labelframe":
-                widget.configure(bg=theme["bg"], fg=theme["fg"])
-            elif widget_class == "Radiobutton":
-                widget.configure(bg=theme["bg"], fg=theme["fg"],
-                               activebackground=theme["bg"],
-                               selectcolor=theme["accent"])
-                
-            # Alt widget'ları da güncelle
-            for child in widget.winfo_children():
-                self.update_widget_colors(child, theme)
-                
-        except tk.TclError:
-            pass  # Bazı widget'lar belirli özellikleri desteklemeyebilir
+        self.root.configure(bg=THEMES[self.current_theme]["bg"])
+    
+    def build_theme_script(self, compiled):
+        """Rol başına tek bir foreach döngüsü içeren Tcl betiği oluştur"""
+        lines = []
+        for role, paths in self.themed_widgets.items():
+            if paths:
+                lines.append(f"foreach w {{{' '.join(paths)}}} {{catch {{$w configure {compiled['roles'][role]}}}}}")
+        return "\n".join(lines)
+    
+    def widget_role(self, widget):
+        """Widget'ın tema rolünü belirle"""
+        if widget is self.download_button:
+            return "download_button"
+        if widget is self.stop_button:
+            return "stop_button"
+        if widget is getattr(self, 'music_count_label', None):
+            return "count_label"
+        return CLASS_ROLES.get(widget.winfo_class())
+    
+    def register_themed_widgets(self, widget):
+        """
+        Widget ağacını gezip rolleri kaydet. Sonradan eklenen bölümler
+        (ör. iş satırları) için de çağrılabilir; kayıt değişince betik önbelleği silinir.
+        """
+        known = {path for paths in self.themed_widgets.values() for path in paths}
+        stack = [widget]
+        while stack:
+            current = stack.pop()
+            role = self.widget_role(current)
+            path = str(current)
+            if role and path not in known:
+                self.themed_widgets.setdefault(role, []).append(path)
+                known.add(path)
+            stack.extend(current.winfo_children())
+        
+        # Yok edilmiş widget'ları kayıttan çıkar
+        for role, paths in self.themed_widgets.items():
+            self.themed_widgets[role] = [p for p in paths if self.root.winfo_exists(p)]
+        self.theme_scripts.clear()
+    
+    def theme_new_widgets(self, widget):
+        """Sonradan eklenen bir widget ağacını kaydet ve mevcut temayı uygula"""
+        self.register_themed_widgets(widget)
+        self.apply_theme()
             
     def download_audio(self):
         """İndirme işlemini başlat"""
@@ -662,7 +987,14 @@ class ModernGUI:
         download_and_convert(url, self.format_var, self.url_entry,
                            self.download_button, self.stop_button,
                            self.widgets['status_label'], self.widgets['progress_bar'], 
-                           self.root, gui_instance=self)
+                           self.root, gui_instance=self, extra_targets=self.get_extra_targets())
+    
+    def get_extra_targets(self):
+        """Seçili ek kopya formatları (ana formatla aynı olan hariç)"""
+        primary = self.format_var.get()
+        return [{"format": value, "folder": None}
+                for value, var in self.extra_format_vars.items()
+                if var.get() and value != primary]
                            
     def stop_download(self):
         """İndirmeyi durdur"""
@@ -682,8 +1014,7 @@ class ModernGUI:
         
     def open_music_folder(self):
         """Music klasörünü aç"""
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        music_folder = os.path.join(script_dir, "Music")
+        music_folder = get_music_folder()
         
         if not os.path.exists(music_folder):
             os.makedirs(music_folder)
@@ -707,9 +1038,8 @@ class ModernGUI:
     def update_music_counts(self):
         """Müzik sayılarını güncelle"""
         try:
-            # History'den indirilen müzik sayısı
-            history = load_history()
-            downloaded_count = len(history.get('music_titles', []))
+            # History'den indirilen müzik sayısı (bellekteki listeden)
+            downloaded_count = len(self.history_titles)
             
             # Klasördeki müzik dosyalarını say
             music_folder = "Music_Files"
@@ -787,96 +1117,162 @@ class ModernGUI:
             debug_print(f"❌ Progress sıfırlama hatası: {e}", "ERROR")
 
     def scan_existing_music(self):
-        """Mevcut müzik dosyalarını tarayıp history'ye ekle"""
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        music_folder = os.path.join(script_dir, "Music")
+        """Mevcut müzik dosyalarını (alt klasörler dahil) arka planda tarayıp history'ye ekle"""
+        music_folder = get_music_folder()
         
         if not os.path.exists(music_folder):
             messagebox.showwarning("⚠️ Warning", "Music folder not found!")
             return
         
-        # Desteklenen ses dosyası formatları
-        audio_extensions = {'.mp3', '.m4a', '.wav', '.flac', '.ogg', '.wma', '.aac'}
+        if self.scan_thread and self.scan_thread.is_alive():
+            messagebox.showinfo("🔍 Scan", "*A scan is already running...*")
+            return
         
-        found_music = []
-        try:
-            for file in os.listdir(music_folder):
-                file_path = os.path.join(music_folder, file)
-                if os.path.isfile(file_path):
-                    file_ext = os.path.splitext(file)[1].lower()
-                    if file_ext in audio_extensions:
-                        # Dosya isminden müzik ismini çıkar
-                        music_title = os.path.splitext(file)[0]
-                        
-                        # Çok uzun isimleri kısalt
-                        if len(music_title) > 60:
-                            music_title = music_title[:57] + "..."
-                        
-                        found_music.append(music_title)
-            
-            if found_music:
-                # Mevcut history'yi yükle
-                history = load_history()
-                if "music_titles" not in history:
-                    history["music_titles"] = []
-                
-                # Yeni müzikleri ekle (duplikat kontrolü ile)
-                new_count = 0
-                for title in found_music:
-                    if title not in history["music_titles"]:
-                        history["music_titles"].append(title)
-                        new_count += 1
-                
-                # History'yi kaydet ve güncelle
-                save_history(history)
-                self.load_history_display()
-                
-                messagebox.showinfo("🎵 Scan Complete", 
-                                  f"*Scan completed!*\n\n"
-                                  f"📁 Found: {len(found_music)} music files\n"
-                                  f"➕ Added: {new_count} new entries\n"
-                                  f"🔄 Duplicates skipped: {len(found_music) - new_count}")
-            else:
-                messagebox.showinfo("🎭 No Music", 
-                                  "*No music files found!*\n\n"
-                                  f"📂 Searched in: Music folder\n"
-                                  f"🎵 Supported formats: MP3, M4A, WAV, FLAC, OGG, WMA, AAC")
-                
-        except Exception as e:
-            messagebox.showerror("❌ Scan Error", f"Error scanning music folder:\n{str(e)}")
+        self.show_progress_bar()
+        self.update_progress(0, "🔍 *Scanning music library...*", "", "📂 *Reading tags and durations...*")
+        
+        def on_progress(scanned, found, current_path):
+            percent = (scanned / found * 100) if found else 0
+            self.root.after(0, lambda: self.update_progress(
+                percent, f"🔍 *Scanning...* {scanned}/{found}", "", f"🎵 {current_path[-60:]}"))
+        
+        def scan_worker():
+            try:
+                # Anlık görüntü sadece tarayıcının önbelleği için; kayıt lock altında yeniden
+                # yüklenen history'ye yapılır (tarama sırasında biten indirmeler kaybolmaz)
+                cached_library = load_history().get("library")
+                records = scan_library(music_folder, cached_library, progress_callback=on_progress)
+                added, updated = upsert_library_records(records) if records else (0, 0)
+                debug_print(f"🔍 Library scan: {len(records)} files, {added} new, {updated} updated", "SUCCESS")
+                self.root.after(0, lambda: self.finish_scan(len(records), added))
+            except Exception as e:
+                debug_print(f"❌ Library scan error: {e}", "ERROR")
+                self.root.after(0, lambda message=str(e): self.finish_scan_error(message))
+        
+        self.scan_thread = threading.Thread(target=scan_worker, daemon=True)
+        self.scan_thread.start()
+    
+    def finish_scan(self, found_count, new_count):
+        """Tarama tamamlandı - Tk thread'inde çalışır"""
+        self.reset_progress()
+        if found_count:
+            self.load_history_display()
+            messagebox.showinfo("🎵 Scan Complete", 
+                              f"*Scan completed!*\n\n"
+                              f"📁 Found: {found_count} music files\n"
+                              f"➕ Added: {new_count} new entries\n"
+                              f"🔄 Already known: {found_count - new_count}")
+        else:
+            messagebox.showinfo("🎭 No Music", 
+                              "*No music files found!*\n\n"
+                              f"📂 Searched in: Music folder (including subfolders)\n"
+                              f"🎵 Supported formats: MP3, M4A, WAV, FLAC, OGG, OPUS, WMA, AAC")
+    
+    def finish_scan_error(self, error_msg):
+        """Tarama hatası - Tk thread'inde çalışır"""
+        self.reset_progress()
+        messagebox.showerror("❌ Scan Error", f"Error scanning music folder:\n{error_msg}")
             
+    def load_history_async(self):
+        """History dosyasını arka plan thread'inde oku, sonucu Tk thread'inde göster"""
+        def history_worker():
+            history = load_history()
+            self.root.after(0, lambda: self.show_history(history))
+        
+        threading.Thread(target=history_worker, daemon=True).start()
+    
     def load_history_display(self):
-        """Geçmişi görüntüle - Numaralandırılmış müzik isimleri ile"""
-        self.history_listbox.delete(0, tk.END)
-        history = load_history()
+        """Geçmişi history dosyasından yeniden yükle - sadece görünen satırlar çizilir"""
+        self.show_history(load_history())
+    
+    def show_history(self, history):
+        """Yüklenmiş history'yi listeye ve arama indeksine aktar"""
+        self.history_titles = list(history.get("music_titles", []))
+        self.history_loaded = True
+        self.start_index_build(history)
+        if self.search_var.get().strip():
+            self.run_search()
+        else:
+            self.history_list.set_items(self.history_titles)
+            self.update_history_count()
+    
+    def update_history_count(self, found=None):
+        """Toplam müzik sayısını (arama varsa bulunan sayısını) göster"""
+        if found is None:
+            self.music_count_label.config(text=f"🎵 *Total Music: {len(self.history_titles)}*")
+        else:
+            self.music_count_label.config(text=f"🔎 *Found: {found} / {len(self.history_titles)}*")
+    
+    def add_history_entry(self, music_title):
+        """İndirme sonrası tam yeniden çizim yerine tek satır ekle"""
+        if self.history_list is None:
+            return  # Panel henüz oluşturulmadı; history yüklenince zaten görünecek
+        if self.search_index is not None:
+            self.search_index.add(music_title)
+        if self.search_var.get().strip():
+            self.history_titles.append(music_title)
+            self.run_search()
+        else:
+            # Filtre yokken liste verisi history_titles'ın kendisidir
+            self.history_list.append(music_title)
+            self.update_history_count()
+    
+    def start_index_build(self, history):
+        """Arama indeksini arka plan thread'inde oluştur"""
+        self.search_index = None
+        self.index_generation += 1
+        generation = self.index_generation
         
-        if "music_titles" in history and history["music_titles"]:
-            total_music = len(history["music_titles"])
-            
-            # Müzik sayısını güncelle
-            self.music_count_label.config(text=f"🎵 *Total Music: {total_music}*")
-            
-            # TÜM müzikleri numaralandırarak göster
-            for i, title in enumerate(history["music_titles"], 1):
-                # Emoji ile süsleme
-                music_emojis = ["🎵", "🎶", "🎼", "🎤", "🎸", "🎹", "🥁", "🎺", "🎻", "🪕"]
-                emoji = music_emojis[(i-1) % len(music_emojis)]
-                
-                # Numaralandırılmış format: "01. 🎵 Song Name"
-                number_str = f"{i:02d}."  # 01, 02, 03 formatında
-                display_text = f"{number_str} {emoji} {title}"
-                self.history_listbox.insert(tk.END, display_text)
+        def index_worker():
+            index = build_index(history)
+            self.root.after(0, lambda: self.on_index_ready(index, generation))
+        
+        threading.Thread(target=index_worker, daemon=True).start()
+    
+    def on_index_ready(self, index, generation):
+        """İndeks hazır - bu arada indirilen satırları da ekle"""
+        if generation != self.index_generation:
+            return  # Daha yeni bir yükleme başladı
+        for title in self.history_titles[len(index):]:
+            index.add(title)
+        self.search_index = index
+        debug_print(f"🔎 Search index ready: {len(index)} entries", "DEBUG")
+        if self.search_var.get().strip():
+            self.run_search()
+    
+    def schedule_search(self):
+        """Yazarken her tuşta değil, kısa bir beklemeden sonra ara"""
+        if self.search_job:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(120, self.run_search)
+    
+    def run_search(self):
+        """Arama kutusundaki sorguya göre listeyi filtrele"""
+        self.search_job = None
+        query = self.search_var.get().strip()
+        if not query:
+            self.history_list.set_items(self.history_titles)
+            self.update_history_count()
+            return
+        
+        if self.search_index is not None:
+            ids = self.search_index.search(query)
         else:
-            # Boş durumda
-            self.music_count_label.config(text="🎵 *Total Music: 0*")
-            self.history_listbox.insert(tk.END, "🎭 No music downloaded yet...")
-            self.history_listbox.insert(tk.END, "🌟 Start downloading some awesome music!")
-            self.history_listbox.insert(tk.END, "🔍 Or scan existing music files!")
+            # İndeks henüz hazır değil - doğrusal arama
+            terms = normalize_text(query).split()
+            ids = [i for i, title in enumerate(self.history_titles)
+                   if all(term in normalize_text(title) for term in terms)]
+        
+        self.history_list.set_items([self.history_titles[i] for i in ids], indices=ids)
+        self.update_history_count(found=len(ids))
             
-    def finish_download_success(self, file_path):
+    def finish_download_success(self, file_path, music_title=None):
         """İndirme başarılı"""
         self.reset_ui()
-        self.load_history_display()
+        if music_title:
+            self.add_history_entry(music_title)
+        else:
+            self.load_history_display()
         self.url_entry.delete(0, tk.END)
         self.url_entry.insert(0, "Enter YouTube URL here...")
         
@@ -900,6 +1296,41 @@ class ModernGUI:
         except KeyboardInterrupt:
             self.root.quit()
 
+def benchmark_theme_switch(gui, rounds=20, extra_rows=0):
+    """
+    Tema geçiş süresini ölçer.
+    extra_rows: iş satırlarını simüle etmek için eklenen (label + buton + progress) satır sayısı
+    """
+    if extra_rows:
+        rows_frame = tk.Frame(gui.main_frame)
+        for i in range(extra_rows):
+            row = tk.Frame(rows_frame)
+            tk.Label(row, text=f"Job {i + 1}").pack(side=tk.LEFT)
+            tk.Button(row, text="✖").pack(side=tk.RIGHT)
+            ttk.Progressbar(row, length=100).pack(side=tk.RIGHT)
+            row.pack(fill=tk.X)
+        gui.theme_new_widgets(rows_frame)
+    
+    widget_count = sum(len(paths) for paths in gui.themed_widgets.values())
+    timings = []
+    for i in range(rounds):
+        theme_name = gui.theme_names[(gui.theme_names.index(gui.current_theme) + 1) % len(gui.theme_names)]
+        start = time.perf_counter()
+        gui.change_theme(theme_name)
+        gui.root.update_idletasks()
+        timings.append((time.perf_counter() - start) * 1000)
+    
+    first = timings[0]
+    steady = sorted(timings[1:] or timings)
+    return {
+        "widgets": widget_count,
+        "rounds": rounds,
+        "first_ms": first,
+        "mean_ms": sum(steady) / len(steady),
+        "p95_ms": steady[min(len(steady) - 1, int(len(steady) * 0.95))],
+        "max_ms": steady[-1]
+    }
+
 # Global fonksiyonlar (eski sistem uyumluluğu için)
 def reset_ui(download_button, stop_button, progress_bar, status_label):
     """UI sıfırlama fonksiyonu"""
@@ -927,8 +1358,7 @@ def finish_download_success(file_path, url_entry, download_button, stop_button,
                                f"📁 File saved to Music folder.\n\n"
                                f"Would you like to open the folder?")
     if result:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        music_folder = os.path.join(script_dir, "Music")
+        music_folder = get_music_folder()
         if sys.platform.startswith('win'):
             os.startfile(music_folder)
 
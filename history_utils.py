@@ -4,16 +4,40 @@ History ve Utility fonksiyonları
 """
 import os
 import json
+import threading
 
 HISTORY_FILE = "download_history.json"
+MAX_TITLE_LENGTH = 60
+
+# Aynı süreçte paralel çalışan işlerin load -> değiştir -> save adımlarını sıraya koyar
+HISTORY_LOCK = threading.RLock()
+
+def get_data_dir():
+    """
+    Veri klasörü (history, Music, traces). Varsayılan program klasörüdür;
+    YT2MP3_DATA_DIR ortam değişkeni ile değiştirilebilir (ör. benchmark'lar için).
+    """
+    return os.environ.get("YT2MP3_DATA_DIR") or os.path.dirname(os.path.abspath(__file__))
+
+def get_history_file():
+    """History dosyasının tam yolu"""
+    return os.path.join(get_data_dir(), HISTORY_FILE)
+
+def get_music_folder():
+    """Music klasörünün tam yolunu döndürür (veri klasörü altında)"""
+    return os.path.join(get_data_dir(), "Music")
+
+def shorten_title(title):
+    """Çok uzun müzik isimlerini listede gösterilecek uzunluğa kısaltır"""
+    if len(title) > MAX_TITLE_LENGTH:
+        return title[:MAX_TITLE_LENGTH - 3] + "..."
+    return title
 
 def load_history():
     """Loads download history - only for URL tracking"""
     history = {"urls": [], "files": []}
     
-    # Get the script directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    history_file = os.path.join(script_dir, HISTORY_FILE)
+    history_file = get_history_file()
     
     # Load the saved history
     if os.path.exists(history_file):
@@ -31,12 +55,10 @@ def load_history():
 
 def save_history(history):
     """Saves the download history and syncs it with the folder"""
-    # Get the script directory
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    history_file = os.path.join(script_dir, HISTORY_FILE)
+    history_file = get_history_file()
     
     # First, scan the folder
-    music_folder = os.path.join(script_dir, "Music")
+    music_folder = get_music_folder()
     if os.path.exists(music_folder):
         # Remove duplicates and files that are no longer in the folder
         history["files"] = list(dict.fromkeys(history["files"]))  # Remove duplicates
@@ -46,4 +68,40 @@ def save_history(history):
         with open(history_file, 'w', encoding='utf-8') as f:
             json.dump(history, f, ensure_ascii=False, indent=2)
     except:
-        pass
+        pass
+
+def upsert_library_records(records, history=None):
+    """
+    Kütüphane tarayıcısından gelen zengin kayıtları history'ye ekler/günceller.
+    Kayıtlar Music klasörüne göre göreli yol ("path") ile anahtarlanır.
+    (eklenen, güncellenen) sayılarını döndürür.
+    """
+    with HISTORY_LOCK:
+        if history is None:
+            history = load_history()
+        return _upsert_library_records(records, history)
+
+def _upsert_library_records(records, history):
+    library = history.setdefault("library", {})
+    titles = history.setdefault("music_titles", [])
+    known_titles = set(titles)
+    
+    added = 0
+    updated = 0
+    for record in records:
+        key = record["path"]
+        if key in library:
+            library[key].update(record)
+            updated += 1
+        else:
+            library[key] = dict(record)
+            added += 1
+        
+        # Liste görünümü için dosya isminden müzik ismi (indirilenlerle aynı format)
+        music_title = shorten_title(os.path.splitext(os.path.basename(key))[0])
+        if music_title not in known_titles:
+            titles.append(music_title)
+            known_titles.add(music_title)
+    
+    save_history(history)
+    return added, updated
@@ -0,0 +1,238 @@
+﻿# -*- coding: utf-8 -*-
+"""
+İş Kuyruğu Modülü - Arayüzsüz indirme işleri için ortak çalışan havuzu
+HTTP API (api_server) ve diğer istemciler işleri buraya gönderir; hepsi aynı
+sınırlı ThreadPoolExecutor'da run_download_job ile çalışır. Her iş kendi
+durdurma bayrağına sahiptir (GUI'nin Stop butonundan bağımsız).
+
+Durum değişiklikleri ve ilerleme, sıra numaralı bir olay günlüğüne yazılır;
+istemciler events_since(after) ile long-poll veya SSE üzerinden izler.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from log_utils import debug_print
+
+# Aynı anda çalışan indirme sayısı (YT2MP3_API_WORKERS ile değiştirilebilir)
+DEFAULT_WORKERS = 3
+# Bellekte tutulan son olay sayısı; daha eskisini isteyen istemci "missed" alır
+EVENT_BUFFER = 5000
+# Bitmiş işler bu sayıyı aşınca en eskileri listeden düşer
+MAX_FINISHED_JOBS = 1000
+# Aynı iş için ilerleme olayları arasındaki en kısa süre
+PROGRESS_INTERVAL = 0.25
+
+FINISHED_STATES = ("success", "error", "cancelled")
+
+
+def default_job_workers():
+    value = os.environ.get("YT2MP3_API_WORKERS", "")
+    return int(value) if value.isdigit() and int(value) > 0 else DEFAULT_WORKERS
+
+
+class Job:
+    """Tek indirme işi; snapshot() JSON'a yazılabilir kopyasını verir"""
+    def __init__(self, url, selected_format, options, client=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.format = selected_format
+        self.options = options
+        self.client = client
+        self.status = "queued"
+        self.progress = 0.0
+        self.text = "Queued"
+        self.speed = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.last_progress_event = 0.0
+        # Dağıtık modda işi kiralayan çalışan ve deneme sayısı (bkz. distributed)
+        self.worker = None
+        self.attempts = 0
+        self.lease_until = None
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "format": self.format,
+            "options": self.options,
+            "client": self.client,
+            "status": self.status,
+            "progress": round(self.progress, 1),
+            "text": self.text,
+            "speed": self.speed,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "worker": self.worker,
+            "attempts": self.attempts,
+        }
+
+
+class JobManager:
+    """
+    İş listesi + çalışan havuzu + olay günlüğü.
+
+        manager = JobManager(max_workers=4)
+        jobs = manager.submit("https://youtu.be/...", "MP3 (320k) - High Quality")
+        events, last, missed = manager.events_since(0, timeout=25)
+    """
+    def __init__(self, max_workers=None, music_folder=None):
+        self.max_workers = max_workers or default_job_workers()
+        self.music_folder = music_folder
+        self.executor = self._make_executor()
+        self.jobs = {}
+        self.events = deque(maxlen=EVENT_BUFFER)
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def _make_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+
+    # -- Olaylar -------------------------------------------------------------
+
+    def _emit(self, event_type, job):
+        """Olayı günlüğe ekle ve bekleyen istemcileri uyandır (lock tutulurken çağrılır)"""
+        self.seq += 1
+        self.events.append({"seq": self.seq, "type": event_type, "time": time.time(), "job": job.snapshot()})
+        self.changed.notify_all()
+
+    def events_since(self, after, timeout=0.0, job_id=None):
+        """
+        after'dan sonraki olaylar: (olaylar, son_sıra, kaçırıldı_mı).
+        Yeni olay yoksa timeout saniyeye kadar bekler (long-poll).
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self.lock:
+            while True:
+                missed = bool(self.events) and self.events[0]["seq"] > after + 1
+                events = [e for e in self.events
+                          if e["seq"] > after and (job_id is None or e["job"]["id"] == job_id)]
+                remaining = deadline - time.monotonic()
+                if events or missed or remaining <= 0:
+                    return events, self.seq, missed
+                # Filtreye uymayan olaylar tekrar taranmasın
+                after = max(after, self.seq)
+                self.changed.wait(remaining)
+
+    # -- İşler ---------------------------------------------------------------
+
+    def submit(self, url, selected_format, client=None, expand=True, **options):
+        """
+        URL'yi (oynatma listesiyse her videosunu) kuyruğa ekle, Job listesini döndür.
+        options: run_download_job argümanları (extra_targets, normalize, trim_silence,
+        split_chapters, clip).
+        """
+        from download_module import normalize_url, is_playlist_url, expand_playlist
+        from clip_utils import split_clip, clip_url
+
+        url, clip = split_clip(url)
+        urls = expand_playlist(url) if expand and is_playlist_url(url) else [normalize_url(url)]
+        clip = options.pop("clip", None) or clip
+        jobs = []
+        for video_url in urls:
+            job = Job(clip_url(video_url, clip), selected_format, dict(options), client)
+            with self.lock:
+                self.jobs[job.id] = job
+                self._emit("queued", job)
+            self._dispatch(job)
+            jobs.append(job)
+        debug_print(f"📨 {len(jobs)} job(s) queued from {client or 'local'}: {url}", "INFO")
+        self._prune()
+        return jobs
+
+    def _dispatch(self, job):
+        """İşi çalıştırılmak üzere sıraya koy (yerel çalışan havuzu)"""
+        job.future = self.executor.submit(self._run, job)
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self, status=None):
+        with self.lock:
+            return [job for job in self.jobs.values() if status is None or job.status == status]
+
+    def cancel(self, job_id):
+        """Kuyruktaki işi hemen iptal et, çalışanı durdurmaya işaretle. İş yoksa None."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_event.set()
+            if job.status == "queued" and job.future and job.future.cancel():
+                job.status = "cancelled"
+                job.text = "Cancelled"
+                job.finished_at = time.time()
+                self._emit("cancelled", job)
+            else:
+                job.text = "Cancelling..."
+                self._emit("cancelling", job)
+        return job
+
+    def shutdown(self, cancel_running=True):
+        """Yeni iş alma; kuyruktakileri iptal et, çalışanları (isteğe bağlı) durdur"""
+        if cancel_running:
+            for job in self.list():
+                self.cancel(job.id)
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _prune(self):
+        """Bitmiş işlerin en eskilerini listeden düşür"""
+        with self.lock:
+            finished = [job for job in self.jobs.values() if job.status in FINISHED_STATES]
+            for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[job.id]
+
+    def _update(self, job, event_type, **fields):
+        with self.lock:
+            for key, value in fields.items():
+                setattr(job, key, value)
+            self._emit(event_type, job)
+
+    def _run(self, job):
+        """Çalışan iş parçacığında: run_download_job + durum olayları"""
+        from download_module import run_download_job, DownloadCancelled, DownloadJobError
+
+        if job.cancel_event.is_set():
+            self._update(job, "cancelled", status="cancelled", text="Cancelled", finished_at=time.time())
+            return
+        self._update(job, "started", status="running", text="Starting...", started_at=time.time())
+
+        def on_progress(percent, text, speed=None):
+            now = time.monotonic()
+            if now - job.last_progress_event < PROGRESS_INTERVAL and percent < 100:
+                return
+            job.last_progress_event = now
+            self._update(job, "progress", progress=percent or 0.0, text=text, speed=speed)
+
+        def on_status(text):
+            self._update(job, "status", text=text)
+
+        try:
+            result = run_download_job(job.url, job.format, music_folder=self.music_folder,
+                                      progress_callback=on_progress, status_callback=on_status,
+                                      stop_check=job.cancel_event.is_set, **job.options)
+        except DownloadCancelled:
+            self._update(job, "cancelled", status="cancelled", text="Cancelled", finished_at=time.time())
+        except DownloadJobError as e:
+            self._update(job, "error", status="error", text="Failed", error=str(e), finished_at=time.time())
+        except Exception as e:
+            debug_print(f"💥 Job {job.id} crashed: {e}", "ERROR")
+            self._update(job, "error", status="error", text="Failed", error=f"{type(e).__name__}: {e}",
+                         finished_at=time.time())
+        else:
+            self._update(job, "success", status="success", progress=100.0, text="Done",
+                         result=result, finished_at=time.time())
@@ -0,0 +1,219 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Loglama Modülü - Kuyruk tabanlı, engellemeyen seviyeli log sistemi
+debug_print çağrıları sadece kaydı kuyruğa koyar; biçimlendirme, yazma ve
+flush arka plan thread'inde toplu olarak yapılır. Kapalı seviyeler tek bir
+karşılaştırma ile elenir.
+
+Ayarlar (ortam değişkeni veya main.py argümanları):
+    YT2MP3_LOG_LEVEL   DEBUG / INFO / SUCCESS / WARNING / ERROR (varsayılan: INFO)
+    YT2MP3_LOG_FORMAT  text / json (varsayılan: text)
+    YT2MP3_LOG_FILE    log dosyası (varsayılan: stdout)
+"""
+import os
+import sys
+import json
+import atexit
+import logging
+import threading
+from queue import SimpleQueue, Empty
+from datetime import datetime
+
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "SUCCESS": SUCCESS,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+LEVEL_COLORS = {
+    "INFO": "\033[36m",      # Cyan
+    "SUCCESS": "\033[32m",   # Green
+    "WARNING": "\033[33m",   # Yellow
+    "ERROR": "\033[31m",     # Red
+    "DEBUG": "\033[35m"      # Magenta
+}
+RESET_COLOR = "\033[0m"
+
+# Bir yazma turunda kuyruktan alınan en fazla kayıt
+MAX_BATCH = 256
+
+logger = logging.getLogger("yt2mp3")
+logger.propagate = False
+
+_setup_lock = threading.Lock()
+
+
+class TextFormatter(logging.Formatter):
+    """'[HH:MM:SS] [LEVEL] mesaj' biçimi; terminalde renkli"""
+    def __init__(self, color=False):
+        super().__init__()
+        self.color = color
+
+    def format(self, record):
+        timestamp = datetime.fromtimestamp(record.created).strftime("%H:%M:%S")
+        line = f"[{timestamp}] [{record.levelname}] {record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        if self.color:
+            return f"{LEVEL_COLORS.get(record.levelname, LEVEL_COLORS['INFO'])}{line}{RESET_COLOR}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Satır başına bir JSON nesnesi (ts, level, thread, source, msg)"""
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "source": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class QueueHandler(logging.Handler):
+    """Kaydı olduğu gibi kuyruğa koyar; biçimlendirme yazıcı thread'inde yapılır"""
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+
+    def emit(self, record):
+        self.queue.put(record)
+
+
+class LogWriter(threading.Thread):
+    """
+    Kuyruktaki kayıtları toplu halde biçimlendirip yazan arka plan thread'i.
+    Her turda birikmiş kayıtlar tek write + tek flush ile yazılır.
+    """
+    def __init__(self, queue, stream, formatter):
+        super().__init__(name="LogWriter", daemon=True)
+        self.queue = queue
+        self.stream = stream
+        self.formatter = formatter
+        self._stopped = threading.Event()
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            batch = [record]
+            stop = False
+            while len(batch) < MAX_BATCH:
+                try:
+                    record = self.queue.get_nowait()
+                except Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self.write(batch)
+            if stop:
+                break
+        self._stopped.set()
+
+    def write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(f"[{record.levelname}] {record.msg}")
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except (OSError, ValueError, UnicodeEncodeError):
+            pass
+
+    def stop(self, timeout=2.0):
+        """Kuyruğu boşalt ve thread'i durdur"""
+        self.queue.put(None)
+        self._stopped.wait(timeout)
+
+
+def _resolve_level(level):
+    if isinstance(level, int):
+        return level
+    return LEVELS.get(str(level).upper(), logging.INFO)
+
+
+_state = {"writer": None, "queue": None,
+          "threshold": _resolve_level(os.environ.get("YT2MP3_LOG_LEVEL") or "INFO")}
+
+
+def setup_logging(level=None, fmt=None, log_file=None):
+    """
+    Log sistemini (yeniden) kur. Argüman verilmeyen ayarlar ortam
+    değişkenlerinden okunur. Aynı süreçte tekrar çağrılabilir.
+    """
+    level = _resolve_level(level or os.environ.get("YT2MP3_LOG_LEVEL") or "INFO")
+    fmt = (fmt or os.environ.get("YT2MP3_LOG_FORMAT") or "text").lower()
+    log_file = log_file or os.environ.get("YT2MP3_LOG_FILE")
+
+    with _setup_lock:
+        shutdown_logging()
+
+        if log_file:
+            stream = open(log_file, "a", encoding="utf-8")
+        else:
+            stream = sys.stdout
+        color = fmt != "json" and not log_file and hasattr(stream, "isatty") and stream.isatty()
+        formatter = JsonFormatter() if fmt == "json" else TextFormatter(color=color)
+
+        queue = SimpleQueue()
+        writer = LogWriter(queue, stream, formatter)
+        writer.start()
+
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(queue))
+        logger.setLevel(level)
+        _state["writer"] = writer
+        _state["queue"] = queue
+        _state["threshold"] = level
+        _state["file"] = stream if log_file else None
+    return logger
+
+
+def shutdown_logging():
+    """Bekleyen kayıtları yaz ve yazıcı thread'ini durdur"""
+    writer = _state.get("writer")
+    if writer is not None:
+        writer.stop()
+        _state["writer"] = None
+        _state["queue"] = None
+    log_file = _state.pop("file", None)
+    if log_file is not None:
+        log_file.close()
+
+
+def log_enabled(level):
+    """Seviye açık mı? Pahalı mesajlar oluşturulmadan önce kontrol için"""
+    return LEVELS.get(level, logging.INFO) >= _state["threshold"]
+
+
+def debug_print(message, level="INFO"):
+    """Terminal çıktısı için debug yazdırma fonksiyonu (kuyruğa yazar, beklemez)"""
+    number = LEVELS.get(level, logging.INFO)
+    if number < _state["threshold"]:
+        return
+    queue = _state["queue"]
+    if queue is None:
+        setup_logging()
+        queue = _state["queue"]
+    # logging.Logger.log yığın taraması (findCaller) yapar; kayıt doğrudan kuyruğa konur
+    source = sys._getframe(1).f_globals.get("__name__", "yt2mp3")
+    queue.put(logging.LogRecord(source, number, "", 0, message, None, None))
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,325 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Ses Yüksekliği Modülü - EBU R128 / ITU-R BS.1770 ölçümü ve normalizasyon
+PCM ffmpeg ile bir kez (48 kHz float) çözülür ve bloklar halinde NumPy ile
+işlenir: K-weighting filtresi FFT ile (overlap-add), 400 ms gated integrated
+loudness 100 ms alt blok enerjilerinden, true peak 4x polyphase oversampling ile.
+Bellek kullanımı dosya uzunluğundan bağımsızdır (alt blok başına iki sayı).
+
+Sonuçlar dosya başına önbelleğe alınır (boyut + mtime ile doğrulanır).
+Modlar: off / tags (ReplayGain tag'leri) / apply (kodlama geçişinde -af volume).
+ffmpeg'in iki geçişli loudnorm'u yerine ölçüm + tek kodlama geçişi kullanılır.
+
+NumPy isteğe bağlıdır; yüklü değilse normalizasyon atlanır.
+"""
+import os
+import json
+import math
+import tempfile
+import threading
+import subprocess
+from history_utils import get_data_dir
+from ffmpeg_utils import iter_pcm
+from log_utils import debug_print
+
+NORMALIZATION_MODES = ("off", "tags", "apply")
+
+# ReplayGain 2.0 referansı ve "apply" modunun hedefi
+REPLAYGAIN_REFERENCE_LUFS = -18.0
+TARGET_LUFS = -14.0
+# Kazanç uygulanırken true peak bu değeri geçmez
+PEAK_CEILING_DB = -1.0
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+# Okuma bloğu (kare, 2.5 sn) ve K-weighting FIR uzunluğu; FFT boyutu ikisini kapsar
+CHUNK_FRAMES = 120000
+K_WEIGHTING_TAPS = 8192
+FFT_SIZE = 131072
+# 100 ms alt blok; 400 ms ölçüm bloğu = 4 alt blok (%75 örtüşme)
+SUB_BLOCK = SAMPLE_RATE // 10
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# True peak: 4x oversampling, faz başına 12 katsayı (BS.1770-4 Annex 2)
+OVERSAMPLE = 4
+TRUE_PEAK_TAPS = 48
+
+CACHE_FILE = "loudness_cache.json"
+
+# ITU-R BS.1770 K-weighting (48 kHz): high-shelf + RLB high-pass biquad'ları
+_K_SHELF = ((1.53512485958697, -2.69169618940638, 1.19839281085285),
+            (1.0, -1.69065929318241, 0.73248077421585))
+_K_HIGHPASS = ((1.0, -2.0, 1.0),
+               (1.0, -1.99004745483398, 0.99007225036621))
+
+_state = {
+    "mode": os.environ.get("YT2MP3_NORMALIZE", "off").lower(),
+    "np": None,
+    "filters": None,
+    "cache": None,
+}
+_cache_lock = threading.Lock()
+
+
+class LoudnessError(Exception):
+    """Ölçüm yapılamadı (NumPy yok, ffmpeg hatası veya ses yok)"""
+
+
+def set_normalization_mode(mode):
+    """Normalizasyon modunu ayarla: off / tags / apply (yeni işler için geçerli)"""
+    mode = (mode or "off").lower()
+    if mode not in NORMALIZATION_MODES:
+        raise ValueError(f"Unknown normalization mode: {mode}")
+    _state["mode"] = mode
+    debug_print(f"🔊 Loudness normalization: {mode}", "INFO")
+
+
+def get_normalization_mode():
+    mode = _state["mode"]
+    return mode if mode in NORMALIZATION_MODES else "off"
+
+
+def _numpy():
+    """NumPy'ı ilk kullanımda yükle"""
+    if _state["np"] is None:
+        try:
+            import numpy
+        except ImportError:
+            raise LoudnessError("NumPy is not installed (pip install numpy)")
+        _state["np"] = numpy
+    return _state["np"]
+
+
+def _biquad_impulse(coefficients, signal):
+    """Biquad filtreyi (saf Python) bir sinyale uygula - FIR tasarımı için bir kez"""
+    (b0, b1, b2), (_, a1, a2) = coefficients
+    x1 = x2 = y1 = y2 = 0.0
+    out = []
+    for x in signal:
+        y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+        x2, x1, y2, y1 = x1, x, y1, y
+        out.append(y)
+    return out
+
+
+def _filters():
+    """
+    K-weighting dürtü yanıtının FFT'si ve true peak polyphase fazları.
+    IIR filtre örnek örnek özyinelemeli olduğu için vektörleştirilemez; dürtü
+    yanıtı K_WEIGHTING_TAPS içinde -120 dB altına indiğinden FIR + FFT ile
+    aynı sonuç blok halinde hesaplanır.
+    """
+    if _state["filters"] is None:
+        np = _numpy()
+        impulse = [1.0] + [0.0] * (K_WEIGHTING_TAPS - 1)
+        response = _biquad_impulse(_K_HIGHPASS, _biquad_impulse(_K_SHELF, impulse))
+        k_fft = np.fft.rfft(np.asarray(response), FFT_SIZE)
+
+        # 4x interpolasyon alçak geçiren filtresi (Kaiser pencereli sinc)
+        n = np.arange(TRUE_PEAK_TAPS) - (TRUE_PEAK_TAPS - 1) / 2
+        prototype = np.sinc(n / OVERSAMPLE) * np.kaiser(TRUE_PEAK_TAPS, 8.0)
+        scale = OVERSAMPLE / prototype.sum()
+        # (faz başına katsayı, faz) matrisi; pencereler ters sırada çarpılır (konvolüsyon)
+        phases = np.stack([prototype[p::OVERSAMPLE][::-1] * scale for p in range(OVERSAMPLE)], axis=1)
+        _state["filters"] = (k_fft, phases)
+    return _state["filters"]
+
+
+class LoudnessMeter:
+    """
+    Akış halinde loudness ölçer. feed() ile (kare, kanal) float32 bloklar
+    verilir; result() integrated loudness (LUFS) ve true peak (dBTP) döndürür.
+    """
+    def __init__(self, channels=CHANNELS):
+        np = _numpy()
+        self.np = np
+        self.channels = channels
+        self.k_fft, self.phases = _filters()
+        self.k_tail = np.zeros((channels, K_WEIGHTING_TAPS - 1))
+        self.pending = np.zeros((channels, 0))
+        self.energies = []
+        self.tp_history = np.zeros((channels, self.phases.shape[0] - 1))
+        self.peak = 0.0
+        self.frames = 0
+
+    def feed(self, block):
+        """block: (kare, kanal) dizisi; uzun bloklar CHUNK_FRAMES'lik parçalara bölünür"""
+        np = self.np
+        if len(block) > CHUNK_FRAMES:
+            for start in range(0, len(block), CHUNK_FRAMES):
+                self.feed(block[start:start + CHUNK_FRAMES])
+            return
+        x = np.asarray(block, dtype=np.float64).T
+        count = x.shape[1]
+        if not count:
+            return
+        self.frames += count
+        self._true_peak(x)
+
+        # K-weighting: FFT ile konvolüsyon, önceki bloğun kuyruğu eklenir
+        weighted = np.fft.irfft(np.fft.rfft(x, FFT_SIZE, axis=1) * self.k_fft, FFT_SIZE, axis=1)
+        weighted = weighted[:, :count + K_WEIGHTING_TAPS - 1]
+        weighted[:, :K_WEIGHTING_TAPS - 1] += self.k_tail
+        self.k_tail = weighted[:, count:].copy()
+
+        # Tam 100 ms alt bloklarının kanal başına enerjisi
+        samples = np.concatenate((self.pending, weighted[:, :count]), axis=1)
+        usable = samples.shape[1] - samples.shape[1] % SUB_BLOCK
+        if usable:
+            blocks = samples[:, :usable].reshape(self.channels, -1, SUB_BLOCK)
+            self.energies.append(np.einsum("cbs,cbs->cb", blocks, blocks))
+        self.pending = samples[:, usable:]
+
+    def _true_peak(self, x):
+        np = self.np
+        extended = np.concatenate((self.tp_history, x), axis=1)
+        self.tp_history = extended[:, -self.tp_history.shape[1]:]
+        # Tüm fazlar tek matris çarpımıyla: (kanal, kare, katsayı) @ (katsayı, faz)
+        windows = np.lib.stride_tricks.sliding_window_view(extended, self.phases.shape[0], axis=1)
+        oversampled = windows @ self.phases
+        self.peak = max(self.peak, float(np.abs(x).max()), float(np.abs(oversampled).max()))
+
+    def result(self):
+        """{"integrated_lufs", "true_peak_db", "duration"}; ölçülecek ses yoksa LoudnessError"""
+        np = self.np
+        if not self.energies:
+            raise LoudnessError("Not enough audio to measure (< 400 ms)")
+        energies = np.concatenate(self.energies, axis=1)
+        if energies.shape[1] < 4:
+            raise LoudnessError("Not enough audio to measure (< 400 ms)")
+        # 400 ms bloklar: ardışık 4 alt bloğun ortalaması, kanallar toplanır (L/R ağırlığı 1)
+        window = energies[:, :-3] + energies[:, 1:-2] + energies[:, 2:-1] + energies[:, 3:]
+        power = window.sum(axis=0) / (4 * SUB_BLOCK)
+        with np.errstate(divide="ignore"):
+            loudness = -0.691 + 10 * np.log10(power)
+        gated = power[loudness > ABSOLUTE_GATE_LUFS]
+        if not gated.size:
+            integrated = float("-inf")
+        else:
+            relative_gate = -0.691 + 10 * math.log10(gated.mean()) + RELATIVE_GATE_LU
+            gated = power[(loudness > ABSOLUTE_GATE_LUFS) & (loudness > relative_gate)]
+            integrated = -0.691 + 10 * math.log10(gated.mean())
+        return {
+            "integrated_lufs": round(integrated, 2),
+            "true_peak_db": round(20 * math.log10(self.peak), 2) if self.peak > 0 else float("-inf"),
+            "duration": round(self.frames / SAMPLE_RATE, 2),
+        }
+
+
+def measure_loudness(path, timeout=None):
+    """Dosyayı ffmpeg ile PCM'e çözüp ölç (tek geçiş, sabit bellek)"""
+    np = _numpy()
+    meter = LoudnessMeter()
+    try:
+        for data in iter_pcm(path, SAMPLE_RATE, CHANNELS, CHUNK_FRAMES, timeout):
+            meter.feed(np.frombuffer(data, dtype="<f4").reshape(-1, CHANNELS))
+    except subprocess.CalledProcessError as e:
+        raise LoudnessError(f"ffmpeg decode failed ({e.returncode}): {e.stderr}")
+    except subprocess.TimeoutExpired:
+        raise LoudnessError("ffmpeg decode timed out")
+    return meter.result()
+
+
+# ---------------------------------------------------------------------------
+# Önbellek
+# ---------------------------------------------------------------------------
+
+def _cache_path():
+    return os.path.join(get_data_dir(), CACHE_FILE)
+
+
+def _load_cache():
+    if _state["cache"] is None:
+        try:
+            with open(_cache_path(), "r", encoding="utf-8") as f:
+                _state["cache"] = json.load(f)
+        except (OSError, ValueError):
+            _state["cache"] = {}
+    return _state["cache"]
+
+
+def _save_cache(cache):
+    path = _cache_path()
+    fd, temp_path = tempfile.mkstemp(prefix=".loudness-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except OSError as e:
+        debug_print(f"⚠️ Loudness cache could not be saved: {e}", "WARNING")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _cache_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def cached_loudness(path):
+    """Dosya değişmediyse önbellekteki ölçüm, yoksa None"""
+    stat = os.stat(path)
+    with _cache_lock:
+        entry = _load_cache().get(_cache_key(path))
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime") == int(stat.st_mtime):
+        return entry
+    return None
+
+
+def store_loudness(path, result):
+    """Ölçümü dosyanın şimdiki boyut/mtime'ı ile önbelleğe yaz"""
+    stat = os.stat(path)
+    entry = dict(result, size=stat.st_size, mtime=int(stat.st_mtime))
+    with _cache_lock:
+        cache = _load_cache()
+        cache[_cache_key(path)] = entry
+        _save_cache(cache)
+    return entry
+
+
+def analyze_file(path, use_cache=True):
+    """Önbellekten ya da ölçerek loudness sonucu; ikinci değer önbellekten mi geldi"""
+    if use_cache:
+        entry = cached_loudness(path)
+        if entry:
+            return entry, True
+    return store_loudness(path, measure_loudness(path)), False
+
+
+# ---------------------------------------------------------------------------
+# Kazanç
+# ---------------------------------------------------------------------------
+
+def normalization_gain(result, target_lufs=TARGET_LUFS, peak_ceiling_db=PEAK_CEILING_DB):
+    """Hedef loudness için dB kazanç; true peak tavanı aşılmayacak şekilde sınırlanır"""
+    if not math.isfinite(result["integrated_lufs"]):
+        return 0.0
+    gain = target_lufs - result["integrated_lufs"]
+    if math.isfinite(result["true_peak_db"]) and result["true_peak_db"] + gain > peak_ceiling_db:
+        gain = peak_ceiling_db - result["true_peak_db"]
+    return round(gain, 2)
+
+
+def volume_filter(gain_db):
+    """ffmpeg -af argümanı (kazanç ihmal edilebilirse None)"""
+    return f"volume={gain_db:.2f}dB" if abs(gain_db) >= 0.05 else None
+
+
+def replaygain_tags(result, scope="track"):
+    """ReplayGain 2.0 gain/peak değerleri (tag_writer custom alanları); scope: track / album"""
+    if not math.isfinite(result["integrated_lufs"]):
+        return {}
+    peak = 10 ** (result["true_peak_db"] / 20) if math.isfinite(result["true_peak_db"]) else 0.0
+    prefix = f"REPLAYGAIN_{scope.upper()}"
+    return {
+        f"{prefix}_GAIN": f"{REPLAYGAIN_REFERENCE_LUFS - result['integrated_lufs']:+.2f} dB",
+        f"{prefix}_PEAK": f"{peak:.6f}",
+    }
+
+
+def shifted_result(result, gain_db):
+    """Kazanç uygulandıktan sonraki beklenen ölçüm (çıktıyı yeniden ölçmemek için)"""
+    return {
+        "integrated_lufs": round(result["integrated_lufs"] + gain_db, 2),
+        "true_peak_db": round(result["true_peak_db"] + gain_db, 2),
+        "duration": result.get("duration"),
+    }
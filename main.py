@@ -3,18 +3,24 @@
 YouTube MP3 Dönüştürücü - Ana Uygulama
 Modern Modüler Sürüm
 """
+import os
+import sys
+import argparse
+from log_utils import setup_logging, LEVELS
 
-def main():
-    """Ana uygulama fonksiyonu"""
+def run_gui():
+    """GUI uygulamasını başlat"""
+    from profile_utils import print_profile_summary
     try:
         # GUI modülünü import et
         from gui_module import ModernGUI
-        
+
         # Ana uygulamayı oluştur ve çalıştır
         print("🚀 YouTube MP3 Converter başlatılıyor...")
         app = ModernGUI()
         app.run()
-        
+        print_profile_summary()
+
     except ImportError as e:
         print(f"❌ Modül import hatası: {e}")
         print("Gerekli modüllerin yüklü olduğundan emin olun.")
@@ -23,5 +29,360 @@ def main():
         print(f"❌ Beklenmeyen hata: {e}")
         input("Çıkmak için Enter'a basın...")
 
+def run_theme_benchmark(args):
+    """Tema geçiş süresini ölç ve yazdır"""
+    from gui_module import ModernGUI, benchmark_theme_switch
+
+    app = ModernGUI()
+    app.root.update()
+    stats = benchmark_theme_switch(app, rounds=args.rounds, extra_rows=args.extra_rows)
+    app.root.destroy()
+
+    print(f"🎨 Theme switch benchmark ({stats['widgets']} themed widgets, {stats['rounds']} switches)")
+    print(f"   First switch (compile): {stats['first_ms']:.2f} ms")
+    print(f"   Mean: {stats['mean_ms']:.2f} ms  p95: {stats['p95_ms']:.2f} ms  max: {stats['max_ms']:.2f} ms")
+
+def run_startup_report(args):
+    """Başlangıç süresi raporu (python -X importtime + GUI aşamaları)"""
+    from startup_utils import importtime_report, measure_gui_startup, print_startup_report
+
+    report = importtime_report("gui_module", top=args.top)
+    gui_timings = None if args.no_gui else measure_gui_startup()
+    print_startup_report(report, gui_timings)
+
+def run_trace_summary(args):
+    """İş izleme dosyasının aşama başına p50/p95 özeti"""
+    from trace_module import summarize_trace, print_trace_summary
+
+    print_trace_summary(summarize_trace(args.file))
+
+def run_download(args):
+    """URL'leri arayüzsüz sırayla indir (toplu iş)"""
+    from download_module import run_download_job, normalize_url, DownloadJobError
+    from clip_utils import split_clip, clip_url, ClipError
+    from profile_utils import print_profile_summary
+
+    failed = 0
+    for url in args.urls:
+        try:
+            # 'URL#t=60,270' -> klip; --clip tüm URL'lere uygulanır
+            url, clip = split_clip(url)
+            url = clip_url(normalize_url(url), args.clip or clip)
+            result = run_download_job(url, args.format,
+                                      status_callback=lambda text: print(f"   {text}"),
+                                      extra_targets=args.also or None)
+            if result.get("chapter_files"):
+                print(f"✅ {result['title']}  ->  {len(result['chapter_files'])} chapters")
+                for chapter_file in result["chapter_files"]:
+                    print(f"   📚 {chapter_file}")
+            else:
+                print(f"✅ {result['music_title']}  ->  {result['file']}")
+            for extra_file in result["extra_files"]:
+                print(f"   ➕ {extra_file}")
+        except (DownloadJobError, ClipError) as e:
+            failed += 1
+            print(f"❌ {url}: {e}")
+    print(f"🎵 {len(args.urls) - failed}/{len(args.urls)} downloaded")
+    print_profile_summary(args.profile_top)
+    return 1 if failed else 0
+
+def run_retag(args):
+    """Kütüphanedeki dosyaların tag'lerini history metadata'sından yeniden yaz"""
+    import time
+    from tag_writer import retag_library
+
+    start = time.perf_counter()
+    summary = retag_library(embed_covers=args.covers, max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"🏷️ Retagged {summary['inplace'] + summary['rewrite']}/{summary['total']} files in {elapsed:.2f}s "
+          f"(in place: {summary['inplace']}, rewritten: {summary['rewrite']}, "
+          f"unchanged: {summary['unchanged']}, skipped: {summary['skipped']}, failed: {summary['failed']})")
+    return 1 if summary["failed"] else 0
+
+def run_sync(args):
+    """Music klasörünü USB belleğe / hedef klasöre artımlı olarak eşitle"""
+    import time
+    from sync_module import sync_library, SyncError
+    from disk_utils import format_bytes
+
+    def on_progress(done, total, rel_path):
+        print(f"\r💾 {done}/{total} {rel_path[:60]:<60}", end="", flush=True)
+
+    start = time.perf_counter()
+    try:
+        summary = sync_library(args.target, query=args.query, include=args.include, exclude=args.exclude,
+                               convert=args.convert, delete=not args.keep_stale, max_workers=args.workers,
+                               dry_run=args.dry_run, progress_callback=on_progress)
+    except SyncError as e:
+        print(f"❌ {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+    if args.dry_run:
+        print(f"🔍 Dry run: {summary['to_copy']} files to copy ({format_bytes(summary['to_copy_bytes'])}), "
+              f"{summary['unchanged']} unchanged, {summary['deleted']} to delete")
+        return 0
+    print(f"\r💾 Synced {summary['total']} files to {args.target} in {elapsed:.2f}s "
+          f"(copied: {summary['copied']}, converted: {summary['converted']}, unchanged: {summary['unchanged']}, "
+          f"deleted: {summary['deleted']}, skipped: {summary['skipped']}, failed: {summary['failed']}, "
+          f"{format_bytes(summary['bytes'])} written)")
+    for error in summary["errors"][:10]:
+        print(f"   ⚠️ {error}")
+    return 1 if summary["failed"] else 0
+
+def run_verify(args):
+    """Kütüphane dosyalarını bütünlük için denetle; istenirse bozukları yeniden indir"""
+    import time
+    from verify_module import verify_library, requeue_problems
+    from disk_utils import format_bytes
+
+    def on_progress(checked, found, rel_path):
+        print(f"\r🩺 {checked}/{found} {rel_path[:60]:<60}", end="", flush=True)
+
+    start = time.perf_counter()
+    summary = verify_library(max_workers=args.workers, changed_only=args.changed_only, progress_callback=on_progress)
+    elapsed = time.perf_counter() - start
+    print(f"\r🩺 Verified {summary['checked']} files ({format_bytes(summary['bytes'])}, "
+          f"{format_bytes(summary['bytes'] / max(elapsed, 1e-6))}/s) in {elapsed:.2f}s "
+          f"(ok: {summary['ok']}, mislabeled: {summary['mislabeled']}, truncated: {summary['truncated']}, "
+          f"corrupt: {summary['corrupt']}, unreadable: {summary['unreadable']}, skipped: {summary['skipped']})")
+    problems = [p for p in summary["problems"] if p["status"] != "unreadable"]
+    for problem in summary["problems"][:50]:
+        print(f"   ⚠️ {problem['status']}: {problem['path']} - {problem['detail']}")
+    if len(summary["problems"]) > 50:
+        print(f"   ... and {len(summary['problems']) - 50} more")
+    if not args.requeue or not problems:
+        return 1 if summary["problems"] else 0
+
+    from job_queue import JobManager
+    manager = JobManager()
+    jobs, skipped = requeue_problems(problems, manager)
+    print(f"🔁 Re-downloading {len(jobs)} source(s); bad files moved to the quarantine folder"
+          f"{f', {len(skipped)} without a source URL left in place' if skipped else ''}")
+    try:
+        for job in jobs:
+            try:
+                job.future.result()
+            except Exception:
+                pass
+            print(f"   {'✅' if job.status == 'success' else '❌'} {job.url} {job.error or ''}".rstrip())
+    except KeyboardInterrupt:
+        print("🛑 Stopping, cancelling re-downloads...")
+    finally:
+        manager.shutdown()
+    return 0 if all(job.status == "success" for job in jobs) and not skipped else 1
+
+def run_serve(args):
+    """HTTP iş API'sini başlat (Ctrl+C ile durur)"""
+    from api_server import ApiServer
+    from job_queue import JobManager
+
+    token = args.token or os.environ.get("YT2MP3_API_TOKEN")
+    if args.coordinator:
+        from distributed import JobCoordinator
+        manager = JobCoordinator()
+    else:
+        manager = JobManager(max_workers=args.workers)
+    server = ApiServer(manager, args.host, args.port, token, open_web=args.open_web)
+    if args.coordinator:
+        print(f"🌐 Coordinator listening on {server.base_url} (jobs run on remote workers, "
+              f"lease {manager.lease_seconds:.0f}s{', token required' if token else ''})")
+        print(f"🛠️ Start workers with: python main.py worker --coordinator {server.base_url}")
+    else:
+        print(f"🌐 Job API listening on {server.base_url} ({server.manager.max_workers} workers"
+              f"{', token required' if token else ''})")
+    print(f"🌍 Web app: {server.base_url}/{'?token=...' if token and not args.open_web else ''}  "
+          f"(cobalt-compatible, cached by video ID + format)")
+    if token and args.open_web:
+        print("⚠️ --open-web: the web app and its downloads do not need the token")
+    if args.host not in ("127.0.0.1", "localhost") and not token:
+        print("⚠️ Listening on the network without --token: anyone on the LAN can submit jobs")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Stopping, cancelling running jobs...")
+    finally:
+        server.httpd.server_close()
+        server.manager.shutdown()
+    return 0
+
+def run_worker(args):
+    """Koordinatörden iş alan çalışanı başlat (Ctrl+C ile durur)"""
+    from distributed import RemoteWorker
+
+    token = args.token or os.environ.get("YT2MP3_API_TOKEN")
+    worker = RemoteWorker(args.coordinator, token=token, slots=args.workers, worker_id=args.id)
+    print(f"🛠️ Worker {worker.worker_id} pulling jobs from {worker.base_url} ({worker.slots} at a time)")
+    try:
+        stats = worker.run()
+    except KeyboardInterrupt:
+        print("🛑 Stopping worker (unfinished jobs are requeued when their lease expires)")
+        return 0
+    print(f"🛠️ Done: {stats}")
+    return 0
+
+def parse_target(value):
+    """'FORMAT' veya 'FORMAT=KLASÖR' -> ek çıktı hedefi"""
+    label, _, folder = value.partition("=")
+    return {"format": label.strip(), "folder": folder.strip() or None}
+
+def parse_clip_arg(value):
+    """argparse için '1:00-4:30' -> klip (geçersizse argparse hatası)"""
+    from clip_utils import parse_clip, ClipError
+    try:
+        return parse_clip(value)
+    except ClipError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def build_parser():
+    """Komut satırı argümanları"""
+    parser = argparse.ArgumentParser(description="🎵 YouTube MP3 Converter Pro")
+    parser.add_argument("--log-level", choices=list(LEVELS), type=str.upper,
+                        help="Minimum log level (default: INFO, or YT2MP3_LOG_LEVEL)")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        help="Log output format (default: text, or YT2MP3_LOG_FORMAT)")
+    parser.add_argument("--log-file", help="Write logs to this file instead of the terminal")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each download/conversion job with cProfile (files in profiles/)")
+    parser.add_argument("--profile-top", type=int, default=20,
+                        help="Number of hot functions in the end-of-session profile summary")
+    parser.add_argument("--normalize", choices=["off", "tags", "apply"],
+                        help="Loudness normalization: write ReplayGain tags or apply gain while encoding "
+                             "(default: off, or YT2MP3_NORMALIZE; needs numpy)")
+    parser.add_argument("--trim-silence", action="store_true",
+                        help="Cut leading/trailing silence from downloads and conversions "
+                             "(or YT2MP3_TRIM_SILENCE=1; needs numpy)")
+    parser.add_argument("--split-chapters", action="store_true",
+                        help="Split videos with chapters into separate tracks in Music/<title>/ "
+                             "(or YT2MP3_SPLIT_CHAPTERS=1)")
+    parser.add_argument("--media-cache", action="store_true",
+                        help="Reuse downloaded sources and encoded outputs across jobs (hardlinked into Music/; "
+                             "or YT2MP3_MEDIA_CACHE=1, size limit YT2MP3_MEDIA_CACHE_MB; always on for serve/worker)")
+    parser.add_argument("--rate-limit", metavar="RATE|PROFILE",
+                        help="Total download bandwidth shared by all jobs, e.g. 4M or "
+                             "'08:00-18:00=2M,18:00-08:00=off' (or YT2MP3_RATE_LIMIT)")
+    parser.add_argument("--job-rate-limit", metavar="RATE",
+                        help="Bandwidth cap per download, e.g. 1M (or YT2MP3_JOB_RATE_LIMIT)")
+    parser.add_argument("--disk-reserve", type=int, metavar="MB",
+                        help="Hold jobs that would leave less than MB free (default 500, or YT2MP3_DISK_RESERVE_MB)")
+    parser.add_argument("--preallocate", action="store_true",
+                        help="Reserve each job's estimated disk space up front (or YT2MP3_DISK_PREALLOCATE=1)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    theme_bench = subparsers.add_parser("theme-bench", help="Measure theme switch time")
+    theme_bench.add_argument("--rounds", type=int, default=20, help="Number of theme switches")
+    theme_bench.add_argument("--extra-rows", type=int, default=0,
+                             help="Add N synthetic job rows to simulate a busy window")
+
+    startup = subparsers.add_parser("startup-report", help="Measure import and GUI startup time")
+    startup.add_argument("--top", type=int, default=15, help="Number of slowest imports to list")
+    startup.add_argument("--no-gui", action="store_true", help="Only run the import-time report")
+
+    trace_summary = subparsers.add_parser("trace-summary", help="Summarize per-phase job timings")
+    trace_summary.add_argument("--file", help="Trace JSONL file (default: traces/download_trace.jsonl)")
+
+    download = subparsers.add_parser("download", help="Download URLs without the GUI")
+    download.add_argument("urls", nargs="+", help="YouTube URLs")
+    download.add_argument("--format", default="MP3 (128k) - Car Compatible",
+                          help="Format label as shown in the GUI, e.g. 'MP3 (320k) - High Quality'")
+    download.add_argument("--also", action="append", type=parse_target, metavar="FORMAT[=FOLDER]",
+                          help="Extra output encoded in the same ffmpeg pass (repeatable), "
+                               "e.g. --also '320k=D:/Archive' --also WAV")
+    download.add_argument("--clip", type=parse_clip_arg, metavar="START-END",
+                          help="Download and encode only this time range, e.g. 1:00-4:30, 1h02m-, -90 "
+                               "(a URL can also carry its own range as URL#t=60,270)")
+
+    retag = subparsers.add_parser("retag", help="Rewrite tags of library files from download metadata")
+    retag.add_argument("--covers", action="store_true", help="Also download and embed cover art")
+    retag.add_argument("--workers", type=int, help="Number of parallel tag writers")
+
+    sync = subparsers.add_parser("sync", help="Mirror the Music folder to a USB stick (only changes are copied)")
+    sync.add_argument("target", help="Target folder, e.g. the mounted USB stick")
+    sync.add_argument("--convert", action="store_true",
+                      help="Convert non-MP3 and >128k files to the car preset (MP3 128k) while copying")
+    sync.add_argument("--query", help="Only files whose title/artist/album/path contain these words")
+    sync.add_argument("--include", action="append", metavar="GLOB", help="Only paths matching GLOB (repeatable)")
+    sync.add_argument("--exclude", action="append", metavar="GLOB", help="Skip paths matching GLOB, e.g. 'WAV/*'")
+    sync.add_argument("--keep-stale", action="store_true", help="Do not delete files removed from Music/")
+    sync.add_argument("--workers", type=int, help="Parallel copies (default 4)")
+    sync.add_argument("--dry-run", action="store_true", help="Only show what would be copied and deleted")
+
+    verify = subparsers.add_parser("verify", help="Find truncated, corrupt or mislabeled files in the Music folder")
+    verify.add_argument("--workers", type=int, help="Parallel checker processes (default: CPU count, max 8; "
+                                                    "use 1-2 on spinning disks)")
+    verify.add_argument("--changed-only", action="store_true",
+                        help="Skip files that passed before and have not changed since (no bit-rot check)")
+    verify.add_argument("--requeue", action="store_true",
+                        help="Move bad files to the quarantine folder and download them again from their URL")
+
+    serve = subparsers.add_parser("serve", help="Run the HTTP job API (submit, monitor, cancel, history)")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to bind (0.0.0.0 for the whole LAN)")
+    serve.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    serve.add_argument("--workers", type=int, help="Concurrent downloads (default: 3, or YT2MP3_API_WORKERS)")
+    serve.add_argument("--token", help="Require 'Authorization: Bearer TOKEN' (or YT2MP3_API_TOKEN) for the API, "
+                                        "the web app's conversions and its downloads (open the page with ?token=)")
+    serve.add_argument("--open-web", action="store_true",
+                       help="Let the web app (POST / and /tunnel/) bypass --token: anyone on the LAN can convert")
+    serve.add_argument("--coordinator", action="store_true",
+                       help="Do not run jobs here; hand them to 'worker' processes on other machines "
+                            "(lease: YT2MP3_LEASE_SECONDS, default 30)")
+
+    worker = subparsers.add_parser("worker", help="Run jobs from a 'serve --coordinator' queue on this machine")
+    worker.add_argument("--coordinator", required=True, help="Coordinator URL, e.g. http://server:8765")
+    worker.add_argument("--workers", type=int, help="Concurrent jobs on this machine (default: 3, or YT2MP3_API_WORKERS)")
+    worker.add_argument("--token", help="Coordinator token (or YT2MP3_API_TOKEN)")
+    worker.add_argument("--id", help="Worker name shown in job status (default: hostname-pid)")
+    return parser
+
+def main(argv=None):
+    """Ana uygulama fonksiyonu"""
+    args = build_parser().parse_args(argv)
+    setup_logging(args.log_level, args.log_format, args.log_file)
+    if args.profile:
+        from profile_utils import set_profiling
+        set_profiling(True)
+    if args.normalize:
+        from loudness_utils import set_normalization_mode
+        set_normalization_mode(args.normalize)
+    if args.trim_silence:
+        from silence_utils import set_silence_trim
+        set_silence_trim(True)
+    if args.split_chapters:
+        from chapter_utils import set_chapter_split
+        set_chapter_split(True)
+    if args.rate_limit or args.job_rate_limit:
+        from bandwidth_utils import set_rate_limit
+        try:
+            set_rate_limit(args.rate_limit or os.environ.get("YT2MP3_RATE_LIMIT"),
+                           args.job_rate_limit or os.environ.get("YT2MP3_JOB_RATE_LIMIT"))
+        except ValueError as e:
+            build_parser().error(str(e))
+    if args.disk_reserve is not None or args.preallocate:
+        from disk_utils import set_disk_reserve
+        set_disk_reserve(args.disk_reserve, True if args.preallocate else None)
+    if args.media_cache or (args.command in ("serve", "worker") and os.environ.get("YT2MP3_MEDIA_CACHE") != "0"):
+        from media_cache import set_media_cache
+        set_media_cache(True)
+
+    if args.command == "theme-bench":
+        run_theme_benchmark(args)
+    elif args.command == "startup-report":
+        run_startup_report(args)
+    elif args.command == "trace-summary":
+        run_trace_summary(args)
+    elif args.command == "download":
+        return run_download(args)
+    elif args.command == "retag":
+        return run_retag(args)
+    elif args.command == "sync":
+        return run_sync(args)
+    elif args.command == "verify":
+        return run_verify(args)
+    elif args.command == "serve":
+        return run_serve(args)
+    elif args.command == "worker":
+        return run_worker(args)
+    else:
+        run_gui()
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,329 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Medya Önbelleği Modülü - İndirilen kaynak ses ve kodlanmış çıktılar için
+içerik adresli, boyut sınırlı (LRU) ortak önbellek.
+
+Anahtarlar: kaynak = video ID + kaynak formatı (+ klip), çıktı = video ID +
+kaynak formatı + ön ayar (codec/kalite/normalizasyon/kırpma) (+ klip).
+Dosyalar SHA-256 özetleriyle media_cache/objects/ab/<özet>.<uzantı> olarak
+saklanır; aynı içerik tek kopya tutulur. Önbelleğe alma ve Music/'e geri verme
+mümkünse hardlink ile yapılır (kopya yok, ek disk alanı yok); farklı disk veya
+hardlink desteklemeyen dosya sisteminde kopyalanır.
+
+Aynı video aynı ön ayarla tekrar istendiğinde indirme ve kodlama atlanır;
+başka bir formatta istendiğinde sadece kodlama yapılır (kaynak önbellekten).
+Kayıt dosya boyutu/mtime ile doğrulanır: Music'teki bağlantı sonradan
+yerinde değiştirilmişse kayıt ve nesne önbellekten düşer. tag_writer yazmadan
+önce bağlantıyı koparır (break_hardlink), bu yüzden tag düzenleme önbelleği bozmaz.
+
+Açmak için: download --media-cache / serve (varsayılan açık) veya
+YT2MP3_MEDIA_CACHE=1. Sınır: YT2MP3_MEDIA_CACHE_MB (varsayılan 4096).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from history_utils import get_data_dir
+from log_utils import debug_print
+
+CACHE_DIR = "media_cache"
+INDEX_FILE = "index.json"
+DEFAULT_MAX_MB = 4096
+HASH_CHUNK = 1024 * 1024
+
+# Önbellek kaydında tutulan info alanları (tag, kapak, history ve bölümler için yeterli)
+INFO_FIELDS = ("id", "title", "track", "artist", "creator", "uploader", "album", "release_year",
+               "upload_date", "genre", "genres", "webpage_url", "duration", "chapters", "format_id", "ext")
+
+
+def _env_max_bytes():
+    value = os.environ.get("YT2MP3_MEDIA_CACHE_MB", "")
+    return (int(value) if value.isdigit() else DEFAULT_MAX_MB) * 1024 * 1024
+
+
+_state = {
+    "enabled": os.environ.get("YT2MP3_MEDIA_CACHE", "") not in ("", "0"),
+    "cache": None,
+}
+_state_lock = threading.Lock()
+
+
+def set_media_cache(enabled):
+    """Medya önbelleğini aç/kapat (yeni işler için geçerli)"""
+    _state["enabled"] = bool(enabled)
+    debug_print(f"🗃️ Media cache {'enabled' if enabled else 'disabled'}", "INFO")
+
+
+def is_media_cache_enabled():
+    return _state["enabled"]
+
+
+def get_media_cache():
+    """Veri klasöründeki ortak önbellek (veri klasörü değişirse yeniden açılır)"""
+    root = os.path.join(get_data_dir(), CACHE_DIR)
+    with _state_lock:
+        if _state["cache"] is None or _state["cache"].root != root:
+            _state["cache"] = MediaCache(root)
+        return _state["cache"]
+
+
+def media_id(url):
+    """Önbellek için video kimliği: YouTube ID'si, değilse URL özeti"""
+    from download_module import extract_video_id
+    return extract_video_id(url) or hashlib.md5(url.encode()).hexdigest()[:16]
+
+
+def preset_key(codec, quality, normalize="off", trim_silence=False):
+    """Çıktıyı belirleyen ayarlar: mp3-320, m4a-192+rg, wav-best+norm+trim ..."""
+    key = f"{codec}-{quality}"
+    if normalize == "tags":
+        key += "+rg"
+    elif normalize == "apply":
+        key += "+norm"
+    if trim_silence:
+        key += "+trim"
+    return key
+
+
+def slim_info(info, title=None):
+    """yt-dlp info sözlüğünden önbellekte saklanacak alanlar"""
+    from tag_writer import thumbnail_url
+    slim = {key: info[key] for key in INFO_FIELDS if info.get(key) is not None}
+    if title:
+        slim["title"] = title
+    slim["thumbnail"] = thumbnail_url(info)
+    return slim
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """Hardlink dene, olmazsa kopyala; "hardlink" / "copy" döndürür"""
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        shutil.copyfile(source, destination)
+        return "copy"
+
+
+def detach(path):
+    """
+    Başka bir adla paylaşılan (ör. önbellekten hardlink'lenmiş) hedef dosyayı sil.
+    ffmpeg -y mevcut dosyanın içine yazar; bağlantı koparılmazsa önbellekteki
+    nesne de değişirdi.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def break_hardlink(path):
+    """
+    Dosya başka adlarla paylaşılıyorsa (önbellek nesnesi, diğer Music kopyaları)
+    kendi kopyasına çevir: içerik aynı klasörde geçici dosyaya kopyalanıp yerine
+    konur. Yerinde değişiklikten (ör. tag yazımı) önce çağrılır; aksi halde
+    değişiklik tüm bağlantılara yansır ve önbellek kaydı geçersizleşirdi.
+    Kopya yapıldıysa True döndürür.
+    """
+    if os.stat(path).st_nlink <= 1:
+        return False
+    fd, temp_path = tempfile.mkstemp(prefix=".unlink-", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        shutil.copy2(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+class MediaCache:
+    """
+    Anahtar -> içerik adresli nesne. Kayıtlar index.json'da tutulur; toplam
+    nesne boyutu max_bytes'ı aşınca en uzun süredir kullanılmayan kayıtlar
+    silinir (başka kayıt aynı nesneyi kullanıyorsa nesne kalır).
+
+        cache = get_media_cache()
+        entry = cache.find("output", "dQw4w9WgXcQ", preset="mp3-320")
+        if entry:
+            cache.link(entry, "Music/Song.mp3")
+    """
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes or _env_max_bytes()
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "deduplicated": 0, "evicted": 0, "invalidated": 0}
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    @staticmethod
+    def make_key(kind, video, format_id, preset=None, clip=None):
+        return "|".join((kind, video, format_id or "audio", preset or "", clip or ""))
+
+    def object_path(self, name):
+        return os.path.join(self.root, "objects", name[:2], name)
+
+    def _save(self):
+        fd, temp_path = tempfile.mkstemp(prefix=".index-", dir=self.root)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": self.entries}, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            debug_print(f"⚠️ Media cache index could not be saved: {e}", "WARNING")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _object_refs(self, name):
+        return sum(1 for entry in self.entries.values() if entry["object"] == name)
+
+    def _drop(self, key):
+        """Kaydı sil; nesneyi kullanan başka kayıt yoksa nesneyi de (lock tutulurken)"""
+        entry = self.entries.pop(key)
+        if not self._object_refs(entry["object"]):
+            try:
+                os.remove(self.object_path(entry["object"]))
+            except OSError:
+                pass
+
+    def _valid(self, entry):
+        try:
+            stat = os.stat(self.object_path(entry["object"]))
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]
+
+    def total_bytes(self):
+        with self.lock:
+            return sum({e["object"]: e["size"] for e in self.entries.values()}.values())
+
+    def find(self, kind, video, preset=None, clip=None):
+        """
+        En son kullanılan geçerli kayıt (kaynak formatı fark etmez) veya None.
+        Dönen kayıtta nesnenin tam yolu "file" alanındadır.
+        """
+        with self.lock:
+            matches = sorted(((key, entry) for key, entry in self.entries.items()
+                              if entry["kind"] == kind and entry["video"] == video
+                              and entry.get("preset") == preset and entry.get("clip") == clip),
+                             key=lambda item: item[1]["last_used"], reverse=True)
+            for key, entry in matches:
+                if not self._valid(entry):
+                    # Nesne silinmiş ya da hardlink üzerinden değiştirilmiş
+                    self.stats["invalidated"] += 1
+                    self._drop(key)
+                    continue
+                entry["hits"] += 1
+                entry["last_used"] = time.time()
+                self.stats["hits"] += 1
+                self._save()
+                return dict(entry, key=key, file=self.object_path(entry["object"]))
+            if matches:
+                self._save()
+            self.stats["misses"] += 1
+            return None
+
+    def link(self, entry, destination):
+        """Kaydın nesnesini hedef yola bağla (varsa üzerine yazar); "hardlink" / "copy" / "same" döndürür"""
+        source = self.object_path(entry["object"])
+        if os.path.exists(destination):
+            if os.path.samefile(source, destination):
+                return "same"
+            os.remove(destination)
+        os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+        return link_or_copy(source, destination)
+
+    def store(self, kind, video, path, format_id=None, preset=None, clip=None, **fields):
+        """
+        Dosyayı önbelleğe al (içerik aynıysa mevcut nesne kullanılır) ve
+        gerekirse LRU ile yer aç. Kaydı döndürür.
+        """
+        key = self.make_key(kind, video, format_id, preset, clip)
+        digest = file_digest(path)
+        name = digest + os.path.splitext(path)[1].lower()
+        object_path = self.object_path(name)
+        stored = "deduplicated"
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+            stored = link_or_copy(path, temp_path)
+            os.replace(temp_path, object_path)
+        stat = os.stat(object_path)
+        now = time.time()
+        entry = {"kind": kind, "video": video, "format_id": format_id or "audio", "preset": preset,
+                 "clip": clip, "object": name, "size": stat.st_size, "mtime": stat.st_mtime,
+                 "created": now, "last_used": now, "hits": 0}
+        entry.update(fields)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            self.entries[key] = entry
+            if old and old["object"] != name and not self._object_refs(old["object"]):
+                try:
+                    os.remove(self.object_path(old["object"]))
+                except OSError:
+                    pass
+            self.stats["stored"] += 1
+            if stored == "deduplicated":
+                self.stats["deduplicated"] += 1
+            self._evict(keep=key)
+            self._save()
+        debug_print(f"🗃️ Cached {kind} {video} {preset or ''} ({stored}, {stat.st_size} bytes)", "DEBUG")
+        return dict(entry, key=key, file=object_path)
+
+    def forget_digest(self, digest):
+        """
+        SHA-256 özeti verilen nesneyi kullanan kayıtları düşür (ör. bozuk çıktı
+        tekrar Music/'e bağlanmasın). Düşen kayıt sayısını döndürür.
+        """
+        with self.lock:
+            keys = [key for key, entry in self.entries.items() if entry["object"].split(".", 1)[0] == digest]
+            for key in keys:
+                self._drop(key)
+            if keys:
+                self.stats["invalidated"] += len(keys)
+                self._save()
+        return len(keys)
+
+    def _evict(self, keep=None):
+        """Toplam boyut sınırın altına inene kadar en eski kayıtları sil (lock tutulurken)"""
+        sizes = {e["object"]: e["size"] for e in self.entries.values()}
+        total = sum(sizes.values())
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            name = entry["object"]
+            self._drop(key)
+            self.stats["evicted"] += 1
+            if name not in {e["object"] for e in self.entries.values()}:
+                total -= sizes[name]
+        if total > self.max_bytes:
+            debug_print(f"⚠️ Media cache over limit: {total} > {self.max_bytes} bytes", "WARNING")
+
+    def summary(self):
+        """Durum özeti (API/cobalt bilgi yanıtı için)"""
+        with self.lock:
+            entries = len(self.entries)
+            objects = {e["object"]: e["size"] for e in self.entries.values()}
+        return {"entries": entries, "objects": len(objects), "bytes": sum(objects.values()),
+                "max_bytes": self.max_bytes, **self.stats}
@@ -0,0 +1,165 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Profil Modülü - İndirme ve dönüştürme işleri için cProfile
+Profil modu açıkken her iş ayrı bir .prof dosyasına yazılır
+(profiles/<iş>_<zaman>_<id>.prof) ve oturum boyunca birleştirilir;
+oturum sonunda en çok zaman harcayan fonksiyonlar listelenir.
+
+Açmak için: python main.py --profile, GUI'deki "Profile jobs" seçeneği
+veya YT2MP3_PROFILE=1.
+"""
+import os
+import io
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from history_utils import get_data_dir
+from log_utils import debug_print
+
+PROFILE_FOLDER = "profiles"
+
+_state = {
+    "enabled": os.environ.get("YT2MP3_PROFILE", "") not in ("", "0"),
+    "stats": None,
+    "jobs": 0,
+    "folders": set(),
+}
+_lock = threading.Lock()
+
+
+def get_profile_folder():
+    """Profil dosyalarının klasörü (veri klasörü altında)"""
+    return os.path.join(get_data_dir(), PROFILE_FOLDER)
+
+
+def set_profiling(enabled):
+    """Profil modunu aç/kapat (yeni başlayan işler için geçerli)"""
+    _state["enabled"] = bool(enabled)
+    debug_print(f"🔬 Job profiling {'enabled' if enabled else 'disabled'}", "INFO")
+
+
+def is_profiling_enabled():
+    return _state["enabled"]
+
+
+@contextmanager
+def profile_job(job_type, job_id=None):
+    """
+    Bir işi cProfile ile ölç. Profil modu kapalıysa hiçbir şey yapmaz.
+    cProfile sadece çağrıldığı thread'i ölçer; iş kendi thread'inde çalışmalıdır.
+    """
+    if not _state["enabled"]:
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Aynı anda başka bir profil aracı aktif (ör. paralel iş)
+        debug_print(f"⚠️ Profiling skipped for {job_type}: {e}", "WARNING")
+        yield None
+        return
+
+    start = time.perf_counter()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        path = save_job_profile(profiler, job_type, job_id)
+        debug_print(f"🔬 {job_type} profile ({elapsed:.2f}s): {path}", "INFO")
+
+
+def save_job_profile(profiler, job_type, job_id=None):
+    """İş profilini dosyaya yaz ve oturum toplamına ekle, dosya yolunu döndür"""
+    folder = get_profile_folder()
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(folder, f"{job_type}_{stamp}_{job_id or uuid.uuid4().hex[:12]}.prof")
+    try:
+        os.makedirs(folder, exist_ok=True)
+        profiler.dump_stats(path)
+        _state["folders"].add(folder)
+    except OSError as e:
+        debug_print(f"❌ Profile could not be written: {e}", "ERROR")
+        path = None
+
+    with _lock:
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        if _state["stats"] is None:
+            _state["stats"] = stats
+        else:
+            _state["stats"].add(stats)
+        _state["jobs"] += 1
+    return path
+
+
+def hot_functions(top=20, sort="tottime"):
+    """
+    Oturumdaki tüm işlerin birleşik profilinden en pahalı fonksiyonlar:
+    [{"function", "calls", "tottime", "cumtime"}, ...]
+    """
+    with _lock:
+        stats = _state["stats"]
+        if stats is None:
+            return []
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            location = f"{os.path.basename(filename)}:{line}" if filename != "~" else "built-in"
+            rows.append({"function": f"{name} ({location})", "calls": calls,
+                         "tottime": tottime, "cumtime": cumtime})
+    key = "cumtime" if sort == "cumtime" else "tottime"
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:top]
+
+
+def _module_of(filename):
+    """Profil dosya yolundan modül/paket adı (yt_dlp, download_module, built-in...)"""
+    if filename == "~":
+        return "built-in"
+    parts = filename.replace("\\", "/").split("/")
+    if "site-packages" in parts:
+        index = parts.index("site-packages")
+        if index + 1 < len(parts):
+            return os.path.splitext(parts[index + 1])[0]
+    name = os.path.splitext(parts[-1])[0]
+    return parts[-2] if name == "__init__" and len(parts) > 1 else name
+
+
+def time_by_module(top=10):
+    """Kendi süresini (tottime) modül/paket bazında topla: [(modül, saniye), ...]"""
+    with _lock:
+        stats = _state["stats"]
+        if stats is None:
+            return []
+        totals = {}
+        for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+            module = _module_of(filename)
+            totals[module] = totals.get(module, 0.0) + tottime
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def print_profile_summary(top=20):
+    """Oturum sonunda en çok zaman harcayan fonksiyonları yazdır"""
+    if not _state["jobs"]:
+        return
+    folders = ", ".join(sorted(_state["folders"])) or "-"
+    print(f"🔬 Profile summary: {_state['jobs']} job(s), files in {folders}")
+    print(f"{'tottime s':>10} {'cumtime s':>10} {'calls':>9}  function")
+    for row in hot_functions(top):
+        print(f"{row['tottime']:>10.3f} {row['cumtime']:>10.3f} {row['calls']:>9}  {row['function']}")
+    print("   Time by module (built-in includes waiting on ffmpeg and the network):")
+    for module, seconds in time_by_module():
+        print(f"   {seconds:>10.3f}s  {module}")
+
+
+def reset_profile_session():
+    """Oturum toplamını sıfırla"""
+    with _lock:
+        _state["stats"] = None
+        _state["jobs"] = 0
+        _state["folders"] = set()
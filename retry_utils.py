@@ -0,0 +1,370 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Yeniden Deneme Modülü - yt-dlp hatalarını sınıflandırır, sınıfa göre üstel
+geri çekilme (+ jitter) ile yeniden dener ve oynatıcı istemcisi (player_client)
+başına devre kesici tutar.
+
+Hata sınıfları ve davranış:
+  - network:     bağlantı koptu / zaman aşımı / 5xx -> aynı istemciyle bekleyip tekrar
+  - throttled:   429 / bot doğrulaması -> bekleyip tekrar; kısa sürede çok sayıda
+                 gelirse tüm yeni denemeler (kuyruk) bir süre durdurulur (IP düzeyinde)
+  - unavailable: özel / silinmiş / bölge kısıtlı video -> tekrar denenmez
+  - disk:        disk dolu / yetersiz alan (bkz. disk_utils) -> tekrar denenmez
+  - extractor:   imza/nsig/player response hataları -> sıradaki istemciye geçilir
+  - unknown:     yedek formata geçilir (eski birincil/yedek davranışı)
+
+Devre kesici: bir istemci WINDOW saniye içinde THRESHOLD kez extractor hatası
+alırsa COOLDOWN saniye açılır ve sonraki işler o istemciyi hiç denemez (toplu
+indirmede her iş aynı bozuk istemciye deneme harcamaz). Süre dolunca tek bir
+deneme yapılır; başarılıysa kapanır. Tüm istemcilerin devresi açıksa iş beklemeden
+başarısız olur.
+
+Ayarlar: YT2MP3_PLAYER_CLIENTS (varsayılan "ios,tv,web"), YT2MP3_MAX_ATTEMPTS
+(varsayılan 4), YT2MP3_CIRCUIT_BREAKER=0 devre kesiciyi kapatır.
+"""
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import deque
+from log_utils import debug_print
+
+DEFAULT_CLIENTS = ("ios", "tv", "web")
+# Yedek format denemesi player_client sabitlemez (yt-dlp varsayılanları)
+FALLBACK_CLIENT = "default"
+DEFAULT_MAX_ATTEMPTS = 4
+
+# Devre kesici: WINDOW saniyede THRESHOLD extractor hatası -> COOLDOWN saniye açık
+THRESHOLD = 3
+WINDOW = 120
+COOLDOWN = 300
+# Kısıtlama: WINDOW saniyede THROTTLE_THRESHOLD 429 -> tüm denemeler THROTTLE_PAUSE bekler
+THROTTLE_THRESHOLD = 3
+THROTTLE_PAUSE = 60
+# Bekleme süreleri bu aralıklarla bölünür (durdurma isteği gecikmeden fark edilir)
+WAIT_SLICE = 0.25
+
+# Sınıf -> (taban bekleme sn, en fazla bekleme sn); listede olmayan sınıflar beklemez
+BACKOFF = {"network": (1.0, 30.0), "throttled": (10.0, 120.0)}
+
+# Sıra önemli: "Sign in to confirm you're not a bot" extractor değil kısıtlamadır
+_PATTERNS = (
+    ("disk", re.compile(r"No space left on device|Not enough disk space|Disk quota exceeded|Errno 28", re.IGNORECASE)),
+    ("unavailable", re.compile(
+        r"video unavailable|private video|has been removed|no longer available|not available in your country|"
+        r"account associated with this video has been terminated|members-only|join this channel|"
+        r"copyright claim|confirm your age|age.restricted|HTTP Error 404|Unsupported URL|"
+        r"live event will begin|Premieres in", re.IGNORECASE)),
+    ("throttled", re.compile(
+        r"HTTP Error 429|Too Many Requests|rate.?limit|confirm you.?re not a bot|Sign in to confirm", re.IGNORECASE)),
+    ("network", re.compile(
+        r"timed out|timeout|Connection (?:reset|refused|aborted)|Temporary failure in name resolution|"
+        r"Name or service not known|Network is unreachable|Remote end closed|IncompleteRead|"
+        r"HTTP Error 5\d\d|EOF occurred|getaddrinfo failed|Unable to download media", re.IGNORECASE)),
+    ("extractor", re.compile(
+        r"Unable to extract|Failed to extract|nsig extraction failed|Signature extraction failed|"
+        r"player response|Requested format is not available|HTTP Error 403|PO Token|ExtractorError",
+        re.IGNORECASE)),
+)
+
+
+def classify_error(error):
+    """Hata (veya mesajı) -> network / throttled / unavailable / disk / extractor / unknown"""
+    if isinstance(error, (socket.timeout, TimeoutError, ConnectionError)):
+        return "network"
+    message = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+    for kind, pattern in _PATTERNS:
+        if pattern.search(message):
+            return kind
+    return "unknown"
+
+
+def backoff_delay(kind, retry, rng=random):
+    """retry. tekrar için bekleme: üstel artan sınırın yarısı + rastgele yarısı (eşit jitter)"""
+    if kind not in BACKOFF:
+        return 0.0
+    base, cap = BACKOFF[kind]
+    ceiling = min(cap, base * 2 ** retry)
+    return ceiling / 2 + rng.uniform(0, ceiling / 2)
+
+
+class ErrorLog:
+    """
+    yt-dlp 'logger' seçeneği: ignoreerrors=True iken hatalar fırlatılmaz, sadece
+    loglanır; son hata mesajı sınıflandırma için burada tutulur.
+    """
+    def __init__(self):
+        self.errors = []
+
+    @property
+    def last_error(self):
+        return self.errors[-1] if self.errors else None
+
+    def debug(self, message):
+        pass
+
+    def info(self, message):
+        pass
+
+    def warning(self, message):
+        debug_print(f"yt-dlp: {message}", "DEBUG")
+
+    def error(self, message):
+        self.errors.append(str(message).replace("ERROR: ", "", 1).strip())
+        debug_print(f"yt-dlp: {message}", "DEBUG")
+
+
+class RetryExhausted(Exception):
+    """Tüm denemeler başarısız oldu; failures: [(istemci, sınıf, mesaj), ...]"""
+    def __init__(self, failures, reason=None):
+        self.failures = failures
+        self.kind = failures[-1][1] if failures else "unknown"
+        lines = [f"[{client}/{kind}] {message}" for client, kind, message in failures]
+        if reason:
+            lines.append(reason)
+        super().__init__("\n".join(lines))
+
+
+class CircuitBreaker:
+    """closed -> (THRESHOLD hata) -> open -> (COOLDOWN) -> half_open (tek deneme) -> closed/open"""
+    def __init__(self, name, threshold=THRESHOLD, window=WINDOW, cooldown=COOLDOWN, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = "closed"
+        self.failures = deque()
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def allow(self):
+        """Bu istemci denenebilir mi (half_open'da sadece tek deneme)"""
+        if self.state == "open" and self.clock() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self.probing = False
+        if self.state == "half_open":
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+        return self.state == "closed"
+
+    def retry_in(self):
+        return max(0.0, self.opened_at + self.cooldown - self.clock()) if self.state == "open" else 0.0
+
+    def success(self):
+        if self.state != "closed":
+            debug_print(f"🟢 Player client '{self.name}' recovered", "INFO")
+        self.state = "closed"
+        self.failures.clear()
+        self.probing = False
+
+    def failure(self):
+        now = self.clock()
+        self.failures.append(now)
+        while self.failures and now - self.failures[0] > self.window:
+            self.failures.popleft()
+        if self.state == "half_open" or len(self.failures) >= self.threshold:
+            if self.state != "open":
+                self.trips += 1
+                debug_print(f"🔴 Player client '{self.name}' circuit open for {self.cooldown}s "
+                            f"({len(self.failures)} extractor failures)", "WARNING")
+            self.state = "open"
+            self.opened_at = now
+            self.probing = False
+
+    def release(self):
+        """Sayılmayan sonuç (ör. ağ hatası): half_open denemesi başkasına bırakılır"""
+        self.probing = False
+
+
+class RetryEngine:
+    """
+    Süreç genelindeki yeniden deneme ve devre kesici durumu.
+
+        engine = get_retry_engine()
+        result = engine.run(lambda client, fallback: deneme(client, fallback), stop_check)
+    """
+    def __init__(self, clients=None, max_attempts=None, breaker=True, clock=time.monotonic, rng=random):
+        self.clients = list(clients or DEFAULT_CLIENTS)
+        self.max_attempts = max_attempts or DEFAULT_MAX_ATTEMPTS
+        self.breaker_enabled = breaker
+        self.clock = clock
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.breakers = {name: CircuitBreaker(name, clock=clock) for name in self.clients + [FALLBACK_CLIENT]}
+        self.throttles = deque()
+        self.paused_until = 0.0
+        self.stats = {"attempts": 0, "successes": 0, "retries": 0, "switches": 0, "fast_failures": 0,
+                      "waited_s": 0.0}
+        self.errors = {}
+
+    def _choose(self, tried, fallback):
+        """Denenecek istemci; uygun istemci kalmadıysa None (lock tutulurken)"""
+        if not fallback:
+            for name in self.clients:
+                if name not in tried and (not self.breaker_enabled or self.breakers[name].allow()):
+                    return name
+        if FALLBACK_CLIENT not in tried and (not self.breaker_enabled or self.breakers[FALLBACK_CLIENT].allow()):
+            return FALLBACK_CLIENT
+        return None
+
+    def _record(self, client, kind):
+        """Denemenin sonucunu devre kesicilere işle (lock tutulurken); kind None ise başarı"""
+        breaker = self.breakers[client]
+        if kind is None:
+            self.stats["successes"] += 1
+            breaker.success()
+            return
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+        if kind == "extractor":
+            breaker.failure()
+        else:
+            breaker.release()
+        if kind == "throttled":
+            now = self.clock()
+            self.throttles.append(now)
+            while self.throttles and now - self.throttles[0] > WINDOW:
+                self.throttles.popleft()
+            if len(self.throttles) >= THROTTLE_THRESHOLD and self.paused_until <= now:
+                self.paused_until = now + THROTTLE_PAUSE
+                debug_print(f"⏸️ Rate limited {len(self.throttles)} times, pausing downloads for "
+                            f"{THROTTLE_PAUSE}s", "WARNING")
+
+    def _sleep(self, seconds, stop_check):
+        """Bekle (durdurma isteğinde erken dön); beklenen süreyi döndürür"""
+        deadline = self.clock() + seconds
+        while not stop_check():
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                break
+            time.sleep(min(WAIT_SLICE, remaining))
+        waited = seconds - max(0.0, deadline - self.clock())
+        with self.lock:
+            self.stats["waited_s"] += waited
+        return waited
+
+    def wait_if_paused(self, stop_check):
+        """Kısıtlama nedeniyle kuyruk durdurulmuşsa süre dolana kadar bekle"""
+        waited = 0.0
+        while not stop_check():
+            with self.lock:
+                remaining = self.paused_until - self.clock()
+            if remaining <= 0:
+                break
+            waited += self._sleep(remaining, stop_check)
+        return waited
+
+    def run(self, attempt, stop_check=None, on_retry=None):
+        """
+        attempt(client, fallback) başarılı olana kadar sınıfa göre yeniden dene.
+        client: player_client adı (fallback=True iken FALLBACK_CLIENT).
+        on_retry(client, kind, delay, error): her başarısız denemeden sonra çağrılır.
+        stop_check True dönerse son hata olduğu gibi fırlatılır; aksi halde RetryExhausted.
+        """
+        stop_check = stop_check or (lambda: False)
+        failures = []
+        tried = set()
+        fallback = False
+        retries = 0
+        for number in range(self.max_attempts):
+            self.wait_if_paused(stop_check)
+            with self.lock:
+                client = self._choose(tried, fallback)
+                open_for = [b.retry_in() for b in self.breakers.values() if b.state == "open"]
+                if client is None and open_for:
+                    self.stats["fast_failures"] += 1
+                    raise RetryExhausted(failures, f"All player clients are failing (circuit open, retry in "
+                                                   f"{min(open_for):.0f}s); yt-dlp may need an update")
+                if client is None:
+                    break
+                self.stats["attempts"] += 1
+                if number:
+                    self.stats["retries"] += 1
+            fallback = fallback or client == FALLBACK_CLIENT
+            try:
+                result = attempt(client, fallback)
+            except Exception as e:
+                if stop_check():
+                    with self.lock:
+                        self.breakers[client].release()
+                    raise
+                kind = classify_error(e)
+                with self.lock:
+                    self._record(client, kind)
+                failures.append((client, kind, str(e).strip()[:300]))
+                delay = 0.0
+                if kind in ("unavailable", "disk") or (fallback and kind in ("extractor", "unknown")):
+                    break
+                elif kind == "extractor":
+                    # Bozuk istemciyi tekrar denemek yerine sıradakine geç
+                    tried.add(client)
+                    with self.lock:
+                        self.stats["switches"] += 1
+                elif kind in BACKOFF:
+                    delay = backoff_delay(kind, retries, self.rng)
+                    retries += 1
+                else:
+                    fallback = True
+                if on_retry:
+                    on_retry(client, kind, delay, e)
+                if delay and number + 1 < self.max_attempts:
+                    debug_print(f"🔁 {kind} error on '{client}', retrying in {delay:.1f}s", "WARNING")
+                    self._sleep(delay, stop_check)
+                continue
+            with self.lock:
+                self._record(client, None)
+            return result
+        raise RetryExhausted(failures)
+
+    def summary(self):
+        """Durum özeti (API sağlık yanıtı için)"""
+        with self.lock:
+            return {
+                "circuit_breaker": self.breaker_enabled,
+                "clients": {name: breaker.state for name, breaker in self.breakers.items()},
+                "paused_for": round(max(0.0, self.paused_until - self.clock()), 1),
+                "errors": dict(self.errors),
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+            }
+
+
+def _env_clients():
+    value = os.environ.get("YT2MP3_PLAYER_CLIENTS", "")
+    return [name.strip() for name in value.split(",") if name.strip()] or list(DEFAULT_CLIENTS)
+
+
+def _env_max_attempts():
+    value = os.environ.get("YT2MP3_MAX_ATTEMPTS", "")
+    return int(value) if value.isdigit() and int(value) > 0 else DEFAULT_MAX_ATTEMPTS
+
+
+_state = {
+    "breaker": os.environ.get("YT2MP3_CIRCUIT_BREAKER", "1") not in ("", "0"),
+    "engine": None,
+}
+_state_lock = threading.Lock()
+
+
+def get_retry_engine():
+    """Süreç genelindeki ortak motor (devre durumları tüm işler arasında paylaşılır)"""
+    with _state_lock:
+        if _state["engine"] is None:
+            _state["engine"] = RetryEngine(_env_clients(), _env_max_attempts(), _state["breaker"])
+        return _state["engine"]
+
+
+def set_circuit_breaker(enabled):
+    """Devre kesiciyi aç/kapat (motor sıfırlanır)"""
+    with _state_lock:
+        _state["breaker"] = bool(enabled)
+        _state["engine"] = None
+    debug_print(f"🔌 Circuit breaker {'enabled' if enabled else 'disabled'}", "INFO")
+
+
+def is_circuit_breaker_enabled():
+    return _state["breaker"]
@@ -0,0 +1,123 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Müzik Kütüphanesi Tarayıcı - Paralel, alt klasörleri de tarar
+Tag ve süre bilgisi ffmpeg çalıştırmadan thread havuzunda okunur.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tag_utils import read_audio_metadata
+
+AUDIO_EXTENSIONS = {'.mp3', '.m4a', '.wav', '.flac', '.ogg', '.opus', '.wma', '.aac', '.mp4', '.webm'}
+
+# Aynı anda kuyrukta bekleyen en fazla okuma işi (bellek sınırı)
+MAX_IN_FLIGHT = 512
+
+
+def default_worker_count():
+    """I/O ağırlıklı okuma için thread sayısı"""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def iter_audio_entries(music_folder):
+    """
+    Music klasörünü os.scandir ile özyinelemeli gezer.
+    (göreli_yol, tam_yol, stat) üretir; göreli yol her platformda '/' ayraçlıdır.
+    """
+    stack = [music_folder]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                            rel_path = os.path.relpath(entry.path, music_folder).replace(os.sep, "/")
+                            yield rel_path, entry.path, entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def read_library_record(rel_path, full_path, stat):
+    """Tek bir dosya için zengin kütüphane kaydı oluştur"""
+    record = {
+        "path": rel_path,
+        "ext": os.path.splitext(rel_path)[1].lower(),
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+    }
+    try:
+        record.update(read_audio_metadata(full_path))
+        record.pop("length_ms", None)
+        record.pop("album_artist", None)
+        if record.get("duration"):
+            record["duration"] = round(record["duration"], 2)
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+
+def scan_library(music_folder, known_records=None, progress_callback=None, stop_event=None, max_workers=None):
+    """
+    Kütüphaneyi tarar ve kayıt listesini döndürür.
+
+    known_records: history["library"] sözlüğü; boyutu ve mtime'ı değişmemiş
+                   dosyalar yeniden okunmaz.
+    progress_callback(scanned, found, current_path): en fazla ~10 kez/saniye çağrılır.
+    stop_event: set edilirse tarama yarıda bırakılır.
+    """
+    known_records = known_records or {}
+    records = []
+    pending = set()
+    found = 0
+    scanned = 0
+    last_report = 0.0
+
+    def report(current_path, force=False):
+        nonlocal last_report
+        if not progress_callback:
+            return
+        now = time.monotonic()
+        if force or now - last_report >= 0.1:
+            last_report = now
+            progress_callback(scanned, found, current_path)
+
+    def collect(done):
+        nonlocal scanned
+        for future in done:
+            record = future.result()
+            records.append(record)
+            scanned += 1
+            report(record["path"])
+
+    with ThreadPoolExecutor(max_workers=max_workers or default_worker_count()) as executor:
+        for rel_path, full_path, stat in iter_audio_entries(music_folder):
+            if stop_event is not None and stop_event.is_set():
+                break
+            found += 1
+
+            known = known_records.get(rel_path)
+            if known and known.get("size") == stat.st_size and known.get("mtime") == int(stat.st_mtime):
+                records.append(known)
+                scanned += 1
+                report(rel_path)
+                continue
+
+            pending.add(executor.submit(read_library_record, rel_path, full_path, stat))
+            if len(pending) >= MAX_IN_FLIGHT:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if stop_event is not None and stop_event.is_set():
+            for future in pending:
+                future.cancel()
+            pending = {f for f in pending if not f.cancelled()}
+        done, _ = wait(pending)
+        collect(done)
+
+    report("", force=True)
+    return records
@@ -0,0 +1,110 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Kütüphane Arama Modülü - Bellek içi trigram indeksi
+Müzik isimleri, dosya yolları, tag'ler ve URL'ler üzerinde yazdıkça arama.
+"""
+import os
+import unicodedata
+from array import array
+from history_utils import shorten_title
+
+# Türkçe karakterlerin aksansız karşılıkları (ı/İ NFKD ile ayrışmaz)
+_TRANSLATE = str.maketrans({"ı": "i", "İ": "i", "ş": "s", "ğ": "g", "ç": "c", "ö": "o", "ü": "u"})
+
+
+def normalize_text(text):
+    """Arama için metni küçük harfe çevir ve aksanları kaldır"""
+    text = text.translate(_TRANSLATE).casefold()
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class LibraryIndex:
+    """
+    Trigram ters indeksi.
+    Her belge bir history satırıdır (music_titles sırası ile aynı id).
+    Sorgu, en seçici trigram'ın posting listesinden aday alır ve
+    adayları alt-dizgi kontrolü ile doğrular.
+    """
+    def __init__(self):
+        self.texts = []
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, text):
+        """Yeni belge ekle, belge id'sini döndür"""
+        doc_id = len(self.texts)
+        normalized = normalize_text(text)
+        self.texts.append(normalized)
+        for gram in _trigrams(normalized):
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array("I")
+            postings.append(doc_id)
+        return doc_id
+
+    def search(self, query, limit=None):
+        """Sorgudaki tüm kelimeleri içeren belge id'lerini (history sırasıyla) döndür"""
+        terms = normalize_text(query).split()
+        if not terms:
+            return list(range(len(self.texts)))
+
+        # En küçük posting listesini sürücü olarak seç
+        driver = None
+        for term in terms:
+            if len(term) < 3:
+                continue
+            for gram in _trigrams(term):
+                postings = self.postings.get(gram)
+                if postings is None:
+                    return []
+                if driver is None or len(postings) < len(driver):
+                    driver = postings
+        candidates = driver if driver is not None else range(len(self.texts))
+
+        results = []
+        texts = self.texts
+        for doc_id in candidates:
+            text = texts[doc_id]
+            if all(term in text for term in terms):
+                results.append(doc_id)
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+
+def build_document_texts(history):
+    """
+    History'deki her müzik ismi için aranacak metni oluştur.
+    Kütüphane kaydı varsa dosya yolu, sanatçı, albüm ve URL de eklenir.
+    """
+    records_by_title = {}
+    for record in history.get("library", {}).values():
+        stem = os.path.splitext(os.path.basename(record["path"]))[0]
+        records_by_title[shorten_title(stem)] = record
+
+    texts = []
+    for title in history.get("music_titles", []):
+        parts = [title]
+        record = records_by_title.get(title)
+        if record:
+            for key in ("path", "title", "artist", "album", "url"):
+                value = record.get(key)
+                if value:
+                    parts.append(str(value))
+        texts.append(" ".join(parts))
+    return texts
+
+
+def build_index(history):
+    """History'den tam indeks oluştur"""
+    index = LibraryIndex()
+    for text in build_document_texts(history):
+        index.add(text)
+    return index
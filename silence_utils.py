@@ -0,0 +1,169 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Sessizlik Kırpma Modülü - Baştaki ve sondaki sessizliği bulup kesme
+PCM ffmpeg ile 16 kHz mono olarak akış halinde çözülür; sabit pencerelerin
+RMS değeri NumPy ile blok blok hesaplanır. Sadece ilk/son sesli pencere
+indeksleri tutulduğu için bellek kullanımı parça uzunluğundan bağımsızdır.
+
+Kesme yeniden kodlamadan (stream copy) yapılır; ffmpeg -ss ile kesim
+noktası paket/frame sınırına hizalanır. Dosya zaten kodlanacaksa (çoklu
+çıktı, normalizasyon, dönüştürme) kesim aynı kodlama geçişine eklenir.
+
+Açmak için: GUI'deki "Trim silence", --trim-silence veya YT2MP3_TRIM_SILENCE=1.
+NumPy isteğe bağlıdır; yüklü değilse kırpma atlanır.
+"""
+import os
+import subprocess
+from ffmpeg_utils import iter_pcm, get_ffmpeg_path, run_ffmpeg
+from log_utils import debug_print
+
+# Bu seviyenin altındaki pencereler sessiz sayılır (dBFS, RMS)
+SILENCE_THRESHOLD_DB = -50.0
+WINDOW_SECONDS = 0.05
+# Sadece bu süreden uzun sessizlikler kesilir; kesimden sonra bu kadar bırakılır
+MIN_SILENCE_SECONDS = 1.0
+KEEP_SILENCE_SECONDS = 0.25
+
+ANALYSIS_RATE = 16000
+CHUNK_FRAMES = ANALYSIS_RATE * 10
+
+# Stream copy ile kesilebilen konteynerler -> ffmpeg çıktı biçimi ve ek argümanlar
+_COPY_FORMATS = {
+    "mp3": ["-f", "mp3", "-id3v2_version", "3", "-write_id3v1", "1"],
+    "mp4": ["-f", "mp4", "-movflags", "+faststart"],
+    "wav": ["-f", "wav"],
+}
+
+_state = {
+    "enabled": os.environ.get("YT2MP3_TRIM_SILENCE", "") not in ("", "0"),
+    "np": None,
+}
+
+
+class SilenceError(Exception):
+    """Sessizlik analizi yapılamadı (NumPy yok veya ffmpeg hatası)"""
+
+
+def set_silence_trim(enabled):
+    """Sessizlik kırpmayı aç/kapat (yeni işler için geçerli)"""
+    _state["enabled"] = bool(enabled)
+    debug_print(f"✂️ Silence trimming {'enabled' if enabled else 'disabled'}", "INFO")
+
+
+def is_silence_trim_enabled():
+    return _state["enabled"]
+
+
+def _numpy():
+    """NumPy'ı ilk kullanımda yükle"""
+    if _state["np"] is None:
+        try:
+            import numpy
+        except ImportError:
+            raise SilenceError("NumPy is not installed (pip install numpy)")
+        _state["np"] = numpy
+    return _state["np"]
+
+
+class SilenceDetector:
+    """
+    Akış halinde sessizlik dedektörü. feed() ile mono float32 örnekler
+    verilir; result() ilk ve son sesli pencerenin zamanlarını döndürür.
+    """
+    def __init__(self, sample_rate=ANALYSIS_RATE, threshold_db=SILENCE_THRESHOLD_DB,
+                 window_seconds=WINDOW_SECONDS):
+        np = _numpy()
+        self.np = np
+        self.sample_rate = sample_rate
+        self.window = max(1, int(sample_rate * window_seconds))
+        # RMS karşılaştırması yerine pencere enerjisi ile (karekök yok)
+        self.threshold = (10 ** (threshold_db / 20)) ** 2 * self.window
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.windows = 0
+        self.first_loud = None
+        self.last_loud = None
+
+    def feed(self, samples):
+        np = self.np
+        samples = np.concatenate((self.pending, np.asarray(samples, dtype=np.float32)))
+        usable = len(samples) - len(samples) % self.window
+        if usable:
+            blocks = samples[:usable].reshape(-1, self.window)
+            loud = np.flatnonzero(np.einsum("ws,ws->w", blocks, blocks) > self.threshold)
+            if loud.size:
+                if self.first_loud is None:
+                    self.first_loud = self.windows + int(loud[0])
+                self.last_loud = self.windows + int(loud[-1])
+            self.windows += len(blocks)
+        self.pending = samples[usable:]
+
+    def result(self):
+        """{"duration", "sound_start", "sound_end"}; tamamen sessizse sound_* None"""
+        seconds = self.window / self.sample_rate
+        duration = (self.windows * self.window + len(self.pending)) / self.sample_rate
+        if self.first_loud is None:
+            return {"duration": duration, "sound_start": None, "sound_end": None}
+        return {
+            "duration": duration,
+            "sound_start": self.first_loud * seconds,
+            "sound_end": min(duration, (self.last_loud + 1) * seconds),
+        }
+
+
+def detect_silence(path, timeout=None):
+    """Dosyayı 16 kHz mono PCM olarak çözüp baştaki/sondaki sessizliği bul"""
+    np = _numpy()
+    detector = SilenceDetector()
+    try:
+        for data in iter_pcm(path, ANALYSIS_RATE, 1, CHUNK_FRAMES, timeout):
+            detector.feed(np.frombuffer(data, dtype="<f4"))
+    except subprocess.CalledProcessError as e:
+        raise SilenceError(f"ffmpeg decode failed ({e.returncode}): {e.stderr}")
+    except subprocess.TimeoutExpired:
+        raise SilenceError("ffmpeg decode timed out")
+    return detector.result()
+
+
+def trim_range(detection, min_silence=MIN_SILENCE_SECONDS, keep=KEEP_SILENCE_SECONDS):
+    """
+    Kesilecek aralık: {"start", "end", "leading", "trailing"} (saniye).
+    Kesilecek kadar uzun sessizlik yoksa veya parça tamamen sessizse None.
+    """
+    start, end, duration = detection["sound_start"], detection["sound_end"], detection["duration"]
+    if start is None:
+        return None
+    cut_start = max(0.0, start - keep) if start >= min_silence else 0.0
+    cut_end = min(duration, end + keep) if duration - end >= min_silence else duration
+    if cut_start == 0.0 and cut_end == duration:
+        return None
+    return {"start": round(cut_start, 3), "end": round(cut_end, 3),
+            "leading": round(cut_start, 3), "trailing": round(duration - cut_end, 3)}
+
+
+def trim_input_args(cut):
+    """Kodlama komutunda '-i'den önce verilecek giriş kesme argümanları"""
+    return ["-ss", f"{cut['start']:.3f}", "-t", f"{cut['end'] - cut['start']:.3f}"]
+
+
+def trim_file(path, cut, container):
+    """
+    Dosyayı yeniden kodlamadan (stream copy) kes ve yerine yaz.
+    container: tag_utils.detect_container sonucu (uzantı yanıltıcı olabilir).
+    Desteklenmeyen konteynerde False döner.
+    """
+    format_args = _COPY_FORMATS.get(container)
+    if format_args is None:
+        return False
+    temp_path = f"{os.path.splitext(path)[0]}_TEMP_TRIM{os.path.splitext(path)[1]}"
+    command = [get_ffmpeg_path(), '-y'] + trim_input_args(cut)[:2] + ['-i', path,
+               '-t', f"{cut['end'] - cut['start']:.3f}", '-map', '0', '-c', 'copy',
+               '-map_metadata', '0'] + format_args + [temp_path]
+    try:
+        result = run_ffmpeg(command, cut["end"] - cut["start"])
+        if result["returncode"] != 0 or not os.path.exists(temp_path):
+            raise SilenceError("ffmpeg stream copy failed: " + " | ".join(result["stderr_tail"][-3:]))
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
@@ -0,0 +1,90 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Başlangıç Süresi Ölçümü - python -X importtime raporu ve ilk çizim süresi
+"""
+import os
+import sys
+import time
+import subprocess
+
+
+def importtime_report(module="gui_module", top=15):
+    """
+    Modülü ayrı bir süreçte `python -X importtime` ile import eder ve
+    en pahalı (kümülatif) import'ları döndürür.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=script_dir)
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append({
+            "module": name.strip(),
+            "depth": depth,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+
+    loaded = {entry["module"] for entry in entries}
+    return {
+        "module": module,
+        "returncode": result.returncode,
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode else "",
+        "total_ms": sum(entry["self_us"] for entry in entries) / 1000,
+        "module_count": len(entries),
+        "yt_dlp_loaded": "yt_dlp" in loaded,
+        "top": sorted(entries, key=lambda e: e["cumulative_us"], reverse=True)[:top],
+    }
+
+
+def measure_gui_startup(timeout=30.0):
+    """
+    GUI başlangıç aşamalarını ölçer (saniye):
+    import, pencere oluşturma, ilk çizim ve history'nin yüklenip görünmesi.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    from gui_module import ModernGUI
+    timings["import"] = time.perf_counter() - start
+
+    app = ModernGUI()
+    timings["construct"] = time.perf_counter() - start
+
+    app.root.update()
+    timings["first_paint"] = time.perf_counter() - start
+
+    deadline = time.monotonic() + timeout
+    while not app.history_loaded and time.monotonic() < deadline:
+        app.root.update()
+        time.sleep(0.005)
+    timings["history_ready"] = time.perf_counter() - start
+
+    app.root.destroy()
+    return timings
+
+
+def print_startup_report(report, gui_timings=None):
+    """Raporu terminale yazdır"""
+    print(f"⏱️ Import time for '{report['module']}': {report['total_ms']:.1f} ms "
+          f"({report['module_count']} modules)")
+    if report["returncode"]:
+        print(f"   ❌ Import failed: {report['error']}")
+    print(f"   yt_dlp imported at startup: {'YES ⚠️' if report['yt_dlp_loaded'] else 'no ✅'}")
+    print("   Slowest imports (cumulative):")
+    for entry in report["top"]:
+        indent = "  " * entry["depth"]
+        print(f"   {entry['cumulative_us'] / 1000:8.1f} ms  {indent}{entry['module']}")
+
+    if gui_timings:
+        print("🖥️ GUI startup:")
+        for phase in ("import", "construct", "first_paint", "history_ready"):
+            print(f"   {phase:<14} {gui_timings[phase] * 1000:8.1f} ms")
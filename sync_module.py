@@ -0,0 +1,377 @@
+﻿# -*- coding: utf-8 -*-
+"""
+USB / Araba Belleği Eşitleme - Music/ klasörünü (veya bir alt kümesini) hedef
+klasöre artımlı olarak yansıtır.
+
+Hedefteki .yt2mp3-sync.json manifestosu her dosyanın kaynak boyutu, mtime'ı,
+SHA-256 özeti ve hedefteki boyut/mtime'ı tutar:
+  - kaynak ve hedef değişmemişse dosyaya dokunulmaz (sadece stat, okuma yok)
+  - sadece mtime değişmişse (ör. dokunulmuş/geri yüklenmiş) özet karşılaştırılır;
+    özet kopyalarken hesaplanmaz (çekirdek içi kopya korunur), kopyalanan dosyada
+    ilk gerektiğinde hedefteki birebir kopyayla karşılaştırılarak bulunur
+  - manifestoda olup artık seçilmeyen dosyalar hedeften silinir (sadece bu
+    eşitlemenin kopyaladığı dosyalar; bellekteki diğer dosyalara dokunulmaz)
+Kopyalar paralel yapılır; çekirdek içi copy_file_range / sendfile, olmazsa
+büyük tamponlu okuma/yazma kullanılır. Yarım kopya .part adıyla yazılır,
+bitince yerine konur. Manifesto düzenli aralıklarla kaydedilir: yarıda kalan
+eşitleme kaldığı yerden devam eder.
+
+convert=True: MP3 olmayan veya 128k'dan yüksek dosyalar araba ön ayarına
+(MP3 128k, 44.1 kHz stereo) dönüştürülerek yazılır.
+Hedef dosya adları FAT32/exFAT'ta geçersiz karakterlerden arındırılır.
+"""
+import fnmatch
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ffmpeg_utils import get_ffmpeg_path, probe_duration, run_ffmpeg
+from log_utils import debug_print
+from scanner_module import iter_audio_entries
+
+MANIFEST_FILE = ".yt2mp3-sync.json"
+# Çekirdek içi kopya / tamponlu kopya parça boyutu
+COPY_CHUNK = 8 * 1024 * 1024
+# Araba ön ayarı
+CAR_CODEC, CAR_QUALITY = "mp3", "128"
+# Manifesto bu kadar dosyada bir kaydedilir (yarıda kalırsa devam için)
+SAVE_EVERY = 50
+# USB bellekler çok sayıda eşzamanlı yazmada yavaşlar
+DEFAULT_WORKERS = 4
+
+_FAT_INVALID = re.compile(r'[<>:"\\|?*\x00-\x1f]')
+
+
+class SyncError(Exception):
+    """Eşitleme başlatılamadı (ör. hedef yok, yer yetmiyor)"""
+
+
+def target_path(rel_path, convert=False):
+    """Kaynak göreli yolu -> hedef göreli yolu (FAT uyumlu; dönüştürülecekse .mp3)"""
+    parts = [_FAT_INVALID.sub("_", part).rstrip(". ") or "_" for part in rel_path.split("/")]
+    if convert:
+        parts[-1] = os.path.splitext(parts[-1])[0] + "." + CAR_CODEC
+    return "/".join(parts)
+
+
+def needs_conversion(full_path):
+    """Araba ön ayarına dönüştürülmesi gerekiyor mu (MP3 değil veya bit hızı > 128k)"""
+    from tag_utils import read_audio_metadata
+    if not full_path.lower().endswith(".mp3"):
+        return True
+    try:
+        bitrate = read_audio_metadata(full_path).get("bitrate")
+    except (OSError, ValueError):
+        return True
+    return bool(bitrate) and bitrate > int(CAR_QUALITY) + 8
+
+
+def _kernel_copy(src, dst, size):
+    """copy_file_range, olmazsa sendfile; kopyalanan bayt (desteklenmiyorsa 0)"""
+    copy_range = getattr(os, "copy_file_range", None)
+    sendfile = getattr(os, "sendfile", None)
+    copied = 0
+    for method in (copy_range, sendfile):
+        if method is None:
+            continue
+        try:
+            while copied < size:
+                count = min(COPY_CHUNK, size - copied)
+                if method is copy_range:
+                    sent = copy_range(src.fileno(), dst.fileno(), count)
+                else:
+                    sent = sendfile(dst.fileno(), src.fileno(), copied, count)
+                if not sent:
+                    break
+                copied += sent
+            return copied
+        except OSError:
+            if copied:
+                raise
+    return 0
+
+
+def copy_file(source, destination):
+    """Kaynağı hedefe kopyala (çekirdek içi, olmazsa büyük tamponla); kopyalanan bayt"""
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        copied = _kernel_copy(src, dst, size) if size else 0
+        if copied < size:
+            src.seek(copied)
+            dst.seek(copied)
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+            copied = dst.tell()
+    return copied
+
+
+def convert_file(source, destination, stop_check=None):
+    """Kaynağı araba ön ayarında MP3 olarak yaz (tag'ler ffmpeg ile taşınır)"""
+    from download_module import encoder_settings
+    _, args = encoder_settings(CAR_CODEC, CAR_QUALITY)
+    command = [get_ffmpeg_path(), "-y", "-i", source, "-map", "0:a:0", "-vn"] + args + ["-f", "mp3", destination]
+    result = run_ffmpeg(command, probe_duration(source), stop_check=stop_check)
+    if result["stopped"]:
+        raise InterruptedError("Sync stopped")
+    if result["returncode"] != 0:
+        raise OSError("ffmpeg failed: " + " | ".join(result["stderr_tail"][-3:]))
+    return os.path.getsize(destination)
+
+
+class SyncManifest:
+    """Hedefteki manifesto: hedef göreli yolu -> kaynak/hedef boyut, mtime, özet"""
+    def __init__(self, target):
+        self.path = os.path.join(target, MANIFEST_FILE)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+        except (OSError, ValueError, AttributeError):
+            self.files = {}
+
+    def save(self):
+        with self.lock:
+            data = {"version": 1, "updated": time.time(), "files": self.files}
+            fd, temp_path = tempfile.mkstemp(prefix=".sync-", dir=os.path.dirname(self.path))
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(temp_path, self.path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+
+def select_sources(music_folder, query=None, include=None, exclude=None, library=None):
+    """
+    Eşitlenecek dosyalar: [(göreli_yol, tam_yol, stat), ...]
+    include/exclude: göreli yol glob kalıpları (ör. "Rock/*", "WAV/*")
+    query: kütüphane kaydındaki başlık/sanatçı/albüm/yol içinde aranan metin
+    """
+    from search_module import normalize_text
+    terms = normalize_text(query).split() if query else []
+    selected = []
+    for rel_path, full_path, stat in iter_audio_entries(music_folder):
+        if include and not any(fnmatch.fnmatch(rel_path, pattern) for pattern in include):
+            continue
+        if exclude and any(fnmatch.fnmatch(rel_path, pattern) for pattern in exclude):
+            continue
+        if terms:
+            record = (library or {}).get(rel_path, {})
+            text = normalize_text(" ".join(str(record.get(key) or "") for key in ("title", "artist", "album"))
+                                  + " " + rel_path)
+            if not all(term in text for term in terms):
+                continue
+        selected.append((rel_path, full_path, stat))
+    return selected
+
+
+def _unchanged(entry, stat, dest_full, preset, full_path):
+    """
+    Manifesto kaydı hâlâ geçerli mi; sadece mtime değiştiyse özetle karar verilir.
+    Kopyalanan dosyaların özeti eşitlemede hesaplanmaz: hedef kaynağın birebir
+    kopyası olduğundan ilk gerektiğinde ikisi karşılaştırılır ve özet saklanır.
+    """
+    from media_cache import file_digest
+    if not entry or entry.get("preset") != preset or entry.get("size") != stat.st_size:
+        return False
+    try:
+        dest_stat = os.stat(dest_full)
+    except OSError:
+        return False
+    if dest_stat.st_size != entry.get("dest_size") or dest_stat.st_mtime != entry.get("dest_mtime"):
+        return False
+    if entry.get("mtime") == stat.st_mtime:
+        return True
+    if entry.get("hash"):
+        if entry["hash"] != file_digest(full_path):
+            return False
+    elif dest_stat.st_size != stat.st_size:
+        return False
+    else:
+        digest = file_digest(full_path)
+        if digest != file_digest(dest_full):
+            return False
+        entry["hash"] = digest
+    entry["mtime"] = stat.st_mtime
+    return True
+
+
+def manifest_path(target, dest_rel):
+    """
+    Manifestodaki göreli yol -> hedef içindeki tam yol. Manifesto çıkarılabilir
+    bellekte durur, elle/başka araçla değiştirilmiş olabilir: dışarı çıkan ('..'),
+    mutlak veya sürücü harfli yollar (ya da hedef dışına uzanan bağlantılar) için None.
+    """
+    parts = [part for part in dest_rel.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or any(part == ".." or ":" in part for part in parts) or dest_rel.startswith(("/", "\\")):
+        return None
+    full_path = os.path.join(target, *parts)
+    root = os.path.realpath(target)
+    if os.path.commonpath([root, os.path.realpath(full_path)]) != root:
+        return None
+    return full_path
+
+
+def _prune_empty_dirs(target, full_path):
+    """Silinen dosyanın boşalan üst klasörlerini kaldır (hedefin kendisine/dışına çıkmadan)"""
+    root = os.path.abspath(target)
+    folder = os.path.dirname(os.path.abspath(full_path))
+    while folder != root and os.path.commonpath([root, folder]) == root:
+        try:
+            os.rmdir(folder)
+        except OSError:
+            break
+        folder = os.path.dirname(folder)
+
+
+def sync_library(target, music_folder=None, query=None, include=None, exclude=None, convert=False, delete=True,
+                 max_workers=None, dry_run=False, progress_callback=None, stop_event=None):
+    """
+    Music klasörünü hedefe artımlı olarak eşitle.
+
+    progress_callback(done, total, rel_path): her dosyadan sonra çağrılır.
+    stop_event: set edilirse yeni kopya başlatılmaz, manifesto kaydedilir.
+    Özet sözlük döndürür: {"total", "copied", "converted", "unchanged", "deleted",
+    "skipped", "failed", "bytes", "errors"}
+    """
+    from history_utils import load_history, get_music_folder
+    from media_cache import file_digest
+    from disk_utils import format_bytes
+
+    music_folder = music_folder or get_music_folder()
+    if not os.path.isdir(target):
+        raise SyncError(f"Target folder does not exist: {target}")
+    if os.path.abspath(target) == os.path.abspath(music_folder):
+        raise SyncError("Target is the Music folder itself")
+    preset = f"{CAR_CODEC}-{CAR_QUALITY}" if convert else "copy"
+    library = load_history().get("library", {}) if query else None
+    sources = select_sources(music_folder, query, include, exclude, library)
+    manifest = SyncManifest(target)
+    summary = {"total": len(sources), "copied": 0, "converted": 0, "unchanged": 0, "deleted": 0,
+               "skipped": 0, "failed": 0, "bytes": 0, "errors": []}
+
+    # Plan: hedef yolu -> kaynak; aynı hedefe düşen ikinci dosya atlanır (ör. a.m4a ve a.mp3)
+    plan = {}
+    for rel_path, full_path, stat in sorted(sources, key=lambda s: (not s[0].lower().endswith(".mp3"), s[0])):
+        dest_rel = target_path(rel_path, convert)
+        key = dest_rel.casefold()
+        if key in plan:
+            summary["skipped"] += 1
+            debug_print(f"🔁 Sync: {rel_path} skipped, same target as {plan[key][1]}", "WARNING")
+            continue
+        plan[key] = (dest_rel, rel_path, full_path, stat)
+
+    work = []
+    for dest_rel, rel_path, full_path, stat in plan.values():
+        dest_full = os.path.join(target, *dest_rel.split("/"))
+        entry = manifest.files.get(dest_rel)
+        if entry and entry.get("source") == rel_path and _unchanged(entry, stat, dest_full, preset, full_path):
+            summary["unchanged"] += 1
+        else:
+            work.append((dest_rel, rel_path, full_path, stat))
+
+    # Önce eski dosyalar silinir (yer açılır), sonra kopyalanır
+    wanted = {dest_rel for dest_rel, _, _, _ in plan.values()}
+    stale = [dest_rel for dest_rel in manifest.files if dest_rel not in wanted] if delete else []
+    for dest_rel in stale:
+        stale_path = manifest_path(target, dest_rel)
+        if stale_path is None:
+            # Hedef dışını gösteren kayıt: dosyaya dokunulmaz, kayıt düşürülür
+            debug_print(f"⚠️ Sync: ignoring unsafe manifest path {dest_rel!r}", "WARNING")
+            summary["errors"].append(f"{dest_rel}: unsafe path in manifest, not deleted")
+            if not dry_run:
+                del manifest.files[dest_rel]
+            continue
+        if not dry_run:
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                summary["errors"].append(f"{dest_rel}: {e}")
+                continue
+            del manifest.files[dest_rel]
+            _prune_empty_dirs(target, stale_path)
+        summary["deleted"] += 1
+
+    need = sum(stat.st_size for _, _, _, stat in work)
+    free = shutil.disk_usage(target).free
+    if dry_run:
+        summary.update(to_copy=len(work), to_copy_bytes=need)
+        return summary
+    if need > free:
+        # Dönüştürmede çıktı kaynaktan küçüktür; kaynak boyutu üst sınırdır
+        manifest.save()
+        message = f"Not enough space on target: {format_bytes(need)} to copy, {format_bytes(free)} free"
+        if not convert:
+            raise SyncError(message)
+        debug_print(f"⚠️ {message} (converted files are smaller, trying anyway)", "WARNING")
+
+    stop_check = (lambda: stop_event.is_set()) if stop_event is not None else None
+
+    def sync_one(dest_rel, rel_path, full_path, stat):
+        if stop_check and stop_check():
+            return None
+        dest_full = os.path.join(target, *dest_rel.split("/"))
+        os.makedirs(os.path.dirname(dest_full), exist_ok=True)
+        part = dest_full + ".part"
+        mode = "copy"
+        try:
+            if convert and needs_conversion(full_path):
+                mode = "convert"
+                written = convert_file(full_path, part, stop_check)
+            else:
+                written = copy_file(full_path, part)
+            os.replace(part, dest_full)
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+        try:
+            # Kaynağın mtime'ı korunur (FAT 2 sn hassasiyetine yuvarlanabilir; manifesto gerçek değeri tutar)
+            os.utime(dest_full, (stat.st_atime, stat.st_mtime))
+        except OSError:
+            pass
+        dest_stat = os.stat(dest_full)
+        entry = {"source": rel_path, "preset": preset, "size": stat.st_size, "mtime": stat.st_mtime,
+                 "hash": file_digest(full_path) if mode == "convert" else None,
+                 "dest_size": dest_stat.st_size, "dest_mtime": dest_stat.st_mtime}
+        return mode, written, entry
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_WORKERS) as executor:
+        futures = {executor.submit(sync_one, *item): item for item in work}
+        for future in as_completed(futures):
+            dest_rel, rel_path = futures[future][:2]
+            done += 1
+            try:
+                result = future.result()
+            except InterruptedError:
+                continue
+            except Exception as e:
+                summary["failed"] += 1
+                summary["errors"].append(f"{rel_path}: {e}")
+                debug_print(f"❌ Sync failed for {rel_path}: {e}", "ERROR")
+                continue
+            if result is None:
+                continue
+            mode, written, entry = result
+            with manifest.lock:
+                manifest.files[dest_rel] = entry
+            summary["copied" if mode == "copy" else "converted"] += 1
+            summary["bytes"] += written
+            if done % SAVE_EVERY == 0:
+                manifest.save()
+            if progress_callback:
+                progress_callback(done, len(work), rel_path)
+
+    manifest.save()
+    if hasattr(os, "sync"):
+        # Bellek çıkarılmadan önce yazma önbelleği boşaltılır
+        os.sync()
+    return summary
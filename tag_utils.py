@@ -0,0 +1,520 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Tag ve süre okuma yardımcıları - ID3 / MP4 / WAV / FLAC / OGG
+ffmpeg çalıştırmadan, doğrudan dosya başlıklarından okur.
+"""
+import os
+import struct
+
+# MPEG ses bitrate tabloları (kbps)
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+# ID3v2 frame -> kayıt alanı eşlemesi (v2.3/v2.4 ve v2.2)
+_ID3_FRAMES = {
+    "TIT2": "title", "TPE1": "artist", "TALB": "album", "TCON": "genre",
+    "TYER": "year", "TDRC": "year", "TLEN": "length_ms", "TRCK": "track",
+    "TT2": "title", "TP1": "artist", "TAL": "album", "TCO": "genre",
+    "TYE": "year", "TLE": "length_ms", "TRK": "track",
+}
+
+# MP4 ilst atom -> kayıt alanı eşlemesi
+_MP4_ATOMS = {
+    b"\xa9nam": "title", b"\xa9ART": "artist", b"\xa9alb": "album",
+    b"\xa9day": "year", b"\xa9gen": "genre", b"aART": "album_artist",
+    b"\xa9cmt": "comment",
+}
+
+
+def detect_container(head):
+    """Dosyanın ilk baytlarından gerçek konteyner türünü tespit et"""
+    if head[:3] == b"ID3":
+        return "mp3"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if len(head) >= 4 and parse_mp3_frame_header(head[:4]):
+        return "mp3"
+    return "unknown"
+
+
+def read_audio_metadata(path):
+    """
+    Bir ses dosyasının tag ve süre bilgisini okur.
+    Dönen sözlük: container, title, artist, album, year, genre, track, comment,
+    duration, bitrate
+    Okunamayan alanlar None olarak kalır.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        return read_stream_metadata(f, file_size)
+
+
+def read_stream_metadata(f, file_size):
+    """
+    read_audio_metadata'nın açık dosya üzerinde çalışan hali; read/seek/tell
+    destekleyen her nesneyle (ör. mmap) kullanılabilir.
+    """
+    info = {
+        "container": "unknown",
+        "title": None,
+        "artist": None,
+        "album": None,
+        "year": None,
+        "genre": None,
+        "track": None,
+        "comment": None,
+        "duration": None,
+        "bitrate": None,
+    }
+    f.seek(0)
+    head = f.read(64)
+    container = detect_container(head)
+    info["container"] = container
+    f.seek(0)
+    if container == "mp3":
+        _read_mp3(f, file_size, info)
+    elif container == "mp4":
+        _read_mp4(f, file_size, info)
+    elif container == "wav":
+        _read_wav(f, file_size, info)
+    elif container == "flac":
+        _read_flac(f, info)
+    elif container == "ogg":
+        _read_ogg(f, file_size, info)
+
+    if info["duration"] and not info["bitrate"] and file_size:
+        info["bitrate"] = int(file_size * 8 / info["duration"] / 1000)
+    return info
+
+
+# ---------------------------------------------------------------------------
+# MP3 / ID3
+# ---------------------------------------------------------------------------
+
+def _synchsafe(data):
+    """ID3v2 synchsafe tamsayısını çöz"""
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_id3_text(data):
+    """ID3 metin frame'ini encoding byte'ına göre çöz"""
+    if not data:
+        return ""
+    encoding, raw = data[0], data[1:]
+    try:
+        if encoding == 0:
+            text = raw.decode("latin-1")
+        elif encoding == 1:
+            text = raw.decode("utf-16")
+        elif encoding == 2:
+            text = raw.decode("utf-16-be")
+        else:
+            text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        text = raw.decode("latin-1", errors="replace")
+    return text.split("\x00")[0].strip()
+
+
+def _decode_id3_comment(data):
+    """
+    COMM frame'i: encoding + dil + kısa açıklama + metin. Sadece açıklaması boş
+    (genel yorum) frame'in metni döner; iTunNORM gibi araç kayıtları için None.
+    """
+    if len(data) < 4:
+        return None
+    encoding, raw = data[0], data[4:]
+    if encoding in (1, 2):
+        end = next((i for i in range(0, len(raw) - 1, 2) if raw[i:i + 2] == b"\x00\x00"), len(raw))
+        description, text = raw[:end], raw[end + 2:]
+    else:
+        end = raw.find(b"\x00")
+        description, text = (raw[:end], raw[end + 1:]) if end >= 0 else (raw, b"")
+    if _decode_id3_text(bytes([encoding]) + description):
+        return None
+    return _decode_id3_text(bytes([encoding]) + text)
+
+
+def read_id3v2_header(f):
+    """
+    ID3v2 başlığını okur. (version, tag_size) döner; tag_size 10 baytlık
+    başlığı ve footer'ı içerir. Tag yoksa (None, 0).
+    """
+    f.seek(0)
+    header = f.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return None, 0
+    version = header[3]
+    size = _synchsafe(header[6:10]) + 10
+    if header[5] & 0x10:  # footer
+        size += 10
+    return version, size
+
+
+def _read_id3v2_frames(f, info):
+    """ID3v2 frame'lerini oku, ses verisinin başladığı offset'i döndür"""
+    version, tag_size = read_id3v2_header(f)
+    if version is None:
+        return 0
+    f.seek(0)
+    header = f.read(10)
+    body = f.read(_synchsafe(header[6:10]))
+    pos = 0
+
+    # Extended header atla
+    if header[5] & 0x40 and len(body) >= 4:
+        if version == 4:
+            pos = _synchsafe(body[:4])
+        else:
+            pos = struct.unpack(">I", body[:4])[0] + 4
+
+    id_len, head_len = (3, 6) if version == 2 else (4, 10)
+    while pos + head_len <= len(body):
+        frame_id = body[pos:pos + id_len]
+        if not frame_id.strip(b"\x00") or not frame_id.isalnum():
+            break  # padding
+        if version == 2:
+            frame_size = int.from_bytes(body[pos + 3:pos + 6], "big")
+        elif version == 4:
+            frame_size = _synchsafe(body[pos + 4:pos + 8])
+        else:
+            frame_size = struct.unpack(">I", body[pos + 4:pos + 8])[0]
+        data = body[pos + head_len:pos + head_len + frame_size]
+        pos += head_len + frame_size
+
+        if frame_id in (b"COMM", b"COM"):
+            if not info.get("comment"):
+                info["comment"] = _decode_id3_comment(data)
+            continue
+        key = _ID3_FRAMES.get(frame_id.decode("latin-1"))
+        if key and not info.get(key):
+            info[key] = _decode_id3_text(data)
+    return tag_size
+
+
+def _read_id3v1(f, file_size, info):
+    """Dosya sonundaki ID3v1 tag'ini oku; varsa True döndür"""
+    if file_size < 128:
+        return False
+    f.seek(file_size - 128)
+    tag = f.read(128)
+    if tag[:3] != b"TAG":
+        return False
+
+    def field(raw):
+        return raw.split(b"\x00")[0].decode("latin-1").strip()
+
+    for key, raw in (("title", tag[3:33]), ("artist", tag[33:63]),
+                     ("album", tag[63:93]), ("year", tag[93:97])):
+        if not info.get(key):
+            info[key] = field(raw) or None
+    return True
+
+
+def parse_mp3_frame_header(data):
+    """
+    4 baytlık MPEG ses frame başlığını çözer.
+    Geçerliyse version, layer, bitrate, sample_rate, channels,
+    samples_per_frame ve frame_length içeren sözlük, değilse None döner.
+    """
+    if len(data) < 4 or data[0] != 0xFF or (data[1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[1] >> 3) & 0x03
+    layer_bits = (data[1] >> 1) & 0x03
+    bitrate_idx = data[2] >> 4
+    rate_idx = (data[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+
+    version = {0: 2.5, 2: 2, 3: 1}[version_bits]
+    layer = 4 - layer_bits
+    table_version = 1 if version == 1 else 2
+    bitrate = _MP3_BITRATES[(table_version, layer)][bitrate_idx]
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_idx]
+    padding = (data[2] >> 1) & 0x01
+    channels = 1 if (data[3] >> 6) == 3 else 2
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if (layer == 2 or version == 1) else 576
+        frame_length = samples_per_frame // 8 * bitrate * 1000 // sample_rate + padding
+
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "samples_per_frame": samples_per_frame,
+        "frame_length": frame_length,
+    }
+
+
+def find_mp3_frame(f, start, file_size, search_limit=65536):
+    """
+    start offset'inden itibaren ilk geçerli MPEG frame'ini bul.
+    Yanlış pozitifleri elemek için bir sonraki frame'in de senkronu kontrol edilir.
+    (offset, header) veya (None, None) döner.
+    """
+    f.seek(start)
+    window = f.read(min(search_limit, max(0, file_size - start)))
+    pos = window.find(b"\xff")
+    while 0 <= pos < len(window) - 4:
+        header = parse_mp3_frame_header(window[pos:pos + 4])
+        if header and header["frame_length"] > 0:
+            next_pos = pos + header["frame_length"]
+            if next_pos + 4 > len(window) or parse_mp3_frame_header(window[next_pos:next_pos + 4]):
+                return start + pos, header
+        pos = window.find(b"\xff", pos + 1)
+    return None, None
+
+
+def _read_mp3(f, file_size, info):
+    """MP3 tag'lerini ve süresini oku (Xing/VBRI varsa frame sayısından)"""
+    audio_start = _read_id3v2_frames(f, info)
+    has_v1 = _read_id3v1(f, file_size, info)
+    audio_end = file_size - (128 if has_v1 else 0)
+
+    offset, header = find_mp3_frame(f, audio_start, file_size)
+    if header is None:
+        return
+    info["sample_rate"] = header["sample_rate"]
+    info["channels"] = header["channels"]
+
+    # Xing/Info ve VBRI başlıkları frame sayısını verir (VBR dosyalar için doğru süre)
+    f.seek(offset)
+    frame = f.read(min(header["frame_length"], 256))
+    if header["version"] == 1:
+        side_info = 17 if header["channels"] == 1 else 32
+    else:
+        side_info = 9 if header["channels"] == 1 else 17
+    frames = None
+    xing = frame[4 + side_info:4 + side_info + 12]
+    if xing[:4] in (b"Xing", b"Info") and len(xing) >= 12:
+        flags = struct.unpack(">I", xing[4:8])[0]
+        if flags & 0x01:
+            frames = struct.unpack(">I", xing[8:12])[0]
+    elif frame[36:40] == b"VBRI" and len(frame) >= 54:
+        frames = struct.unpack(">I", frame[50:54])[0]
+
+    if frames:
+        info["duration"] = frames * header["samples_per_frame"] / header["sample_rate"]
+        info["bitrate"] = int((audio_end - offset) * 8 / info["duration"] / 1000) if info["duration"] else None
+    else:
+        info["bitrate"] = header["bitrate"]
+        info["duration"] = (audio_end - offset) * 8 / (header["bitrate"] * 1000)
+
+    if not info["duration"] and info.get("length_ms"):
+        try:
+            info["duration"] = int(info["length_ms"]) / 1000
+        except ValueError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# MP4 / M4A
+# ---------------------------------------------------------------------------
+
+def iter_mp4_atoms(f, start, end):
+    """
+    [start, end) aralığındaki atom'ları gezer.
+    (atom_type, atom_offset, header_size, atom_size) üretir.
+    """
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield atom_type, pos, header_size, size
+        pos += size
+
+
+def find_mp4_atom(f, path, start, end):
+    """b'moov/udta/meta' gibi bir yol için atom'u bul; (offset, header_size, size) döner"""
+    parts = path.split(b"/")
+    for atom_type, offset, header_size, size in iter_mp4_atoms(f, start, end):
+        if atom_type != parts[0]:
+            continue
+        if len(parts) == 1:
+            return offset, header_size, size
+        child_start = offset + header_size + (4 if atom_type == b"meta" else 0)
+        return find_mp4_atom(f, b"/".join(parts[1:]), child_start, offset + size)
+    return None
+
+
+def _read_mp4(f, file_size, info):
+    """MP4 mvhd süresini ve ilst tag'lerini oku"""
+    moov = find_mp4_atom(f, b"moov", 0, file_size)
+    if moov is None:
+        return
+    moov_offset, moov_header, moov_size = moov
+    moov_end = moov_offset + moov_size
+
+    mvhd = find_mp4_atom(f, b"mvhd", moov_offset + moov_header, moov_end)
+    if mvhd:
+        f.seek(mvhd[0] + mvhd[1])
+        data = f.read(32)
+        if data[0] == 1:
+            timescale, duration = struct.unpack(">IQ", data[20:32])
+        else:
+            timescale, duration = struct.unpack(">II", data[12:20])
+        if timescale:
+            info["duration"] = duration / timescale
+
+    ilst = find_mp4_atom(f, b"udta/meta/ilst", moov_offset + moov_header, moov_end)
+    if ilst is None:
+        return
+    ilst_offset, ilst_header, ilst_size = ilst
+    for atom_type, offset, header_size, size in iter_mp4_atoms(f, ilst_offset + ilst_header, ilst_offset + ilst_size):
+        key = "track" if atom_type == b"trkn" else _MP4_ATOMS.get(atom_type)
+        if not key:
+            continue
+        data_atom = find_mp4_atom(f, b"data", offset + header_size, offset + size)
+        if data_atom is None:
+            continue
+        f.seek(data_atom[0] + data_atom[1] + 8)  # type indicator + locale
+        value = f.read(data_atom[2] - data_atom[1] - 8)
+        if key == "track":
+            # trkn ikilidir: 0 / parça / toplam (/ 0)
+            if len(value) >= 6:
+                number, total = struct.unpack(">HH", value[2:6])
+                info[key] = f"{number}/{total}" if total else str(number)
+            continue
+        info[key] = value.decode("utf-8", errors="replace").strip()
+
+    if not info.get("artist") and info.get("album_artist"):
+        info["artist"] = info["album_artist"]
+
+
+# ---------------------------------------------------------------------------
+# WAV / FLAC / OGG
+# ---------------------------------------------------------------------------
+
+def _read_wav(f, file_size, info):
+    """RIFF/WAVE fmt ve data chunk'larından süreyi hesapla"""
+    f.seek(12)
+    byte_rate = None
+    while f.tell() + 8 <= file_size:
+        chunk_id, chunk_size = struct.unpack("<4sI", f.read(8))
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            channels, sample_rate, byte_rate = struct.unpack("<HII", fmt[2:12])
+            info["sample_rate"] = sample_rate
+            info["channels"] = channels
+            info["bitrate"] = byte_rate * 8 // 1000
+            f.seek(chunk_size & 1, os.SEEK_CUR)
+            continue
+        if chunk_id == b"data" and byte_rate:
+            info["duration"] = min(chunk_size, file_size - f.tell()) / byte_rate
+            return
+        f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def _parse_vorbis_comments(data, info):
+    """Vorbis comment bloğunu (FLAC/OGG) çöz"""
+    try:
+        vendor_len = struct.unpack("<I", data[:4])[0]
+        pos = 4 + vendor_len
+        count = struct.unpack("<I", data[pos:pos + 4])[0]
+        pos += 4
+        for _ in range(count):
+            length = struct.unpack("<I", data[pos:pos + 4])[0]
+            pos += 4
+            entry = data[pos:pos + length].decode("utf-8", errors="replace")
+            pos += length
+            if "=" not in entry:
+                continue
+            name, value = entry.split("=", 1)
+            key = {"TITLE": "title", "ARTIST": "artist", "ALBUM": "album",
+                   "DATE": "year", "GENRE": "genre"}.get(name.upper())
+            if key and not info.get(key):
+                info[key] = value.strip()
+    except struct.error:
+        pass
+
+
+def _read_flac(f, info):
+    """FLAC STREAMINFO ve VORBIS_COMMENT metadata bloklarını oku"""
+    f.seek(4)
+    while True:
+        block_header = f.read(4)
+        if len(block_header) < 4:
+            return
+        is_last = block_header[0] & 0x80
+        block_type = block_header[0] & 0x7F
+        length = int.from_bytes(block_header[1:4], "big")
+        block = f.read(length)
+        if block_type == 0 and len(block) >= 18:
+            packed = int.from_bytes(block[10:18], "big")
+            sample_rate = packed >> 44
+            total_samples = packed & 0xFFFFFFFFF
+            info["sample_rate"] = sample_rate
+            info["channels"] = ((packed >> 41) & 0x07) + 1
+            if sample_rate:
+                info["duration"] = total_samples / sample_rate
+        elif block_type == 4:
+            _parse_vorbis_comments(block, info)
+        if is_last:
+            return
+
+
+def _read_ogg(f, file_size, info):
+    """OGG Vorbis/Opus: başlık paketinden örnekleme hızı, son sayfadan süre"""
+    head = f.read(65536)
+    sample_rate = None
+    pre_skip = 0
+    vorbis = head.find(b"\x01vorbis")
+    opus = head.find(b"OpusHead")
+    if vorbis >= 0:
+        sample_rate = struct.unpack("<I", head[vorbis + 12:vorbis + 16])[0]
+        comments = head.find(b"\x03vorbis")
+        if comments >= 0:
+            _parse_vorbis_comments(head[comments + 7:], info)
+    elif opus >= 0:
+        sample_rate = 48000
+        pre_skip = struct.unpack("<H", head[opus + 10:opus + 12])[0]
+        comments = head.find(b"OpusTags")
+        if comments >= 0:
+            _parse_vorbis_comments(head[comments + 8:], info)
+    if not sample_rate:
+        return
+    info["sample_rate"] = sample_rate
+
+    # Son OggS sayfasının granule position değeri toplam örnek sayısıdır
+    f.seek(max(0, file_size - 65536))
+    tail = f.read()
+    last = tail.rfind(b"OggS")
+    if last >= 0 and last + 14 <= len(tail):
+        granule = struct.unpack("<q", tail[last + 6:last + 14])[0]
+        if granule > 0:
+            info["duration"] = max(0, granule - pre_skip) / sample_rate
@@ -0,0 +1,609 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Tag Yazma Modülü - ID3v2.3 / ID3v1 ve MP4 (ilst) tag'leri ile kapak resmi
+Ses verisine dokunmadan, yeniden kodlama/mux yapmadan yazar:
+mevcut tag alanına (padding dahil) sığıyorsa yerinde üzerine yazılır;
+sığmıyorsa dosya bir kez, ileride yerinde yazmaya yetecek padding ile yeniden yazılır.
+"""
+import os
+import re
+import struct
+import tempfile
+import shutil
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from media_cache import break_hardlink
+from tag_utils import _decode_id3_text, read_id3v2_header, detect_container, find_mp4_atom, iter_mp4_atoms
+
+# Tag büyürken bırakılan boş alan (sonraki yazmalar yerinde olsun diye)
+DEFAULT_PADDING = 2048
+
+# Yazılan alan -> ID3v2.3 frame
+_ID3_WRITE_FRAMES = {
+    "title": "TIT2", "artist": "TPE1", "album": "TALB",
+    "year": "TYER", "genre": "TCON", "track": "TRCK",
+}
+
+# Yazılan alan -> MP4 ilst atom
+_MP4_WRITE_ATOMS = {
+    "title": b"\xa9nam", "artist": b"\xa9ART", "album": b"\xa9alb",
+    "year": b"\xa9day", "genre": b"\xa9gen", "comment": b"\xa9cmt",
+}
+
+# moov içinde alt atom'ları olan (konteyner) atom'lar
+_MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"udta", b"meta", b"ilst", b"edts", b"dinf"}
+
+
+class TagWriteError(Exception):
+    """Dosya türü desteklenmiyor veya tag yapısı bozuk"""
+
+
+def write_tags(path, tags, cover=None):
+    """
+    Dosyaya tag yaz. tags: title, artist, album, year, genre, comment, track
+    (None/boş alanlar yazılmaz) ve custom: {"REPLAYGAIN_TRACK_GAIN": ...}
+    (ID3 TXXX / MP4 '----' serbest alanları). cover: JPEG/PNG baytları.
+    Yazılmayan mevcut alanlar korunur. "inplace" veya "rewrite" döndürür.
+    Önbellekten hardlink'lenmiş dosya önce kendi kopyasına çevrilir: tag'ler
+    önbellek nesnesine ve aynı nesneye bağlı diğer kopyalara yazılmaz.
+    """
+    with open(path, "rb") as f:
+        container = detect_container(f.read(64))
+    if container in ("mp3", "mp4"):
+        break_hardlink(path)
+    if container == "mp3":
+        mode = write_id3v2(path, tags, cover)
+        if any(tags.get(key) for key in ("title", "artist", "album")):
+            write_id3v1(path, tags)
+        return mode
+    if container == "mp4":
+        return write_mp4_tags(path, tags, cover)
+    raise TagWriteError(f"Unsupported container for tagging: {container}")
+
+
+# ---------------------------------------------------------------------------
+# ID3v2.3 / ID3v1
+# ---------------------------------------------------------------------------
+
+def _encode_id3_text(text):
+    """ID3v2.3 metni: latin-1'e sığıyorsa encoding 0, yoksa BOM'lu UTF-16 (1)"""
+    try:
+        return b"\x00" + text.encode("latin-1")
+    except UnicodeEncodeError:
+        return b"\x01" + text.encode("utf-16")
+
+
+def _id3_frame(frame_id, payload):
+    return frame_id.encode("latin-1") + struct.pack(">IH", len(payload), 0) + payload
+
+
+def _image_mime(data):
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    return None
+
+
+def build_id3v2_frames(tags, cover=None):
+    """Yazılacak tag'lerden ID3v2.3 frame baytları ve frame id kümesi"""
+    frames = []
+    ids = set()
+    for key, frame_id in _ID3_WRITE_FRAMES.items():
+        value = tags.get(key)
+        if value:
+            frames.append(_id3_frame(frame_id, _encode_id3_text(str(value))))
+            ids.add(frame_id)
+    if tags.get("comment"):
+        # COMM: encoding + dil + boş kısa açıklama + metin
+        encoded = _encode_id3_text(str(tags["comment"]))
+        terminator = b"\x00\x00" if encoded[:1] == b"\x01" else b"\x00"
+        description = b"\xff\xfe" if encoded[:1] == b"\x01" else b""
+        frames.append(_id3_frame("COMM", encoded[:1] + b"eng" + description + terminator + encoded[1:]))
+        ids.add("COMM")
+    for name, value in (tags.get("custom") or {}).items():
+        # TXXX: encoding + açıklama + sonlandırıcı + değer
+        encoded = _encode_id3_text(f"{name}\x00{value}")
+        frames.append(_id3_frame("TXXX", encoded))
+        ids.add(f"TXXX:{name.upper()}")
+    mime = _image_mime(cover) if cover else None
+    if mime:
+        # APIC: encoding 0, mime, resim türü 3 (ön kapak), boş açıklama
+        frames.append(_id3_frame("APIC", b"\x00" + mime.encode("latin-1") + b"\x00\x03\x00" + cover))
+        ids.add("APIC")
+    return b"".join(frames), ids
+
+
+def _existing_id3v23_frames(f, skip_ids):
+    """
+    Mevcut ID3v2.3 tag'indeki, yeniden yazılmayan frame'leri (ör. TSSE, TLEN)
+    ham halde döndürür. TXXX frame'leri açıklamalarına göre ("TXXX:AD") ayrılır.
+    v2.2/v2.4 frame'leri farklı yapıda olduğu için korunmaz.
+    """
+    version, tag_size = read_id3v2_header(f)
+    if version != 3:
+        return b""
+    f.seek(0)
+    header = f.read(10)
+    if header[5] & 0x80:  # unsynchronisation - ham kopyalama güvenli değil
+        return b""
+    body = f.read(tag_size - 10)
+    pos = 0
+    if header[5] & 0x40 and len(body) >= 4:
+        pos = struct.unpack(">I", body[:4])[0] + 4
+    kept = []
+    while pos + 10 <= len(body):
+        frame_id = body[pos:pos + 4]
+        if not frame_id.strip(b"\x00") or not frame_id.isalnum():
+            break
+        frame_size = struct.unpack(">I", body[pos + 4:pos + 8])[0]
+        end = pos + 10 + frame_size
+        if end > len(body):
+            break
+        key = frame_id.decode("latin-1")
+        if key == "TXXX":
+            key = "TXXX:" + _decode_id3_text(body[pos + 10:end]).upper()
+        if key not in skip_ids:
+            kept.append(body[pos:end])
+        pos = end
+    return b"".join(kept)
+
+
+def _synchsafe_bytes(value):
+    return bytes([(value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F])
+
+
+def write_id3v2(path, tags, cover=None, padding=DEFAULT_PADDING):
+    """
+    ID3v2.3 tag'ini yaz. Yeni tag eski tag alanına sığıyorsa sadece o bölge
+    yerinde yazılır ("inplace"); sığmıyorsa ses verisi padding'li yeni tag'in
+    arkasına akış halinde kopyalanır ("rewrite").
+    """
+    new_frames, ids = build_id3v2_frames(tags, cover)
+    # Kapak verilmediyse mevcut APIC korunur
+    with open(path, "rb") as f:
+        _, old_size = read_id3v2_header(f)
+        frames = new_frames + _existing_id3v23_frames(f, ids)
+
+    if old_size and len(frames) + 10 <= old_size:
+        body = frames + bytes(old_size - 10 - len(frames))
+        with open(path, "r+b") as f:
+            f.write(b"ID3\x03\x00\x00" + _synchsafe_bytes(len(body)) + body)
+        return "inplace"
+
+    body = frames + bytes(padding)
+    tag = b"ID3\x03\x00\x00" + _synchsafe_bytes(len(body)) + body
+    _rewrite_with_prefix(path, tag, old_size)
+    return "rewrite"
+
+
+def _rewrite_with_prefix(path, prefix, skip_bytes):
+    """Dosyanın ilk skip_bytes baytını prefix ile değiştir (geçici dosya + atomik replace)"""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tag-", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+            out.write(prefix)
+            src.seek(skip_bytes)
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_id3v1(path, tags):
+    """Dosya sonundaki ID3v1 tag'ini yerinde güncelle (yoksa ekle)"""
+    def field(value, length):
+        return str(value or "").encode("latin-1", errors="replace")[:length].ljust(length, b"\x00")
+
+    tag = (b"TAG" + field(tags.get("title"), 30) + field(tags.get("artist"), 30) +
+           field(tags.get("album"), 30) + field(str(tags.get("year") or "")[:4], 4) +
+           field(tags.get("comment"), 30) + b"\xff")
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        if size >= 128:
+            f.seek(size - 128)
+            if f.read(3) == b"TAG":
+                f.seek(size - 128)
+                f.write(tag)
+                return
+        f.seek(0, os.SEEK_END)
+        f.write(tag)
+
+
+# ---------------------------------------------------------------------------
+# MP4 (ilst)
+# ---------------------------------------------------------------------------
+
+def _atom(atom_type, payload):
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+def build_ilst_items(tags, cover=None):
+    """ilst içindeki tag atom'ları (her biri 'data' alt atom'lu)"""
+    items = []
+    for key, atom_type in _MP4_WRITE_ATOMS.items():
+        value = tags.get(key)
+        if value:
+            # data: tür 1 (UTF-8) + locale 0
+            items.append(_atom(atom_type, _atom(b"data", struct.pack(">II", 1, 0) + str(value).encode("utf-8"))))
+    track = _track_numbers(tags.get("track"))
+    if track:
+        # trkn: tür 0 (ikili) + locale 0, 0 / parça / toplam / 0
+        items.append(_atom(b"trkn", _atom(b"data", struct.pack(">IIHHHH", 0, 0, 0, track[0], track[1], 0))))
+    mime = _image_mime(cover) if cover else None
+    if mime:
+        image_type = 13 if mime == "image/jpeg" else 14
+        items.append(_atom(b"covr", _atom(b"data", struct.pack(">II", image_type, 0) + cover)))
+    for name, value in (tags.get("custom") or {}).items():
+        # Serbest alan: ---- (mean: com.apple.iTunes, name, data)
+        items.append(_atom(b"----", _atom(b"mean", b"\x00" * 4 + b"com.apple.iTunes") +
+                           _atom(b"name", b"\x00" * 4 + name.encode("utf-8")) +
+                           _atom(b"data", struct.pack(">II", 1, 0) + str(value).encode("utf-8"))))
+    return items
+
+
+def _track_numbers(value):
+    """'3/12' veya '3' -> (3, 12) / (3, 0); geçersizse None"""
+    match = re.match(r"\s*(\d+)(?:\s*/\s*(\d+))?", str(value or ""))
+    if not match:
+        return None
+    return min(int(match.group(1)), 0xFFFF), min(int(match.group(2) or 0), 0xFFFF)
+
+
+def _ilst_item_key(data):
+    """ilst atom'unun ayırt edici anahtarı: tip, '----' için b'----:AD'"""
+    atom_type = data[4:8]
+    if atom_type != b"----":
+        return atom_type
+    pos = 8
+    while pos + 8 <= len(data):
+        size, child_type = struct.unpack(">I4s", data[pos:pos + 8])
+        if size < 8:
+            break
+        if child_type == b"name":
+            return b"----:" + data[pos + 12:pos + size].upper()
+        pos += size
+    return atom_type
+
+
+def _read_existing_ilst_items(f, ilst, replace_types):
+    """Mevcut ilst'de yeniden yazılmayan atom'lar (ham)"""
+    if ilst is None:
+        return []
+    offset, header_size, size = ilst
+    kept = []
+    for _, child_offset, _, child_size in iter_mp4_atoms(f, offset + header_size, offset + size):
+        f.seek(child_offset)
+        data = f.read(child_size)
+        if _ilst_item_key(data) not in replace_types:
+            kept.append(data)
+    return kept
+
+
+def write_mp4_tags(path, tags, cover=None, padding=DEFAULT_PADDING):
+    """
+    MP4/M4A ilst tag'lerini yaz. Yeni ilst, eskisi + hemen arkasındaki 'free'
+    atom'ları alanına sığıyorsa yerinde yazılır. Sığmıyorsa moov yeniden
+    oluşturulur (padding için 'free' atom eklenir) ve moov mdat'tan önceyse
+    stco/co64 chunk offset'leri kaydırılır.
+    """
+    items = build_ilst_items(tags, cover)
+    replace_types = {_ilst_item_key(item) for item in items}
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        moov = find_mp4_atom(f, b"moov", 0, size)
+        if moov is None:
+            raise TagWriteError("moov atom not found")
+        meta = find_mp4_atom(f, b"udta/meta", moov[0] + moov[1], moov[0] + moov[2])
+        ilst = find_mp4_atom(f, b"udta/meta/ilst", moov[0] + moov[1], moov[0] + moov[2])
+        items = items + _read_existing_ilst_items(f, ilst, replace_types)
+        new_ilst = _atom(b"ilst", b"".join(items))
+
+        if ilst is not None and meta is not None:
+            available = _ilst_space(f, ilst, meta[0] + meta[2])
+            remainder = available - len(new_ilst)
+            if remainder == 0 or remainder >= 8:
+                region = new_ilst + (_atom(b"free", bytes(remainder - 8)) if remainder else b"")
+                with open(path, "r+b") as out:
+                    out.seek(ilst[0])
+                    out.write(region)
+                return "inplace"
+
+        f.seek(moov[0])
+        moov_bytes = f.read(moov[2])
+        mdat_after_moov = any(atom_type == b"mdat" and offset > moov[0]
+                              for atom_type, offset, _, _ in iter_mp4_atoms(f, 0, size))
+
+    new_moov = _rebuild_moov(moov_bytes, new_ilst, padding)
+    delta = len(new_moov) - len(moov_bytes)
+    if mdat_after_moov and delta:
+        new_moov = _shift_chunk_offsets(new_moov, delta)
+    _rewrite_region(path, moov[0], moov[2], new_moov)
+    return "rewrite"
+
+
+def _ilst_space(f, ilst, meta_end):
+    """
+    ilst boyutu + meta içinde hemen ardından gelen 'free' atom'ların boyutu.
+    meta_end'de durulur: moov dışındaki (ör. +faststart'ın mdat önüne koyduğu)
+    'free' atom'ları ilst alanı değildir.
+    """
+    offset, _, size = ilst
+    available = size
+    position = offset + size
+    while position + 8 <= meta_end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        atom_size, atom_type = struct.unpack(">I4s", header)
+        if atom_type != b"free" or atom_size < 8 or position + atom_size > meta_end:
+            break
+        available += atom_size
+        position += atom_size
+    return available
+
+
+def _parse_atoms(data, start=0, end=None):
+    """Bellekteki atom'ları ağaca çevir: [tip, ön_ek, çocuklar veya ham veri]"""
+    end = len(data) if end is None else end
+    nodes = []
+    pos = start
+    while pos + 8 <= end:
+        size, atom_type = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise TagWriteError("Corrupt MP4 atom structure")
+        if atom_type in _MP4_CONTAINERS:
+            prefix_len = 4 if atom_type == b"meta" else 0
+            prefix = data[pos + header:pos + header + prefix_len]
+            nodes.append([atom_type, prefix, _parse_atoms(data, pos + header + prefix_len, pos + size)])
+        else:
+            nodes.append([atom_type, None, data[pos + header:pos + size]])
+        pos += size
+    return nodes
+
+
+def _serialize_atoms(nodes):
+    out = []
+    for atom_type, prefix, content in nodes:
+        if prefix is None:
+            payload = content
+        else:
+            payload = prefix + _serialize_atoms(content)
+        if len(payload) + 8 > 0xFFFFFFFF:
+            out.append(struct.pack(">I4sQ", 1, atom_type, len(payload) + 16) + payload)
+        else:
+            out.append(struct.pack(">I4s", len(payload) + 8, atom_type) + payload)
+    return b"".join(out)
+
+
+def _child(nodes, atom_type, factory):
+    for node in nodes:
+        if node[0] == atom_type:
+            return node
+    node = factory()
+    nodes.append(node)
+    return node
+
+
+def _rebuild_moov(moov_bytes, new_ilst, padding):
+    """moov'u yeni ilst ve padding ile yeniden oluştur (udta/meta yoksa eklenir)"""
+    tree = _parse_atoms(moov_bytes)
+    moov = tree[0]
+    udta = _child(moov[2], b"udta", lambda: [b"udta", b"", []])
+    meta = _child(udta[2], b"meta", lambda: [b"meta", b"\x00\x00\x00\x00", [
+        # iTunes meta handler (mdir/appl)
+        [b"hdlr", None, b"\x00" * 8 + b"mdirappl" + b"\x00" * 9],
+    ]])
+    children = meta[2]
+    # Eski ilst ve padding'i çıkar, yenisini padding ile ekle
+    children[:] = [node for node in children if node[0] not in (b"ilst", b"free")]
+    children.append([b"ilst", None, new_ilst[8:]])
+    if padding:
+        children.append([b"free", None, bytes(padding)])
+    return _serialize_atoms(tree)
+
+
+def _shift_chunk_offsets(moov_bytes, delta):
+    """moov içindeki tüm stco/co64 tablolarındaki chunk offset'lerine delta ekle"""
+    tree = _parse_atoms(moov_bytes)
+
+    def walk(nodes):
+        for node in nodes:
+            atom_type, prefix, content = node
+            if prefix is not None:
+                walk(content)
+            elif atom_type == b"stco":
+                count = struct.unpack(">I", content[4:8])[0]
+                offsets = struct.unpack(f">{count}I", content[8:8 + 4 * count])
+                node[2] = content[:8] + struct.pack(f">{count}I", *(o + delta for o in offsets))
+            elif atom_type == b"co64":
+                count = struct.unpack(">I", content[4:8])[0]
+                offsets = struct.unpack(f">{count}Q", content[8:8 + 8 * count])
+                node[2] = content[:8] + struct.pack(f">{count}Q", *(o + delta for o in offsets))
+    walk(tree)
+    return _serialize_atoms(tree)
+
+
+def _rewrite_region(path, offset, old_length, replacement):
+    """[offset, offset+old_length) bölgesini replacement ile değiştirerek dosyayı yeniden yaz"""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tag-", dir=folder)
+    try:
+        with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+            remaining = offset
+            while remaining > 0:
+                chunk = src.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                out.write(chunk)
+                remaining -= len(chunk)
+            out.write(replacement)
+            src.seek(offset + old_length)
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Metadata ve kapak
+# ---------------------------------------------------------------------------
+
+def tags_from_info(info, title=None):
+    """yt-dlp info sözlüğünden yazılacak tag'ler"""
+    artist = info.get("artist") or info.get("creator") or info.get("uploader") or ""
+    if artist.endswith(" - Topic"):
+        artist = artist[:-len(" - Topic")]
+    year = info.get("release_year") or (info.get("upload_date") or "")[:4] or None
+    genres = info.get("genres") or ([info["genre"]] if info.get("genre") else [])
+    return {
+        "title": info.get("track") or title or info.get("title"),
+        "artist": artist or None,
+        "album": info.get("album"),
+        "year": str(year) if year else None,
+        "genre": genres[0] if genres else None,
+        "comment": info.get("webpage_url"),
+    }
+
+
+def thumbnail_url(info):
+    """info'daki en uygun JPEG/PNG kapak adresi (webp ID3/MP4'te desteklenmez)"""
+    candidates = []
+    for thumb in info.get("thumbnails") or []:
+        url = thumb.get("url") or ""
+        if url.split("?")[0].lower().endswith((".jpg", ".jpeg", ".png")):
+            candidates.append(((thumb.get("preference") or 0), (thumb.get("width") or 0), url))
+    if candidates:
+        return max(candidates)[2]
+    url = info.get("thumbnail")
+    if url and url.split("?")[0].lower().endswith((".jpg", ".jpeg", ".png")):
+        return url
+    video_id = info.get("id")
+    return f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg" if video_id else None
+
+
+def fetch_cover(url, timeout=10, max_bytes=2 * 1024 * 1024):
+    """Kapak resmini indir; JPEG/PNG değilse veya hata olursa None"""
+    if not url:
+        return None
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            data = response.read(max_bytes + 1)
+    except (OSError, ValueError):
+        return None
+    if len(data) > max_bytes or not _image_mime(data):
+        return None
+    return data
+
+
+def tags_match(path, tags):
+    """
+    Dosyadaki tag'ler yazılacaklarla aynı mı? (gereksiz yazmaları atlamak için)
+    tags_from_record'un tüm alanları karşılaştırılır; okunamayan özel (TXXX /
+    ----) alanlar yazılacaksa eşleşme sayılmaz.
+    """
+    from tag_utils import read_audio_metadata
+    if tags.get("custom"):
+        return False
+    try:
+        current = read_audio_metadata(path)
+    except OSError:
+        return False
+    for key in ("title", "artist", "album", "year", "genre", "comment"):
+        if tags.get(key) and str(tags[key]) != (current.get(key) or ""):
+            return False
+    if tags.get("track") and _track_numbers(tags["track"]) != _track_numbers(current.get("track")):
+        return False
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Toplu yeniden tag'leme
+# ---------------------------------------------------------------------------
+
+def tags_from_record(record):
+    """history["library"] kaydından yazılacak tag'ler"""
+    return {
+        "title": record.get("title"),
+        "artist": record.get("artist"),
+        "album": record.get("album"),
+        "year": record.get("year"),
+        "genre": record.get("genre"),
+        "track": record.get("track"),
+        "comment": record.get("url"),
+    }
+
+
+def _retag_one(full_path, record, embed_covers):
+    """Tek dosya: 'unchanged' / 'inplace' / 'rewrite' / 'skipped' / 'failed'"""
+    tags = tags_from_record(record)
+    if not tags["title"]:
+        return "skipped"
+    if not embed_covers and tags_match(full_path, tags):
+        return "unchanged"
+    cover = fetch_cover(record.get("thumbnail")) if embed_covers else None
+    try:
+        return write_tags(full_path, tags, cover)
+    except TagWriteError:
+        return "skipped"
+    except OSError:
+        return "failed"
+
+
+def retag_library(music_folder=None, embed_covers=False, max_workers=None, progress_callback=None):
+    """
+    Kütüphanedeki (history["library"]) tüm MP3/M4A dosyalarının tag'lerini
+    kayıtlardaki metadata ile güncelle. Tag'leri zaten aynı olan dosyalara
+    yazılmaz. Yazılan dosyaların size/mtime değerleri kayıtlarda güncellenir,
+    böylece sonraki tarama bu dosyaları yeniden okumaz.
+
+    progress_callback(done, total): her dosyadan sonra çağrılır.
+    Özet sözlük döndürür: {"total", "inplace", "rewrite", "unchanged", "skipped", "failed"}
+    """
+    from history_utils import load_history, save_history, get_music_folder, HISTORY_LOCK
+    from scanner_module import default_worker_count
+
+    music_folder = music_folder or get_music_folder()
+    library = load_history().get("library", {})
+    jobs = []
+    for rel_path, record in library.items():
+        full_path = os.path.join(music_folder, *rel_path.split("/"))
+        if os.path.splitext(rel_path)[1].lower() in (".mp3", ".m4a", ".mp4") and os.path.isfile(full_path):
+            jobs.append((rel_path, full_path, record))
+
+    summary = {"total": len(jobs), "inplace": 0, "rewrite": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    written = {}
+    with ThreadPoolExecutor(max_workers=max_workers or default_worker_count()) as executor:
+        futures = [(rel_path, full_path, executor.submit(_retag_one, full_path, record, embed_covers))
+                   for rel_path, full_path, record in jobs]
+        for done, (rel_path, full_path, future) in enumerate(futures, 1):
+            result = future.result()
+            summary[result] += 1
+            if result in ("inplace", "rewrite"):
+                stat = os.stat(full_path)
+                written[rel_path] = {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+            if progress_callback:
+                progress_callback(done, len(jobs))
+
+    if written:
+        with HISTORY_LOCK:
+            history = load_history()
+            for rel_path, values in written.items():
+                if rel_path in history.get("library", {}):
+                    history["library"][rel_path].update(values)
+            save_history(history)
+    return summary
@@ -0,0 +1,181 @@
+﻿# -*- coding: utf-8 -*-
+"""
+İş İzleme (Tracing) Modülü
+Her indirme/dönüştürme işinin aşamalarını süre, bayt, hız ve hata sınıfı ile
+JSONL dosyasına yazar; özet için aşama başına p50/p95 hesaplar.
+"""
+import os
+import json
+import math
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from history_utils import get_data_dir
+
+TRACE_FOLDER = "traces"
+TRACE_FILE = "download_trace.jsonl"
+
+_write_lock = threading.Lock()
+
+
+def get_trace_file():
+    """Varsayılan trace dosyasının tam yolu (veri klasörü altında)"""
+    return os.path.join(get_data_dir(), TRACE_FOLDER, TRACE_FILE)
+
+
+class JobTrace:
+    """
+    Tek bir işin aşama kayıtları.
+    Her aşama ve iş sonu ayrı bir JSONL satırı olarak yazılır; satırlar job_id ile bağlanır.
+    """
+    def __init__(self, job_type, url=None, trace_file=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.job_type = job_type
+        self.url = url
+        self.trace_file = trace_file or get_trace_file()
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.phases = []
+        self.finished = False
+
+    @contextmanager
+    def phase(self, name, **fields):
+        """
+        Bir aşamayı ölç. Aşama içinde record["bytes"] gibi alanlar doldurulabilir:
+
+            with trace.phase("download") as record:
+                record["bytes"] = 1234
+        """
+        record = dict(fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error_class"] = type(e).__name__
+            record["error"] = str(e)[:200]
+            raise
+        finally:
+            self.add_phase(name, time.perf_counter() - start, **record)
+
+    def add_phase(self, name, duration, **fields):
+        """Dışarıda (ör. yt-dlp hook'larıyla) ölçülmüş bir aşamayı kaydet"""
+        record = {
+            "type": "phase",
+            "job_id": self.job_id,
+            "job_type": self.job_type,
+            "phase": name,
+            "duration_s": round(duration, 4),
+        }
+        record.update({k: v for k, v in fields.items() if v is not None})
+        if record.get("bytes") and duration > 0:
+            record["throughput_bps"] = round(record["bytes"] / duration)
+        self.phases.append(record)
+        write_trace_record(record, self.trace_file)
+
+    def finish(self, status, error=None):
+        """İşi sonlandır ve özet satırını yaz (birden fazla çağrıda sadece ilki yazılır)"""
+        if self.finished:
+            return
+        self.finished = True
+        record = {
+            "type": "job",
+            "job_id": self.job_id,
+            "job_type": self.job_type,
+            "url": self.url,
+            "started_at": self.started_at,
+            "status": status,
+            "duration_s": round(time.perf_counter() - self.started, 4),
+            "phase_count": len(self.phases),
+        }
+        if error is not None:
+            record["error_class"] = type(error).__name__ if isinstance(error, BaseException) else "Error"
+            record["error"] = str(error)[:200]
+        write_trace_record(record, self.trace_file)
+
+
+def write_trace_record(record, trace_file=None):
+    """Tek bir JSONL satırı ekle (thread-safe)"""
+    trace_file = trace_file or get_trace_file()
+    try:
+        os.makedirs(os.path.dirname(trace_file), exist_ok=True)
+        line = json.dumps(record, ensure_ascii=False)
+        with _write_lock:
+            with open(trace_file, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError:
+        pass
+
+
+def percentile(sorted_values, fraction):
+    """Sıralı listede en yakın-sıra yüzdelik değeri"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_trace(trace_file=None):
+    """
+    Trace dosyasını okuyup aşama başına özet çıkar:
+    count, p50/p95/max süre, toplam bayt, ortalama hız, hata sınıfları.
+    """
+    trace_file = trace_file or get_trace_file()
+    phases = {}
+    jobs = {"count": 0, "status": {}, "durations": []}
+
+    if not os.path.exists(trace_file):
+        return {"phases": {}, "jobs": jobs}
+
+    with open(trace_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("type") == "job":
+                jobs["count"] += 1
+                jobs["status"][record.get("status")] = jobs["status"].get(record.get("status"), 0) + 1
+                jobs["durations"].append(record.get("duration_s", 0))
+                continue
+            name = f"{record.get('job_type')}.{record.get('phase')}"
+            stats = phases.setdefault(name, {"durations": [], "bytes": 0, "errors": {}})
+            stats["durations"].append(record.get("duration_s", 0))
+            stats["bytes"] += record.get("bytes") or 0
+            if record.get("error_class"):
+                stats["errors"][record["error_class"]] = stats["errors"].get(record["error_class"], 0) + 1
+
+    summary = {}
+    for name, stats in phases.items():
+        durations = sorted(stats["durations"])
+        total_time = sum(durations)
+        summary[name] = {
+            "count": len(durations),
+            "p50_s": percentile(durations, 0.50),
+            "p95_s": percentile(durations, 0.95),
+            "max_s": durations[-1],
+            "total_s": total_time,
+            "bytes": stats["bytes"],
+            "throughput_bps": stats["bytes"] / total_time if stats["bytes"] and total_time else None,
+            "errors": stats["errors"],
+        }
+
+    job_durations = sorted(jobs.pop("durations"))
+    jobs["p50_s"] = percentile(job_durations, 0.50)
+    jobs["p95_s"] = percentile(job_durations, 0.95)
+    return {"phases": summary, "jobs": jobs}
+
+
+def print_trace_summary(summary):
+    """Özeti tablo halinde yazdır"""
+    jobs = summary["jobs"]
+    print(f"📊 Jobs: {jobs['count']}  status: {jobs['status']}")
+    if jobs["count"]:
+        print(f"   Job duration p50: {jobs['p50_s']:.2f}s  p95: {jobs['p95_s']:.2f}s")
+    print(f"{'phase':<28} {'count':>6} {'p50 s':>9} {'p95 s':>9} {'max s':>9} {'MB/s':>8}  errors")
+    for name, stats in sorted(summary["phases"].items()):
+        speed = f"{stats['throughput_bps'] / 1024 / 1024:.2f}" if stats["throughput_bps"] else "-"
+        errors = ", ".join(f"{k}={v}" for k, v in stats["errors"].items()) or "-"
+        print(f"{name:<28} {stats['count']:>6} {stats['p50_s']:>9.3f} {stats['p95_s']:>9.3f} "
+              f"{stats['max_s']:>9.3f} {speed:>8}  {errors}")
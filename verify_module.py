@@ -0,0 +1,457 @@
+﻿# -*- coding: utf-8 -*-
+"""
+Kütüphane Bütünlük Denetimi - yarım kalmış, bozuk veya yanlış uzantılı
+dosyaları bulur (ör. yarıda kesilen indirme, MP3'e dönüştürülmeden .mp3
+adı verilmiş M4A).
+
+Her dosya bir süreç havuzunda mmap ile açılır:
+  - SHA-256 özeti mmap üzerinden hesaplanır (kopyasız, büyük parçalar)
+  - başlıktaki gerçek konteyner uzantıyla karşılaştırılır -> "mislabeled"
+  - yapı denetimi: MP3 frame senkronu (tüm frame zinciri, Xing frame sayısı),
+    MP4 atom zinciri ve moov, WAV RIFF/data boyutları, OGG son sayfası
+    -> "truncated" / "corrupt"
+  - dosya tarandığından beri küçüldüyse süre, kayıttaki (taranmış) süreyle
+    karşılaştırılır -> "truncated"
+  - boyut ve mtime aynı kalıp özet değiştiyse (disk hatası) -> "corrupt"
+Özet ve durum history["library"] kayıtlarına yazılır ("checksum", "integrity",
+"verified"). Süreç havuzu özet ve frame zinciri için tek çekirdeği değil
+diski doyurur; dönen disklerde --workers 1-2 daha hızlıdır.
+
+requeue_problems: sorunlu dosyalar veri klasöründeki quarantine/ altına
+taşınır ve kaynak URL'si bilinenler JobManager ile yeniden indirilir.
+"""
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from log_utils import debug_print
+from scanner_module import iter_audio_entries
+from tag_utils import detect_container, parse_mp3_frame_header, read_stream_metadata
+
+STATUSES = ("ok", "mislabeled", "truncated", "corrupt", "unreadable")
+QUARANTINE_DIR = "quarantine"
+# Özet hesaplamada mmap'ten tek seferde verilen parça
+HASH_CHUNK = 8 * 1024 * 1024
+# Aynı anda kuyrukta bekleyen en fazla dosya (bellek sınırı)
+MAX_IN_FLIGHT = 256
+# Frame arama penceresi (ID3 sonrası dolgu / senkron kaybı sonrası)
+SYNC_SEARCH = 65536
+# Son frame'den sonra yok sayılan tanınmayan bayt (kodlayıcı artıkları)
+TAIL_SLACK = 1024
+# Kayıttaki süreden bu kadar (veya %2) kısa dosya yarım sayılır
+DURATION_TOLERANCE = 2.0
+
+# Uzantı -> beklenen konteyner (listede olmayanlar, ör. .wma/.aac, sadece özetlenir)
+EXTENSION_CONTAINERS = {
+    ".mp3": "mp3", ".m4a": "mp4", ".mp4": "mp4", ".wav": "wav", ".flac": "flac",
+    ".ogg": "ogg", ".opus": "ogg", ".webm": "webm",
+}
+
+# Yeniden indirmede kullanılacak GUI format etiketi
+_REQUEUE_LABELS = {".m4a": "M4A - Mobile", ".mp4": "M4A - Mobile", ".wav": "WAV - Lossless"}
+_MP3_LABELS = ((320, "MP3 (320k) - High Quality"), (192, "MP3 (192k) - Good Quality"),
+               (0, "MP3 (128k) - Car Compatible"))
+
+
+def default_process_count():
+    """Özet hesaplama CPU'da, okuma diskte: çekirdek sayısı (en fazla 8)"""
+    return min(8, os.cpu_count() or 1)
+
+
+def mmap_digest(mm):
+    """mmap'lenmiş dosyanın SHA-256 özeti (parçalar kopyalanmadan hashlib'e verilir)"""
+    digest = hashlib.sha256()
+    with memoryview(mm) as view:
+        for offset in range(0, len(view), HASH_CHUNK):
+            digest.update(view[offset:offset + HASH_CHUNK])
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Yapı denetimleri: (durum, açıklama, süre) döndürür
+# ---------------------------------------------------------------------------
+
+def _mp3_audio_range(mm, size):
+    """ID3v2 başlığı ve ID3v1/APE son tag'leri hariç ses verisinin [başlangıç, bitiş) aralığı"""
+    start = 0
+    if size >= 10 and mm[:3] == b"ID3":
+        start = 10 + ((mm[6] & 0x7F) << 21 | (mm[7] & 0x7F) << 14 | (mm[8] & 0x7F) << 7 | (mm[9] & 0x7F))
+        if mm[5] & 0x10:
+            start += 10
+    end = size
+    if end - start >= 128 and mm[end - 128:end - 125] == b"TAG":
+        end -= 128
+    if end - start >= 32 and mm[end - 32:end - 24] == b"APETAGEX":
+        tag_size, _, flags = struct.unpack_from("<III", mm, end - 20)
+        end -= tag_size + (32 if flags & 0x80000000 else 0)
+    return min(start, size), max(end, 0)
+
+
+def _find_frame(mm, start, end):
+    """start'tan itibaren (bir sonrakiyle doğrulanmış) ilk geçerli frame; (offset, header) veya (None, None)"""
+    limit = min(end, start + SYNC_SEARCH)
+    pos = mm.find(b"\xff", start, limit)
+    while pos != -1 and pos + 4 <= end:
+        header = parse_mp3_frame_header(mm[pos:pos + 4])
+        if header and header["frame_length"] > 0:
+            next_pos = pos + header["frame_length"]
+            if next_pos + 4 > end or parse_mp3_frame_header(mm[next_pos:next_pos + 4]):
+                return pos, header
+        pos = mm.find(b"\xff", pos + 1, limit)
+    return None, None
+
+
+def _xing_frames(mm, offset, header):
+    """İlk frame'deki Xing/Info başlığının frame sayısı (yoksa None)"""
+    if header["version"] == 1:
+        side_info = 17 if header["channels"] == 1 else 32
+    else:
+        side_info = 9 if header["channels"] == 1 else 17
+    tag = offset + 4 + side_info
+    if tag + 12 > len(mm) or mm[tag:tag + 4] not in (b"Xing", b"Info"):
+        return None
+    flags, frames = struct.unpack_from(">II", mm, tag + 4)
+    return frames if flags & 0x01 else None
+
+
+def _check_mp3(mm, size):
+    """Tüm frame zincirini gez: senkron kaybı, yarım son frame, eksik frame"""
+    start, end = _mp3_audio_range(mm, size)
+    offset, first = _find_frame(mm, start, end)
+    if first is None:
+        return "corrupt", "no MPEG audio frames", None
+
+    # Frame başlıkları dosya boyunca birkaç farklı değer alır: uzunluklar önbelleklenir
+    lengths = {}
+    pos, frames, sync_losses, damaged = offset, 0, 0, 0
+    while pos + 4 <= end:
+        raw = mm[pos:pos + 4]
+        length = lengths.get(raw)
+        if length is None:
+            header = parse_mp3_frame_header(raw)
+            length = lengths[raw] = header["frame_length"] if header else 0
+        if length > 0:
+            frames += 1
+            pos += length
+            continue
+        next_pos, _ = _find_frame(mm, pos + 1, end)
+        if next_pos is None:
+            break
+        sync_losses += 1
+        damaged += next_pos - pos
+        pos = next_pos
+
+    xing = _xing_frames(mm, offset, first)
+    audio_frames = frames - 1 if xing is not None else frames
+    duration = audio_frames * first["samples_per_frame"] / first["sample_rate"]
+    if pos > end:
+        return "truncated", f"last frame cut short ({pos - end} bytes missing)", duration
+    tail = mm[pos:end] if pos < end else b""
+    if len(tail) >= 4 and not tail.strip(b"\0"):
+        return "truncated", f"audio ends in {len(tail)} zero bytes", duration
+    if xing and audio_frames < xing - 1:
+        return "truncated", f"{audio_frames} of {xing} frames present", duration
+    if sync_losses:
+        return "corrupt", f"frame sync lost {sync_losses} time(s), {damaged} bytes damaged", duration
+    if len(tail) > TAIL_SLACK:
+        return "corrupt", f"{len(tail)} bytes of non-audio data after the last frame", duration
+    return "ok", "", duration
+
+
+def _check_mp4(mm, size):
+    """Üst düzey atom zinciri dosya sonunda tam bitmeli; moov (indeks) ve medya verisi olmalı"""
+    pos, atoms = 0, set()
+    while pos + 8 <= size:
+        atom_size, atom_type = struct.unpack_from(">I4s", mm, pos)
+        header_size = 8
+        if atom_size == 1:
+            if pos + 16 > size:
+                break
+            atom_size = struct.unpack_from(">Q", mm, pos + 8)[0]
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - pos
+        name = atom_type.decode("latin-1")
+        if atom_size < header_size:
+            return "corrupt", f"invalid '{name}' atom size at offset {pos}", None
+        if pos + atom_size > size:
+            return "truncated", f"'{name}' atom cut short ({pos + atom_size - size} bytes missing)", None
+        atoms.add(atom_type)
+        pos += atom_size
+    if pos < size:
+        return "truncated", f"partial atom header at offset {pos}", None
+    if b"moov" not in atoms:
+        return ("truncated" if b"mdat" in atoms else "corrupt"), "no 'moov' atom (index missing)", None
+    if b"mdat" not in atoms and b"moof" not in atoms:
+        return "corrupt", "no media data ('mdat')", None
+    return "ok", "", None
+
+
+def _check_wav(mm, size):
+    """RIFF ve data chunk boyutları dosyaya sığmalı (0 / 0xFFFFFFFF: akıştan yazılmış, bilinmiyor)"""
+    unknown = (0, 0xFFFFFFFF)
+    riff_size = struct.unpack_from("<I", mm, 4)[0]
+    if riff_size not in unknown and riff_size + 8 > size:
+        return "truncated", f"RIFF header declares {riff_size + 8} bytes, file has {size}", None
+    pos = 12
+    while pos + 8 <= size:
+        chunk_id, chunk_size = struct.unpack_from("<4sI", mm, pos)
+        if chunk_id == b"data":
+            if chunk_size not in unknown and pos + 8 + chunk_size > size:
+                return "truncated", f"data chunk cut short ({pos + 8 + chunk_size - size} bytes missing)", None
+            return "ok", "", None
+        pos += 8 + chunk_size + (chunk_size & 1)
+    return "corrupt", "no data chunk", None
+
+
+def _check_ogg(mm, size):
+    """Son Ogg sayfası dosya sonunda tam bitmeli ve akış sonu (EOS) işaretli olmalı"""
+    last = mm.rfind(b"OggS", max(0, size - SYNC_SEARCH))
+    if last < 0:
+        return "truncated", "no Ogg page near the end", None
+    if last + 27 > size or last + 27 + mm[last + 26] > size:
+        return "truncated", "last Ogg page header cut short", None
+    segments = mm[last + 26]
+    page_end = last + 27 + segments + sum(mm[last + 27:last + 27 + segments])
+    if page_end > size:
+        return "truncated", f"last Ogg page cut short ({page_end - size} bytes missing)", None
+    if not mm[last + 5] & 0x04:
+        return "truncated", "stream has no end-of-stream page", None
+    return "ok", "", None
+
+
+_CHECKERS = {"mp3": _check_mp3, "mp4": _check_mp4, "wav": _check_wav, "ogg": _check_ogg}
+
+
+def check_structure(mm, size, ext):
+    """Konteyner ve yapı denetimi; (durum, açıklama, konteyner, süre) döndürür"""
+    container = detect_container(mm[:64])
+    expected = EXTENSION_CONTAINERS.get(ext)
+    if container == "unknown":
+        if not expected:
+            return "ok", "", container, None
+        detail = "unrecognized header (all zeros)" if not mm[:64].strip(b"\0") else "unrecognized header"
+        return "corrupt", detail, container, None
+
+    checker = _CHECKERS.get(container)
+    status, detail, duration = checker(mm, size) if checker else ("ok", "", None)
+    if duration is None:
+        try:
+            duration = read_stream_metadata(mm, size).get("duration")
+        except Exception:
+            duration = None
+    if expected and container != expected:
+        mismatch = f"{ext} file contains {container} data"
+        if status == "ok":
+            status, detail = "mislabeled", mismatch
+        else:
+            detail = f"{detail}; {mismatch}"
+    return status, detail, container, duration
+
+
+def verify_file(rel_path, full_path, expected=None):
+    """
+    Tek dosyanın denetimi (süreç havuzunda çalışır).
+    expected: kütüphane kaydından {"size", "duration", "checksum"} (varsa).
+    Sonuç: {"path", "status", "detail", "container", "duration", "sha256", "size", "mtime"}
+    """
+    expected = expected or {}
+    result = {"path": rel_path, "status": "ok", "detail": "", "container": None, "duration": None,
+              "sha256": None, "size": 0, "mtime": 0}
+    try:
+        with open(full_path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            size = result["size"] = stat.st_size
+            result["mtime"] = int(stat.st_mtime)
+            if not size:
+                result.update(status="truncated", detail="empty file", sha256=hashlib.sha256().hexdigest())
+                return result
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                result["sha256"] = mmap_digest(mm)
+                status, detail, container, duration = check_structure(mm, size, os.path.splitext(rel_path)[1].lower())
+    except (OSError, ValueError) as e:
+        result.update(status="unreadable", detail=str(e)[:200])
+        return result
+    result.update(status=status, detail=detail, container=container,
+                  duration=round(duration, 2) if duration else None)
+
+    checksum = expected.get("checksum") or {}
+    if (checksum.get("size") == size and checksum.get("mtime") == result["mtime"]
+            and checksum.get("sha256") not in (None, result["sha256"])):
+        result.update(status="corrupt", detail="content changed but size and mtime did not (disk error?)")
+    recorded = expected.get("duration")
+    if (result["status"] == "ok" and recorded and duration and expected.get("size") and size < expected["size"]
+            and recorded - duration > max(DURATION_TOLERANCE, recorded * 0.02)):
+        result.update(status="truncated", detail=f"{duration:.1f}s left of {recorded:.1f}s recorded at scan")
+    return result
+
+
+def verify_library(music_folder=None, max_workers=None, changed_only=False, record=True,
+                   progress_callback=None, stop_event=None):
+    """
+    Music klasöründeki tüm ses dosyalarını denetler.
+
+    changed_only: son denetimde sağlam bulunan ve o zamandan beri boyutu/mtime'ı
+                  değişmemiş dosyalar atlanır (sessiz disk bozulması aranmaz).
+    record: sonuçları history["library"] kayıtlarına yaz.
+    progress_callback(checked, found, current_path): en fazla ~10 kez/saniye çağrılır.
+    stop_event: set edilirse denetim yarıda bırakılır (bitenler yine kaydedilir).
+
+    Özet sözlük döndürür: {"total", "checked", "skipped", "bytes", "recorded", "problems",
+    ve her durum için sayı}; problems sağlam olmayan dosyaların sonuçlarıdır.
+    """
+    from history_utils import load_history, get_music_folder
+
+    music_folder = music_folder or get_music_folder()
+    library = load_history().get("library", {})
+    summary = {"total": 0, "checked": 0, "skipped": 0, "bytes": 0, "recorded": 0, "problems": [],
+               **{status: 0 for status in STATUSES}}
+    results = []
+    pending = set()
+    last_report = 0.0
+
+    def report(current_path, force=False):
+        nonlocal last_report
+        if not progress_callback:
+            return
+        now = time.monotonic()
+        if force or now - last_report >= 0.1:
+            last_report = now
+            progress_callback(summary["checked"], summary["total"], current_path)
+
+    def collect(done):
+        for future in done:
+            result = future.result()
+            results.append(result)
+            summary["checked"] += 1
+            summary["bytes"] += result["size"]
+            summary[result["status"]] += 1
+            if result["status"] != "ok":
+                summary["problems"].append(result)
+            report(result["path"])
+
+    with ProcessPoolExecutor(max_workers=max_workers or default_process_count()) as executor:
+        for rel_path, full_path, stat in iter_audio_entries(music_folder):
+            if stop_event is not None and stop_event.is_set():
+                break
+            summary["total"] += 1
+            known = library.get(rel_path) or {}
+            checksum = known.get("checksum") or {}
+            if (changed_only and known.get("integrity") == "ok" and checksum.get("size") == stat.st_size
+                    and checksum.get("mtime") == int(stat.st_mtime)):
+                summary["skipped"] += 1
+                continue
+
+            expected = {key: known[key] for key in ("size", "duration", "checksum") if known.get(key)}
+            pending.add(executor.submit(verify_file, rel_path, full_path, expected))
+            if len(pending) >= MAX_IN_FLIGHT:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        if stop_event is not None and stop_event.is_set():
+            for future in pending:
+                future.cancel()
+            pending = {f for f in pending if not f.cancelled()}
+        done, _ = wait(pending)
+        collect(done)
+
+    report("", force=True)
+    if record and results:
+        summary["recorded"] = record_results(results)
+    summary["problems"].sort(key=lambda result: result["path"])
+    for problem in summary["problems"]:
+        debug_print(f"🩺 {problem['status']}: {problem['path']} - {problem['detail']}", "DEBUG")
+    return summary
+
+
+def record_results(results):
+    """
+    Özet ve durumları history["library"] kayıtlarına yaz (sadece kayıtlı dosyalar).
+    Aynı boyut/mtime için kaydedilmiş özet korunur: bozulmuş içeriğin özeti
+    sağlam özetin yerine geçmez. Güncellenen kayıt sayısını döndürür.
+    """
+    from history_utils import load_history, save_history, HISTORY_LOCK
+
+    now = int(time.time())
+    updated = 0
+    with HISTORY_LOCK:
+        history = load_history()
+        library = history.get("library", {})
+        for result in results:
+            entry = library.get(result["path"])
+            if entry is None or result["status"] == "unreadable":
+                continue
+            entry["integrity"] = result["status"]
+            entry["verified"] = now
+            checksum = entry.get("checksum") or {}
+            if checksum.get("size") != result["size"] or checksum.get("mtime") != result["mtime"]:
+                entry["checksum"] = {"sha256": result["sha256"], "size": result["size"], "mtime": result["mtime"]}
+            updated += 1
+        if updated:
+            save_history(history)
+    return updated
+
+
+def requeue_format(record):
+    """Kütüphane kaydı -> yeniden indirmede kullanılacak GUI format etiketi"""
+    ext = os.path.splitext(record["path"])[1].lower()
+    if ext in _REQUEUE_LABELS:
+        return _REQUEUE_LABELS[ext]
+    bitrate = record.get("bitrate") or 0
+    return next(label for minimum, label in _MP3_LABELS if bitrate >= minimum)
+
+
+def requeue_problems(problems, manager, music_folder=None):
+    """
+    Sorunlu dosyaları veri klasöründeki quarantine/ altına taşı (silinmez) ve
+    kaydında kaynak URL'si olanları manager'a (JobManager) yeniden indirme işi
+    olarak ver. Bölüm parçaları için video bir kez, bölümlere ayrılarak indirilir.
+    Önbellekte aynı içerikli (bozuk) nesne varsa düşürülür, yoksa iş onu geri bağlardı.
+    (işler, atlanan göreli yollar) döndürür.
+    """
+    from history_utils import load_history, save_history, get_data_dir, get_music_folder, HISTORY_LOCK
+    from media_cache import get_media_cache, CACHE_DIR
+
+    music_folder = music_folder or manager.music_folder or get_music_folder()
+    quarantine = os.path.join(get_data_dir(), QUARANTINE_DIR)
+    cache = get_media_cache() if os.path.isdir(os.path.join(get_data_dir(), CACHE_DIR)) else None
+    requests = {}
+    skipped = []
+    with HISTORY_LOCK:
+        history = load_history()
+        library = history.get("library", {})
+        for problem in problems:
+            record = library.get(problem["path"])
+            url = record.get("url") if record else None
+            if not url:
+                skipped.append(problem["path"])
+                continue
+            parts = problem["path"].split("/")
+            destination = os.path.join(quarantine, *parts)
+            try:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                if os.path.exists(destination):
+                    os.remove(destination)
+                shutil.move(os.path.join(music_folder, *parts), destination)
+            except OSError as e:
+                debug_print(f"⚠️ Could not move {problem['path']} to quarantine: {e}", "WARNING")
+                skipped.append(problem["path"])
+                continue
+            if cache and problem.get("sha256"):
+                cache.forget_digest(problem["sha256"])
+            del library[problem["path"]]
+            options = {"split_chapters": True} if record.get("chapter_start") is not None else {}
+            requests.setdefault(url, (requeue_format(record), options))
+        if len(skipped) < len(problems):
+            save_history(history)
+
+    jobs = []
+    for url, (label, options) in requests.items():
+        jobs.extend(manager.submit(url, label, client="verify", expand=False, **options))
+    debug_print(f"🔁 {len(jobs)} re-download(s) queued, {len(skipped)} file(s) without a source URL", "INFO")
+    return jobs, skipped